@@ -0,0 +1,403 @@
+"""
+Model Artifact Benchmark
+
+Measures what each model generation costs to serve, next to how well it
+scores, so choosing between generations takes production cost into account:
+
+- MLT/ml: US_Accidents_Predictor_Model_<timestamp> generations, once per
+  artifact format they ship in (joblib; flat / native after convert_artifacts.py)
+- MLT/ml_final: US_Accidents_MODEL_<timestamp> pipelines (the shadow
+  candidate, see models/shadow.py)
+
+Each generation and format is measured in a fresh Python process, loaded by
+the same code that serves it (SafeStridePredictor / FinalModelPipeline), so
+import and unpickling costs count as they do for a new worker:
+
+- disk: size of the files the format loads
+- load_ms: time to load the artifacts, imports included
+- rss_mb: resident memory added by loading, and the process total after one
+  prediction
+- single-row latency (p50 / p90 / p99 of --single-rows raw inputs,
+  preprocessing included)
+- throughput (rows/s) at each of --batch-sizes
+- agreement with the served generation on one reference sample: decision
+  agreement and mean / max |delta P(High Risk)|
+- the test metrics stored in the generation's metadata
+
+Generations whose artifacts are missing or fail to load are reported with the
+error (this replaces verify_models.py), and the script exits non-zero.
+
+The reference sample is drawn from US_Accidents_March23.csv when present,
+else from sampled raw inputs.
+
+Usage:
+    python benchmark_artifacts.py
+    python benchmark_artifacts.py --generations MLT/ml:20251118_160136 MLT/ml_final:20251202_161146
+    python benchmark_artifacts.py --csv US_Accidents_March23.csv --rows 20000 --report reports/artifacts.md
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from models.artifacts import artifact_paths
+from utils.batch_memory import current_rss
+from utils.dataset import DEFAULT_CHUNK_SIZE
+
+SERVED = "MLT/ml:20251118_162845"
+DEFAULT_DIRS = ["MLT/ml", "MLT/ml_final"]
+DEFAULT_BATCH_SIZES = [10, 100, 1000, 10000]
+MIN_THROUGHPUT_SECONDS = 0.5  # each batch size is repeated at least this long
+DECISION_THRESHOLD = 0.5
+
+# Files each artifact format of an MLT/ml generation loads (models/artifacts.artifact_paths keys)
+FORMAT_FILES = {
+    "flat": ["model_flat", "scaler_flat", "features_json", "metadata_json"],
+    "native": ["model_native", "scaler_flat", "features_json", "metadata_json"],
+    "joblib": ["model_joblib", "scaler_joblib", "features_joblib", "metadata_joblib"],
+}
+FINAL_SUFFIXES = ["model", "preprocessor", "meta"]
+
+
+def discover(model_dir: Path) -> List[Dict[str, Any]]:
+    """Every generation in a model directory, one entry per artifact format"""
+    candidates = []
+    final = sorted({path.name[len("US_Accidents_MODEL_"):-len("_model.joblib")]
+                    for path in model_dir.glob("US_Accidents_MODEL_*_model.joblib")})
+    for timestamp in final:
+        candidates.append(final_candidate(model_dir, timestamp))
+    stems = {path.stem[len("US_Accidents_Predictor_Model_"):]
+             for path in model_dir.glob("US_Accidents_Predictor_Model_*")}
+    for timestamp in sorted(stems):
+        candidates.extend(ml_candidates(model_dir, timestamp))
+    return candidates
+
+
+def final_candidate(model_dir: Path, timestamp: str) -> Dict[str, Any]:
+    files = [model_dir / f"US_Accidents_MODEL_{timestamp}_{suffix}.joblib" for suffix in FINAL_SUFFIXES]
+    return _candidate("final", model_dir, timestamp, "pipeline", files)
+
+
+def ml_candidates(model_dir: Path, timestamp: str) -> List[Dict[str, Any]]:
+    """One candidate per format whose model file exists (missing companion files are reported)"""
+    paths = artifact_paths(model_dir, timestamp)
+    model_files = {"flat": "model_flat", "native": "model_native", "joblib": "model_joblib"}
+    return [_candidate("ml", model_dir, timestamp, artifact_format,
+                       [paths[name] for name in FORMAT_FILES[artifact_format]])
+            for artifact_format, model_file in model_files.items() if paths[model_file].exists()]
+
+
+def _candidate(kind: str, model_dir: Path, timestamp: str, artifact_format: str, files: List[Path]) -> Dict[str, Any]:
+    missing = [path.name for path in files if not path.exists()]
+    return {
+        "kind": kind,
+        "model_dir": str(model_dir),
+        "timestamp": timestamp,
+        "format": artifact_format,
+        "name": f"{model_dir.name}/{timestamp} ({artifact_format})",
+        "disk_mb": round(sum(path.stat().st_size for path in files if path.exists()) / 2**20, 3),
+        "missing": missing,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Child process: load one candidate and time it
+# ---------------------------------------------------------------------------
+
+def load_candidate(candidate: Dict[str, Any]):
+    """
+    Load a candidate with the code that serves it
+
+    Returns:
+        (score, threshold, metrics): score maps a DataFrame of raw inputs to
+        P(High Risk); metrics are the test metrics from its metadata
+    """
+    if candidate["kind"] == "final":
+        from models.shadow import FinalModelPipeline
+
+        pipeline = FinalModelPipeline(candidate["model_dir"], candidate["timestamp"])
+        pipeline.load()
+        metrics = pipeline.metadata.get("metrics_opt") or pipeline.metadata.get("metrics_default") or {}
+        return (lambda inputs: pipeline.predict_proba_high(inputs.to_dict("records")),
+                pipeline.threshold, metrics)
+
+    from models.predictor import SafeStridePredictor
+    from utils.preprocessing import FeaturePreprocessor
+
+    predictor = SafeStridePredictor(candidate["model_dir"], candidate["timestamp"],
+                                    artifact_format=candidate["format"], fuse_scaler=True)
+    predictor.load_models()
+    preprocessor = FeaturePreprocessor(predictor.feature_names)
+    metrics = (predictor.model_metadata or {}).get("performance", {})
+    return (lambda inputs: predictor.predict_risk(preprocessor.preprocess_batch(inputs)),
+            DECISION_THRESHOLD, metrics)
+
+
+def _percentiles(timings: List[float]) -> Dict[str, float]:
+    return {f"p{q}": round(float(np.percentile(timings, q)), 3) for q in (50, 90, 99)}
+
+
+def measure_child(candidate: Dict[str, Any], reference_path: str, output_path: str,
+                  single_rows: int, batch_sizes: List[int]) -> Dict[str, Any]:
+    reference = pd.read_pickle(reference_path)
+    rss_before = current_rss()
+    start = time.perf_counter()
+    score, threshold, metrics = load_candidate(candidate)
+    load_ms = (time.perf_counter() - start) * 1000
+    rss_loaded = current_rss()
+
+    # First prediction (lazy initialisation, caches) is reported, not averaged in
+    start = time.perf_counter()
+    score(reference.iloc[:1])
+    first_ms = (time.perf_counter() - start) * 1000
+
+    timings = []
+    for i in range(min(single_rows, len(reference))):
+        row = reference.iloc[i:i + 1]
+        begin = time.perf_counter()
+        score(row)
+        timings.append((time.perf_counter() - begin) * 1000)
+
+    throughput = {}
+    for batch_size in batch_sizes:
+        batch = reference.iloc[:batch_size]
+        if len(batch) < batch_size:
+            batch = reference.sample(batch_size, replace=True, random_state=0)
+        rows, begin = 0, time.perf_counter()
+        while rows == 0 or time.perf_counter() - begin < MIN_THROUGHPUT_SECONDS:
+            score(batch)
+            rows += batch_size
+        throughput[str(batch_size)] = round(rows / (time.perf_counter() - begin))
+
+    np.save(output_path, np.asarray(score(reference), dtype=np.float64))
+    rss_after = current_rss()
+    return {
+        "load_ms": round(load_ms, 1),
+        "rss_load_mb": round((rss_loaded - rss_before) / 2**20, 1) if rss_before and rss_loaded else None,
+        "rss_total_mb": round(rss_after / 2**20, 1) if rss_after else None,
+        "first_prediction_ms": round(first_ms, 2),
+        "single_row_ms": _percentiles(timings),
+        "rows_per_s": throughput,
+        "threshold": threshold,
+        "metrics": {key: round(float(value), 4) for key, value in metrics.items()
+                    if isinstance(value, (int, float))},
+    }
+
+
+# ---------------------------------------------------------------------------
+# Parent process
+# ---------------------------------------------------------------------------
+
+def run_candidate(candidate: Dict[str, Any], reference_path: str, workdir: Path,
+                  args: argparse.Namespace) -> Dict[str, Any]:
+    """Measure one candidate in a fresh process; its probabilities land in workdir"""
+    output_path = workdir / f"{len(list(workdir.glob('*.npy')))}.npy"
+    command = [sys.executable, os.path.abspath(__file__), "--child", json.dumps(candidate),
+               "--child-reference", reference_path, "--child-output", str(output_path),
+               "--single-rows", str(args.single_rows),
+               "--batch-sizes", *[str(size) for size in args.batch_sizes]]
+    completed = subprocess.run(command, capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)),
+                               env=dict(os.environ, PYTHONWARNINGS="ignore"))
+    if completed.returncode != 0:
+        lines = (completed.stderr or completed.stdout).strip().splitlines()
+        return {**candidate, "error": lines[-1] if lines else f"exit code {completed.returncode}"}
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    return {**candidate, **result, "probabilities": str(output_path)}
+
+
+def agreement(result: Dict[str, Any], served: Dict[str, Any]) -> Dict[str, Any]:
+    prob = np.load(result["probabilities"])
+    served_prob = np.load(served["probabilities"])
+    delta = np.abs(prob - served_prob)
+    decisions = (prob > result["threshold"]) == (served_prob > served["threshold"])
+    return {
+        "decision_agreement": round(float(decisions.mean()), 5),
+        "mean_abs_delta": round(float(delta.mean()), 5),
+        "max_abs_delta": round(float(delta.max()), 5),
+        "high_risk_rate": round(float((prob > result["threshold"]).mean()), 4),
+    }
+
+
+def _ratio(value: Optional[float], base: Optional[float]) -> str:
+    return f"{value / base:.2f}x" if value is not None and base else "-"
+
+
+def write_report(results: List[Dict[str, Any]], served: Optional[Dict[str, Any]], source: str,
+                 rows: int, batch_sizes: List[int], path: Path):
+    """Markdown comparison report, plus the raw numbers as JSON next to it"""
+    measured = [result for result in results if "error" not in result]
+    failed = [result for result in results if "error" in result]
+    largest = str(batch_sizes[-1])
+    lines = [
+        "# Model Artifact Benchmark",
+        "",
+        f"Generated {time.strftime('%Y-%m-%d %H:%M:%S')} on {os.cpu_count()} CPU(s). "
+        f"Reference sample: {rows:,} rows of {source}. "
+        f"Served generation: {served['name'] if served else 'not measured'}.",
+        "",
+        "## Cost",
+        "",
+        "| generation | disk MB | load ms | RSS MB (load / total) | single row p50 / p90 ms | "
+        + " | ".join(f"rows/s @{size}" for size in batch_sizes) + " |",
+        "|---|---:|---:|---:|---:|" + "---:|" * len(batch_sizes),
+    ]
+    for result in measured:
+        latency = result["single_row_ms"]
+        lines.append(
+            f"| {result['name']} | {result['disk_mb']:.2f} | {result['load_ms']:.0f} | "
+            f"{result['rss_load_mb']} / {result['rss_total_mb']} | {latency['p50']:.2f} / {latency['p90']:.2f} | "
+            + " | ".join(f"{result['rows_per_s'][str(size)]:,}" for size in batch_sizes) + " |")
+
+    lines += [
+        "",
+        "## Quality",
+        "",
+        "| generation | test accuracy | test F1 | test ROC AUC | agreement with served | mean / max abs dP | "
+        f"High Risk rate | vs served: load, RSS, p50, rows/s @{largest} |",
+        "|---|---:|---:|---:|---:|---:|---:|---|",
+    ]
+    for result in measured:
+        metrics = result["metrics"]
+        compared = result.get("agreement") or {}
+        relative = "-" if served is None else ", ".join([
+            _ratio(result["load_ms"], served["load_ms"]),
+            _ratio(result["rss_load_mb"], served["rss_load_mb"]),
+            _ratio(result["single_row_ms"]["p50"], served["single_row_ms"]["p50"]),
+            _ratio(result["rows_per_s"][largest], served["rows_per_s"][largest]),
+        ])
+        lines.append(
+            f"| {result['name']} | {metrics.get('accuracy', '-')} | "
+            f"{metrics.get('f1_score', metrics.get('f1', '-'))} | {metrics.get('roc_auc', '-')} | "
+            f"{compared.get('decision_agreement', '-')} | "
+            f"{compared.get('mean_abs_delta', '-')} / {compared.get('max_abs_delta', '-')} | "
+            f"{compared.get('high_risk_rate', '-')} | {relative} |")
+
+    if failed:
+        lines += ["", "## Not measured", ""]
+        lines += [f"- {result['name']}: {result['error']}" for result in failed]
+    lines += [
+        "",
+        "Load time includes imports and unpickling in a fresh process; latency and throughput start "
+        "from raw inputs, so each generation's own preprocessing is included.",
+        "",
+    ]
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(lines), encoding="utf-8")
+    clean = [{key: value for key, value in result.items() if key != "probabilities"} for result in results]
+    path.with_suffix(".json").write_text(json.dumps({"source": source, "rows": rows, "results": clean}, indent=2),
+                                         encoding="utf-8")
+
+
+def parse_generation(spec: str) -> List[Dict[str, Any]]:
+    """"<dir>:<timestamp>[:<format>]" -> candidates (every available format when none is given)"""
+    parts = spec.split(":")
+    model_dir, timestamp = Path(parts[0]), parts[1]
+    if (model_dir / f"US_Accidents_MODEL_{timestamp}_model.joblib").exists():
+        return [final_candidate(model_dir, timestamp)]
+    candidates = ml_candidates(model_dir, timestamp)
+    if len(parts) > 2:
+        candidates = [candidate for candidate in candidates if candidate["format"] == parts[2]]
+    if not candidates:
+        candidates = [_candidate("ml", model_dir, timestamp, parts[2] if len(parts) > 2 else "joblib",
+                                 [artifact_paths(model_dir, timestamp)["model_joblib"]])]
+    return candidates
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark and compare model generations")
+    parser.add_argument("--generations", nargs="+",
+                        help="<dir>:<timestamp>[:<format>] to measure (default: all in MLT/ml and MLT/ml_final)")
+    parser.add_argument("--served", default=SERVED, help="Served generation, <dir>:<timestamp>[:<format>]")
+    parser.add_argument("--csv", default="US_Accidents_March23.csv", help="Dataset the reference sample is drawn from")
+    parser.add_argument("--rows", type=int, default=10_000, help="Reference sample rows")
+    parser.add_argument("--fraction", type=float, default=0.01, help="Fraction of dataset rows sampled")
+    parser.add_argument("--single-rows", type=int, default=200, help="Single-row predictions timed")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per dataset chunk")
+    parser.add_argument("--report", default="artifact_report.md", help="Markdown report (JSON written next to it)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--child-reference", help=argparse.SUPPRESS)
+    parser.add_argument("--child-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.batch_sizes = sorted(args.batch_sizes)
+
+    if args.child:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            result = measure_child(json.loads(args.child), args.child_reference, args.child_output,
+                                   args.single_rows, args.batch_sizes)
+        print(json.dumps(result))
+        return 0
+
+    print("=" * 60)
+    print("SafeStride Model Artifact Benchmark")
+    print("=" * 60)
+
+    if args.generations:
+        candidates = [candidate for spec in args.generations for candidate in parse_generation(spec)]
+    else:
+        candidates = [candidate for model_dir in DEFAULT_DIRS for candidate in discover(Path(model_dir))]
+    served_candidate = parse_generation(args.served)[0]
+    if not any(candidate["name"] == served_candidate["name"] for candidate in candidates):
+        candidates.insert(0, served_candidate)
+    print(f"  ✓ {len(candidates)} generation/format combinations; served: {served_candidate['name']}")
+
+    if Path(args.csv).exists():
+        from build_surrogate import sample_dataset
+
+        reference = sample_dataset(args.csv, args.rows, args.fraction, args.chunk_size)
+        source = f"dataset sample ({Path(args.csv).name})"
+    else:
+        from utils.preprocessing import sample_inputs
+
+        reference = sample_inputs(args.rows, seed=31)
+        source = f"sampled inputs ({args.csv} not found)"
+    print(f"  ✓ Reference sample: {len(reference):,} rows of {source}")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="safestride-bench-") as workdir:
+        reference_path = str(Path(workdir) / "reference.pkl")
+        reference.to_pickle(reference_path)
+        for candidate in candidates:
+            if candidate["missing"]:
+                result = {**candidate, "error": f"missing {', '.join(candidate['missing'])}"}
+            else:
+                result = run_candidate(candidate, reference_path, Path(workdir), args)
+            results.append(result)
+            if "error" in result:
+                print(f"  ✗ {candidate['name']}: {result['error']}")
+            else:
+                print(f"  ✓ {candidate['name']}: load {result['load_ms']:.0f} ms, "
+                      f"+{result['rss_load_mb']} MB, single row p50 {result['single_row_ms']['p50']:.2f} ms, "
+                      f"{result['rows_per_s'][str(args.batch_sizes[-1])]:,} rows/s @{args.batch_sizes[-1]}")
+
+        served = next((result for result in results
+                       if result["name"] == served_candidate["name"] and "error" not in result), None)
+        for result in results:
+            if served is not None and "error" not in result:
+                result["agreement"] = agreement(result, served)
+        report = Path(args.report)
+        write_report(results, served, source, len(reference), args.batch_sizes, report)
+
+    print(f"  ✓ Wrote {report} and {report.with_suffix('.json')}")
+    failed = [result for result in results if "error" in result]
+    if failed:
+        print(f"✗ FAILURE: {len(failed)} generation(s) could not be measured")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
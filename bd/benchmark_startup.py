@@ -0,0 +1,75 @@
+"""
+Startup Time Benchmark
+
+Measures process start to ready (models loaded and warm-up inference done)
+for each artifact format by launching fresh Python processes, so import and
+unpickling costs are included exactly as an autoscaled instance sees them.
+
+Usage:
+    python benchmark_startup.py
+    python benchmark_startup.py --runs 10 --formats flat joblib
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Runs inside the child process: the same sequence as main.startup_event
+CHILD_SCRIPT = """
+import asyncio, json, logging, time
+t0 = time.perf_counter()
+logging.disable(logging.CRITICAL)
+import main
+t_import = time.perf_counter()
+asyncio.run(main.startup_event())
+t_ready = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t_import - t0) * 1000,
+    "startup_ms": (t_ready - t_import) * 1000,
+    "load_ms": main.predictor.load_time_ms,
+}))
+"""
+
+
+def run_once(artifact_format: str) -> dict:
+    env = dict(os.environ, SAFESTRIDE_ARTIFACT_FORMAT=artifact_format, PYTHONWARNINGS="ignore")
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    total_ms = (time.perf_counter() - start) * 1000
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["total_ms"] = total_ms
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SafeStride cold-start time per artifact format")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per format")
+    parser.add_argument("--formats", nargs="+", default=["flat", "native", "joblib"],
+                        choices=["flat", "native", "joblib"])
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print("SafeStride Startup Benchmark (median of {} runs, milliseconds)".format(args.runs))
+    print("=" * 72)
+    print(f"{'format':<10}{'process->ready':>16}{'imports':>12}{'startup':>12}{'artifact load':>16}")
+
+    for artifact_format in args.formats:
+        runs = [run_once(artifact_format) for _ in range(args.runs)]
+        median = {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+        print(f"{artifact_format:<10}{median['total_ms']:>16.0f}{median['import_ms']:>12.0f}"
+              f"{median['startup_ms']:>12.0f}{median['load_ms']:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
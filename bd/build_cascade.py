@@ -0,0 +1,199 @@
+"""
+Cascade Builder
+
+Distils the served model into the small first stage used in cascade mode
+(see models/cascade.py):
+
+1. Sample rows of US_Accidents_March23.csv (or sampled raw inputs without
+   it), preprocess them and score them with the full model
+2. Split the rows into training, calibration and held-out thirds
+   (--train-fraction of them for training, the rest halved)
+3. Train a few shallow trees on the raw features with the full model's
+   P(High Risk) as soft labels (XGBoost binary:logistic) and flatten them
+4. On the calibration rows, widen each tail of the band until the
+   confident rows that disagree with the full model's decision fit in
+   --max-disagreement (half per tail)
+5. Measure escalation rate, decision agreement and batch throughput against
+   the full model on the held-out rows; the measurement ships inside the
+   artifact, where /api/metrics publishes it
+
+Usage:
+    python build_cascade.py --csv US_Accidents_March23.csv
+    python build_cascade.py --csv US_Accidents_March23.csv --rows 400000 --max-disagreement 0.002
+"""
+
+import argparse
+import sys
+import time
+import warnings
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+from build_surrogate import load_scorer, sample_dataset
+from models.artifacts import FlatScaler, FlatTreeEnsemble, artifact_paths, load_json
+from models.cascade import DECISION_THRESHOLD, CascadeModel, cascade_path
+from utils.dataset import DEFAULT_CHUNK_SIZE
+from utils.preprocessing import FeaturePreprocessor, sample_inputs
+
+THROUGHPUT_BATCH = 1000
+
+
+def train_stage_one(X: np.ndarray, target: np.ndarray, n_trees: int, max_depth: int) -> FlatTreeEnsemble:
+    """Shallow boosted trees fitted to the full model's probabilities, flattened"""
+    import xgboost as xgb
+
+    params = {"objective": "binary:logistic", "max_depth": max_depth, "eta": 0.3,
+              "tree_method": "hist", "verbosity": 0}
+    booster = xgb.train(params, xgb.DMatrix(X, label=target), num_boost_round=n_trees)
+    return FlatTreeEnsemble.from_booster(booster)
+
+
+def calibrate_band(stage_one: np.ndarray, full: np.ndarray, max_disagreement: float) -> Tuple[float, float]:
+    """
+    Widest confident tails whose decision errors fit the budget
+
+    Rows below `low` are answered Low Risk and rows above `high` High Risk by
+    the first stage; each tail may hold at most max_disagreement / 2 of all
+    rows where the full model decides otherwise.
+    """
+    budget = max_disagreement / 2 * len(stage_one)
+    full_high = full > DECISION_THRESHOLD
+
+    # Low tail: ascending first-stage probability, errors are full-model High Risk rows
+    order = np.argsort(stage_one, kind="stable")
+    errors = np.cumsum(full_high[order])
+    ok = np.flatnonzero((errors <= budget) & (stage_one[order] < DECISION_THRESHOLD))
+    low = float(np.nextafter(stage_one[order][ok[-1]], 1.0)) if len(ok) else 0.0
+
+    # High tail: descending, errors are full-model Low Risk rows
+    order = order[::-1]
+    errors = np.cumsum(~full_high[order])
+    ok = np.flatnonzero((errors <= budget) & (stage_one[order] > DECISION_THRESHOLD))
+    high = float(np.nextafter(stage_one[order][ok[-1]], 0.0)) if len(ok) else 1.0
+    return min(low, DECISION_THRESHOLD), max(high, DECISION_THRESHOLD)
+
+
+def measure(cascade: CascadeModel, full_score, raw: np.ndarray, full: np.ndarray) -> dict:
+    """Escalation rate, decision agreement and batch throughput on held-out rows"""
+    stage_one = cascade.predict_proba_high(raw)
+    in_band, _ = cascade.route(stage_one)
+    answer = np.where(in_band, full, stage_one)
+    agreement = float(((answer > DECISION_THRESHOLD) == (full > DECISION_THRESHOLD)).mean())
+
+    def rows_per_second(score) -> float:
+        start = time.perf_counter()
+        for begin in range(0, len(raw), THROUGHPUT_BATCH):
+            score(raw[begin:begin + THROUGHPUT_BATCH])
+        return len(raw) / (time.perf_counter() - start)
+
+    def cascade_score(X):
+        prob_high = cascade.predict_proba_high(X)
+        band, _ = cascade.route(prob_high)
+        if band.any():
+            prob_high[band] = full_score(X[band])
+        return prob_high
+
+    full_rps = rows_per_second(full_score)
+    cascade_rps = rows_per_second(cascade_score)
+    return {
+        "rows": len(raw),
+        "escalation_rate": round(float(in_band.mean()), 4),
+        "decision_agreement": round(agreement, 5),
+        "mean_abs_error": round(float(np.abs(answer - full).mean()), 5),
+        "stage_one_agreement": round(float(((stage_one > DECISION_THRESHOLD) == (full > DECISION_THRESHOLD)).mean()), 5),
+        "full_rows_per_s": round(full_rps),
+        "cascade_rows_per_s": round(cascade_rps),
+        "speedup": round(cascade_rps / full_rps, 2),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Distil the first stage for cascade inference")
+    parser.add_argument("--csv", default="US_Accidents_March23.csv", help="Dataset the rows are sampled from")
+    parser.add_argument("--model-dir", default="MLT/ml", help="Directory containing the model artifacts")
+    parser.add_argument("--timestamp", default="20251118_162845", help="Model generation timestamp")
+    parser.add_argument("--rows", type=int, default=200_000, help="Rows sampled in total")
+    parser.add_argument("--fraction", type=float, default=0.05, help="Fraction of dataset rows sampled")
+    parser.add_argument("--train-fraction", type=float, default=0.6, help="Share of rows used for training")
+    parser.add_argument("--trees", type=int, default=20, help="First-stage trees")
+    parser.add_argument("--depth", type=int, default=4, help="First-stage tree depth")
+    parser.add_argument("--max-disagreement", type=float, default=0.005,
+                        help="Share of rows allowed to change decision")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk")
+    args = parser.parse_args()
+
+    model_dir = Path(args.model_dir)
+    paths = artifact_paths(model_dir, args.timestamp)
+    feature_names = load_json(paths["features_json"])
+
+    print("=" * 60)
+    print("SafeStride Cascade Builder")
+    print("=" * 60)
+
+    try:
+        import xgboost  # noqa: F401
+    except ImportError:
+        print("✗ FAILURE: xgboost is required to train the first stage")
+        return 1
+
+    score = load_scorer(model_dir, args.timestamp)
+    # Throughput is compared against what serving runs: the flat booster with the scaler folded in
+    served = FlatTreeEnsemble.load(paths["model_flat"])
+    scaler = FlatScaler.load(paths["scaler_flat"])
+    served = served.fold_scaler(scaler.mean_, scaler.scale_)
+
+    if Path(args.csv).exists():
+        inputs = sample_dataset(args.csv, args.rows, args.fraction, args.chunk_size)
+        source = f"dataset sample ({Path(args.csv).name})"
+    else:
+        inputs = sample_inputs(args.rows)
+        source = f"sampled inputs ({args.csv} not found)"
+
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        raw = FeaturePreprocessor(feature_names).preprocess_batch(inputs).to_numpy(dtype=np.float64)
+        full = np.asarray(score(raw), dtype=np.float64)
+    print(f"  ✓ Scored {len(raw):,} rows of {source} with the full model ({time.perf_counter() - start:.1f}s)")
+
+    n_train = int(len(raw) * args.train_fraction)
+    n_calibrate = (len(raw) - n_train) // 2
+    train, calibrate, held_out = np.split(np.arange(len(raw)), [n_train, n_train + n_calibrate])
+
+    start = time.perf_counter()
+    stage_one = train_stage_one(raw[train], full[train], args.trees, args.depth)
+    print(f"  ✓ Trained {stage_one.n_trees} trees of depth {stage_one.max_depth} on {len(train):,} rows "
+          f"({time.perf_counter() - start:.1f}s)")
+
+    cascade = CascadeModel(stage_one, (0.0, 1.0), {})
+    band = calibrate_band(cascade.predict_proba_high(raw[calibrate]), full[calibrate], args.max_disagreement)
+    cascade.band = band
+    print(f"  ✓ Band [{band[0]:.4f}, {band[1]:.4f}] on {len(calibrate):,} calibration rows")
+
+    metrics = measure(cascade, lambda X: served.predict_proba(X)[:, 1], raw[held_out], full[held_out])
+    cascade.metrics = {
+        "model_timestamp": args.timestamp,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "source": source,
+        "trees": stage_one.n_trees,
+        "max_depth": stage_one.max_depth,
+        "max_disagreement": args.max_disagreement,
+        **metrics,
+    }
+
+    path = cascade_path(model_dir, args.timestamp)
+    cascade.save(path)
+
+    print(f"  ✓ Held-out {metrics['rows']:,} rows: escalated {metrics['escalation_rate']:.1%}, "
+          f"decision agreement {metrics['decision_agreement']:.3%} "
+          f"(first stage alone {metrics['stage_one_agreement']:.2%})")
+    print(f"  ✓ Throughput at {THROUGHPUT_BATCH} rows/batch: {metrics['full_rows_per_s']:,} rows/s full, "
+          f"{metrics['cascade_rows_per_s']:,} rows/s cascade ({metrics['speedup']:.2f}x)")
+    print(f"  ✓ Wrote {path} ({path.stat().st_size / 1024:.1f} KB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
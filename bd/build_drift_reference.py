@@ -0,0 +1,88 @@
+"""
+Drift Reference Builder
+
+Builds the reference distribution used by the drift monitor from a streaming
+pass over US_Accidents_March23.csv, in constant memory:
+
+1. Count accidents per City and State (for City_Frequency / State_Frequency)
+2. Run each chunk through FeaturePreprocessor.preprocess_batch and fold it into
+   fixed-bin sketches, using the same bin edges the monitor derives from the
+   model's scaler
+
+Without this file the monitor falls back to a reference derived from the
+scaler alone.
+
+Usage:
+    python build_drift_reference.py --csv US_Accidents_March23.csv
+    python build_drift_reference.py --csv US_Accidents_March23.csv --max-rows 500000
+"""
+
+import argparse
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from models.predictor import SafeStridePredictor
+from utils.dataset import DEFAULT_CHUNK_SIZE, iter_dataset_chunks, to_model_inputs
+from utils.drift_monitor import DriftReference, FeatureSketch, reference_path
+from utils.preprocessing import FeaturePreprocessor
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build the drift monitor reference from the dataset")
+    parser.add_argument("--csv", default="US_Accidents_March23.csv", help="Path to the US Accidents CSV")
+    parser.add_argument("--model-dir", default="MLT/ml", help="Directory containing the model artifacts")
+    parser.add_argument("--timestamp", default="20251118_162845", help="Model generation timestamp")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk")
+    parser.add_argument("--max-rows", type=int, default=None, help="Only scan the first N rows")
+    args = parser.parse_args()
+
+    predictor = SafeStridePredictor(model_dir=args.model_dir, timestamp=args.timestamp)
+    predictor.load_models()
+    preprocessor = FeaturePreprocessor(predictor.feature_names)
+    feature_index = {name: j for j, name in enumerate(predictor.feature_names)}
+
+    print("=" * 60)
+    print("SafeStride Drift Reference Builder")
+    print("=" * 60)
+
+    # Pass 1: location frequencies
+    start = time.perf_counter()
+    city_counts, state_counts = Counter(), Counter()
+    for chunk in iter_dataset_chunks(args.csv, ["City", "State"], args.chunk_size, args.max_rows):
+        city_counts.update(chunk["City"].dropna().astype(str))
+        state_counts.update(chunk["State"].dropna().astype(str))
+    print(f"  ✓ Counted {len(city_counts)} cities / {len(state_counts)} states "
+          f"({time.perf_counter() - start:.1f}s)")
+
+    # Pass 2: feature sketches over fixed bin edges
+    base = DriftReference.from_scaler(predictor.feature_names, predictor.scaler.mean_, predictor.scaler.scale_)
+    sketch = FeatureSketch(base)
+    for chunk in iter_dataset_chunks(args.csv, chunk_size=args.chunk_size, max_rows=args.max_rows):
+        inputs = to_model_inputs(chunk)
+        features = preprocessor.preprocess_batch(inputs).to_numpy()
+        features[:, feature_index["City_Frequency"]] = inputs["City"].astype(str).map(city_counts).fillna(0)
+        features[:, feature_index["State_Frequency"]] = inputs["State"].astype(str).map(state_counts).fillna(0)
+        sketch.update(features)
+        print(f"  … {sketch.count:,} rows", end="\r")
+    print(f"  ✓ Sketched {sketch.count:,} rows ({time.perf_counter() - start:.1f}s)")
+
+    if sketch.count == 0:
+        print("✗ FAILURE: No rows read from the dataset")
+        return 1
+
+    reference = DriftReference(
+        predictor.feature_names, base.binary, base.edges, sketch.proportions(),
+        sketch.mean, np.sqrt(sketch.m2 / max(sketch.count - 1, 1)), source=f"dataset:{Path(args.csv).name}",
+    )
+    path = reference_path(Path(args.model_dir), args.timestamp)
+    reference.save(path)
+    print(f"  ✓ Wrote {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
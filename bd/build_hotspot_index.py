@@ -0,0 +1,113 @@
+"""
+Hotspot Index Builder
+
+Builds the spatial index behind the `nearby_accidents` response field and the
+hotspot risk factor (see models/hotspots.py):
+
+1. Stream the Start_Lat / Start_Lng columns of the dataset (CSV or the
+   Parquet cache from convert_dataset.py)
+2. Bucket the points into the grid, sort them by cell and write the
+   memory-mappable arrays
+3. Calibrate: count nearby accidents around sampled historical locations and
+   store the percentiles used to rank a location's density
+4. Time single and batched lookups against the written (memory-mapped) index
+
+Usage:
+    python build_hotspot_index.py --csv US_Accidents_March23.csv
+    python build_hotspot_index.py --csv US_Accidents_March23.parquet --radius-m 300
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from models.hotspots import DEFAULT_RADIUS_M, MAX_RADIUS_M, HotspotIndex, hotspot_path
+from utils.dataset import DEFAULT_CHUNK_SIZE, iter_dataset_chunks
+
+COORDINATE_COLUMNS = ["Start_Lat", "Start_Lng"]
+
+
+def read_coordinates(path: str, chunk_size: int, max_rows=None):
+    """Accident coordinates as float64 arrays (rows with missing values dropped)"""
+    lat_parts, lng_parts = [], []
+    for chunk in iter_dataset_chunks(path, COORDINATE_COLUMNS, chunk_size, max_rows):
+        chunk = chunk.dropna()
+        lat_parts.append(chunk["Start_Lat"].to_numpy(dtype=np.float64))
+        lng_parts.append(chunk["Start_Lng"].to_numpy(dtype=np.float64))
+    return np.concatenate(lat_parts), np.concatenate(lng_parts)
+
+
+def time_lookups(index: HotspotIndex, lat: np.ndarray, lng: np.ndarray, n_queries: int = 2000) -> dict:
+    """Single-lookup latency percentiles and batched per-lookup cost"""
+    rng = np.random.default_rng(3)
+    picks = rng.choice(len(lat), size=min(n_queries, len(lat)), replace=False)
+    timings = []
+    for i in picks:
+        start = time.perf_counter()
+        index.nearby(lat[i], lng[i])
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1e6
+
+    start = time.perf_counter()
+    index.nearby(lat[picks], lng[picks])
+    batch_us = (time.perf_counter() - start) / len(picks) * 1e6
+    return {
+        "single_p50_us": round(float(np.percentile(timings, 50)), 1),
+        "single_p99_us": round(float(np.percentile(timings, 99)), 1),
+        "batch_us": round(batch_us, 1),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build the spatial hotspot index from the dataset")
+    parser.add_argument("--csv", default="US_Accidents_March23.csv", help="Dataset path (CSV or Parquet directory)")
+    parser.add_argument("--model-dir", default="MLT/ml", help="Directory the index is written to")
+    parser.add_argument("--radius-m", type=float, default=DEFAULT_RADIUS_M,
+                        help=f"Radius of the nearby-density factor in metres (max {MAX_RADIUS_M:g})")
+    parser.add_argument("--calibration-samples", type=int, default=20_000,
+                        help="Historical locations sampled for the density percentiles")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk")
+    parser.add_argument("--max-rows", type=int, default=None, help="Only index the first N rows")
+    args = parser.parse_args()
+    if not 0 < args.radius_m <= MAX_RADIUS_M:
+        parser.error(f"--radius-m must be in (0, {MAX_RADIUS_M:g}]")
+
+    print("=" * 60)
+    print("SafeStride Hotspot Index Builder")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    try:
+        lat, lng = read_coordinates(args.csv, args.chunk_size, args.max_rows)
+    except (FileNotFoundError, ImportError) as e:
+        print(f"✗ FAILURE: {e}")
+        return 1
+    print(f"  ✓ Read {len(lat):,} accident coordinates ({time.perf_counter() - start:.1f}s)")
+
+    start = time.perf_counter()
+    index = HotspotIndex.build(lat, lng)
+    print(f"  ✓ Indexed {index.points:,} points in {len(index.cell_keys):,} cells "
+          f"({time.perf_counter() - start:.1f}s)")
+
+    start = time.perf_counter()
+    index.calibrate(args.radius_m, args.calibration_samples)
+    levels = index.meta["count_percentiles"]
+    print(f"  ✓ Accidents within {args.radius_m:g} m of a past accident: median {levels[50]:.0f}, "
+          f"p90 {levels[90]:.0f}, p99 {levels[99]:.0f} ({time.perf_counter() - start:.1f}s)")
+
+    index.meta.update({"source": args.csv, "built_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+    path = hotspot_path(args.model_dir)
+    index.save(path)
+    size_mb = sum(f.stat().st_size for f in path.iterdir()) / 1024 ** 2
+
+    timings = time_lookups(HotspotIndex.load(path), lat, lng)
+    print(f"  ✓ Lookup: single p50 {timings['single_p50_us']:.0f} µs, p99 {timings['single_p99_us']:.0f} µs; "
+          f"batched {timings['batch_us']:.0f} µs/location")
+    print(f"  ✓ Wrote {path} ({size_mb:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
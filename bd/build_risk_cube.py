@@ -0,0 +1,158 @@
+"""
+Risk Cube Builder
+
+Builds or updates the aggregate cube behind `/api/stats` (see
+models/risk_cube.py):
+
+1. List the sources under --csv: the CSV file itself, or every State / Year
+   partition of the Parquet dataset from convert_dataset.py
+2. Compare them with the sources already in the cube:
+   - new sources are read once, scored with the model and added to the
+     observed measures and the model's risk layer
+   - known sources not yet scored by this model version are re-scored into
+     its risk layer only (a new model version keeps the observed measures)
+   - unchanged, already scored sources are skipped
+3. Checkpoint the cube between sources, so an interrupted build resumes where
+   it stopped
+
+A source whose file changed after it was ingested cannot be subtracted from
+the cube; rebuild it from scratch with --rebuild.
+
+Usage:
+    python build_risk_cube.py --csv US_Accidents_March23.parquet
+    python build_risk_cube.py --csv US_Accidents_March23.parquet --timestamp 20260301_120000
+    python build_risk_cube.py --csv US_Accidents_March23.csv --rebuild
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import pandas as pd
+
+from models.predictor import SafeStridePredictor
+from models.risk_cube import RiskCube, RiskCubeStats, cell_indices, risk_cube_path
+from utils.dataset import (
+    DEFAULT_CHUNK_SIZE, MODEL_INPUT_COLUMNS, iter_dataset_chunks, iter_parquet_batches, to_model_inputs,
+)
+from utils.preprocessing import FeaturePreprocessor
+
+CUBE_COLUMNS = MODEL_INPUT_COLUMNS + ["Severity"]
+
+
+def _fingerprint(files: List[Path], max_rows) -> str:
+    stats = [f.stat() for f in files]
+    fingerprint = f"{sum(s.st_size for s in stats)}:{max((int(s.st_mtime) for s in stats), default=0)}"
+    return fingerprint if max_rows is None else f"{fingerprint}:{max_rows}"
+
+
+def list_sources(path: str, max_rows=None) -> List[Tuple[str, str, dict]]:
+    """(key, fingerprint, reader arguments) per source, in a stable order"""
+    root = Path(path)
+    if not root.exists():
+        raise FileNotFoundError(f"Dataset not found: {path}")
+    if not root.is_dir():
+        return [(root.name, _fingerprint([root], max_rows), {})]
+    sources = []
+    for partition in sorted(root.glob("State=*/Year=*")):
+        files = sorted(partition.glob("*.parquet"))
+        if files:
+            state, year = partition.parent.name.split("=", 1)[1], int(partition.name.split("=", 1)[1])
+            key = f"{root.name}/{partition.parent.name}/{partition.name}"
+            sources.append((key, _fingerprint(files, max_rows), {"states": [state], "years": [year]}))
+    return sources
+
+
+def read_source(path: str, reader: dict, chunk_size: int, max_rows=None) -> Iterator[pd.DataFrame]:
+    if reader:
+        return iter_parquet_batches(path, CUBE_COLUMNS, batch_size=chunk_size, max_rows=max_rows, **reader)
+    return iter_dataset_chunks(path, CUBE_COLUMNS, chunk_size, max_rows)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build or update the aggregate risk cube from the dataset")
+    parser.add_argument("--csv", default="US_Accidents_March23.csv", help="Dataset path (CSV or Parquet directory)")
+    parser.add_argument("--model-dir", default="MLT/ml", help="Directory containing the model artifacts")
+    parser.add_argument("--timestamp", default="20251118_162845", help="Model generation timestamp")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk")
+    parser.add_argument("--max-rows", type=int, default=None, help="Only read the first N rows of each source")
+    parser.add_argument("--checkpoint-interval", type=float, default=60.0,
+                        help="Seconds between cube checkpoints (always written at the end)")
+    parser.add_argument("--rebuild", action="store_true", help="Discard the existing cube and start over")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("SafeStride Risk Cube Builder")
+    print("=" * 60)
+
+    path = risk_cube_path(args.model_dir)
+    try:
+        sources = list_sources(args.csv, args.max_rows)
+        cube = RiskCube.load(path) if (path / "meta.json").exists() and not args.rebuild else RiskCube.empty()
+    except (FileNotFoundError, ValueError) as e:
+        print(f"✗ FAILURE: {e}")
+        return 1
+    model = args.timestamp
+
+    plan = {key: cube.source_status(key, fingerprint, model) for key, fingerprint, _ in sources}
+    changed = [key for key, status in plan.items() if status == "changed"]
+    if changed:
+        print(f"✗ FAILURE: {len(changed)} source(s) changed since they were ingested (e.g. {changed[0]}); "
+              f"run with --rebuild")
+        return 1
+    counts = {status: sum(1 for s in plan.values() if s == status) for status in ("new", "score", "current")}
+    print(f"  ✓ {len(sources)} source(s): {counts['new']} new, {counts['score']} to score with model {model}, "
+          f"{counts['current']} up to date")
+    if counts["new"] + counts["score"] == 0:
+        print(f"  ✓ Cube at {path} is up to date ({cube.rows:,} rows)")
+        return 0
+
+    predictor = SafeStridePredictor(model_dir=args.model_dir, timestamp=model)
+    predictor.load_models()
+    preprocessor = FeaturePreprocessor(predictor.feature_names)
+
+    start = last_checkpoint = time.perf_counter()
+    scored_rows = 0
+    for key, fingerprint, reader in sources:
+        status = plan[key]
+        if status == "current":
+            continue
+        rows = 0
+        for chunk in read_source(args.csv, reader, args.chunk_size, args.max_rows):
+            inputs = to_model_inputs(chunk)
+            if len(inputs) == 0:
+                continue
+            features = preprocessor.preprocess_batch(inputs)
+            cells = cell_indices(inputs["State"], features)
+            if status == "new":
+                cube.add_observations(cells, inputs["Severity"].to_numpy(dtype="float64", na_value=0.0))
+            cube.add_risk(model, cells, predictor.predict_risk(features))
+            rows += len(inputs)
+            scored_rows += len(inputs)
+            elapsed = time.perf_counter() - start
+            print(f"  … {scored_rows:,} rows ({scored_rows / max(elapsed, 1e-9):,.0f} rows/s)", end="\r")
+        cube.record_source(key, fingerprint, rows, model)
+        if time.perf_counter() - last_checkpoint >= args.checkpoint_interval:
+            cube.save(path, models=[model])
+            last_checkpoint = time.perf_counter()
+
+    cube.save(path, models=[model])
+    print(f"  ✓ Scored {scored_rows:,} rows ({time.perf_counter() - start:.1f}s)")
+    complete = cube.complete_models()
+    print(f"  ✓ Cube holds {cube.rows:,} rows from {len(cube.meta['sources'])} source(s); "
+          f"complete risk layers: {', '.join(complete) or 'none'}")
+
+    # Typical dashboard query against the written cube
+    stats = RiskCubeStats()
+    stats.configure_for_model(args.model_dir, model)
+    query_start = time.perf_counter()
+    stats.query(group_by=["state", "hour"])
+    print(f"  ✓ State x hour roll-up: {(time.perf_counter() - query_start) * 1000:.1f} ms")
+    print(f"  ✓ Wrote {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+Lookup Surrogate Builder
+
+Builds the quantized probability table behind `/api/predict?approximate=true`
+(see models/surrogate.py):
+
+1. Sample rows of US_Accidents_March23.csv and split them into background
+   rows (the first --background-rows) and held-out evaluation rows
+2. Enumerate every cell of the quantized input space, write the cell's
+   representative input into each background row and score it with the served
+   model (native XGBoost booster when xgboost is installed, else the flat
+   booster); the cell value is the mean over the background rows
+3. Quantize the probabilities to uint8
+4. Score the held-out rows with both the full model and the table, and store
+   the error distribution in the artifact, where /api/metrics publishes it
+
+Without the CSV the cells are scored at the API defaults and the error is
+measured on sampled raw inputs.
+
+Usage:
+    python build_surrogate.py --csv US_Accidents_March23.csv
+    python build_surrogate.py --csv US_Accidents_March23.csv --eval-rows 200000 --eval-fraction 0.05
+"""
+
+import argparse
+import sys
+import time
+import warnings
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from models.artifacts import FlatScaler, FlatTreeEnsemble, artifact_paths, load_json, load_native_model
+from models.surrogate import (
+    QUANTIZATION_LEVELS, TABLE_SHAPE, LookupSurrogate,
+    cell_feature_assignments, cell_features, surrogate_path,
+)
+from utils.dataset import DEFAULT_CHUNK_SIZE, iter_dataset_chunks, to_model_inputs
+from utils.preprocessing import FeaturePreprocessor, sample_inputs
+
+CELLS_PER_BATCH = 500_000
+DEFAULT_BACKGROUND_ROWS = 8
+
+
+def load_scorer(model_dir: Path, timestamp: str) -> Callable[[np.ndarray], np.ndarray]:
+    """P(High Risk) for raw feature matrices, using the fastest available booster"""
+    paths = artifact_paths(model_dir, timestamp)
+    scaler = FlatScaler.load(paths["scaler_flat"])
+    try:
+        booster = load_native_model(paths["model_native"]).get_booster()
+        print("  ✓ Scoring with the native XGBoost booster")
+        return lambda X: booster.inplace_predict(scaler.transform(X))
+    except ImportError:
+        model = FlatTreeEnsemble.load(paths["model_flat"])
+        print("  ✓ Scoring with the flat booster (xgboost not installed)")
+        return lambda X: model.predict_proba(scaler.transform(X))[:, 1]
+
+
+def build_table(score: Callable[[np.ndarray], np.ndarray], feature_names,
+                background: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Score every cell's representative input and quantize to uint8
+
+    Args:
+        score: P(High Risk) for raw feature matrices
+        feature_names: Model feature order
+        background: Feature vectors (rows) supplying the fields the table does
+            not index; None scores at the API defaults
+
+    Returns:
+        uint8 table of shape TABLE_SHAPE
+    """
+    default_base, assignments = cell_feature_assignments(feature_names)
+    bases = [default_base] if background is None or len(background) == 0 else list(background)
+    n_cells = int(np.prod(TABLE_SHAPE))
+    table = np.empty(n_cells, dtype=np.uint8)
+    for start in range(0, n_cells, CELLS_PER_BATCH):
+        cells = np.arange(start, min(start + CELLS_PER_BATCH, n_cells))
+        proba = sum(score(cell_features(base, assignments, cells)) for base in bases) / len(bases)
+        table[cells] = np.rint(np.clip(proba, 0.0, 1.0) * QUANTIZATION_LEVELS).astype(np.uint8)
+    return table.reshape(TABLE_SHAPE)
+
+
+def sample_dataset(csv_path: str, n_rows: int, fraction: float, chunk_size: int) -> pd.DataFrame:
+    """Random sample of dataset rows (model input columns), up to n_rows, shuffled"""
+    rng = np.random.default_rng(5)
+    parts, rows = [], 0
+    for chunk in iter_dataset_chunks(csv_path, chunk_size=chunk_size):
+        inputs = to_model_inputs(chunk)
+        part = inputs[rng.random(len(inputs)) < fraction]
+        parts.append(part.iloc[:n_rows - rows])
+        rows += len(parts[-1])
+        if rows >= n_rows:
+            break
+    sample = pd.concat(parts, ignore_index=True)
+    return sample.iloc[rng.permutation(len(sample))].reset_index(drop=True)
+
+
+def measure_error(surrogate: LookupSurrogate, score, preprocessor: FeaturePreprocessor,
+                  inputs: pd.DataFrame) -> dict:
+    """Error of the table against the full model on raw inputs"""
+    full = score(preprocessor.preprocess_batch(inputs).to_numpy(dtype=np.float64))
+
+    records = inputs.to_dict(orient="records")
+    start = time.perf_counter()
+    approx = np.array([surrogate.predict_proba_high(record) for record in records])
+    lookup_us = (time.perf_counter() - start) / max(len(records), 1) * 1e6
+
+    error = np.abs(approx - full)
+    return {
+        "rows": len(records),
+        "mean_abs_error": round(float(error.mean()), 5),
+        "p50_abs_error": round(float(np.percentile(error, 50)), 5),
+        "p95_abs_error": round(float(np.percentile(error, 95)), 5),
+        "p99_abs_error": round(float(np.percentile(error, 99)), 5),
+        "max_abs_error": round(float(error.max()), 5),
+        "label_agreement": round(float(((approx > 0.5) == (full > 0.5)).mean()), 5),
+        "lookup_us": round(lookup_us, 2),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build the lookup surrogate for approximate predictions")
+    parser.add_argument("--csv", default="US_Accidents_March23.csv", help="Dataset used for the held-out error")
+    parser.add_argument("--model-dir", default="MLT/ml", help="Directory containing the model artifacts")
+    parser.add_argument("--timestamp", default="20251118_162845", help="Model generation timestamp")
+    parser.add_argument("--eval-rows", type=int, default=100_000, help="Held-out rows used to measure error")
+    parser.add_argument("--eval-fraction", type=float, default=0.02, help="Fraction of dataset rows sampled")
+    parser.add_argument("--background-rows", type=int, default=DEFAULT_BACKGROUND_ROWS,
+                        help="Dataset rows each cell is averaged over")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk")
+    args = parser.parse_args()
+
+    model_dir = Path(args.model_dir)
+    feature_names = load_json(artifact_paths(model_dir, args.timestamp)["features_json"])
+
+    print("=" * 60)
+    print("SafeStride Lookup Surrogate Builder")
+    print("=" * 60)
+
+    score = load_scorer(model_dir, args.timestamp)
+    preprocessor = FeaturePreprocessor(feature_names)
+
+    if Path(args.csv).exists():
+        sample = sample_dataset(args.csv, args.background_rows + args.eval_rows, args.eval_fraction,
+                                args.chunk_size)
+        background = preprocessor.preprocess_batch(sample.iloc[:args.background_rows]).to_numpy(dtype=np.float64)
+        inputs = sample.iloc[args.background_rows:].reset_index(drop=True)
+        source = f"dataset sample ({Path(args.csv).name})"
+    else:
+        background = None
+        inputs = sample_inputs(args.eval_rows)
+        source = f"sampled inputs ({args.csv} not found)"
+
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        table = build_table(score, feature_names, background)
+    build_s = time.perf_counter() - start
+    n_background = 0 if background is None else len(background)
+    print(f"  ✓ Scored {table.size:,} cells {TABLE_SHAPE} x {max(n_background, 1)} background rows ({build_s:.1f}s)")
+
+    surrogate = LookupSurrogate(table, {})
+    metrics = measure_error(surrogate, score, preprocessor, inputs)
+    surrogate.metrics = {
+        "model_timestamp": args.timestamp,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "source": source,
+        "cells": int(table.size),
+        "background_rows": n_background,
+        "quantization_step": round(1 / QUANTIZATION_LEVELS, 5),
+        **metrics,
+    }
+
+    path = surrogate_path(model_dir, args.timestamp)
+    surrogate.save(path)
+
+    print(f"  ✓ Error on {metrics['rows']:,} rows of {source}:")
+    print(f"      mean {metrics['mean_abs_error']:.4f}, p95 {metrics['p95_abs_error']:.4f}, "
+          f"p99 {metrics['p99_abs_error']:.4f}, max {metrics['max_abs_error']:.4f}")
+    print(f"      label agreement {metrics['label_agreement']:.2%}, lookup {metrics['lookup_us']:.1f} µs/row")
+    print(f"  ✓ Wrote {path} ({path.stat().st_size / 1024:.1f} KB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Weather Index Builder
+
+Builds the station index and observation store used to fill omitted weather
+fields (see models/weather_index.py):
+
+1. Stream the station, timestamp and weather columns of the dataset (CSV or
+   the Parquet cache from convert_dataset.py), keeping each station
+   observation once (accidents share the same Weather_Timestamp)
+2. Place every station (Airport_Code) at the mean location of its accidents
+3. Bucket the observations by (station, year, month, hour) and by
+   (station, month, hour) for the climatology fallback, and write the
+   memory-mappable arrays
+4. Time single and batched lookups against the written index
+
+Usage:
+    python build_weather_index.py --csv US_Accidents_March23.csv
+    python build_weather_index.py --csv US_Accidents_March23.parquet
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from models.weather_index import NUMERIC_FIELDS, WeatherEnricher, WeatherObservations, weather_index_path
+from utils.dataset import DEFAULT_CHUNK_SIZE, iter_dataset_chunks
+
+WEATHER_COLUMNS = ["Airport_Code", "Start_Lat", "Start_Lng", "Weather_Timestamp"] + NUMERIC_FIELDS + [
+    "Weather_Condition"]
+
+
+def read_weather(path: str, chunk_size: int, max_rows=None):
+    """(stations, observations): mean accident location per station, and unique station observations"""
+    location_parts, observation_parts = [], []
+    rows = 0
+    for chunk in iter_dataset_chunks(path, WEATHER_COLUMNS, chunk_size, max_rows):
+        chunk = chunk.dropna(subset=["Airport_Code", "Weather_Timestamp"])
+        chunk = chunk.assign(Airport_Code=chunk["Airport_Code"].astype(str),
+                             Weather_Timestamp=pd.to_datetime(chunk["Weather_Timestamp"], errors="coerce"))
+        location_parts.append(chunk.groupby("Airport_Code")[["Start_Lat", "Start_Lng"]].agg(["sum", "count"]))
+        observation_parts.append(chunk.drop(columns=["Start_Lat", "Start_Lng"])
+                                 .drop_duplicates(["Airport_Code", "Weather_Timestamp"]))
+        rows += len(chunk)
+        print(f"  … {rows:,} rows", end="\r")
+
+    locations = pd.concat(location_parts).groupby(level=0).sum()
+    stations = pd.DataFrame({
+        "Airport_Code": locations.index,
+        "lat": (locations[("Start_Lat", "sum")] / locations[("Start_Lat", "count")]).to_numpy(),
+        "lng": (locations[("Start_Lng", "sum")] / locations[("Start_Lng", "count")]).to_numpy(),
+    })
+    observations = pd.concat(observation_parts, ignore_index=True).drop_duplicates(
+        ["Airport_Code", "Weather_Timestamp"])
+    return stations, observations, rows
+
+
+def time_lookups(index: WeatherObservations, n_queries: int = 2000) -> dict:
+    """Single-lookup latency percentiles (uncached and cached) and batched per-lookup cost"""
+    rng = np.random.default_rng(3)
+    picks = rng.integers(0, len(index.stations), size=n_queries)
+    inputs = [{"Start_Lat": float(index.station_lat[i]) + 0.01, "Start_Lng": float(index.station_lng[i]) + 0.01,
+               "Year": int(rng.integers(2016, 2024)), "Month": int(rng.integers(1, 13)),
+               "Hour": int(rng.integers(0, 24))} for i in picks]
+
+    enricher = WeatherEnricher()
+    enricher.index = index
+    timings = {"cold": [], "warm": []}
+    for phase in timings:
+        for row in inputs:
+            start = time.perf_counter()
+            enricher.fill([dict(row)])
+            timings[phase].append((time.perf_counter() - start) * 1e6)
+
+    enricher = WeatherEnricher()
+    enricher.index = index
+    start = time.perf_counter()
+    enricher.fill([dict(row) for row in inputs])
+    batch_us = (time.perf_counter() - start) / len(inputs) * 1e6
+    return {
+        "single_p50_us": round(float(np.percentile(timings["cold"], 50)), 1),
+        "cached_p50_us": round(float(np.percentile(timings["warm"], 50)), 1),
+        "batch_us": round(batch_us, 1),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build the weather station index from the dataset")
+    parser.add_argument("--csv", default="US_Accidents_March23.csv", help="Dataset path (CSV or Parquet directory)")
+    parser.add_argument("--model-dir", default="MLT/ml", help="Directory the index is written to")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk")
+    parser.add_argument("--max-rows", type=int, default=None, help="Only read the first N rows")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("SafeStride Weather Index Builder")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    try:
+        stations, observations, rows = read_weather(args.csv, args.chunk_size, args.max_rows)
+    except (FileNotFoundError, ImportError, KeyError) as e:
+        print(f"✗ FAILURE: {e}")
+        return 1
+    if stations.empty:
+        print("✗ FAILURE: no rows with an Airport_Code and Weather_Timestamp")
+        return 1
+    print(f"  ✓ Read {rows:,} rows: {len(stations):,} stations, {len(observations):,} unique observations "
+          f"({time.perf_counter() - start:.1f}s)")
+
+    start = time.perf_counter()
+    index = WeatherObservations.build(stations, observations)
+    print(f"  ✓ Bucketed into {len(index.obs_keys):,} station hours and {len(index.clim_keys):,} "
+          f"climatology buckets ({time.perf_counter() - start:.1f}s)")
+
+    index.meta.update({"source": args.csv, "built_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+    path = weather_index_path(args.model_dir)
+    index.save(path)
+    size_mb = sum(f.stat().st_size for f in path.iterdir()) / 1024 ** 2
+
+    timings = time_lookups(WeatherObservations.load(path))
+    print(f"  ✓ Lookup: single p50 {timings['single_p50_us']:.0f} µs ({timings['cached_p50_us']:.0f} µs cached); "
+          f"batched {timings['batch_us']:.0f} µs/location")
+    print(f"  ✓ Wrote {path} ({size_mb:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,11 @@
+"""
+pytest configuration for the backend unit tests
+
+Run from bd/:  python -m pytest -q
+
+test_api.py, test_integration.py and test_predictions.py are manual scripts
+(they call a running server or load the full model at import time) and are
+run directly with python, not collected here.
+"""
+
+collect_ignore = ["test_api.py", "test_integration.py", "test_predictions.py"]
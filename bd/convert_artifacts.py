@@ -0,0 +1,151 @@
+"""
+Model Artifact Conversion Script
+
+Exports a joblib model generation in MLT/ml to the fast-loading formats used
+at startup (flat-array booster and scaler, native XGBoost booster, JSON
+feature list and metadata), then checks that the converted model reproduces
+the original predictions.
+
+The fused check compares the flat booster with the scaler folded into its
+split thresholds (SAFESTRIDE_FUSE_SCALER) against the unfused joblib
+scaler + model pipeline, on served features built from the dataset CSV (or on
+sampled inputs when the CSV is not available).
+
+Usage:
+    python convert_artifacts.py
+    python convert_artifacts.py --timestamp 20251118_162845 --model-dir MLT/ml
+    python convert_artifacts.py --csv US_Accidents_March23.csv --max-rows 1000000
+"""
+
+import argparse
+import sys
+import warnings
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from models.artifacts import FlatScaler, FlatTreeEnsemble, artifact_paths, export_artifacts, load_native_model
+from utils.dataset import DEFAULT_CHUNK_SIZE, iter_dataset_chunks, to_model_inputs
+from utils.preprocessing import FeaturePreprocessor
+
+
+def check_parity(model_dir: Path, timestamp: str, n_samples: int = 20000, tolerance: float = 1e-5) -> bool:
+    """Compare converted artifacts against the joblib originals on sampled inputs"""
+    import joblib
+
+    paths = artifact_paths(model_dir, timestamp)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = joblib.load(paths["model_joblib"])
+        scaler = joblib.load(paths["scaler_joblib"])
+    flat_model = FlatTreeEnsemble.load(paths["model_flat"])
+    flat_scaler = FlatScaler.load(paths["scaler_flat"])
+    native_model = load_native_model(paths["model_native"])
+
+    # Sample raw feature vectors around the training distribution
+    rng = np.random.default_rng(42)
+    raw = rng.normal(flat_scaler.mean_, flat_scaler.scale_, size=(n_samples, flat_scaler.n_features_in_))
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        scaled = scaler.transform(raw)
+    reference = model.predict_proba(scaled)[:, 1]
+
+    flat_scaled = flat_scaler.transform(raw)
+    checks = {
+        "scaler": np.abs(flat_scaled - scaled).max(),
+        "flat model": np.abs(flat_model.predict_proba(flat_scaled)[:, 1] - reference).max(),
+        "native model": np.abs(native_model.predict_proba(scaled)[:, 1] - reference).max(),
+    }
+
+    ok = True
+    for name, max_diff in checks.items():
+        passed = max_diff <= tolerance
+        ok = ok and passed
+        print(f"  {'✓' if passed else '✗'} {name}: max abs difference {max_diff:.2e}")
+    return ok
+
+
+def check_fused_parity(model_dir: Path, timestamp: str, csv_path: str, max_rows: Optional[int] = None,
+                       chunk_size: int = DEFAULT_CHUNK_SIZE, n_samples: int = 20000, tolerance: float = 1e-5) -> bool:
+    """Compare the scaler-fused flat model against the unfused joblib pipeline"""
+    import joblib
+
+    paths = artifact_paths(model_dir, timestamp)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = joblib.load(paths["model_joblib"])
+        scaler = joblib.load(paths["scaler_joblib"])
+    fused_model = FlatTreeEnsemble.load(paths["model_flat"]).fold_scaler(scaler.mean_, scaler.scale_)
+
+    if Path(csv_path).exists():
+        preprocessor = FeaturePreprocessor(list(joblib.load(paths["features_joblib"])))
+        batches = (
+            preprocessor.preprocess_batch(to_model_inputs(chunk)).to_numpy(dtype=np.float64)
+            for chunk in iter_dataset_chunks(csv_path, chunk_size=chunk_size, max_rows=max_rows)
+        )
+        source = f"dataset {csv_path}"
+    else:
+        rng = np.random.default_rng(7)
+        batches = [rng.normal(scaler.mean_, scaler.scale_, size=(n_samples, scaler.n_features_in_))]
+        source = f"{n_samples} sampled inputs ({csv_path} not found)"
+
+    rows, label_mismatches, max_diff = 0, 0, 0.0
+    for raw in batches:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            reference = model.predict_proba(scaler.transform(raw))[:, 1]
+        fused = fused_model.predict_proba(raw)[:, 1]
+        rows += len(raw)
+        label_mismatches += int(((fused > 0.5) != (reference > 0.5)).sum())
+        max_diff = max(max_diff, float(np.abs(fused - reference).max(initial=0.0)))
+
+    passed = rows > 0 and max_diff <= tolerance and label_mismatches == 0
+    print(f"  {'✓' if passed else '✗'} fused model on {source}: {rows:,} rows, "
+          f"max abs difference {max_diff:.2e}, {label_mismatches} label mismatches")
+    return passed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Convert SafeStride joblib artifacts to fast-loading formats")
+    parser.add_argument("--model-dir", default="MLT/ml", help="Directory containing the joblib artifacts")
+    parser.add_argument("--timestamp", default="20251118_162845", help="Model generation timestamp")
+    parser.add_argument("--skip-parity", action="store_true", help="Skip the prediction parity check")
+    parser.add_argument("--csv", default="US_Accidents_March23.csv", help="Dataset used for the fused parity check")
+    parser.add_argument("--max-rows", type=int, default=None, help="Only check the first N dataset rows")
+    args = parser.parse_args()
+
+    model_dir = Path(args.model_dir)
+
+    print("=" * 60)
+    print("SafeStride Artifact Conversion")
+    print("=" * 60)
+    print()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        written = export_artifacts(model_dir, args.timestamp)
+
+    for path in written.values():
+        print(f"  ✓ Wrote {path} ({path.stat().st_size / 1024:.1f} KB)")
+    print()
+
+    if args.skip_parity:
+        return 0
+
+    print("Checking prediction parity against joblib artifacts...")
+    ok = check_parity(model_dir, args.timestamp)
+    ok = check_fused_parity(model_dir, args.timestamp, args.csv, args.max_rows) and ok
+    if ok:
+        print()
+        print("✓ SUCCESS: Converted artifacts match the originals")
+        return 0
+
+    print()
+    print("✗ FAILURE: Converted artifacts do not match the originals")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Dataset Conversion Script
+
+One-time conversion of US_Accidents_March23.csv to a Parquet dataset
+partitioned by State and Year (State=CA/Year=2021/part-0.parquet), with typed
+columns and dictionary-encoded categoricals. Offline jobs accept the output
+directory wherever they take the CSV path (--csv), and read only the columns
+they need instead of re-parsing all 46 text columns:
+
+    python build_drift_reference.py --csv US_Accidents_March23.parquet
+    python train_model.py --csv US_Accidents_March23.parquet
+
+Requires pyarrow.
+
+Usage:
+    python convert_dataset.py --csv US_Accidents_March23.csv
+    python convert_dataset.py --csv US_Accidents_March23.csv --output /data/us_accidents.parquet
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from utils.dataset import (
+    DEFAULT_CHUNK_SIZE, DEFAULT_CSV_PATH, DEFAULT_PARQUET_PATH, MODEL_INPUT_COLUMNS,
+    convert_to_parquet, iter_dataset_chunks,
+)
+
+
+def _scan_seconds(path: str, chunk_size: int) -> float:
+    """Time a full pass over the model input columns"""
+    start = time.perf_counter()
+    for _ in iter_dataset_chunks(path, MODEL_INPUT_COLUMNS, chunk_size):
+        pass
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Convert the US Accidents CSV to a partitioned Parquet dataset")
+    parser.add_argument("--csv", default=DEFAULT_CSV_PATH, help="Path to the US Accidents CSV")
+    parser.add_argument("--output", default=DEFAULT_PARQUET_PATH, help="Output dataset directory")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk")
+    parser.add_argument("--max-rows", type=int, default=None, help="Only convert the first N rows")
+    parser.add_argument("--skip-benchmark", action="store_true", help="Skip the CSV vs Parquet scan timing")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("SafeStride Dataset Conversion")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    try:
+        result = convert_to_parquet(args.csv, args.output, args.chunk_size, args.max_rows)
+    except (FileNotFoundError, ImportError) as e:
+        print(f"✗ FAILURE: {e}")
+        return 1
+
+    files = list(Path(args.output).rglob("*.parquet"))
+    partitions = {path.parent for path in files}
+    size_mb = sum(path.stat().st_size for path in files) / 1024 ** 2
+    print(f"  ✓ Wrote {result['rows']:,} rows to {args.output}: {len(partitions)} partitions, "
+          f"{size_mb:.1f} MB ({time.perf_counter() - start:.1f}s)")
+
+    if not args.skip_benchmark and args.max_rows is None:
+        csv_s = _scan_seconds(args.csv, args.chunk_size)
+        parquet_s = _scan_seconds(args.output, args.chunk_size)
+        print(f"  ✓ Model input columns scan: CSV {csv_s:.1f}s, Parquet {parquet_s:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,38 @@
+# Cap the BLAS / OpenMP thread pools before NumPy and XGBoost load them
+from utils.inference_threads import cap_blas_threads, inference_threads
+cap_blas_threads()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import logging
-import sys
+import time
 
+from models.latency_budget import LATENCY_CALIBRATION, latency_budget
 from models.predictor import predictor
+from models.risk_cube import risk_cube
+from models.shadow import shadow_scorer
+from models.weather_index import weather_index
 from routes.prediction import router as prediction_router
+from routes.counterfactuals import router as counterfactuals_router
+from routes.history import router as history_router
+from routes.jobs import router as jobs_router
+from routes.live import router as live_router
+from routes.models import router as models_router
+from routes.monitoring import router as monitoring_router
+from routes.profiling import router as profiling_router
+from routes.stats import router as stats_router
+from utils.admission import APPROX_FALLBACK, AdmissionMiddleware, admission_controller
+from utils.batch_memory import BatchMemoryMiddleware
+from utils.drift_monitor import drift_monitor
+from utils.history_store import history_store
+from utils.job_queue import batch_jobs
+from utils.logging_utils import configure_logging, prediction_counters, stop_logging
+from utils.preprocessing import FeaturePreprocessor, get_default_features
+from utils.profiling import ProfilingMiddleware
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Configure logging (queue-backed; records are written by a background thread)
+configure_logging()
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +45,14 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Admission control / load shedding for the prediction routes (inside CORS so
+# 429/503 responses stay readable by browsers)
+app.add_middleware(AdmissionMiddleware)
+
+# Reject batch requests too large for the batch memory budget before they are
+# read into memory or take an admission slot
+app.add_middleware(BatchMemoryMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -33,17 +60,47 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-Id", "Retry-After"],
 )
 
+# Opt-in per-request Server-Timing breakdowns and sampling profiles
+app.add_middleware(ProfilingMiddleware)
+
 
 @app.on_event("startup")
 async def startup_event():
-    """Load ML models on application startup"""
+    """Load ML models and run a warm-up inference before reporting ready"""
     try:
+        start = time.perf_counter()
         logger.info("🚀 Starting SafeStride API...")
         logger.info("📦 Loading ML models...")
         predictor.load_models()
-        logger.info("✅ SafeStride API is ready!")
+        # Again for pools loaded with the model (e.g. XGBoost's OpenMP runtime)
+        inference_threads.configure(cap_blas_threads())
+        logger.info(f"🧵 Inference threads: {inference_threads.cores} per process, BLAS/OpenMP pools "
+                    f"capped at {inference_threads.blas['env']['OMP_NUM_THREADS']}")
+        
+        warmup_features = FeaturePreprocessor(predictor.feature_names).preprocess(get_default_features())
+        predictor.warmup(warmup_features)
+        # Answer would-be-shed interactive requests from the lookup surrogate
+        admission_controller.approximate_fallback = APPROX_FALLBACK and predictor.surrogate is not None
+        
+        # Background services
+        drift_monitor.configure_for_model(predictor.model_dir, predictor.timestamp,
+                                          predictor.feature_names, predictor.scaler)
+        risk_cube.configure_for_model(predictor.model_dir, predictor.timestamp)
+        weather_index.configure_for_model(predictor.model_dir)
+        if LATENCY_CALIBRATION:
+            latency_budget.start(predictor)
+        shadow_scorer.start()
+        history_store.open()
+        await history_store.start()
+        batch_jobs.open()
+        batch_jobs.start()
+        prediction_counters.start_summary(logging.getLogger("safestride.predictions"))
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"✅ SafeStride API is ready! (startup took {elapsed_ms:.0f} ms)")
     except Exception as e:
         logger.error(f"❌ Failed to load models: {str(e)}")
         raise
@@ -53,10 +110,24 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on application shutdown"""
     logger.info("👋 Shutting down SafeStride API...")
+    await history_store.stop()
+    # Waits for running jobs to reach a chunk boundary; they are re-queued
+    await asyncio.to_thread(batch_jobs.stop)
+    shadow_scorer.stop()
+    prediction_counters.stop_summary()
+    stop_logging()
 
 
 # Include routers
 app.include_router(prediction_router)
+app.include_router(counterfactuals_router)
+app.include_router(history_router)
+app.include_router(live_router)
+app.include_router(jobs_router)
+app.include_router(models_router)
+app.include_router(monitoring_router)
+app.include_router(profiling_router)
+app.include_router(stats_router)
 
 
 @app.get("/")
@@ -69,8 +140,19 @@ async def root():
         "endpoints": {
             "predict": "/api/predict",
             "batch_predict": "/api/batch-predict",
+            "counterfactuals": "/api/counterfactuals",
+            "jobs": "/api/jobs",
+            "models": "/api/models",
+            "routed_predict": "/api/models/predict",
+            "live": "ws /api/live",
             "health": "/api/health",
             "metrics": "/api/metrics",
+            "history": "/api/history",
+            "stats": "/api/stats",
+            "drift": "/api/drift",
+            "shadow": "/api/shadow",
+            "admission": "/api/admission",
+            "profiles": "/api/profiles/{profile_id}",
             "docs": "/docs"
         }
     }
@@ -0,0 +1,301 @@
+"""
+SafeStride Artifact Formats
+
+Fast-loading alternatives to the joblib pickles in MLT/ml. The joblib files
+need scikit-learn, xgboost and joblib at import time (well over a second on a
+cold process), so `convert_artifacts.py` exports each model generation to:
+
+- US_Accidents_Predictor_Model_*.npz: booster flattened to node arrays (numpy only)
+- US_Accidents_Predictor_Model_*.ubj: booster in XGBoost's native UBJSON format
+- US_Accidents_Scaler_*.npz: StandardScaler mean/scale vectors
+- US_Accidents_Features_*.json: feature names in training order
+- US_Accidents_Metadata_*.json: model performance metrics
+
+The flat formats are evaluated with plain numpy and reproduce the XGBoost and
+StandardScaler outputs to float32 precision.
+"""
+
+import json
+import math
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class FlatScaler:
+    """StandardScaler replacement backed by two flat arrays"""
+
+    def __init__(self, mean: np.ndarray, scale: np.ndarray):
+        self.mean_ = np.asarray(mean, dtype=np.float64)
+        self.scale_ = np.asarray(scale, dtype=np.float64)
+        self.n_features_in_ = len(self.mean_)
+
+    def transform(self, X) -> np.ndarray:
+        """Standardize features exactly like StandardScaler.transform"""
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+    @classmethod
+    def from_sklearn(cls, scaler) -> "FlatScaler":
+        n_features = scaler.n_features_in_
+        mean = scaler.mean_ if getattr(scaler, "with_mean", True) and scaler.mean_ is not None else np.zeros(n_features)
+        scale = scaler.scale_ if getattr(scaler, "with_std", True) and scaler.scale_ is not None else np.ones(n_features)
+        return cls(mean, scale)
+
+    def save(self, path: Path):
+        np.savez(path, mean=self.mean_, scale=self.scale_)
+
+    @classmethod
+    def load(cls, path: Path) -> "FlatScaler":
+        with np.load(path) as data:
+            return cls(data["mean"], data["scale"])
+
+
+class FlatTreeEnsemble:
+    """
+    Binary-logistic gradient boosted trees stored as flat node arrays
+
+    All trees are concatenated into one set of arrays; `roots` holds the index
+    of each tree's root node. Leaves point to themselves, so every row can be
+    advanced `max_depth` times in lockstep without branching.
+    """
+
+    ARRAYS = ("feature", "threshold", "left", "right", "default_left", "value", "roots")
+
+    def __init__(self, feature, threshold, left, right, default_left, value, roots,
+                 base_margin: float, max_depth: int):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        # float32 like XGBoost; float64 once a scaler has been folded in
+        threshold = np.asarray(threshold)
+        self.threshold = threshold if threshold.dtype == np.float64 else threshold.astype(np.float32)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.value = np.asarray(value, dtype=np.float32)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.base_margin = float(base_margin)
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(self.feature.max()) + 1 if len(self.feature) else 0
+        self.classes_ = np.array([0, 1])
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def leaf_indices(self, X, n_trees: Optional[int] = None) -> np.ndarray:
+        """Return the leaf node reached in every tree (or the first n_trees), shape (n_rows, n_trees)"""
+        X = np.asarray(X, dtype=self.threshold.dtype)
+        roots = self.roots[:n_trees]
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(roots, (X.shape[0], len(roots))).copy()
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = np.where(np.isnan(x), self.default_left[nodes], x < self.threshold[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_margin(self, X, n_trees: Optional[int] = None) -> np.ndarray:
+        leaves = self.leaf_indices(X, n_trees)
+        return self.base_margin + self.value[leaves].sum(axis=1, dtype=np.float64)
+
+    def predict_proba(self, X, n_trees: Optional[int] = None) -> np.ndarray:
+        """[P(Low Risk), P(High Risk)] per row; n_trees evaluates only the first boosting rounds"""
+        prob_high = 1.0 / (1.0 + np.exp(-self.predict_margin(X, n_trees)))
+        return np.column_stack([1.0 - prob_high, prob_high])
+
+    def predict(self, X) -> np.ndarray:
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(int)
+
+    def fold_scaler(self, mean: np.ndarray, scale: np.ndarray) -> "FlatTreeEnsemble":
+        """
+        Return a copy that takes raw (unscaled) features
+
+        Splits are invariant under a per-feature increasing affine transform,
+        (x - mean) / scale < t  <=>  x < t * scale + mean  for scale > 0, so the
+        scaler can be folded into the thresholds once and skipped at inference.
+        XGBoost's hist splits sit exactly on observed (scaled) values, so each
+        raw threshold is the exact float64 boundary of the float32 comparison
+        the unfused pipeline makes rather than the rounded product above.
+        """
+        mean = np.asarray(mean, dtype=np.float64)
+        scale = np.asarray(scale, dtype=np.float64)
+        if np.any(scale <= 0):
+            raise ValueError("Cannot fold a scaler with non-positive scale")
+        threshold = _raw_thresholds(self.threshold, mean[self.feature], scale[self.feature])
+        return FlatTreeEnsemble(
+            self.feature, threshold, self.left, self.right, self.default_left, self.value, self.roots,
+            base_margin=self.base_margin, max_depth=self.max_depth,
+        )
+
+    @classmethod
+    def from_booster(cls, booster) -> "FlatTreeEnsemble":
+        """Flatten an xgboost Booster (gbtree, binary:logistic) into node arrays"""
+        learner = json.loads(booster.save_raw("json"))["learner"]
+        objective = learner["objective"]["name"]
+        gbm = learner["gradient_booster"]
+        if objective != "binary:logistic" or gbm["name"] != "gbtree":
+            raise ValueError(f"Unsupported booster for flat export: {gbm['name']} / {objective}")
+
+        base_score = float(learner["learner_model_param"]["base_score"])
+        base_margin = math.log(base_score / (1.0 - base_score))
+
+        columns: Dict[str, List[np.ndarray]] = {name: [] for name in cls.ARRAYS}
+        offset = 0
+        max_depth = 0
+        for tree in gbm["model"]["trees"]:
+            left = np.asarray(tree["left_children"], dtype=np.int64)
+            right = np.asarray(tree["right_children"], dtype=np.int64)
+            is_leaf = left == -1
+            own = np.arange(len(left))
+            columns["feature"].append(np.where(is_leaf, 0, tree["split_indices"]))
+            columns["threshold"].append(np.where(is_leaf, 0.0, tree["split_conditions"]).astype(np.float32))
+            columns["left"].append(np.where(is_leaf, own, left) + offset)
+            columns["right"].append(np.where(is_leaf, own, right) + offset)
+            columns["default_left"].append(np.asarray(tree["default_left"], dtype=bool))
+            # XGBoost stores the leaf weight in split_conditions for leaf nodes
+            columns["value"].append(np.where(is_leaf, tree["split_conditions"], 0.0))
+            columns["roots"].append(np.array([offset]))
+            max_depth = max(max_depth, _tree_depth(left, right))
+            offset += len(left)
+
+        arrays = {name: np.concatenate(parts) for name, parts in columns.items()}
+        return cls(**arrays, base_margin=base_margin, max_depth=max_depth)
+
+    def save(self, path: Path):
+        np.savez(
+            path,
+            **{name: getattr(self, name) for name in self.ARRAYS},
+            base_margin=np.array(self.base_margin),
+            max_depth=np.array(self.max_depth),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "FlatTreeEnsemble":
+        with np.load(path) as data:
+            return cls(
+                **{name: data[name] for name in cls.ARRAYS},
+                base_margin=float(data["base_margin"]),
+                max_depth=int(data["max_depth"]),
+            )
+
+
+def _tree_depth(left: np.ndarray, right: np.ndarray) -> int:
+    """Depth of a single tree given its child index arrays"""
+    depth = 0
+    frontier = [0]
+    while True:
+        children = [c for n in frontier for c in (left[n], right[n]) if c != -1]
+        if not children:
+            return depth
+        depth += 1
+        frontier = children
+
+
+def _raw_thresholds(threshold: np.ndarray, mean: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    """
+    Smallest raw value per node whose scaled float32 value is >= the threshold
+
+    With T returned for threshold t, x < T exactly when
+    float32((x - mean) / scale) < t, matching StandardScaler followed by
+    XGBoost. Found by bracketing t * scale + mean and bisecting to adjacent
+    float64 values, vectorized over all nodes.
+    """
+    threshold = np.asarray(threshold, dtype=np.float32)
+
+    def at_or_above(x):
+        return ((x - mean) / scale).astype(np.float32) >= threshold
+
+    guess = threshold.astype(np.float64) * scale + mean
+    step = scale * (np.abs(threshold) + 1.0) * 1e-6
+    lo, hi = guess - step, guess + step
+    while True:
+        low_bad, high_bad = at_or_above(lo), ~at_or_above(hi)
+        if not (low_bad.any() or high_bad.any()):
+            break
+        step = step * 2
+        lo = np.where(low_bad, guess - step, lo)
+        hi = np.where(high_bad, guess + step, hi)
+
+    for _ in range(200):
+        mid = lo + (hi - lo) / 2
+        open_gap = (mid > lo) & (mid < hi)
+        if not open_gap.any():
+            break
+        above = at_or_above(mid)
+        hi = np.where(open_gap & above, mid, hi)
+        lo = np.where(open_gap & ~above, mid, lo)
+    return hi
+
+
+def artifact_paths(model_dir: Path, timestamp: str) -> Dict[str, Path]:
+    """Paths of every artifact for one model generation, joblib and fast formats"""
+    return {
+        "model_joblib": model_dir / f"US_Accidents_Predictor_Model_{timestamp}.joblib",
+        "scaler_joblib": model_dir / f"US_Accidents_Scaler_{timestamp}.joblib",
+        "features_joblib": model_dir / f"US_Accidents_Features_{timestamp}.joblib",
+        "metadata_joblib": model_dir / f"US_Accidents_Metadata_{timestamp}.joblib",
+        "model_flat": model_dir / f"US_Accidents_Predictor_Model_{timestamp}.npz",
+        "model_native": model_dir / f"US_Accidents_Predictor_Model_{timestamp}.ubj",
+        "scaler_flat": model_dir / f"US_Accidents_Scaler_{timestamp}.npz",
+        "features_json": model_dir / f"US_Accidents_Features_{timestamp}.json",
+        "metadata_json": model_dir / f"US_Accidents_Metadata_{timestamp}.json",
+    }
+
+
+def load_json(path: Path) -> Any:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_native_model(path: Path):
+    """Load a native UBJSON booster into an XGBClassifier (imports xgboost)"""
+    from xgboost import XGBClassifier
+
+    model = XGBClassifier()
+    model.load_model(path)
+    return model
+
+
+def export_artifacts(model_dir: Path, timestamp: str) -> Dict[str, Path]:
+    """
+    Convert one joblib model generation into the fast-loading formats
+
+    Args:
+        model_dir: Directory containing the US_Accidents_*.joblib files
+        timestamp: Generation timestamp, e.g. "20251118_162845"
+
+    Returns:
+        Dictionary of written artifact paths
+    """
+    import joblib
+
+    paths = artifact_paths(Path(model_dir), timestamp)
+    model = joblib.load(paths["model_joblib"])
+    scaler = joblib.load(paths["scaler_joblib"])
+    feature_names = list(joblib.load(paths["features_joblib"]))
+    metadata = joblib.load(paths["metadata_joblib"])
+
+    booster = model.get_booster()
+    FlatTreeEnsemble.from_booster(booster).save(paths["model_flat"])
+    model.save_model(paths["model_native"])
+    FlatScaler.from_sklearn(scaler).save(paths["scaler_flat"])
+
+    with open(paths["features_json"], "w", encoding="utf-8") as f:
+        json.dump(feature_names, f, indent=2)
+    with open(paths["metadata_json"], "w", encoding="utf-8") as f:
+        json.dump(_jsonable(metadata), f, indent=2)
+
+    return {name: path for name, path in paths.items() if not name.endswith("_joblib")}
+
+
+def _jsonable(value: Any) -> Any:
+    """Recursively convert numpy scalars and non-string keys for JSON output"""
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value
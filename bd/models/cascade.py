@@ -0,0 +1,161 @@
+"""
+SafeStride Cascade - a distilled first stage in front of the full booster
+
+Most inputs are clearly Low Risk or clearly High Risk. In cascade mode
+(SAFESTRIDE_CASCADE=1) a small boosted model distilled from the served
+model's own P(High Risk) scores every row of a batch first; only rows whose
+first-stage probability falls inside the uncertainty band go on to the full
+200-tree booster, so those rows get exactly the served answer and the rest
+keep the first-stage probability.
+
+- First stage: a few shallow trees (FlatTreeEnsemble, numpy only) trained by
+  build_cascade.py on raw (unscaled) features against the full model's
+  probabilities, so the confident rows skip the scaler too
+- Band: chosen per tail by build_cascade.py so the confident rows disagree
+  with the full model's decision on at most --max-disagreement of the
+  calibration rows; the escalation rate and decision agreement measured on
+  held-out rows ship inside the artifact
+- Online audit: a sample of the confident rows (SAFESTRIDE_CASCADE_AUDIT_RATE)
+  is sent to the full model as well and answered by it, which measures the
+  live agreement; /api/metrics publishes it with the escalation rate
+- Batches smaller than SAFESTRIDE_CASCADE_MIN_ROWS skip the cascade: a
+  single row costs a fixed numpy overhead per tree level either way, and the
+  escalated ones would pay for both stages
+
+predict_risk() (risk cube, counterfactual search) always uses the full model.
+
+Settings (environment variables):
+    SAFESTRIDE_CASCADE              1 = load the cascade and use it for batches, 0 = off (default)
+    SAFESTRIDE_CASCADE_BAND         "low,high" band overriding the built one, e.g. "0.15,0.85"
+    SAFESTRIDE_CASCADE_AUDIT_RATE   fraction of confident rows also scored by the full model (0.01)
+    SAFESTRIDE_CASCADE_MIN_ROWS     smallest batch the cascade is used for (32)
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from models.artifacts import FlatTreeEnsemble
+
+
+def _parse_band(value: Optional[str]) -> Optional[Tuple[float, float]]:
+    if not value:
+        return None
+    low, high = (float(part) for part in value.split(","))
+    if not 0.0 <= low <= 0.5 <= high <= 1.0:
+        raise ValueError(f"SAFESTRIDE_CASCADE_BAND must satisfy 0 <= low <= 0.5 <= high <= 1, got {value!r}")
+    return low, high
+
+
+CASCADE_BAND = _parse_band(os.getenv("SAFESTRIDE_CASCADE_BAND"))
+CASCADE_AUDIT_RATE = float(os.getenv("SAFESTRIDE_CASCADE_AUDIT_RATE", "0.01"))
+CASCADE_MIN_ROWS = int(os.getenv("SAFESTRIDE_CASCADE_MIN_ROWS", "32"))
+
+CASCADE_VERSION = 1
+DECISION_THRESHOLD = 0.5
+
+
+def cascade_path(model_dir: Path, timestamp: str) -> Path:
+    return Path(model_dir) / f"US_Accidents_Cascade_{timestamp}.npz"
+
+
+class CascadeModel:
+    """First-stage model, uncertainty band and live escalation / agreement counters"""
+
+    def __init__(self, stage_one: FlatTreeEnsemble, band: Tuple[float, float], metrics: Dict[str, Any],
+                 audit_rate: float = 0.0):
+        self.stage_one = stage_one
+        self.band = (float(band[0]), float(band[1]))
+        self.metrics = metrics
+        self.audit_rate = audit_rate
+        self._lock = threading.Lock()
+        self._rng = np.random.default_rng()
+        self.rows = 0
+        self.escalated = 0
+        self.audited = 0
+        self.audit_agreed = 0
+
+    def predict_proba_high(self, X: np.ndarray) -> np.ndarray:
+        """First-stage P(High Risk) for raw feature rows"""
+        return 1.0 / (1.0 + np.exp(-self.stage_one.predict_margin(X)))
+
+    def route(self, prob_high: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows for the full model
+
+        Returns:
+            (in_band, audited) boolean masks: rows inside the uncertainty
+            band, and the sampled confident rows scored again for the audit
+        """
+        low, high = self.band
+        in_band = (prob_high >= low) & (prob_high <= high)
+        if self.audit_rate <= 0:
+            return in_band, np.zeros_like(in_band)
+        with self._lock:
+            sample = self._rng.random(len(prob_high)) < self.audit_rate
+        return in_band, sample & ~in_band
+
+    def record(self, stage_one: np.ndarray, full: np.ndarray, in_band: np.ndarray, audited: np.ndarray):
+        """
+        Count one batch
+
+        Args:
+            stage_one: First-stage P(High Risk) of every row
+            full: Full-model P(High Risk) of the rows in in_band | audited
+            in_band / audited: Masks returned by route()
+        """
+        checked = audited[in_band | audited]
+        agreed = (stage_one[audited] > DECISION_THRESHOLD) == (full[checked] > DECISION_THRESHOLD)
+        with self._lock:
+            self.rows += len(stage_one)
+            self.escalated += int(in_band.sum())
+            self.audited += int(audited.sum())
+            self.audit_agreed += int(agreed.sum())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            escalation_rate = self.escalated / self.rows if self.rows else None
+            audit_agreement = self.audit_agreed / self.audited if self.audited else None
+            # Escalated rows get the full model's answer, so only confident rows can disagree
+            agreement = (escalation_rate + (1 - escalation_rate) * audit_agreement
+                         if escalation_rate is not None and audit_agreement is not None else None)
+            return {
+                "band": [round(edge, 4) for edge in self.band],
+                "stage_one_trees": self.stage_one.n_trees,
+                "rows": self.rows,
+                "escalated": self.escalated,
+                "escalation_rate": round(escalation_rate, 4) if escalation_rate is not None else None,
+                "audited": self.audited,
+                "audit_agreement": round(audit_agreement, 5) if audit_agreement is not None else None,
+                "estimated_agreement": round(agreement, 5) if agreement is not None else None,
+                "built": self.metrics,
+            }
+
+    def save(self, path: Path):
+        np.savez_compressed(
+            path,
+            **{name: getattr(self.stage_one, name) for name in FlatTreeEnsemble.ARRAYS},
+            base_margin=np.array(self.stage_one.base_margin),
+            max_depth=np.array(self.stage_one.max_depth),
+            band=np.array(self.band),
+            version=np.array(CASCADE_VERSION),
+            metrics=np.array(json.dumps(self.metrics)),
+        )
+
+    @classmethod
+    def load(cls, path: Path, band: Optional[Tuple[float, float]] = None,
+             audit_rate: float = 0.0) -> "CascadeModel":
+        """Load a cascade; band overrides the built one"""
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) != CASCADE_VERSION:
+                raise ValueError(f"Cascade version {int(data['version'])} != {CASCADE_VERSION}; rebuild it")
+            stage_one = FlatTreeEnsemble(
+                **{name: data[name] for name in FlatTreeEnsemble.ARRAYS},
+                base_margin=float(data["base_margin"]),
+                max_depth=int(data["max_depth"]),
+            )
+            return cls(stage_one, band or tuple(data["band"]), json.loads(str(data["metrics"])), audit_rate)
@@ -0,0 +1,247 @@
+"""
+SafeStride Counterfactual Search - "what change would lower this risk"
+
+Finds the smallest changes to the controllable inputs of a High Risk
+prediction that bring P(High Risk) under the decision threshold, for
+`/api/counterfactuals`:
+
+- Factors: the hour and day of the trip, the street type (highway / main
+  street / local street) and the road features at the location (crossing,
+  junction, traffic signal, stop sign). Location and weather are fixed
+- A candidate is a set of (factor, value) changes; its size is the number of
+  factors changed and its distance the sum of per-factor step sizes (hours
+  and days are circular, everything else counts 1)
+- The input and every single change are preprocessed once; each factor
+  drives its own features, so any candidate's feature row is the input's
+  with the features of its changes patched in (array copies, no further
+  preprocessing)
+- Best-first search: candidates are expanded in order of (size, P(High
+  Risk)), a beam of parents at a time, and all their children (one more
+  factor changed) are scored as one batch. Candidates below
+  the threshold are answers and are not expanded; supersets of an answer and
+  candidates larger than the smallest answer are never scored
+- The search stops when the smallest answers are complete, max_changes is
+  reached, or the time budget runs out (then "complete" is false and the
+  answers are the best found so far)
+
+Changing the hour re-derives Sunrise_Sunset and re-looks-up weather fields
+that were filled from the weather index, so candidates stay consistent.
+"""
+
+import heapq
+import time
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from models.weather_index import weather_index
+from utils.preprocessing import (
+    FIELD_DEPENDENCIES, SUNRISE_SUNSET_FEATURES, FeaturePreprocessor, _HIGHWAY_RE, _MAIN_STREET_RE,
+)
+
+DECISION_THRESHOLD = 0.5  # labels are P(High Risk) > 0.5
+BEAM_WIDTH = 16  # parents expanded per scored batch
+MAX_BATCH_ROWS = 4096
+
+# Street text standing in for each street type (matches the preprocessing markers)
+STREET_TYPES = {"highway": "Highway", "main_street": "Main Street", "local_street": "Local Street"}
+
+# Controllable factors: input field and candidate values
+FACTORS: Dict[str, Tuple[str, List[Any]]] = {
+    "hour": ("Hour", list(range(24))),
+    "day_of_week": ("Day_of_Week", list(range(7))),
+    "street_type": ("Street", list(STREET_TYPES)),
+    "crossing": ("Crossing", [0, 1]),
+    "junction": ("Junction", [0, 1]),
+    "traffic_signal": ("Traffic_Signal", [0, 1]),
+    "stop": ("Stop", [0, 1]),
+}
+CYCLES = {"hour": 24, "day_of_week": 7}
+
+Candidate = FrozenSet[Tuple[str, Any]]
+
+
+def street_type(street: Any) -> str:
+    text = "" if street is None else str(street).upper()
+    if _HIGHWAY_RE.search(text):
+        return "highway"
+    if _MAIN_STREET_RE.search(text):
+        return "main_street"
+    return "local_street"
+
+
+def _step(factor: str, current: Any, value: Any) -> int:
+    if factor in CYCLES:
+        diff = abs(int(value) - int(current)) % CYCLES[factor]
+        return min(diff, CYCLES[factor] - diff)
+    return 1
+
+
+class CounterfactualSearch:
+    """Best-first search over changes to one input"""
+
+    def __init__(self, predictor, input_data: Dict[str, Any], weather_fields: Iterable[str] = (),
+                 factors: Optional[List[str]] = None):
+        """
+        Args:
+            predictor: Loaded SafeStridePredictor
+            input_data: Complete, validated raw input
+            weather_fields: Weather fields that were filled from the weather
+                index (looked up again when the hour changes)
+            factors: Factors that may change (default: all of FACTORS)
+        """
+        unknown = sorted(set(factors or []) - set(FACTORS))
+        if unknown:
+            raise ValueError(f"Unknown factors: {', '.join(unknown)} (choose from {', '.join(FACTORS)})")
+        self.predictor = predictor
+        self.preprocessor = FeaturePreprocessor(predictor.feature_names)
+        self.input_data = dict(input_data)
+        self.weather_fields = list(weather_fields)
+        self.factors = [name for name in FACTORS if not factors or name in factors]
+        self.current = {name: self._current(name) for name in self.factors}
+        self.scored = 0
+        self._base: Optional[np.ndarray] = None
+
+    def _current(self, factor: str) -> Any:
+        field = FACTORS[factor][0]
+        if factor == "street_type":
+            return street_type(self.input_data.get(field))
+        return int(self.input_data.get(field) or 0)
+
+    def _apply(self, candidate: Candidate) -> Dict[str, Any]:
+        row = dict(self.input_data)
+        for factor, value in candidate:
+            field = FACTORS[factor][0]
+            row[field] = STREET_TYPES[value] if factor == "street_type" else value
+            if factor == "hour":
+                row["Sunrise_Sunset"] = None
+                for weather_field in self.weather_fields:
+                    row[weather_field] = None
+        return row
+
+    def _prepare(self):
+        """
+        Feature values of every single change, from one preprocessing pass
+
+        Each factor drives its own set of features (FIELD_DEPENDENCIES), so a
+        candidate's features are the input's with each change's features
+        patched in; no further preprocessing is needed while searching.
+        """
+        singles = [(factor, value) for factor in self.factors
+                   for value in FACTORS[factor][1] if value != self.current[factor]]
+        rows = [self._apply(frozenset([change])) for change in singles] + [dict(self.input_data)]
+        refill = [row for row in rows if any(row.get(field) is None for field in self.weather_fields)]
+        if refill:
+            weather_index.fill(refill)
+            for row in refill:
+                for field in self.weather_fields:
+                    if row.get(field) is None:
+                        row[field] = self.input_data.get(field)
+        features = self.preprocessor.preprocess_batch(rows).to_numpy(dtype=np.float64)
+        self._patches = features[:-1]
+        self._base = features[-1]
+        self._patch_rows = {change: i for i, change in enumerate(singles)}
+
+        index = {name: j for j, name in enumerate(self.preprocessor.feature_names)}
+        self._columns = {}
+        for factor in self.factors:
+            field = FACTORS[factor][0]
+            names = list(FIELD_DEPENDENCIES.get(field, [field]))
+            if factor == "hour":
+                names += SUNRISE_SUNSET_FEATURES
+                for weather_field in self.weather_fields:
+                    names += FIELD_DEPENDENCIES.get(weather_field, [weather_field])
+            self._columns[factor] = np.array(sorted({index[name] for name in names if name in index}), dtype=np.int64)
+
+    def score(self, candidates: List[Candidate]) -> np.ndarray:
+        """P(High Risk) of each candidate, in one inference pass"""
+        if self._base is None:
+            self._prepare()
+        features = np.repeat(self._base[None, :], len(candidates), axis=0)
+        for factor in self.factors:
+            rows, patches = [], []
+            for i, candidate in enumerate(candidates):
+                for change in candidate:
+                    if change[0] == factor:
+                        rows.append(i)
+                        patches.append(self._patch_rows[change])
+            if rows:
+                columns = self._columns[factor]
+                features[np.asarray(rows)[:, None], columns] = self._patches[np.asarray(patches)][:, columns]
+        self.scored += len(candidates)
+        return self.predictor.predict_risk(pd.DataFrame(features, columns=self.preprocessor.feature_names))
+
+    def _children(self, parent: Candidate) -> List[Candidate]:
+        changed = {factor for factor, _ in parent}
+        return [parent | {(factor, value)}
+                for factor in self.factors if factor not in changed
+                for value in FACTORS[factor][1] if value != self.current[factor]]
+
+    def describe(self, candidate: Candidate, probability: float) -> Dict[str, Any]:
+        changes = sorted(candidate, key=lambda change: list(FACTORS).index(change[0]))
+        return {
+            "changes": [{"factor": factor, "field": FACTORS[factor][0], "from": self.current[factor], "to": value}
+                        for factor, value in changes],
+            "size": len(candidate),
+            "distance": sum(_step(factor, self.current[factor], value) for factor, value in candidate),
+            "probability_high": round(float(probability), 4),
+        }
+
+    def run(self, max_changes: int = 2, limit: int = 5, budget_ms: float = 250.0,
+            threshold: float = DECISION_THRESHOLD) -> Dict[str, Any]:
+        """
+        Search for the smallest changes that bring P(High Risk) to or below threshold
+
+        Returns:
+            probability_high of the input, counterfactuals (smallest first,
+            then by distance and probability; at most `limit`), candidates
+            scored, and whether the search completed within the budget
+        """
+        deadline = time.perf_counter() + budget_ms / 1000.0
+        base = float(self.score([frozenset()])[0])
+        answers: List[Tuple[Candidate, float]] = []
+        result = {"probability_high": round(base, 4), "threshold": threshold, "factors": self.factors}
+        if base <= threshold:
+            return {**result, "counterfactuals": [], "candidates_scored": self.scored, "complete": True}
+
+        # (size, P(High Risk), tie-breaker, candidate); the smallest, most promising parents first
+        frontier: List[Tuple[int, float, int, Candidate]] = [(0, base, 0, frozenset())]
+        seen = {frozenset()}
+        best_size = max_changes
+        complete = True
+        counter = 1
+        while frontier and frontier[0][0] < best_size:
+            if time.perf_counter() >= deadline:
+                complete = False
+                break
+            parents = []
+            while frontier and frontier[0][0] < best_size and len(parents) < BEAM_WIDTH:
+                parents.append(heapq.heappop(frontier)[3])
+            children = []
+            for parent in parents:
+                for child in self._children(parent):
+                    if child in seen or any(answer <= child for answer, _ in answers):
+                        continue
+                    seen.add(child)
+                    children.append(child)
+            for start in range(0, len(children), MAX_BATCH_ROWS):
+                batch = children[start:start + MAX_BATCH_ROWS]
+                for child, probability in zip(batch, self.score(batch)):
+                    if probability <= threshold:
+                        answers.append((child, float(probability)))
+                        best_size = min(best_size, len(child))
+                    elif len(child) < max_changes:
+                        heapq.heappush(frontier, (len(child), float(probability), counter, child))
+                        counter += 1
+                if time.perf_counter() >= deadline and start + MAX_BATCH_ROWS < len(children):
+                    complete = False
+                    break
+            if not complete:
+                break
+
+        ranked = sorted((self.describe(candidate, probability) for candidate, probability in answers
+                         if len(candidate) == best_size),
+                        key=lambda answer: (answer["size"], answer["distance"], answer["probability_high"]))
+        return {**result, "counterfactuals": ranked[:limit], "candidates_scored": self.scored,
+                "complete": complete}
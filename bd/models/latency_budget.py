@@ -0,0 +1,183 @@
+"""
+SafeStride Latency Budget - fewer boosting rounds under a deadline
+
+Callers with a hard deadline (e.g. in-vehicle alerting) send `budget_ms` with
+/api/predict, or the server applies SAFESTRIDE_LATENCY_BUDGET_MS to every
+request without one. The prediction then evaluates only the first K boosting
+rounds of the model, K being the most rounds expected to finish in the time
+left; the response reports K.
+
+- Calibration table, built in a background thread once the model is loaded
+  and warmed up (budgets are ignored until it is ready): for a ladder
+  of round counts (ROUND_LADDER, plus all of the model's rounds) the p90
+  latency of a single-row predict(), and the accuracy lost against all rounds
+  on CALIBRATION_ROWS sampled inputs (mean / max absolute error of
+  P(High Risk), decision agreement). Preprocessing one row is timed too and
+  counted as a fixed cost
+- Time left = budget - time since the request reached admission control
+  (queueing included) - preprocessing. The entry with the most rounds whose
+  latency, scaled by the observed slowdown, fits is used
+- Slowdown: moving average of observed / calibrated latency (never below 1),
+  so when the CPU is contended requests drop to fewer rounds instead of
+  missing their deadline
+- When not even the smallest entry fits, the lookup surrogate answers
+  (approximate mode) if it is loaded, else the smallest entry is used
+
+Tree evaluation is only a small part of a single-row prediction with the
+flat booster (preprocessing and result assembly dominate), so there the
+table is nearly flat and budgets mostly choose between all rounds and the
+surrogate; fewer rounds pay off with larger models or the native booster.
+
+Settings (environment variables):
+    SAFESTRIDE_LATENCY_BUDGET_MS    default budget for /api/predict requests without one (0 = none)
+    SAFESTRIDE_LATENCY_CALIBRATION  1 = build the calibration table at startup (default), 0 = budgets ignored
+"""
+
+import logging
+import os
+import threading
+import time
+import warnings
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from utils.preprocessing import FeaturePreprocessor, sample_inputs
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUDGET_MS = float(os.getenv("SAFESTRIDE_LATENCY_BUDGET_MS", "0"))
+LATENCY_CALIBRATION = os.getenv("SAFESTRIDE_LATENCY_CALIBRATION", "1") == "1"
+
+ROUND_LADDER = [5, 10, 20, 30, 50, 75, 100, 150]
+CALIBRATION_ROWS = 2000
+CALIBRATION_REPEATS = 30  # single-row predictions timed per entry
+LATENCY_PERCENTILE = 90
+SLOWDOWN_ALPHA = 0.1
+
+
+class LatencyBudget:
+    """Rounds calibration table, round selection and deadline counters"""
+
+    def __init__(self):
+        self.table: List[Dict[str, Any]] = []
+        self.preprocess_ms = 0.0
+        self.calibration_ms = None
+        self._slowdown = 1.0
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "truncated": 0, "approximate": 0, "deadline_missed": 0}
+
+    @property
+    def calibrated(self) -> bool:
+        return bool(self.table)
+
+    @property
+    def slowdown(self) -> float:
+        return max(1.0, self._slowdown)
+
+    def calibrate(self, predictor) -> float:
+        """
+        Build the calibration table for a loaded predictor
+
+        Returns:
+            Calibration duration in milliseconds
+        """
+        start = time.perf_counter()
+        preprocessor = FeaturePreprocessor(predictor.feature_names)
+        inputs = sample_inputs(CALIBRATION_ROWS, seed=23)
+        records = inputs.iloc[:CALIBRATION_REPEATS].to_dict("records")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            features_df = preprocessor.preprocess_batch(inputs)
+            full = predictor.predict_risk(features_df)
+
+            timings = []
+            for record in records:
+                begin = time.perf_counter()
+                preprocessor.preprocess(record)
+                timings.append((time.perf_counter() - begin) * 1000)
+            preprocess_ms = float(np.percentile(timings, LATENCY_PERCENTILE))
+
+            table = []
+            for rounds in sorted({r for r in ROUND_LADDER if r < predictor.n_rounds} | {predictor.n_rounds}):
+                truncated = predictor.predict_risk(features_df, rounds=rounds)
+                error = np.abs(truncated - full)
+                agreement = float(((truncated > 0.5) == (full > 0.5)).mean())
+                timings = []
+                for i in range(CALIBRATION_REPEATS):
+                    row = features_df.iloc[i:i + 1]
+                    begin = time.perf_counter()
+                    predictor.predict(row, rounds=rounds)
+                    timings.append((time.perf_counter() - begin) * 1000)
+                table.append({
+                    "rounds": rounds,
+                    "latency_ms": round(float(np.percentile(timings, LATENCY_PERCENTILE)), 4),
+                    "mean_abs_error": round(float(error.mean()), 5),
+                    "max_abs_error": round(float(error.max()), 5),
+                    "decision_agreement": round(agreement, 5),
+                })
+
+        # More rounds never run faster; smooth out timing noise so fewer rounds are only
+        # chosen when they actually save time
+        for previous, entry in zip(table, table[1:]):
+            entry["latency_ms"] = max(entry["latency_ms"], previous["latency_ms"])
+
+        with self._lock:
+            self.table = table
+            self.preprocess_ms = round(preprocess_ms, 4)
+            self._slowdown = 1.0
+            self.calibration_ms = round((time.perf_counter() - start) * 1000, 1)
+        return self.calibration_ms
+
+    def start(self, predictor) -> threading.Thread:
+        """Calibrate in a daemon thread, so startup does not wait for the timing runs"""
+        def run():
+            try:
+                calibration_ms = self.calibrate(predictor)
+                logger.info(f"⏱️ Latency budget calibrated over {len(self.table)} round counts "
+                            f"({calibration_ms:.0f} ms)")
+            except Exception as e:
+                logger.warning(f"⚠️ Latency budget calibration failed, budgets are ignored: {str(e)}")
+
+        thread = threading.Thread(target=run, name="latency-calibration", daemon=True)
+        thread.start()
+        return thread
+
+    def choose(self, remaining_ms: float) -> Optional[Dict[str, Any]]:
+        """Table entry with the most rounds expected to finish in remaining_ms (None if none fits)"""
+        slowdown = self.slowdown
+        fits = [entry for entry in self.table
+                if (self.preprocess_ms + entry["latency_ms"]) * slowdown <= remaining_ms]
+        return max(fits, key=lambda entry: entry["rounds"]) if fits else None
+
+    def observe(self, entry: Dict[str, Any], elapsed_ms: float):
+        """Fold one budgeted prediction's preprocess + predict time into the slowdown"""
+        ratio = elapsed_ms / (self.preprocess_ms + entry["latency_ms"])
+        with self._lock:
+            self._slowdown += SLOWDOWN_ALPHA * (ratio - self._slowdown)
+
+    def record(self, entry: Optional[Dict[str, Any]], max_rounds: int, approximate: bool, missed: bool):
+        with self._lock:
+            self.counters["requests"] += 1
+            self.counters["truncated"] += int(entry is not None and entry["rounds"] < max_rounds)
+            self.counters["approximate"] += int(approximate)
+            self.counters["deadline_missed"] += int(missed)
+            if approximate:
+                # Nothing was timed; decay so a past spike cannot keep every request on the surrogate
+                self._slowdown += SLOWDOWN_ALPHA * (1.0 - self._slowdown)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "default_budget_ms": LATENCY_BUDGET_MS or None,
+                "calibrated": self.calibrated,
+                "calibration_ms": self.calibration_ms,
+                "preprocess_ms": self.preprocess_ms,
+                "slowdown": round(self.slowdown, 3),
+                "table": self.table,
+                **self.counters,
+            }
+
+
+# Global latency budget instance
+latency_budget = LatencyBudget()
@@ -0,0 +1,326 @@
+"""
+SafeStride Model Router - one deployment, one model per market
+
+Picks the model (and its matching preprocessor) for each request, so a
+single deployment can serve US and UK callers:
+
+- "us": the US Accidents binary model (models/predictor.py), with
+  FeaturePreprocessor and weather filling; High Risk / Low Risk
+- "uk": the legacy UK severity model (models/uk_predictor.py), with
+  UKFeaturePreprocessor; Fatal / Serious / Slight
+
+Resolution, first match wins:
+1. An explicit model key (`model` query parameter or X-SafeStride-Model header
+   on /api/models/*)
+2. Region: the input's coordinates (Start_Lat / Start_Lng or latitude /
+   longitude) inside a model's bounding boxes
+3. Fields only one model reads (e.g. Speed_limit and Road_Surface_Conditions
+   for the UK model)
+4. SAFESTRIDE_DEFAULT_MODEL
+
+Each model is loaded on first use, under its own lock, so a worker only pays
+the load time and memory of the markets it actually serves (the US model is
+still loaded at startup, since the rest of the API serves it). Every model has
+its own batch path (one preprocessing and inference pass per model in a
+mixed batch) and its own LRU result cache keyed on the canonical input.
+
+Settings (environment variables):
+    SAFESTRIDE_MODELS           comma-separated model keys served by the router ("us,uk")
+    SAFESTRIDE_DEFAULT_MODEL    model used when nothing else decides ("us")
+    SAFESTRIDE_MODEL_CACHE      results cached per model (10000; 0 = off)
+"""
+
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models.predictor import predictor
+from models.uk_predictor import UKSeverityPredictor
+from models.weather_index import weather_index
+from utils.preprocessing import FeaturePreprocessor
+from utils.uk_preprocessing import UKFeaturePreprocessor
+
+logger = logging.getLogger(__name__)
+
+ENABLED_MODELS = [key.strip() for key in os.getenv("SAFESTRIDE_MODELS", "us,uk").split(",") if key.strip()]
+DEFAULT_MODEL = os.getenv("SAFESTRIDE_DEFAULT_MODEL", "us")
+MODEL_CACHE_ENTRIES = int(os.getenv("SAFESTRIDE_MODEL_CACHE", "10000"))
+
+# (lat_min, lat_max, lng_min, lng_max)
+Box = Tuple[float, float, float, float]
+REGIONS: Dict[str, List[Box]] = {
+    "us": [(24.4, 49.5, -125.0, -66.9),  # contiguous states
+           (51.2, 71.5, -180.0, -129.9),  # Alaska
+           (18.9, 22.3, -160.3, -154.8)],  # Hawaii
+    "uk": [(49.8, 60.9, -8.7, 1.8)],
+}
+COORDINATE_FIELDS = [("Start_Lat", "Start_Lng"), ("latitude", "longitude")]
+
+# Fields only one model reads
+MARKER_FIELDS = {
+    "us": ["Start_Lat", "Street", "City", "State", "Distance(mi)"],
+    "uk": ["Speed_limit", "Road_Surface_Conditions", "Light_Conditions", "Urban_or_Rural_Area"],
+}
+
+
+class ModelNotAvailable(KeyError):
+    """Unknown or disabled model key"""
+
+
+class ServedModel:
+    """One model of the router: lazy loading, batch path and result cache"""
+
+    def __init__(self, key: str, description: str, load: Callable[[], Any],
+                 preprocessor: Callable[[Any], Any], cache_entries: int = MODEL_CACHE_ENTRIES):
+        self.key = key
+        self.description = description
+        self._load = load
+        self._make_preprocessor = preprocessor
+        self.model = None
+        self.preprocessor = None
+        self.load_ms = None
+        self.cache_entries = cache_entries
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "rows": 0, "cache_hits": 0}
+
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None
+
+    def ensure_loaded(self):
+        """Load the model and its preprocessor on first use (once, even under concurrent requests)"""
+        if self.model is not None:
+            return
+        with self._load_lock:
+            if self.model is not None:
+                return
+            start = time.perf_counter()
+            model = self._load()
+            self.preprocessor = self._make_preprocessor(model)
+            self.load_ms = round((time.perf_counter() - start) * 1000, 1)
+            self.model = model
+            logger.info(f"📦 Model '{self.key}' ready ({self.load_ms:.0f} ms)")
+
+    def prepare(self, input_dicts: List[Dict[str, Any]]) -> List[Any]:
+        """Per-row extras attached to results before validation (e.g. filled weather fields)"""
+        return [None] * len(input_dicts)
+
+    def score(self, input_dicts: List[Dict[str, Any]],
+              positions: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """
+        Validate and score inputs in one batch, answering repeated inputs from the cache
+
+        Args:
+            input_dicts: Raw inputs
+            positions: Row numbers used in validation errors (default: 0..n-1)
+
+        Raises:
+            ValueError: listing the validation errors of every invalid row
+        """
+        self.ensure_loaded()
+        keys = [json.dumps(row, sort_keys=True, default=str) for row in input_dicts]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(input_dicts)
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    results[i] = copy.deepcopy(cached)
+        misses = [i for i, result in enumerate(results) if result is None]
+
+        if misses:
+            rows = [dict(input_dicts[i]) for i in misses]
+            extras = self.prepare(rows)
+            positions = positions or list(range(len(input_dicts)))
+            errors = self._errors(rows, [positions[i] for i in misses])
+            if errors:
+                raise ValueError("; ".join(errors))
+            scored = self.model.batch_predict(self.preprocessor.preprocess_batch(rows))
+            with self._lock:
+                for i, result, extra in zip(misses, scored, extras):
+                    if extra is not None:
+                        result = {**result, **extra}
+                    results[i] = result
+                    if self.cache_entries > 0:
+                        self._cache[keys[i]] = copy.deepcopy(result)
+                        self._cache.move_to_end(keys[i])
+                while len(self._cache) > self.cache_entries:
+                    self._cache.popitem(last=False)
+
+        with self._lock:
+            self.counters["requests"] += 1
+            self.counters["rows"] += len(input_dicts)
+            self.counters["cache_hits"] += len(input_dicts) - len(misses)
+        return results
+
+    def validate(self, input_dicts: List[Dict[str, Any]], positions: List[int]) -> List[str]:
+        """Validation errors of the inputs, prepared as score() would (nothing is scored or cached)"""
+        self.ensure_loaded()
+        rows = [dict(row) for row in input_dicts]
+        self.prepare(rows)
+        return self._errors(rows, positions)
+
+    def _errors(self, rows: List[Dict[str, Any]], positions: List[int]) -> List[str]:
+        errors = []
+        for position, row in zip(positions, rows):
+            is_valid, row_errors = self.preprocessor.validate_input(row)
+            if not is_valid:
+                errors.extend(f"Row {position}: {error}" for error in row_errors)
+        return errors
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "description": self.description,
+                "loaded": self.loaded,
+                "load_ms": self.load_ms,
+                "features": len(self.preprocessor.feature_names) if self.preprocessor else None,
+                "cache_size": len(self._cache),
+                "cache_capacity": self.cache_entries,
+                **self.counters,
+            }
+
+
+class USModel(ServedModel):
+    """The US model fills omitted weather fields before validation"""
+
+    def prepare(self, input_dicts: List[Dict[str, Any]]) -> List[Any]:
+        return [{"weather": weather} for weather in weather_index.fill(input_dicts)]
+
+
+def _load_us():
+    if not predictor.loaded:
+        predictor.load_models()
+    return predictor
+
+
+def _load_uk():
+    uk_predictor = UKSeverityPredictor()
+    uk_predictor.load_models()
+    return uk_predictor
+
+
+def _in_region(input_data: Dict[str, Any], boxes: List[Box]) -> Optional[bool]:
+    """Whether the input's coordinates fall in one of the boxes (None without coordinates)"""
+    for lat_field, lng_field in COORDINATE_FIELDS:
+        try:
+            lat, lng = float(input_data[lat_field]), float(input_data[lng_field])
+        except (KeyError, TypeError, ValueError):
+            continue
+        return any(lat_min <= lat <= lat_max and lng_min <= lng <= lng_max
+                   for lat_min, lat_max, lng_min, lng_max in boxes)
+    return None
+
+
+class ModelRouter:
+    """Registry of the served models and per-request model resolution"""
+
+    def __init__(self, enabled: List[str] = ENABLED_MODELS, default: str = DEFAULT_MODEL):
+        available = {
+            "us": USModel("us", "US Accidents - High Risk / Low Risk", _load_us,
+                          lambda model: FeaturePreprocessor(model.feature_names)),
+            "uk": ServedModel("uk", "UK road safety (STATS19) - Fatal / Serious / Slight", _load_uk,
+                              lambda model: UKFeaturePreprocessor(model.feature_names)),
+        }
+        unknown = [key for key in enabled if key not in available]
+        if unknown:
+            logger.warning(f"⚠️ Ignoring unknown models in SAFESTRIDE_MODELS: {', '.join(unknown)}")
+        self.models = {key: model for key, model in available.items() if key in enabled}
+        self.default = default if default in self.models else next(iter(self.models), None)
+
+    def get(self, key: str) -> ServedModel:
+        model = self.models.get(key)
+        if model is None:
+            raise ModelNotAvailable(f"Model '{key}' is not served (available: {', '.join(self.models)})")
+        return model
+
+    def resolve(self, input_data: Dict[str, Any], model_key: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Model key for one input
+
+        Returns:
+            (model key, how it was chosen: "explicit", "region", "fields" or "default")
+        """
+        if model_key:
+            return self.get(model_key).key, "explicit"
+        for key in self.models:
+            if _in_region(input_data, REGIONS.get(key, [])):
+                return key, "region"
+        matches = [key for key in self.models
+                   if any(input_data.get(field) is not None for field in MARKER_FIELDS.get(key, []))]
+        if len(matches) == 1:
+            return matches[0], "fields"
+        if self.default is None:
+            raise ModelNotAvailable("No models are served (SAFESTRIDE_MODELS is empty)")
+        return self.default, "default"
+
+    def predict_batch(self, input_dicts: List[Dict[str, Any]],
+                      model_key: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Score inputs, grouping them per model: one batch pass per model, results in input order
+
+        Raises:
+            ModelNotAvailable: model_key is not served
+            ValueError: some rows failed validation
+        """
+        groups, routes = self._group(input_dicts, model_key)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(input_dicts)
+        errors = []
+        for key, positions in groups.items():
+            try:
+                scored = self.models[key].score([input_dicts[i] for i in positions], positions)
+            except ValueError as e:
+                errors.append(f"{key}: {e}")
+                continue
+            for i, result in zip(positions, scored):
+                results[i] = {**result, **routes[i]}
+        if errors:
+            raise ValueError("; ".join(errors))
+        return results
+
+    def validate_batch(self, input_dicts: List[Dict[str, Any]], model_key: Optional[str] = None):
+        """
+        Check inputs the way predict_batch() would, without scoring them
+
+        Lets a batch that is scored in several calls fail before any of it is answered.
+
+        Raises:
+            ModelNotAvailable: model_key is not served
+            ValueError: some rows failed validation
+        """
+        groups, _ = self._group(input_dicts, model_key)
+        errors = []
+        for key, positions in groups.items():
+            model_errors = self.models[key].validate([input_dicts[i] for i in positions], positions)
+            if model_errors:
+                errors.append(f"{key}: {'; '.join(model_errors)}")
+        if errors:
+            raise ValueError("; ".join(errors))
+
+    def _group(self, input_dicts: List[Dict[str, Any]],
+               model_key: Optional[str]) -> Tuple[Dict[str, List[int]], List[Dict[str, str]]]:
+        """Row positions per model key, and each row's model / routed_by"""
+        groups: Dict[str, List[int]] = {}
+        routes = []
+        for i, input_data in enumerate(input_dicts):
+            key, reason = self.resolve(input_data, model_key)
+            groups.setdefault(key, []).append(i)
+            routes.append({"model": key, "routed_by": reason})
+        return groups, routes
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "default": self.default,
+            "models": {key: model.stats() for key, model in self.models.items()},
+        }
+
+
+# Global model router instance
+model_router = ModelRouter()
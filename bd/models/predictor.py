@@ -1,13 +1,35 @@
-import joblib
+import os
+import threading
+import time
 import pandas as pd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import logging
 
-logging.basicConfig(level=logging.INFO)
+from models.artifacts import FlatScaler, FlatTreeEnsemble, artifact_paths, load_json, load_native_model
+from models.cascade import CASCADE_AUDIT_RATE, CASCADE_BAND, CASCADE_MIN_ROWS, CascadeModel, cascade_path
+from models.hotspots import HotspotIndex, hotspot_path
+from models.surrogate import LookupSurrogate, surrogate_path
+from utils.inference_threads import inference_threads
+from utils.preprocessing import FeaturePreprocessor
+from utils.profiling import current_timer
+
 logger = logging.getLogger(__name__)
 
+ARTIFACT_FORMATS = ("auto", "flat", "native", "joblib")
+
+# Features read by _identify_risk_factors (derived from raw input in approximate mode)
+RISK_FACTOR_FEATURES = [
+    'Is_Highway', 'Traffic_Signal', 'Stop', 'Crossing', 'Junction', 'Is_Night', 'Is_Rush_Hour',
+    'Freezing_Rain', 'Night_Low_Visibility', 'Is_Weekend', 'Distance(mi)',
+]
+
+# Nearby-accident density (percentile among past accident locations) flagged as a hotspot
+HOTSPOT_PERCENTILE = 90
+
 
 class SafeStridePredictor:
     """
@@ -19,57 +41,212 @@ class SafeStridePredictor:
     - US_Accidents_Scaler_*.joblib: StandardScaler for feature scaling
     - US_Accidents_Features_*.joblib: List of 43 feature names in training order
     - US_Accidents_Metadata_*.joblib: Model performance metrics
+    
+    When the fast formats written by convert_artifacts.py are present they are
+    preferred: a flat-array booster and scaler (numpy only, no sklearn/xgboost
+    import) or the booster in XGBoost's native format.
+    
+    With fuse_scaler enabled the flat booster's split thresholds are mapped
+    into raw feature space at load time, so inference skips the scaler pass.
+    
+    With load_surrogate enabled the lookup table written by build_surrogate.py
+    (if present) is loaded too, for approximate predictions.
+    
+    With load_hotspots enabled the spatial index written by
+    build_hotspot_index.py (if present) is memory-mapped, and every result
+    carries the historical accident count near its location.
+    
+    With load_cascade enabled the distilled first stage written by
+    build_cascade.py (if present) scores batches first, and only rows in its
+    uncertainty band reach the full model (see models/cascade.py).
+    
+    Predictions can evaluate only the first `rounds` boosting rounds, trading
+    accuracy for latency under a per-request budget (see
+    models/latency_budget.py).
     """
     
-    def __init__(self, model_dir: str = "MLT/ml"):
+    def __init__(self, model_dir: str = "MLT/ml", timestamp: str = "20251118_162845",
+                 artifact_format: str = "auto", fuse_scaler: bool = False, load_surrogate: bool = False,
+                 load_hotspots: bool = False, load_cascade: bool = False):
+        if artifact_format not in ARTIFACT_FORMATS:
+            raise ValueError(f"artifact_format must be one of {ARTIFACT_FORMATS}")
         self.model_dir = Path(model_dir)
+        self.timestamp = timestamp
+        self.artifact_format = artifact_format
+        self.fuse_scaler = fuse_scaler
+        self.scaler_fused = False
+        self.load_surrogate = load_surrogate
+        self.surrogate = None
+        self.load_hotspots = load_hotspots
+        self.hotspots = None
+        self.load_cascade = load_cascade
+        self.cascade = None
+        self.loaded_format = None
         self.model = None
         self.scaler = None
         self.feature_names = None
         self.model_metadata = None
         self.loaded = False
+        self.warmed_up = False
+        self.load_time_ms = None
+        self._boosters: Dict[int, Any] = {}
+        self._booster_lock = threading.Lock()
+        self._iteration_range = (0, 0)
+        self.n_rounds = 0
         
+    def _resolve_format(self, paths: Dict[str, Path]) -> str:
+        """Pick the artifact format to load, falling back to joblib"""
+        if self.artifact_format != "auto":
+            return self.artifact_format
+        fast_files = ("model_flat", "scaler_flat", "features_json", "metadata_json")
+        if all(paths[name].exists() for name in fast_files):
+            return "flat"
+        return "joblib"
+    
+    def _artifact_loaders(self, artifact_format: str, paths: Dict[str, Path]) -> Dict[str, Any]:
+        """Map each artifact to a zero-argument loader for the chosen format"""
+        if artifact_format == "joblib":
+            # Deferred: joblib unpickling pulls in sklearn and xgboost
+            import joblib
+            return {
+                "model": lambda: joblib.load(paths["model_joblib"]),
+                "scaler": lambda: joblib.load(paths["scaler_joblib"]),
+                "feature_names": lambda: joblib.load(paths["features_joblib"]),
+                "model_metadata": lambda: joblib.load(paths["metadata_joblib"]),
+            }
+        
+        if artifact_format == "native":
+            model_loader = lambda: load_native_model(paths["model_native"])
+        else:
+            model_loader = lambda: FlatTreeEnsemble.load(paths["model_flat"])
+        return {
+            "model": model_loader,
+            "scaler": lambda: FlatScaler.load(paths["scaler_flat"]),
+            "feature_names": lambda: load_json(paths["features_json"]),
+            "model_metadata": lambda: load_json(paths["metadata_json"]),
+        }
+    
     def load_models(self):
-        """Load all required model artifacts"""
+        """Load all required model artifacts in parallel"""
         try:
-            timestamp = "20251118_162845"
-            
-            # Load XGBoost model
-            model_path = self.model_dir / f"US_Accidents_Predictor_Model_{timestamp}.joblib"
-            self.model = joblib.load(model_path)
-            logger.info(f"✓ Loaded model from {model_path}")
-            
-            # Load scaler
-            scaler_path = self.model_dir / f"US_Accidents_Scaler_{timestamp}.joblib"
-            self.scaler = joblib.load(scaler_path)
-            logger.info(f"✓ Loaded scaler from {scaler_path}")
+            start = time.perf_counter()
+            paths = artifact_paths(self.model_dir, self.timestamp)
+            artifact_format = self._resolve_format(paths)
+            loaders = self._artifact_loaders(artifact_format, paths)
+            surrogate_file = surrogate_path(self.model_dir, self.timestamp)
+            if self.load_surrogate and surrogate_file.exists():
+                loaders["surrogate"] = lambda: self._read_surrogate(surrogate_file)
+            hotspot_dir = hotspot_path(self.model_dir)
+            if self.load_hotspots and hotspot_dir.exists():
+                loaders["hotspots"] = lambda: self._read_hotspots(hotspot_dir)
+            cascade_file = cascade_path(self.model_dir, self.timestamp)
+            if self.load_cascade and cascade_file.exists():
+                loaders["cascade"] = lambda: self._read_cascade(cascade_file)
             
-            # Load feature names
-            features_path = self.model_dir / f"US_Accidents_Features_{timestamp}.joblib"
-            self.feature_names = joblib.load(features_path)
-            logger.info(f"✓ Loaded {len(self.feature_names)} feature names")
+            with ThreadPoolExecutor(max_workers=len(loaders)) as pool:
+                futures = {name: pool.submit(loader) for name, loader in loaders.items()}
+                artifacts = {name: future.result() for name, future in futures.items()}
             
-            # Load model metadata
-            metadata_path = self.model_dir / f"US_Accidents_Metadata_{timestamp}.joblib"
-            self.model_metadata = joblib.load(metadata_path)
-            logger.info(f"✓ Loaded model metadata")
+            self.model = artifacts["model"]
+            self.scaler = artifacts["scaler"]
+            self.feature_names = list(artifacts["feature_names"])
+            self.model_metadata = artifacts["model_metadata"]
+            self.surrogate = artifacts.get("surrogate")
+            self.hotspots = artifacts.get("hotspots")
+            self.cascade = artifacts.get("cascade")
+            if self.cascade is not None and self.cascade.stage_one.n_features_in_ > len(self.feature_names):
+                logger.warning(f"⚠️ Ignoring cascade {cascade_file.name}: built for a different feature set")
+                self.cascade = None
+            self.loaded_format = artifact_format
+            self.scaler_fused = False
+            self._boosters = {}
+            # XGBClassifier.predict() stops at the early-stopping round, if any
+            best_iteration = getattr(self.model, "best_iteration", None)
+            self._iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+            self.n_rounds = self._count_rounds()
+            if self.fuse_scaler:
+                self._fuse_scaler()
+            self.load_time_ms = round((time.perf_counter() - start) * 1000, 2)
             
             self.loaded = True
-            logger.info("🎉 All models loaded successfully!")
+            logger.info(f"🎉 All models loaded successfully! ({artifact_format} format, {self.load_time_ms} ms)")
             logger.info(f"   Model type: {type(self.model).__name__}")
             logger.info(f"   Feature count: {len(self.feature_names)}")
+            if self.scaler_fused:
+                logger.info(f"   Scaler folded into split thresholds")
+            if self.surrogate is not None:
+                logger.info(f"   Lookup surrogate loaded (mean abs error "
+                            f"{self.surrogate.metrics.get('mean_abs_error')})")
+            if self.hotspots is not None:
+                logger.info(f"   Hotspot index mapped ({self.hotspots.points:,} accident locations)")
+            if self.cascade is not None:
+                logger.info(f"   Cascade first stage loaded (band {self.cascade.band}, built escalation rate "
+                            f"{self.cascade.metrics.get('escalation_rate')})")
             logger.info(f"   Binary Classification: Low Risk (0) / High Risk (1)")
             
         except Exception as e:
             logger.error(f"❌ Error loading models: {str(e)}")
             raise
     
-    def predict(self, features_df: pd.DataFrame) -> Dict[str, Any]:
+    def _fuse_scaler(self):
+        """Fold the StandardScaler into the flat booster's split thresholds"""
+        if not isinstance(self.model, FlatTreeEnsemble):
+            logger.warning(f"⚠️ Scaler fusion needs the flat artifact format (loaded {self.loaded_format}), "
+                           f"keeping the separate scaler step")
+            return
+        self.model = self.model.fold_scaler(self.scaler.mean_, self.scaler.scale_)
+        self.scaler_fused = True
+    
+    def _count_rounds(self) -> int:
+        """Boosting rounds the full model evaluates (one tree per round for binary:logistic)"""
+        if isinstance(self.model, FlatTreeEnsemble):
+            return self.model.n_trees
+        if self._iteration_range[1]:
+            return self._iteration_range[1]
+        if hasattr(self.model, "get_booster"):
+            return self.model.get_booster().num_boosted_rounds()
+        return 0
+    
+    @staticmethod
+    def _read_surrogate(path: Path):
+        """Load the lookup surrogate; a stale or unreadable table only disables approximate mode"""
+        try:
+            return LookupSurrogate.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"⚠️ Ignoring lookup surrogate {path.name}: {str(e)}")
+            return None
+    
+    @staticmethod
+    def _read_hotspots(path: Path):
+        """Map the hotspot index; a stale or unreadable index only drops the density factor"""
+        try:
+            return HotspotIndex.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"⚠️ Ignoring hotspot index {path.name}: {str(e)}")
+            return None
+    
+    @staticmethod
+    def _read_cascade(path: Path):
+        """Load the cascade first stage; a stale or unreadable one only disables cascade mode"""
+        try:
+            return CascadeModel.load(path, band=CASCADE_BAND, audit_rate=CASCADE_AUDIT_RATE)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"⚠️ Ignoring cascade {path.name}: {str(e)}")
+            return None
+    
+    def _nearby_accidents(self, lat, lng) -> List[Optional[Dict[str, Any]]]:
+        """Nearby accident density per location (None without the hotspot index)"""
+        if self.hotspots is None:
+            return [None] * len(np.atleast_1d(lat))
+        return self.hotspots.nearby(lat, lng)
+    
+    def predict(self, features_df: pd.DataFrame, rounds: Optional[int] = None) -> Dict[str, Any]:
         """
         Make binary prediction for a single input
         
         Args:
             features_df: DataFrame with preprocessed and scaled features (43 features)
+            rounds: Evaluate only the first `rounds` boosting rounds (None = all)
             
         Returns:
             Dictionary with prediction results:
@@ -78,76 +255,270 @@ class SafeStridePredictor:
             - probability: Probability of predicted class
             - raw_proba: [prob_low, prob_high]
         """
+        return self.batch_predict(features_df.iloc[:1], rounds=rounds)[0]
+    
+    def predict_vector(self, features: np.ndarray) -> Dict[str, Any]:
+        """
+        Make a prediction from one feature vector in training order
+        
+        Skips the DataFrame round trip; used by the live-scoring channel,
+        which keeps each session's features as a vector.
+        
+        Args:
+            features: 43 preprocessed (unscaled) feature values
+        
+        Returns:
+            Same dictionary as predict()
+        """
         if not self.loaded:
             raise RuntimeError("Models not loaded. Call load_models() first.")
         
-        try:
-            # Scale features
-            features_scaled = self.scaler.transform(features_df)
-            
-            # Make prediction (returns 0 or 1)
-            prediction_label = int(self.model.predict(features_scaled)[0])
-            
-            # Get probabilities [prob_low_risk, prob_high_risk]
-            prediction_proba = self.model.predict_proba(features_scaled)[0]
-            prob_low = float(prediction_proba[0])
-            prob_high = float(prediction_proba[1])
+        row = np.asarray(features, dtype=np.float64).reshape(1, -1)
+        timer = current_timer()
+        if self.scaler_fused:
+            model_input = row
+        else:
+            with timer.stage("scale"):
+                # The sklearn scaler was fitted on a DataFrame and warns on bare arrays
+                if hasattr(self.scaler, "feature_names_in_"):
+                    model_input = self.scaler.transform(pd.DataFrame(row, columns=self.feature_names))
+                else:
+                    model_input = self.scaler.transform(row)
+        
+        with timer.stage("infer"):
+            prediction_proba = self._predict_proba(model_input)[0]
+            prediction_label = int(prediction_proba[1] > 0.5)
+        
+        with timer.stage("explain"):
+            features = dict(zip(self.feature_names, row[0].tolist()))
+            nearby = self._nearby_accidents(features.get('Start_Lat'), features.get('Start_Lng'))[0]
+            return self._build_result(prediction_label, prediction_proba, features, nearby)
+    
+    def predict_approximate(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Answer from the lookup surrogate instead of the model
+        
+        No preprocessing or tree evaluation: the probability is a table
+        lookup, and risk factors are derived from the raw input directly.
+        
+        Args:
+            input_data: Raw input fields (same as the /api/predict body)
+        
+        Returns:
+            Same dictionary as predict()
+        """
+        if self.surrogate is None:
+            raise RuntimeError("Lookup surrogate not loaded. Run build_surrogate.py first.")
+        
+        timer = current_timer()
+        with timer.stage("infer"):
+            prob_high = self.surrogate.predict_proba_high(input_data)
+        
+        with timer.stage("explain"):
+            features = {name: FeaturePreprocessor._derive_feature(name, input_data)
+                        for name in RISK_FACTOR_FEATURES}
+            nearby = self._nearby_accidents(input_data.get('Start_Lat'), input_data.get('Start_Lng'))[0]
+            return self._build_result(int(prob_high > 0.5), np.array([1.0 - prob_high, prob_high]),
+                                      features, nearby)
+    
+    def warmup(self, features_df: pd.DataFrame) -> float:
+        """
+        Run one throwaway prediction so the first real request does not pay
+        for lazy initialization (allocator, numpy dispatch, xgboost predictor)
+        
+        Args:
+            features_df: Any valid preprocessed single-row DataFrame
             
-            # Map to risk level
-            risk_level = "High Risk" if prediction_label == 1 else "Low Risk"
-            confidence = prob_high if prediction_label == 1 else prob_low
+        Returns:
+            Warm-up duration in milliseconds
+        """
+        start = time.perf_counter()
+        self.predict(features_df)
+        self.warmed_up = True
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+        logger.info(f"🔥 Warm-up inference completed in {elapsed_ms} ms")
+        return elapsed_ms
+    
+    def batch_predict(self, features_df: pd.DataFrame, rounds: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Make predictions for multiple inputs
+        
+        Scaling and inference run once over the whole matrix; only the risk
+        factors and recommendations are built per row. With the cascade
+        loaded, batches of at least CASCADE_MIN_ROWS rows go through it.
+        
+        Args:
+            features_df: DataFrame with preprocessed features for multiple samples
+            rounds: Evaluate only the first `rounds` boosting rounds (None = all;
+                the cascade is skipped when set)
             
-            # Identify risk factors
-            risk_factors = self._identify_risk_factors(features_df)
+        Returns:
+            List of prediction dictionaries
+        """
+        if not self.loaded:
+            raise RuntimeError("Models not loaded. Call load_models() first.")
+        if len(features_df) == 0:
+            return []
+        
+        timer = current_timer()
+        try:
+            if self.cascade is not None and rounds is None and len(features_df) >= CASCADE_MIN_ROWS:
+                with timer.stage("infer"):
+                    prediction_probas = self._predict_cascade(features_df)
+            else:
+                if self.scaler_fused:
+                    # Thresholds are already in raw feature space
+                    features_scaled = features_df.to_numpy(dtype=np.float64)
+                else:
+                    # Scale features
+                    with timer.stage("scale"):
+                        features_scaled = self.scaler.transform(features_df)
+                
+                with timer.stage("infer"):
+                    # Get probabilities [prob_low_risk, prob_high_risk] per row
+                    prediction_probas = self._predict_proba(features_scaled, rounds)
             
-            # Generate recommendations
-            recommendations = self._generate_recommendations(risk_level, risk_factors)
+            # Predictions (0 or 1 per row), as the classifier's predict() derives them
+            prediction_labels = (prediction_probas[:, 1] > 0.5).astype(int)
             
-            return {
-                "prediction": risk_level,
-                "label": prediction_label,
-                "probability": round(confidence, 4),
-                "raw_proba": [round(prob_low, 4), round(prob_high, 4)],
-                "risk_factors": risk_factors,
-                "recommendations": recommendations
-            }
+            with timer.stage("explain"):
+                # One batched spatial query for the whole frame
+                nearby = self._nearby_accidents(features_df['Start_Lat'].to_numpy(),
+                                                features_df['Start_Lng'].to_numpy())
+                return [
+                    self._build_result(int(label), proba, features, location)
+                    for label, proba, features, location in zip(
+                        prediction_labels, prediction_probas, features_df.to_dict("records"), nearby
+                    )
+                ]
             
         except Exception as e:
             logger.error(f"Prediction error: {str(e)}")
             raise
     
-    def batch_predict(self, features_df: pd.DataFrame) -> List[Dict[str, Any]]:
+    def predict_risk(self, features_df: pd.DataFrame, rounds: Optional[int] = None) -> np.ndarray:
         """
-        Make predictions for multiple inputs
-        
+        P(High Risk) for multiple inputs, without building result dictionaries
+
+        Used by offline jobs that only aggregate the probabilities.
+
         Args:
             features_df: DataFrame with preprocessed features for multiple samples
-            
+            rounds: Evaluate only the first `rounds` boosting rounds (None = all)
+
         Returns:
-            List of prediction dictionaries
+            float64 array with one probability per row
         """
         if not self.loaded:
             raise RuntimeError("Models not loaded. Call load_models() first.")
+        if len(features_df) == 0:
+            return np.empty(0)
+        if self.scaler_fused:
+            features_scaled = features_df.to_numpy(dtype=np.float64)
+        else:
+            features_scaled = self.scaler.transform(features_df)
+        return np.asarray(self._predict_proba(features_scaled, rounds)[:, 1], dtype=np.float64)
+
+    def _predict_cascade(self, features_df: pd.DataFrame) -> np.ndarray:
+        """
+        Class probabilities from the cascade
+        
+        The first stage scores every row on raw features; rows inside the
+        uncertainty band, plus the audit sample, are scaled and scored by the
+        full model, whose answer they get.
+        """
+        raw = features_df.to_numpy(dtype=np.float64)
+        prob_high = self.cascade.predict_proba_high(raw)
+        in_band, audited = self.cascade.route(prob_high)
+        escalate = in_band | audited
+        if escalate.any():
+            if self.scaler_fused:
+                model_input = raw[escalate]
+            else:
+                model_input = self.scaler.transform(features_df[escalate])
+            full = self._predict_proba(model_input)[:, 1]
+            self.cascade.record(prob_high, full, in_band, audited)
+            prob_high[escalate] = full
+        else:
+            self.cascade.record(prob_high, prob_high[:0], in_band, audited)
+        return np.column_stack([1.0 - prob_high, prob_high])
+    
+    def _predict_proba(self, model_input, rounds: Optional[int] = None) -> np.ndarray:
+        """
+        Class probabilities on the inference threads granted to this call
+
+        The flat booster evaluates row blocks in parallel; XGBoost models use
+        a booster copy per thread tier with its nthread fixed, so concurrent
+        calls never change each other's thread count. With `rounds` only the
+        first boosting rounds are evaluated.
+        """
+        if rounds is not None and rounds >= self.n_rounds:
+            rounds = None
+        with inference_threads.reserve(len(model_input)) as threads:
+            if isinstance(self.model, FlatTreeEnsemble):
+                predict = self.model.predict_proba if rounds is None else partial(self.model.predict_proba,
+                                                                                  n_trees=rounds)
+                return inference_threads.map_rows(predict, model_input, threads)
+            booster = self._booster_for(threads)
+            if booster is None:
+                return self.model.predict_proba(model_input)
+            iteration_range = self._iteration_range if rounds is None else (0, rounds)
+            prob_high = booster.inplace_predict(np.asarray(model_input), iteration_range=iteration_range,
+                                                validate_features=False)
+            return np.column_stack([1.0 - prob_high, prob_high])
+
+    def _booster_for(self, threads: int):
+        """The model's booster with nthread = threads (None for models without one)"""
+        booster = self._boosters.get(threads)
+        if booster is None and hasattr(self.model, "get_booster"):
+            with self._booster_lock:
+                booster = self._boosters.get(threads)
+                if booster is None:
+                    booster = self.model.get_booster().copy()
+                    booster.set_param({"nthread": threads})
+                    self._boosters[threads] = booster
+        return booster
+
+    def _build_result(self, prediction_label: int, prediction_proba: np.ndarray,
+                      features: Dict[str, float], nearby: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Assemble the response dictionary for one row"""
+        prob_low = float(prediction_proba[0])
+        prob_high = float(prediction_proba[1])
+        
+        # Map to risk level
+        risk_level = "High Risk" if prediction_label == 1 else "Low Risk"
+        confidence = prob_high if prediction_label == 1 else prob_low
         
-        results = []
-        for idx in range(len(features_df)):
-            single_sample = features_df.iloc[idx:idx+1]
-            result = self.predict(single_sample)
-            results.append(result)
+        # Identify risk factors
+        risk_factors = self._identify_risk_factors(features, nearby)
         
-        return results
+        # Generate recommendations
+        recommendations = self._generate_recommendations(risk_level, risk_factors)
+        
+        return {
+            "prediction": risk_level,
+            "label": prediction_label,
+            "probability": round(confidence, 4),
+            "raw_proba": [round(prob_low, 4), round(prob_high, 4)],
+            "risk_factors": risk_factors,
+            "recommendations": recommendations,
+            "nearby_accidents": nearby
+        }
     
-    def _identify_risk_factors(self, features_df: pd.DataFrame) -> List[str]:
-        """Identify key risk factors from the input features (US Accidents model)"""
+    def _identify_risk_factors(self, features: Dict[str, float],
+                               nearby: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Identify key risk factors from one row of input features (US Accidents model)"""
         risk_factors = []
         
-        # Get first row as dict
-        features = features_df.iloc[0].to_dict()
-        
         # Check highway (most important feature)
         if features.get('Is_Highway', 0) == 1:
             risk_factors.append("⚠️ Highway location - higher speed traffic")
         
+        # Check historical accident density around the location
+        if nearby and nearby.get('percentile') is not None and nearby['percentile'] >= HOTSPOT_PERCENTILE:
+            risk_factors.append(f"📍 Accident hotspot - {nearby['count']:,} past accidents "
+                                f"within {nearby['radius_m']} m")
+        
         # Check traffic signals
         if features.get('Traffic_Signal', 0) == 1:
             risk_factors.append("🚦 Traffic signal intersection")
@@ -217,6 +588,9 @@ class SafeStridePredictor:
         if "highway" in risk_text:
             recommendations.append("🛣️ Avoid walking on highways - use alternative routes")
         
+        if "hotspot" in risk_text:
+            recommendations.append("📍 Accidents cluster here - take extra care crossing")
+        
         if "weather" in risk_text or "rain" in risk_text:
             recommendations.append("☔ Wait for weather conditions to improve if possible")
         
@@ -238,13 +612,27 @@ class SafeStridePredictor:
     def health_check(self) -> Dict[str, Any]:
         """Check if model is loaded and ready"""
         return {
-            "status": "healthy" if self.loaded else "not_ready",
+            "status": "healthy" if self.loaded and self.warmed_up else "not_ready",
             "model_loaded": self.model is not None,
             "scaler_loaded": self.scaler is not None,
+            "warmed_up": self.warmed_up,
             "features_count": len(self.feature_names) if self.feature_names else 0,
-            "model_type": str(type(self.model).__name__) if self.model else None
+            "model_type": str(type(self.model).__name__) if self.model else None,
+            "artifact_format": self.loaded_format,
+            "scaler_fused": self.scaler_fused,
+            "surrogate_loaded": self.surrogate is not None,
+            "hotspots_loaded": self.hotspots is not None,
+            "cascade_loaded": self.cascade is not None,
+            "boosting_rounds": self.n_rounds,
+            "load_time_ms": self.load_time_ms
         }
 
 
 # Global predictor instance
-predictor = SafeStridePredictor()
+predictor = SafeStridePredictor(
+    artifact_format=os.getenv("SAFESTRIDE_ARTIFACT_FORMAT", "auto"),
+    fuse_scaler=os.getenv("SAFESTRIDE_FUSE_SCALER", "1") == "1",
+    load_surrogate=os.getenv("SAFESTRIDE_SURROGATE", "0") == "1",
+    load_hotspots=os.getenv("SAFESTRIDE_HOTSPOTS", "1") == "1",
+    load_cascade=os.getenv("SAFESTRIDE_CASCADE", "0") == "1",
+)
@@ -0,0 +1,414 @@
+"""
+SafeStride Risk Cube - precomputed aggregates for dashboard statistics
+
+A dense multidimensional cube of accident counts, observed severity and the
+served model's mean P(High Risk), built offline by build_risk_cube.py from a
+scoring pass over the dataset and served by `/api/stats`, which answers
+slices and roll-ups with a few array reductions instead of scanning or
+re-scoring rows.
+
+Dimensions (~2M cells):
+- state: the 50 states and DC, plus "Other"
+- hour, day_of_week: as in the API inputs
+- weather: the model's 15 weather categories
+- crossing, junction, traffic_signal, stop: road flags
+
+Measures per cell: count, severity sum, count with Severity >= 3 (the
+training label) and, per model version, the sum of predicted risk.
+
+The cube is updated incrementally. Every ingested source (a CSV file, or one
+State / Year partition of the Parquet dataset) is recorded with its
+fingerprint and the model versions that scored it, so a build only reads the
+sources that are new and, for a new model version, only adds its risk layer
+(the observed measures are kept). Risk layers are stored per model version;
+a layer is served only once it covers every ingested source.
+
+Files (one directory): observed_<generation>.npz and
+risk_<timestamp>_<generation>.npz (compressed; most cells are empty) plus
+meta.json. Every save writes its arrays under a new generation name, then
+replaces meta.json, which names the files of each array: that rename is the
+single commit point, so a crash leaves either the old cube or the new one,
+never new observations with an old ledger. Files no longer named by meta.json
+or the previous one are deleted after the commit.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.preprocessing import WEATHER_CATEGORIES
+from utils.solar import STATE_UTC_OFFSETS
+
+logger = logging.getLogger(__name__)
+
+RISK_CUBE_VERSION = 1
+OTHER_STATE = "Other"
+HIGH_SEVERITY = 3  # Severity >= 3 is labelled High Risk in training
+
+# (name, labels) per axis, in storage order
+DIMENSIONS: List[Tuple[str, list]] = [
+    ("state", sorted(STATE_UTC_OFFSETS) + [OTHER_STATE]),
+    ("hour", list(range(24))),
+    ("day_of_week", list(range(7))),
+    ("weather", list(WEATHER_CATEGORIES)),
+    ("crossing", [0, 1]),
+    ("junction", [0, 1]),
+    ("traffic_signal", [0, 1]),
+    ("stop", [0, 1]),
+]
+DIMENSION_NAMES = [name for name, _ in DIMENSIONS]
+CUBE_SHAPE = tuple(len(labels) for _, labels in DIMENSIONS)
+OBSERVED_MEASURES = ("count", "severity_sum", "high_severity")
+
+# Roll-ups materialized at load time (besides the full cube); a query reads the
+# smallest one covering its group_by and filter dimensions
+ROLLUPS = [
+    ("state", "hour", "day_of_week", "weather"),
+    ("state", "hour", "day_of_week", "crossing", "junction", "traffic_signal", "stop"),
+    ("state", "weather", "crossing", "junction", "traffic_signal", "stop"),
+    ("hour", "day_of_week", "weather", "crossing", "junction", "traffic_signal", "stop"),
+]
+QUERY_CACHE_SIZE = 256
+RELOAD_CHECK_INTERVAL = 10.0  # seconds between checks for a rebuilt cube
+
+_STATE_INDEX = {state: i for i, state in enumerate(DIMENSIONS[0][1])}
+_ROAD_COLUMNS = ["Crossing", "Junction", "Traffic_Signal", "Stop"]
+_WEATHER_COLUMNS = [f"Weather_Condition_{category}" for category in WEATHER_CATEGORIES]
+
+
+def risk_cube_path(model_dir: Path) -> Path:
+    return Path(model_dir) / "US_Accidents_RiskCube"
+
+
+def cell_indices(states: Sequence[Any], features_df: pd.DataFrame) -> np.ndarray:
+    """
+    Flat cube cell of each row
+
+    Args:
+        states: State code per row (unknown codes go to "Other")
+        features_df: The same rows preprocessed by FeaturePreprocessor
+    """
+    state = (pd.Series(states, dtype=object).astype(str).str.upper()
+             .map(_STATE_INDEX).fillna(_STATE_INDEX[OTHER_STATE]).to_numpy(dtype=np.int64))
+    hour = np.clip(features_df["Hour"].to_numpy(dtype=np.int64), 0, 23)
+    day = np.clip(features_df["Day_of_Week"].to_numpy(dtype=np.int64), 0, 6)
+    weather = features_df[_WEATHER_COLUMNS].to_numpy().argmax(axis=1)
+    road = [(features_df[col].to_numpy() > 0).astype(np.int64) for col in _ROAD_COLUMNS]
+    return np.ravel_multi_index((state, hour, day, weather, *road), CUBE_SHAPE)
+
+
+def _bincount(cells: np.ndarray, weights=None) -> np.ndarray:
+    return np.bincount(cells, weights=weights, minlength=int(np.prod(CUBE_SHAPE))).reshape(CUBE_SHAPE)
+
+
+def _save_npz(path: Path, **arrays):
+    # Write-then-rename so a concurrent reader never sees a partial file
+    partial = path.with_name(path.name + ".part")
+    with open(partial, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(partial, path)
+
+
+class RiskCube:
+    """Observed measures, per-model risk layers and the ingested-source ledger"""
+
+    def __init__(self, observed: Dict[str, np.ndarray], risk: Dict[str, np.ndarray],
+                 meta: Optional[Dict[str, Any]] = None):
+        for name, array in (*observed.items(), *risk.items()):
+            if array.shape != CUBE_SHAPE:
+                raise ValueError(f"Risk cube array {name} has shape {array.shape}, expected {CUBE_SHAPE}; "
+                                 f"rebuild it")
+        self.observed = observed
+        self.risk = risk
+        self.meta = meta or {}
+        self.meta.setdefault("sources", {})
+
+    @classmethod
+    def empty(cls) -> "RiskCube":
+        observed = {name: np.zeros(CUBE_SHAPE, dtype=np.int64) for name in OBSERVED_MEASURES}
+        return cls(observed, {})
+
+    @property
+    def rows(self) -> int:
+        return int(sum(source["rows"] for source in self.meta["sources"].values()))
+
+    # ----- building -----
+
+    def source_status(self, key: str, fingerprint: str, model: str) -> str:
+        """What a build has to do for one source: "new", "score", "current" or "changed" """
+        source = self.meta["sources"].get(key)
+        if source is None:
+            return "new"
+        if source["fingerprint"] != fingerprint:
+            return "changed"
+        return "current" if model in source["models"] else "score"
+
+    def add_observations(self, cells: np.ndarray, severity: np.ndarray):
+        severity = np.nan_to_num(np.asarray(severity, dtype=np.float64))
+        self.observed["count"] += _bincount(cells).astype(np.int64)
+        self.observed["severity_sum"] += _bincount(cells, severity).round().astype(np.int64)
+        self.observed["high_severity"] += _bincount(cells, severity >= HIGH_SEVERITY).round().astype(np.int64)
+
+    def add_risk(self, model: str, cells: np.ndarray, risk: np.ndarray):
+        if model not in self.risk:
+            self.risk[model] = np.zeros(CUBE_SHAPE, dtype=np.float64)
+        self.risk[model] += _bincount(cells, risk)
+
+    def record_source(self, key: str, fingerprint: str, rows: int, model: str):
+        source = self.meta["sources"].setdefault(key, {"fingerprint": fingerprint, "rows": rows, "models": []})
+        if model not in source["models"]:
+            source["models"].append(model)
+
+    def complete_models(self) -> List[str]:
+        """Model versions whose risk layer covers every ingested source"""
+        sources = self.meta["sources"].values()
+        return [model for model in self.risk if all(model in source["models"] for source in sources)]
+
+    def save(self, directory: Path, models: Optional[List[str]] = None):
+        """
+        Write the observed arrays, the given risk layers (default: all) and meta.json
+
+        Arrays go to new files of a fresh generation; other risk layers keep
+        the files they were loaded from. Replacing meta.json commits them all.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        generation = uuid.uuid4().hex[:12]
+        previous = self.meta.get("files", {})
+        files = {"observed": f"observed_{generation}.npz", "risk": {}}
+        _save_npz(directory / files["observed"], **self.observed)
+        for model in sorted(self.risk):
+            name = previous.get("risk", {}).get(model)
+            if name is None or models is None or model in models:
+                name = f"risk_{model}_{generation}.npz"
+                _save_npz(directory / name, risk_sum=self.risk[model])
+            files["risk"][model] = name
+
+        meta = {**self.meta, "version": RISK_CUBE_VERSION, "dimensions": dict(DIMENSIONS), "rows": self.rows,
+                "models": sorted(self.risk), "generation": generation, "files": files, "updated_at": time.time()}
+        partial = directory / "meta.json.part"
+        with open(partial, "w") as f:
+            json.dump(meta, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(partial, directory / "meta.json")
+        self.meta["files"] = files
+
+        # Keep the previous generation's files for readers that opened its meta.json
+        keep = {files["observed"], *files["risk"].values(),
+                previous.get("observed"), *previous.get("risk", {}).values()}
+        for path in [*directory.glob("observed*.npz"), *directory.glob("risk_*.npz"), *directory.glob("*.part")]:
+            if path.name not in keep:
+                path.unlink(missing_ok=True)
+
+    @classmethod
+    def load(cls, directory: Path, models: Optional[List[str]] = None) -> "RiskCube":
+        """Read the cube with the given risk layers (default: all)"""
+        directory = Path(directory)
+        with open(directory / "meta.json") as f:
+            meta = json.load(f)
+        if meta.get("version") != RISK_CUBE_VERSION or meta.get("dimensions") != json.loads(
+                json.dumps(dict(DIMENSIONS))):
+            raise ValueError(f"Risk cube version {meta.get('version')} does not match {RISK_CUBE_VERSION}; "
+                             f"rebuild it")
+        # Cubes written before generations named their files observed.npz / risk_<model>.npz
+        files = meta.setdefault("files", {
+            "observed": "observed.npz",
+            "risk": {model: f"risk_{model}.npz" for model in meta.get("models", [])},
+        })
+        with np.load(directory / files["observed"]) as data:
+            observed = {name: data[name] for name in OBSERVED_MEASURES}
+        risk = {}
+        for model in meta.get("models", []):
+            if models is None or model in models:
+                with np.load(directory / files["risk"][model]) as data:
+                    risk[model] = data["risk_sum"]
+        for key in ("dimensions", "models", "rows"):
+            meta.pop(key, None)
+        return cls(observed, risk, meta)
+
+
+class RiskCubeStats:
+    """
+    The served view of the cube: slices and roll-ups for `/api/stats`
+
+    Holds the observed measures and one risk layer, the served model's when
+    complete (else the most recent complete one), stacked so a query is one
+    reduction, plus the ROLLUPS of that stack. Results are cached until the
+    cube on disk changes; the directory is re-checked at most every
+    RELOAD_CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self.directory: Optional[Path] = None
+        self.model: Optional[str] = None
+        self.risk_model: Optional[str] = None
+        self.meta: Dict[str, Any] = {}
+        self._views: List[Tuple[Tuple[str, ...], np.ndarray]] = []
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return bool(self._views)
+
+    def configure_for_model(self, model_dir: Path, timestamp: str):
+        """Serve the cube next to the model artifacts, preferring this model's risk layer"""
+        self.directory = risk_cube_path(model_dir)
+        self.model = timestamp
+        self._mtime = None
+        self._checked_at = 0.0
+        self._maybe_reload()
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if self.directory is None or now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            mtime = (self.directory / "meta.json").stat().st_mtime
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.directory / "meta.json") as f:
+                meta = json.load(f)
+            # Pick the layer to serve from the ledger, then read only that one
+            sources = meta.get("sources", {}).values()
+            complete = [model for model in meta.get("models", [])
+                        if all(model in source["models"] for source in sources)]
+            risk_model = self.model if self.model in complete else (complete[-1] if complete else None)
+            cube = RiskCube.load(self.directory, models=[risk_model] if risk_model else [])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"⚠️ Could not load the risk cube at {self.directory}: {str(e)}")
+            self._mtime = mtime
+            return
+        values = np.stack([cube.observed[name].astype(np.float64) for name in OBSERVED_MEASURES]
+                          + [cube.risk[risk_model] if risk_model else np.full(CUBE_SHAPE, np.nan)], axis=-1)
+        # Smallest first, so a query takes the first view covering its dimensions
+        views = [(tuple(DIMENSION_NAMES), values)]
+        for dims in ROLLUPS:
+            dropped = tuple(axis for axis, name in enumerate(DIMENSION_NAMES) if name not in dims)
+            views.append((tuple(name for name in DIMENSION_NAMES if name in dims), values.sum(axis=dropped)))
+        views.sort(key=lambda view: view[1].size)
+        with self._lock:
+            self._views = views
+            self.risk_model = risk_model
+            self.meta = {"rows": cube.rows, "sources": len(cube.meta["sources"]),
+                         "updated_at": cube.meta.get("updated_at")}
+            self._mtime = mtime
+            self._cache.clear()
+        logger.info(f"✓ Risk cube loaded: {cube.rows:,} rows, risk layer {risk_model or 'none'}"
+                    f"{' (not the served model)' if risk_model != self.model else ''}")
+
+    def query(self, group_by: Sequence[str] = (), filters: Optional[Dict[str, list]] = None,
+              min_count: int = 1) -> Dict[str, Any]:
+        """
+        Aggregate the cube over a slice
+
+        Args:
+            group_by: Dimensions to break the result down by (none = one total)
+            filters: Dimension -> labels to keep (cells outside are left out)
+            min_count: Leave out groups with fewer accidents
+
+        Returns:
+            total plus one entry per group: count, mean_risk, mean_severity and
+            high_severity_rate (share with Severity >= 3)
+        """
+        self._maybe_reload()
+        if not self.available:
+            raise RuntimeError("Risk cube not built; run build_risk_cube.py")
+        filters = filters or {}
+        for name in [*group_by, *filters]:
+            if name not in DIMENSION_NAMES:
+                raise ValueError(f"Unknown dimension '{name}'; expected one of {DIMENSION_NAMES}")
+        key = (tuple(group_by), tuple(sorted((k, tuple(v)) for k, v in filters.items())), min_count)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+            views, risk_model = self._views, self.risk_model
+        needed = {*group_by, *filters}
+        dims, values = next(view for view in views if needed.issubset(view[0]))
+
+        # Slice the filtered axes, then sum every axis that is not grouped
+        positions = {}
+        for axis, name in enumerate(dims):
+            labels = DIMENSIONS[DIMENSION_NAMES.index(name)][1]
+            if name in filters:
+                lookup = {str(label).upper(): i for i, label in enumerate(labels)}
+                unknown = [label for label in filters[name] if str(label).upper() not in lookup]
+                if unknown:
+                    raise ValueError(f"Unknown {name} value(s) {unknown}; expected {labels}")
+                positions[axis] = sorted({lookup[str(label).upper()] for label in filters[name]})
+                values = np.take(values, positions[axis], axis=axis)
+        grouped = [dims.index(name) for name in group_by]
+        summed = values.sum(axis=tuple(axis for axis in range(len(dims)) if axis not in grouped))
+        total = summed.reshape(-1, values.shape[-1]).sum(axis=0)
+
+        # Groups come out in storage order; present them in group_by order
+        order = sorted(range(len(grouped)), key=lambda i: grouped[i])
+        summed = np.moveaxis(summed, list(range(len(grouped))), order) if grouped else summed
+        flat = summed.reshape(-1, values.shape[-1])
+        kept = np.flatnonzero(flat[:, 0] >= max(min_count, 1))
+        columns = {}
+        indices = np.unravel_index(kept, summed.shape[:-1]) if group_by else ()
+        for name, index in zip(group_by, indices):
+            axis = dims.index(name)
+            labels = DIMENSIONS[DIMENSION_NAMES.index(name)][1]
+            columns[name] = [labels[i] for i in (np.asarray(positions[axis])[index] if axis in positions else index)]
+        columns.update(self._measures(flat[kept]))
+        groups = [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+        result = {
+            "risk_model": risk_model,
+            "stale": risk_model != self.model,
+            "total": {name: column[0] for name, column in self._measures(total[None, :]).items()},
+            "groups": groups,
+        }
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > QUERY_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _measures(values: np.ndarray) -> Dict[str, list]:
+        """Measure columns for rows of (count, severity_sum, high_severity, risk_sum)"""
+        count = values[:, 0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = {
+                "mean_risk": np.round(values[:, 3] / count, 4),
+                "mean_severity": np.round(values[:, 1] / count, 3),
+                "high_severity_rate": np.round(values[:, 2] / count, 4),
+            }
+        columns = {"count": count.astype(np.int64).tolist()}
+        for name, mean in means.items():
+            columns[name] = [None if np.isnan(x) else x for x in mean.tolist()]
+        return columns
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "model": self.model,
+            "risk_model": self.risk_model,
+            "dimensions": {name: labels for name, labels in DIMENSIONS},
+            **self.meta,
+        }
+
+
+# Global risk cube instance
+risk_cube = RiskCubeStats()
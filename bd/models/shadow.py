@@ -0,0 +1,289 @@
+"""
+SafeStride Shadow Scoring - ml_final candidate model
+
+Scores a sampled fraction of live traffic with the newer model generation in
+MLT/ml_final, off the request path, and records how it compares with the
+served model:
+
+- US_Accidents_MODEL_*_preprocessor.joblib: sklearn ColumnTransformer over 28 raw columns
+- US_Accidents_MODEL_*_model.joblib: binary classifier (sklearn HistGradientBoosting)
+- US_Accidents_MODEL_*_meta.joblib: evaluation metrics (optionally a decision threshold)
+
+Request handlers only sample rows and hand them to a small thread pool;
+submissions are dropped (and counted) when the pool is saturated or shutting
+down, so shadow work never adds latency to the primary response. The
+candidate model is loaded and probed with one prediction at startup; if
+either fails, shadow scoring is disabled with a warning.
+
+The candidate preprocessor expects a few columns the served feature pipeline
+does not produce. They are rebuilt here:
+- City_Freq / State_Freq: left missing so the fitted imputer fills them
+- Infrastructure_Risk: number of road features present (Crossing, Junction,
+  Traffic_Signal, Stop)
+- Weather_Severity: 0 (clear) to 3 (severe) from the weather description
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.preprocessing import HIGHWAY_PATTERN, MAIN_STREET_PATTERN, get_default_features
+
+logger = logging.getLogger(__name__)
+
+SHADOW_RATE = float(os.getenv("SAFESTRIDE_SHADOW_RATE", "0.0"))
+SHADOW_WORKERS = int(os.getenv("SAFESTRIDE_SHADOW_WORKERS", "2"))
+SHADOW_MAX_PENDING = int(os.getenv("SAFESTRIDE_SHADOW_MAX_PENDING", "64"))
+SHADOW_MODEL_DIR = os.getenv("SAFESTRIDE_SHADOW_MODEL_DIR", "MLT/ml_final")
+SHADOW_TIMESTAMP = os.getenv("SAFESTRIDE_SHADOW_TIMESTAMP", "20251202_161146")
+
+LATENCY_WINDOW = 1000
+
+WEATHER_SEVERITY_KEYWORDS = [
+    (3, ('thunder', 't-storm', 'heavy', 'blizzard', 'freezing', 'ice', 'hail', 'tornado', 'squall')),
+    (2, ('rain', 'snow', 'sleet', 'drizzle', 'shower', 'fog', 'smoke', 'dust', 'sand')),
+    (1, ('cloud', 'overcast', 'haze', 'mist')),
+]
+
+
+def weather_severity(condition: Any) -> int:
+    condition_lower = str(condition).lower()
+    for severity, keywords in WEATHER_SEVERITY_KEYWORDS:
+        if any(keyword in condition_lower for keyword in keywords):
+            return severity
+    return 0
+
+
+def _match_installed_node_dtype(model):
+    """
+    Cast pickled HistGradientBoosting tree nodes to this scikit-learn's record dtype
+
+    ml_final was pickled by a scikit-learn whose node records hold
+    feature_idx as uint32; 1.3 switched the field to intp without converting
+    older pickles (1.4 added that conversion on unpickle), so predicting
+    fails with "Buffer dtype mismatch". The records are otherwise identical,
+    and the cast is value-preserving.
+    """
+    predictors = getattr(model, "_predictors", None)
+    if not predictors:
+        return model
+    from sklearn.ensemble._hist_gradient_boosting.common import PREDICTOR_RECORD_DTYPE
+
+    for iteration in predictors:
+        for tree in iteration:
+            if tree.nodes.dtype != PREDICTOR_RECORD_DTYPE:
+                tree.nodes = tree.nodes.astype(PREDICTOR_RECORD_DTYPE, casting="same_kind")
+    return model
+
+
+class FinalModelPipeline:
+    """Loads and runs the ml_final preprocessor + classifier"""
+
+    def __init__(self, model_dir: str = SHADOW_MODEL_DIR, timestamp: str = SHADOW_TIMESTAMP):
+        self.model_dir = Path(model_dir)
+        self.timestamp = timestamp
+        self.preprocessor = None
+        self.model = None
+        self.metadata: Dict[str, Any] = {}
+        self.threshold = 0.5
+
+    def load(self):
+        import joblib
+
+        prefix = self.model_dir / f"US_Accidents_MODEL_{self.timestamp}"
+        self.preprocessor = joblib.load(f"{prefix}_preprocessor.joblib")
+        self.model = _match_installed_node_dtype(joblib.load(f"{prefix}_model.joblib"))
+        self.metadata = joblib.load(f"{prefix}_meta.joblib")
+        self.threshold = float(self.metadata.get("threshold", 0.5))
+        logger.info(f"✓ Loaded shadow model {prefix.name} ({self.metadata.get('backend_used', type(self.model).__name__)})")
+
+    def build_inputs(self, input_dicts: List[Dict[str, Any]]) -> pd.DataFrame:
+        """Raw API inputs -> the 28 columns the ml_final preprocessor was fitted on"""
+        df = pd.DataFrame(input_dicts)
+        hour = df['Hour'].astype(int)
+        df['Is_Weekend'] = (df['Day_of_Week'] >= 5).astype(int)
+        df['Is_Rush_Hour'] = ((hour >= 7) & (hour <= 9) | (hour >= 17) & (hour <= 19)).astype(int)
+        df['Is_Night'] = ((hour >= 22) | (hour <= 6)).astype(int)
+        df['City_Freq'] = np.nan
+        df['State_Freq'] = np.nan
+        street = df['Street'].fillna('').astype(str).str.upper()
+        df['Is_Highway'] = street.str.contains(HIGHWAY_PATTERN, regex=True).astype(int)
+        df['Is_Main_Street'] = street.str.contains(MAIN_STREET_PATTERN, regex=True).astype(int)
+        df['Weather_Severity'] = df['Weather_Condition'].map(weather_severity)
+        df['Infrastructure_Risk'] = df[['Crossing', 'Junction', 'Traffic_Signal', 'Stop']].sum(axis=1)
+        return df[list(self.preprocessor.feature_names_in_)]
+
+    def predict_proba_high(self, input_dicts: List[Dict[str, Any]]) -> np.ndarray:
+        X = self.preprocessor.transform(self.build_inputs(input_dicts))
+        return self.model.predict_proba(X)[:, 1]
+
+
+class ShadowScorer:
+    """Samples live traffic and scores it with the candidate model in a worker pool"""
+
+    def __init__(self, rate: float = SHADOW_RATE, workers: int = SHADOW_WORKERS,
+                 max_pending: int = SHADOW_MAX_PENDING, pipeline: Optional[FinalModelPipeline] = None):
+        self.rate = rate
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pipeline = pipeline or FinalModelPipeline()
+        self.load_error: Optional[str] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._load_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._pending = 0
+        self._loaded = False
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.submitted = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+        self.rows_scored = 0
+        self.agreements = 0
+        self.delta_sum = 0.0
+        self.delta_abs_sum = 0.0
+        self.delta_abs_max = 0.0
+        self.primary_latency_ms = deque(maxlen=LATENCY_WINDOW)
+        self.shadow_latency_ms = deque(maxlen=LATENCY_WINDOW)
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0 and self.load_error is None
+
+    def start(self):
+        """Load the candidate and probe it with one prediction; shadowing stays off if either fails"""
+        if self.rate <= 0 or self._executor is not None or not self._ensure_loaded():
+            return
+        try:
+            self.pipeline.predict_proba_high([get_default_features()])
+        except Exception as e:
+            self.load_error = f"probe prediction failed: {str(e)}"
+            logger.warning(f"⚠️ Shadow model {self.load_error}; shadow scoring disabled")
+            return
+        with self._stats_lock:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="safestride-shadow")
+        logger.info(f"✓ Shadow scoring {self.rate:.1%} of traffic with {self.pipeline.model_dir}")
+
+    def stop(self):
+        with self._stats_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, input_dicts: List[Dict[str, Any]], results: List[Dict[str, Any]], primary_latency_ms: float):
+        """
+        Offer served rows for shadow scoring; returns immediately
+
+        Args:
+            input_dicts: Raw inputs as served (not mutated afterwards)
+            results: Primary predictions for the same rows
+            primary_latency_ms: Latency of the primary request
+        """
+        if self._executor is None or not self.enabled:
+            return
+        picked = np.flatnonzero(np.random.random(len(input_dicts)) < self.rate)
+        if len(picked) == 0:
+            return
+        sampled = [(input_dicts[i], results[i]) for i in picked]
+        with self._stats_lock:
+            if self._executor is None:
+                return  # stopped since the check above
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending += 1
+            self.submitted += 1
+            self._executor.submit(self._score, sampled, primary_latency_ms)
+
+    def _ensure_loaded(self) -> bool:
+        if self._loaded:
+            return True
+        with self._load_lock:
+            if not self._loaded and self.load_error is None:
+                try:
+                    self.pipeline.load()
+                    self._loaded = True
+                except Exception as e:
+                    self.load_error = str(e)
+                    logger.warning(f"⚠️ Shadow model failed to load, shadow scoring disabled: {self.load_error}")
+        return self._loaded
+
+    def _score(self, sampled, primary_latency_ms: float):
+        try:
+            if not self._ensure_loaded():
+                return
+            inputs = [inp for inp, _ in sampled]
+            primary = [res for _, res in sampled]
+            start = time.perf_counter()
+            shadow_high = self.pipeline.predict_proba_high(inputs)
+            shadow_latency_ms = (time.perf_counter() - start) * 1000
+
+            primary_high = np.array([res["raw_proba"][1] for res in primary])
+            primary_labels = np.array([res["label"] for res in primary])
+            shadow_labels = (shadow_high >= self.pipeline.threshold).astype(int)
+            delta = shadow_high - primary_high
+
+            with self._stats_lock:
+                self.rows_scored += len(inputs)
+                self.agreements += int((shadow_labels == primary_labels).sum())
+                self.delta_sum += float(delta.sum())
+                self.delta_abs_sum += float(np.abs(delta).sum())
+                self.delta_abs_max = max(self.delta_abs_max, float(np.abs(delta).max()))
+                self.primary_latency_ms.append(primary_latency_ms)
+                self.shadow_latency_ms.append(shadow_latency_ms)
+        except Exception as e:
+            with self._stats_lock:
+                self.failed += 1
+                first_failure = self.last_error is None
+                self.last_error = str(e)
+            if first_failure:
+                logger.error(f"Shadow scoring error (further errors are counted in /api/shadow): {str(e)}")
+        finally:
+            with self._stats_lock:
+                self._pending -= 1
+
+    def report(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            rows = self.rows_scored
+            return {
+                "enabled": self.enabled,
+                "sample_rate": self.rate,
+                "candidate": str(self.pipeline.model_dir / f"US_Accidents_MODEL_{self.pipeline.timestamp}"),
+                "candidate_loaded": self._loaded,
+                "load_error": self.load_error,
+                "batches_submitted": self.submitted,
+                "batches_dropped": self.dropped,
+                "batches_failed": self.failed,
+                "last_error": self.last_error,
+                "rows_scored": rows,
+                "agreement_rate": round(self.agreements / rows, 4) if rows else None,
+                "mean_probability_delta": round(self.delta_sum / rows, 4) if rows else None,
+                "mean_abs_probability_delta": round(self.delta_abs_sum / rows, 4) if rows else None,
+                "max_abs_probability_delta": round(self.delta_abs_max, 4) if rows else None,
+                "latency_ms": {
+                    "primary": _percentiles(self.primary_latency_ms),
+                    "shadow": _percentiles(self.shadow_latency_ms),
+                },
+            }
+
+
+def _percentiles(values) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    arr = np.fromiter(values, dtype=np.float64)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+
+
+# Global shadow scorer instance
+shadow_scorer = ShadowScorer()
@@ -0,0 +1,161 @@
+"""
+SafeStride Lookup Surrogate - approximate prediction mode
+
+A precomputed table of the served model's P(High Risk) over a quantized input
+space, answering `/api/predict?approximate=true` (and interactive requests
+that would otherwise be shed under overload) with an array lookup instead of
+preprocessing + 200 trees.
+
+Cells are indexed by the inputs carrying ~95% of the model's split gain
+(excluding City/State frequency, which serving pins to a constant):
+- Start_Lat / Start_Lng: 0.5° x 1° grid over the contiguous US (clipped at the edges)
+- highway / other street
+- road flags: Crossing, Junction, Traffic_Signal, Stop (16 combinations)
+- Month
+- Distance(mi): < 0.5, 0.5 - 1, > 1
+
+Each cell holds the model output at a representative input (bin centre or
+typical value), averaged over a small background sample of dataset rows for
+every other field (or at their API defaults when built without the dataset),
+quantized to uint8. `build_surrogate.py` builds the table and measures its
+error against the full model on held-out rows; the measurement ships inside
+the artifact.
+"""
+
+import json
+import math
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from utils.preprocessing import FIELD_DEPENDENCIES, HIGHWAY_MARKERS, FeaturePreprocessor, get_default_features
+
+SURROGATE_VERSION = 1
+QUANTIZATION_LEVELS = 255
+
+LAT_START, LAT_STEP, LAT_BINS = 24.0, 0.5, 52
+LNG_START, LNG_STEP, LNG_BINS = -125.0, 1.0, 58
+
+STREET_TYPES = ["Local Rd", "I-25"]  # other / highway
+ROAD_FLAGS = ["Crossing", "Junction", "Traffic_Signal", "Stop"]
+DISTANCE_EDGES = [0.5, 1.0]
+DISTANCE_REPRESENTATIVES = [0.1, 0.75, 2.0]
+
+
+def _grid_centers(start: float, step: float, bins: int) -> List[float]:
+    return [start + (k + 0.5) * step for k in range(bins)]
+
+
+# (name, representative raw fields per bin), in table axis order
+DIMENSIONS: List[Tuple[str, List[Dict[str, Any]]]] = [
+    ("lat", [{"Start_Lat": v} for v in _grid_centers(LAT_START, LAT_STEP, LAT_BINS)]),
+    ("lng", [{"Start_Lng": v} for v in _grid_centers(LNG_START, LNG_STEP, LNG_BINS)]),
+    ("highway", [{"Street": v} for v in STREET_TYPES]),
+    ("road_flags", [{flag: (k >> bit) & 1 for bit, flag in enumerate(ROAD_FLAGS)} for k in range(16)]),
+    ("month", [{"Month": v} for v in range(1, 13)]),
+    ("distance", [{"Distance(mi)": v} for v in DISTANCE_REPRESENTATIVES]),
+]
+TABLE_SHAPE = tuple(len(bins) for _, bins in DIMENSIONS)
+
+
+def surrogate_path(model_dir: Path, timestamp: str) -> Path:
+    return Path(model_dir) / f"US_Accidents_Surrogate_{timestamp}.npz"
+
+
+def _text(value: Any, default: str) -> str:
+    """Missing (None / NaN) text falls back to the preprocessing default"""
+    return default if value is None or value != value else str(value)
+
+
+def _grid_bin(value: float, start: float, step: float, bins: int) -> int:
+    if value != value:  # NaN
+        return 0
+    return min(max(int(math.floor((value - start) / step)), 0), bins - 1)
+
+
+class LookupSurrogate:
+    """Quantized probability table plus the error measured when it was built"""
+
+    def __init__(self, table: np.ndarray, metrics: Dict[str, Any]):
+        if table.shape != TABLE_SHAPE:
+            raise ValueError(f"Surrogate table shape {table.shape} does not match {TABLE_SHAPE}; rebuild it")
+        self.table = table
+        self.metrics = metrics
+
+    def cell(self, input_data: Dict[str, Any]) -> Tuple[int, ...]:
+        """Table index for one raw input"""
+        street = _text(input_data.get('Street'), '').upper()
+        highway = int(any(marker in street for marker in HIGHWAY_MARKERS))
+
+        flags = 0
+        for bit, flag in enumerate(ROAD_FLAGS):
+            if input_data.get(flag):
+                flags |= 1 << bit
+
+        distance = float(input_data.get('Distance(mi)') or 0.0)
+        if distance != distance:
+            distance = 0.0
+        return (
+            _grid_bin(float(input_data.get('Start_Lat', 0.0)), LAT_START, LAT_STEP, LAT_BINS),
+            _grid_bin(float(input_data.get('Start_Lng', 0.0)), LNG_START, LNG_STEP, LNG_BINS),
+            highway,
+            flags,
+            min(max(int(input_data.get('Month', 1)), 1), 12) - 1,
+            int(np.searchsorted(DISTANCE_EDGES, distance, side='right')),
+        )
+
+    def predict_proba_high(self, input_data: Dict[str, Any]) -> float:
+        return int(self.table[self.cell(input_data)]) / QUANTIZATION_LEVELS
+
+    def save(self, path: Path):
+        np.savez_compressed(path, table=self.table, version=np.array(SURROGATE_VERSION),
+                            metrics=np.array(json.dumps(self.metrics)))
+
+    @classmethod
+    def load(cls, path: Path) -> "LookupSurrogate":
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) != SURROGATE_VERSION:
+                raise ValueError(f"Surrogate version {int(data['version'])} != {SURROGATE_VERSION}; rebuild it")
+            return cls(data["table"], json.loads(str(data["metrics"])))
+
+
+def cell_feature_assignments(feature_names: List[str]):
+    """
+    Per-dimension feature values for every bin
+
+    Returns the base feature vector (API defaults) and, for each dimension,
+    the feature columns it controls plus a (bins, columns) array of their
+    values. Dimensions touch disjoint columns, so a cell's feature vector is
+    any base vector (defaults or a background row) with each dimension's row
+    written in.
+    """
+    preprocessor = FeaturePreprocessor(feature_names)
+    defaults = get_default_features()
+    base = preprocessor.preprocess_vector(defaults)
+    index = {name: j for j, name in enumerate(feature_names)}
+
+    assignments = []
+    for _, bins in DIMENSIONS:
+        fields = list(bins[0])
+        columns = sorted({
+            index[feature]
+            for field in fields
+            for feature in FIELD_DEPENDENCIES.get(field, [field])
+            if feature in index
+        })
+        values = np.empty((len(bins), len(columns)))
+        for k, representative in enumerate(bins):
+            vector = base.copy()
+            preprocessor.update_vector(vector, {**defaults, **representative}, fields)
+            values[k] = vector[columns]
+        assignments.append((np.array(columns, dtype=np.intp), values))
+    return base, assignments
+
+
+def cell_features(base: np.ndarray, assignments, flat_cells: np.ndarray) -> np.ndarray:
+    """Feature matrix for a range of flat table indices"""
+    X = np.tile(base, (len(flat_cells), 1))
+    for (columns, values), bins in zip(assignments, np.unravel_index(flat_cells, TABLE_SHAPE)):
+        X[:, columns] = values[bins]
+    return X
@@ -0,0 +1,195 @@
+"""
+SafeStride UK Severity Predictor - the legacy UK road safety model
+
+Serves the multi-class model in MLT/ (trained on UK STATS19 data before the
+US Accidents model replaced it) next to the US model, through the model
+router (see models/model_router.py). It predicts the severity of an accident
+at the given place and conditions: Fatal, Serious or Slight.
+
+Model expects 4 joblib files:
+- SafeStride_Model.joblib: XGBClassifier (multi:softprob, trained on GPU; scored on CPU here)
+- SafeStride_LabelEncoder.joblib: Accident_Severity codes 1-3 (plus one class for missing labels)
+- SafeStride_Features.joblib: List of 85 feature names in training order
+- SafeStride_Metadata.joblib: Model performance metrics
+
+Inference uses the booster up to its best iteration (early stopping), as the
+classifier's own predict_proba() does. The class for missing labels is
+dropped and the three severities renormalized; the result's label is the
+most likely severity (1 = Fatal, 2 = Serious, 3 = Slight).
+"""
+
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.inference_threads import inference_threads
+from utils.uk_preprocessing import SEVERITY_NAMES
+
+logger = logging.getLogger(__name__)
+
+# Severity probability above which a Slight prediction still warns about serious harm
+SERIOUS_WARNING_PROBABILITY = 0.2
+
+
+class UKSeverityPredictor:
+    """Loads and runs the legacy UK severity model"""
+
+    def __init__(self, model_dir: str = "MLT"):
+        self.model_dir = Path(model_dir)
+        self.model = None
+        self.booster = None
+        self.feature_names: Optional[List[str]] = None
+        self.model_metadata = None
+        self.severity_columns: List[int] = []
+        self.severities: List[int] = []
+        self.loaded = False
+        self.load_time_ms = None
+        self._iteration_range = (0, 0)
+        self._boosters: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+
+    def load_models(self):
+        """Load the four joblib artifacts (the xgboost import is paid here, not at startup)"""
+        import joblib
+
+        start = time.perf_counter()
+        try:
+            model = joblib.load(self.model_dir / "SafeStride_Model.joblib")
+            label_encoder = joblib.load(self.model_dir / "SafeStride_LabelEncoder.joblib")
+            feature_names = list(joblib.load(self.model_dir / "SafeStride_Features.joblib"))
+            metadata = joblib.load(self.model_dir / "SafeStride_Metadata.joblib")
+        except Exception as e:
+            logger.error(f"❌ Error loading UK model artifacts: {str(e)}")
+            raise
+
+        booster = model.get_booster()
+        booster.set_param({"device": "cpu"})
+        best_iteration = getattr(model, "best_iteration", None)
+        n_rounds = booster.num_boosted_rounds()
+        self._iteration_range = (0, best_iteration + 1 if best_iteration is not None else n_rounds)
+
+        # Columns of the real severities (the encoder also holds a class for missing labels)
+        self.severity_columns = [i for i, code in enumerate(label_encoder.classes_) if code == code]
+        self.severities = [int(label_encoder.classes_[i]) for i in self.severity_columns]
+        self.model = model
+        self.booster = booster
+        self.feature_names = feature_names
+        self.model_metadata = metadata
+        self.loaded = True
+        self.load_time_ms = round((time.perf_counter() - start) * 1000, 1)
+        logger.info(f"✅ UK severity model loaded: {len(feature_names)} features, "
+                    f"{self._iteration_range[1]} rounds ({self.load_time_ms:.0f} ms)")
+
+    def predict_severity(self, features_df: pd.DataFrame) -> np.ndarray:
+        """Probabilities of the severities (columns in self.severities order), one row per input"""
+        if not self.loaded:
+            raise RuntimeError("Models not loaded. Call load_models() first.")
+        with inference_threads.reserve(len(features_df)) as threads:
+            proba = self._booster_for(threads).inplace_predict(
+                features_df.to_numpy(dtype=np.float32), iteration_range=self._iteration_range,
+                validate_features=False)
+        proba = proba[:, self.severity_columns]
+        return proba / proba.sum(axis=1, keepdims=True)
+
+    def _booster_for(self, threads: int):
+        """Booster copy with nthread = threads, so concurrent calls keep their own thread count"""
+        booster = self._boosters.get(threads)
+        if booster is None:
+            with self._lock:
+                booster = self._boosters.get(threads)
+                if booster is None:
+                    booster = self.booster.copy()
+                    booster.set_param({"nthread": threads})
+                    self._boosters[threads] = booster
+        return booster
+
+    def batch_predict(self, features_df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """
+        Make predictions for multiple inputs
+
+        Args:
+            features_df: DataFrame with preprocessed features (UKFeaturePreprocessor)
+
+        Returns:
+            List of prediction dictionaries
+        """
+        if len(features_df) == 0:
+            return []
+        proba = self.predict_severity(features_df)
+        return [self._build_result(row, features)
+                for row, features in zip(proba, features_df.to_dict("records"))]
+
+    def _build_result(self, proba: np.ndarray, features: Dict[str, float]) -> Dict[str, Any]:
+        """Assemble the response dictionary for one row"""
+        best = int(np.argmax(proba))
+        severity = self.severities[best]
+        class_probabilities = {SEVERITY_NAMES[code]: round(float(p), 4) for code, p in zip(self.severities, proba)}
+        serious = class_probabilities.get("Fatal", 0.0) + class_probabilities.get("Serious", 0.0)
+        risk_factors = self._identify_risk_factors(features)
+        return {
+            "prediction": SEVERITY_NAMES[severity],
+            "label": severity,
+            "probability": round(float(proba[best]), 4),
+            "raw_proba": [round(float(p), 4) for p in proba],
+            "class_probabilities": class_probabilities,
+            "risk_factors": risk_factors,
+            "recommendations": self._generate_recommendations(severity, serious, risk_factors),
+        }
+
+    def _identify_risk_factors(self, features: Dict[str, float]) -> List[str]:
+        """Identify key risk factors from one row of input features (UK model)"""
+        risk_factors = []
+        speed = features.get('Speed_limit', 0)
+        if speed >= 50:
+            risk_factors.append(f"⚠️ High speed road ({speed:.0f} mph limit)")
+        if features.get('High_Speed_Multi_Vehicle', 0) == 1:
+            risk_factors.append("🚗 Multi-vehicle collision at speed")
+        if features.get('Is_Night', 0) == 1:
+            risk_factors.append("🌙 Night time - reduced visibility")
+        elif features.get('Is_Rush_Hour', 0) == 1:
+            risk_factors.append("⏰ Rush hour - heavy traffic")
+        if any(features.get(f'Light_Conditions_{code}.0', 0) == 1 for code in (5, 6)):
+            risk_factors.append("💡 Unlit road")
+        if any(features.get(f'Road_Surface_Conditions_{code}.0', 0) == 1 for code in (2, 3, 4, 5)):
+            risk_factors.append("🌧️ Wet or icy road surface")
+        if features.get('Urban_or_Rural_Area_2.0', 0) == 1:
+            risk_factors.append("🌾 Rural area - longer emergency response")
+        if not risk_factors:
+            risk_factors.append("Standard traffic conditions")
+        return risk_factors[:5]
+
+    def _generate_recommendations(self, severity: int, serious: float, risk_factors: List[str]) -> List[str]:
+        """Generate safety recommendations based on severity and factors"""
+        if severity in (1, 2) or serious >= SERIOUS_WARNING_PROBABILITY:
+            recommendations = [
+                "⚠️ Accidents here are likely to cause serious injury",
+                "🚗 Consider alternative routes",
+                "👀 Maintain maximum alertness",
+            ]
+        else:
+            recommendations = [
+                "✅ Accidents here are usually slight",
+                "🚸 Still follow all traffic rules and signals",
+                "🛣️ Use designated crossings when available",
+            ]
+        risk_text = " ".join(risk_factors).lower()
+        if "night" in risk_text or "unlit" in risk_text:
+            recommendations.append("💡 Use reflective clothing or lights")
+        if "surface" in risk_text:
+            recommendations.append("☔ Allow extra stopping distance on wet or icy roads")
+        if "high speed" in risk_text:
+            recommendations.append("🛣️ Cross only at designated crossings on fast roads")
+        return recommendations[:5]
+
+    def health_check(self) -> Dict[str, Any]:
+        return {
+            "model_loaded": self.loaded,
+            "features_count": len(self.feature_names) if self.feature_names else 0,
+            "boosting_rounds": self._iteration_range[1],
+            "load_time_ms": self.load_time_ms,
+        }
@@ -0,0 +1,343 @@
+"""
+SafeStride Weather Index - server-side weather fields from station observations
+
+The dataset pairs every accident with the observation of a nearby weather
+station (Airport_Code, Weather_Timestamp and the weather columns).
+build_weather_index.py turns those into a station index and an observation
+store, so requests may omit the weather fields and have them filled in from
+the station nearest to Start_Lat / Start_Lng at Year / Month / Hour.
+
+- Stations: one per Airport_Code, placed at the mean location of its
+  accidents (the dataset has no station coordinates). Lookups use a k-d tree
+  over unit vectors (exact great-circle nearest) and ignore stations further
+  than SAFESTRIDE_WEATHER_MAX_KM
+- Observations are de-duplicated per (station, Weather_Timestamp) and
+  bucketed by (station, year, month, hour): inputs carry no day of month, so
+  a bucket holds the mean of each numeric field and the most frequent
+  Weather_Condition over that hour of that month. A (station, month, hour)
+  climatology over all years fills buckets, or single fields, with no
+  observation
+- Layout: sorted int64 bucket keys with float32 value rows and int16
+  condition codes (vocabulary in meta.json), memory-mapped, so a lookup is a
+  tree query and one binary search per distinct bucket
+- Resolved buckets are kept in an LRU cache (SAFESTRIDE_WEATHER_CACHE
+  entries); batches resolve each distinct bucket once
+
+Only fields missing from the input are filled; given values always win.
+
+Settings (environment variables):
+    SAFESTRIDE_WEATHER          1 = fill omitted weather fields (default), 0 = require them
+    SAFESTRIDE_WEATHER_MAX_KM   furthest station used, in km (50)
+    SAFESTRIDE_WEATHER_CACHE    resolved (station, hour) buckets kept in memory (100000)
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.preprocessing import TEMPORAL_RANGES, WEATHER_FIELDS, _is_missing
+
+logger = logging.getLogger(__name__)
+
+WEATHER_ENABLED = os.getenv("SAFESTRIDE_WEATHER", "1") == "1"
+WEATHER_MAX_KM = float(os.getenv("SAFESTRIDE_WEATHER_MAX_KM", "50"))
+WEATHER_CACHE_ENTRIES = int(os.getenv("SAFESTRIDE_WEATHER_CACHE", "100000"))
+
+WEATHER_INDEX_VERSION = 1
+EARTH_RADIUS_KM = 6371.0
+
+# Numeric weather fields (value columns, in order); Weather_Condition is stored as a code
+NUMERIC_FIELDS = [field for field in WEATHER_FIELDS if field != 'Weather_Condition']
+# Input fields the lookup reads
+LOOKUP_FIELDS = ['Start_Lat', 'Start_Lng', 'Year', 'Month', 'Hour']
+
+ARRAY_NAMES = ("station_lat", "station_lng", "obs_keys", "obs_values", "obs_condition",
+               "clim_keys", "clim_values", "clim_condition")
+
+
+def weather_index_path(model_dir: Path) -> Path:
+    return Path(model_dir) / "US_Accidents_Weather"
+
+
+def pack_keys(station, year, month, hour):
+    """Bucket key(s): station (16 bits), year (12), month (4), hour (5); year 0 = climatology"""
+    return (((station << 12 | year) << 4 | month) << 5) | hour
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def _unit_vectors(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    phi, lam = np.radians(lat), np.radians(lng)
+    return np.column_stack([np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)])
+
+
+def _bucket_table(obs: pd.DataFrame, keys: List[str], conditions: List[str]) -> Tuple[np.ndarray, ...]:
+    """(sorted keys, mean value rows, modal condition codes) of obs grouped by keys"""
+    grouped = obs.groupby(keys, sort=True)
+    values = grouped[NUMERIC_FIELDS].mean()
+    index = values.index.to_frame(index=False)
+    year = index['year'] if 'year' in index else 0
+    bucket_keys = pack_keys(index['station'].to_numpy(np.int64), np.asarray(year, dtype=np.int64),
+                            index['month'].to_numpy(np.int64), index['hour'].to_numpy(np.int64))
+
+    # Most frequent condition per bucket (ties: first in vocabulary order)
+    codes = pd.Series(pd.Categorical(obs['Weather_Condition'], categories=conditions).codes, index=obs.index)
+    named = obs[keys].assign(code=codes)
+    counts = named[named['code'] >= 0].groupby(keys + ['code']).size().rename('n').reset_index()
+    modal = counts.sort_values(['n', 'code'], ascending=[False, True]).drop_duplicates(keys)
+    condition = index.merge(modal, on=keys, how='left')['code'].fillna(-1).to_numpy(np.int16)
+    return bucket_keys.astype(np.int64), values.to_numpy(np.float32), condition
+
+
+class WeatherObservations:
+    """Station locations and the bucketed observation store"""
+
+    def __init__(self, station_lat: np.ndarray, station_lng: np.ndarray,
+                 obs_keys: np.ndarray, obs_values: np.ndarray, obs_condition: np.ndarray,
+                 clim_keys: np.ndarray, clim_values: np.ndarray, clim_condition: np.ndarray,
+                 meta: Dict[str, Any]):
+        if (len(station_lat) != len(meta.get("stations", [])) or len(obs_keys) != len(obs_values)
+                or len(clim_keys) != len(clim_values)):
+            raise ValueError("Weather index arrays are inconsistent; rebuild it")
+        self.station_lat = station_lat
+        self.station_lng = station_lng
+        self.obs_keys = obs_keys
+        self.obs_values = obs_values
+        self.obs_condition = obs_condition
+        self.clim_keys = clim_keys
+        self.clim_values = clim_values
+        self.clim_condition = clim_condition
+        self.meta = meta
+        self.stations: List[str] = meta["stations"]
+        self.conditions: List[str] = meta["conditions"]
+        self._tree = None
+
+    @classmethod
+    def build(cls, stations: pd.DataFrame, observations: pd.DataFrame) -> "WeatherObservations":
+        """
+        Build the store
+
+        Args:
+            stations: Airport_Code, lat, lng (one row per station)
+            observations: Airport_Code, Weather_Timestamp, the numeric weather
+                fields and Weather_Condition (de-duplicated per station and timestamp)
+        """
+        stations = stations.dropna().sort_values('Airport_Code').reset_index(drop=True)
+        codes = {code: i for i, code in enumerate(stations['Airport_Code'])}
+        timestamp = pd.to_datetime(observations['Weather_Timestamp'], errors='coerce')
+        obs = observations.assign(
+            station=observations['Airport_Code'].map(codes),
+            year=timestamp.dt.year, month=timestamp.dt.month, hour=timestamp.dt.hour,
+        ).dropna(subset=['station', 'year'])
+        obs = obs.astype({'station': np.int64, 'year': np.int64, 'month': np.int64, 'hour': np.int64})
+        conditions = sorted(obs['Weather_Condition'].dropna().astype(str).unique())
+
+        obs_keys, obs_values, obs_condition = _bucket_table(obs, ['station', 'year', 'month', 'hour'], conditions)
+        clim_keys, clim_values, clim_condition = _bucket_table(obs, ['station', 'month', 'hour'], conditions)
+        meta = {"stations": stations['Airport_Code'].tolist(), "conditions": conditions,
+                "fields": NUMERIC_FIELDS, "observations": int(len(obs))}
+        return cls(stations['lat'].to_numpy(np.float32), stations['lng'].to_numpy(np.float32),
+                   obs_keys, obs_values, obs_condition, clim_keys, clim_values, clim_condition, meta)
+
+    def nearest_stations(self, lat: np.ndarray, lng: np.ndarray,
+                         max_km: float = WEATHER_MAX_KM) -> Tuple[np.ndarray, np.ndarray]:
+        """(station index or -1, distance in km) per location"""
+        if self._tree is None:
+            from scipy.spatial import cKDTree
+
+            self._tree = cKDTree(_unit_vectors(self.station_lat.astype(np.float64),
+                                               self.station_lng.astype(np.float64)))
+        chord_limit = 2 * np.sin(min(max_km, np.pi * EARTH_RADIUS_KM) / (2 * EARTH_RADIUS_KM))
+        chord, station = self._tree.query(_unit_vectors(lat, lng), distance_upper_bound=chord_limit * (1 + 1e-9))
+        found = np.isfinite(chord)
+        distance_km = np.where(found, 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(np.where(found, chord, 0) / 2, 1)),
+                               np.nan)
+        return np.where(found, station, -1).astype(np.int64), distance_km
+
+    def resolve(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Weather of bucket keys: values (NaN where unknown), condition codes
+        (-1 = unknown) and source (2 = observed, 1 = climatology only, 0 = none)
+        """
+        values = np.full((len(keys), len(NUMERIC_FIELDS)), np.nan, dtype=np.float32)
+        condition = np.full(len(keys), -1, dtype=np.int16)
+        source = np.zeros(len(keys), dtype=np.int8)
+        # Climatology first, then overwritten by the observed bucket where it has a value
+        climatology = pack_keys(keys >> 21, 0, (keys >> 5) & 15, keys & 31)
+        for table_keys, table_values, table_condition, level, lookup in (
+                (self.clim_keys, self.clim_values, self.clim_condition, 1, climatology),
+                (self.obs_keys, self.obs_values, self.obs_condition, 2, keys)):
+            if len(table_keys) == 0:
+                continue
+            pos = np.minimum(np.searchsorted(table_keys, lookup), len(table_keys) - 1)
+            hit = np.flatnonzero(table_keys[pos] == lookup)
+            rows = np.asarray(table_values[pos[hit]])
+            values[hit] = np.where(np.isnan(rows), values[hit], rows)
+            codes = np.asarray(table_condition[pos[hit]])
+            condition[hit] = np.where(codes >= 0, codes, condition[hit])
+            source[hit] = level
+        return values, condition, source
+
+    def save(self, directory: Path):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(directory / f"{name}.npy", getattr(self, name))
+        meta = {**self.meta, "version": WEATHER_INDEX_VERSION, "buckets": int(len(self.obs_keys)),
+                "climatology_buckets": int(len(self.clim_keys))}
+        with open(directory / "meta.json", "w") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> "WeatherObservations":
+        directory = Path(directory)
+        with open(directory / "meta.json") as f:
+            meta = json.load(f)
+        if meta.get("version") != WEATHER_INDEX_VERSION or meta.get("fields") != NUMERIC_FIELDS:
+            raise ValueError(f"Weather index version {meta.get('version')} does not match "
+                             f"{WEATHER_INDEX_VERSION}; rebuild it")
+        arrays = {name: np.load(directory / f"{name}.npy", mmap_mode="r" if mmap else None)
+                  for name in ARRAY_NAMES}
+        return cls(meta=meta, **arrays)
+
+
+class WeatherEnricher:
+    """Fills omitted weather fields of raw inputs from the weather index"""
+
+    def __init__(self, max_km: float = WEATHER_MAX_KM, max_entries: int = WEATHER_CACHE_ENTRIES):
+        self.max_km = max_km
+        self.max_entries = max_entries
+        self.index: Optional[WeatherObservations] = None
+        self._cache: "OrderedDict[int, Tuple[tuple, int, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.filled_rows = 0
+        self.unresolved_rows = 0
+
+    @property
+    def available(self) -> bool:
+        return self.index is not None
+
+    def configure_for_model(self, model_dir: Path):
+        """Load the weather index next to the model artifacts (if built and enabled)"""
+        path = weather_index_path(model_dir)
+        with self._lock:
+            self._cache.clear()
+        if not WEATHER_ENABLED or not (path / "meta.json").exists():
+            self.index = None
+            return
+        try:
+            self.index = WeatherObservations.load(path)
+            logger.info(f"🌦️ Weather index: {len(self.index.stations):,} stations, "
+                        f"{len(self.index.obs_keys):,} hourly buckets")
+        except (OSError, ValueError, KeyError) as e:
+            self.index = None
+            logger.warning(f"⚠️ Could not load the weather index at {path}: {str(e)}")
+
+    def fill(self, inputs: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Fill missing weather fields in place, with one batched lookup
+
+        Returns:
+            Per input: None when nothing was filled, else station, distance_km,
+            source ("observed" or "climatology") and the fields filled
+        """
+        info: List[Optional[Dict[str, Any]]] = [None] * len(inputs)
+        if self.index is None:
+            return info
+        rows = [i for i, row in enumerate(inputs) if any(_is_missing(row.get(f)) for f in WEATHER_FIELDS)]
+        if not rows:
+            return info
+
+        def column(field):
+            return np.array([_as_float(inputs[i].get(field)) for i in rows], dtype=np.float64)
+
+        lat, lng = column('Start_Lat'), column('Start_Lng')
+        station, distance_km = self.index.nearest_stations(np.nan_to_num(lat), np.nan_to_num(lng), self.max_km)
+        station[~(np.isfinite(lat) & np.isfinite(lng))] = -1
+        year, month, hour = (
+            np.clip(np.nan_to_num(column(field), nan=low), low, high).astype(np.int64)
+            for field, (low, high) in ((f, TEMPORAL_RANGES[f]) for f in ('Year', 'Month', 'Hour'))
+        )
+        keys = pack_keys(np.maximum(station, 0), year, month, hour)
+        weather = self._resolve(keys[station >= 0])
+
+        found = np.flatnonzero(station >= 0)
+        for j, (values, code, level) in zip(found, weather):
+            row = inputs[rows[j]]
+            filled = []
+            for field, value in zip(NUMERIC_FIELDS, values):
+                if _is_missing(row.get(field)) and value == value:
+                    row[field] = round(value, 2)
+                    filled.append(field)
+            if _is_missing(row.get('Weather_Condition')) and code >= 0:
+                row['Weather_Condition'] = self.index.conditions[code]
+                filled.append('Weather_Condition')
+            if filled:
+                info[rows[j]] = {"station": self.index.stations[station[j]],
+                                 "distance_km": round(float(distance_km[j]), 1),
+                                 "source": "observed" if level == 2 else "climatology", "fields": filled}
+        with self._lock:
+            resolved = sum(1 for i in rows if info[i] is not None)
+            self.filled_rows += resolved
+            self.unresolved_rows += len(rows) - resolved
+        return info
+
+    def _resolve(self, keys: np.ndarray) -> List[Tuple[tuple, int, int]]:
+        """(values, condition code, source) per key, from the cache or one batched store lookup"""
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        resolved: List[Optional[Tuple[tuple, int, int]]] = [None] * len(unique_keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(unique_keys.tolist()):
+                cached = self._cache.get(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    resolved[i] = cached
+            self.hits += len(unique_keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            values, condition, source = self.index.resolve(unique_keys[missing])
+            entries = list(zip(map(tuple, values.tolist()), condition.tolist(), source.tolist()))
+            with self._lock:
+                for i, entry in zip(missing, entries):
+                    resolved[i] = entry
+                    self._cache[int(unique_keys[i])] = entry
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return [resolved[i] for i in inverse.reshape(-1)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": WEATHER_ENABLED,
+                "available": self.index is not None,
+                "stations": len(self.index.stations) if self.index is not None else 0,
+                "buckets": int(len(self.index.obs_keys)) if self.index is not None else 0,
+                "max_km": self.max_km,
+                "cache_entries": len(self._cache),
+                "cache_hits": self.hits,
+                "cache_misses": self.misses,
+                "filled_rows": self.filled_rows,
+                "unresolved_rows": self.unresolved_rows,
+            }
+
+
+# Global weather enrichment instance
+weather_index = WeatherEnricher()
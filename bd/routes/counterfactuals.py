@@ -0,0 +1,63 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+import logging
+import time
+
+from models.counterfactuals import FACTORS, CounterfactualSearch
+from models.predictor import predictor
+from models.weather_index import weather_index
+from routes.prediction import PredictionInput
+from utils.preprocessing import FeaturePreprocessor
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api", tags=["counterfactuals"])
+
+
+def _search(input_dict, factors, max_changes, limit, budget_ms):
+    weather = weather_index.fill([input_dict])[0]
+    is_valid, errors = FeaturePreprocessor(predictor.feature_names).validate_input(input_dict)
+    if not is_valid:
+        raise ValueError("; ".join(errors))
+    search = CounterfactualSearch(predictor, input_dict, weather["fields"] if weather else (), factors)
+    return {**search.run(max_changes=max_changes, limit=limit, budget_ms=budget_ms), "weather": weather}
+
+
+@router.post("/counterfactuals")
+async def find_counterfactuals(
+    input_data: PredictionInput,
+    factors: Optional[str] = Query(None, description=f"Comma-separated factors that may change "
+                                                     f"(default: all of {', '.join(FACTORS)})"),
+    max_changes: int = Query(2, ge=1, le=4, description="Most factors changed in one answer"),
+    limit: int = Query(5, ge=1, le=50, description="Answers returned"),
+    budget_ms: float = Query(250.0, gt=0, le=5000, description="Search time budget in milliseconds")
+):
+    """
+    Smallest changes to controllable factors that turn a High Risk prediction into Low Risk
+
+    Takes the same body as /api/predict. Candidate changes (another hour or
+    day, a different street type, adding or removing a crossing, junction,
+    traffic signal or stop sign) are scored in batches with a best-first
+    search; see models/counterfactuals.py.
+
+    Returns:
+        - probability_high: P(High Risk) of the input as sent
+        - counterfactuals: Answers with P(High Risk) at or below the threshold,
+          fewest factors changed first, then smallest change (hours and days
+          are circular) and lowest probability. Each has changes (factor,
+          field, from, to), size, distance and probability_high. Empty when
+          the input is already Low Risk or nothing within max_changes helps
+        - candidates_scored / complete: Search effort, and false when the
+          time budget ran out first (answers are the best found so far)
+    """
+    selected = [part.strip() for part in factors.split(",") if part.strip()] if factors else None
+    start = time.perf_counter()
+    try:
+        result = await run_in_threadpool(_search, input_data.model_dump(by_alias=True), selected,
+                                         max_changes, limit, budget_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Counterfactual search error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Counterfactual search failed: {str(e)}")
+    return {**result, "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)}
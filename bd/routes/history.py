@@ -0,0 +1,44 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+import asyncio
+import logging
+
+from utils.history_store import history_store
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api", tags=["history"])
+
+
+@router.get("/history")
+async def get_prediction_history(
+    start: Optional[float] = Query(None, description="Earliest Unix timestamp (inclusive)"),
+    end: Optional[float] = Query(None, description="Latest Unix timestamp (inclusive)"),
+    state: Optional[str] = Query(None, description="State code (e.g., 'CA')"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitude; filters to its ~11 km cell"),
+    lng: Optional[float] = Query(None, ge=-180, le=180, description="Longitude; filters to its ~11 km cell"),
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=1000, description="Page size")
+):
+    """
+    Page through the server-side prediction history, newest first
+    
+    Returns:
+        - items: Stored predictions with inputs, probabilities, model version and latency
+        - next_cursor: Pass as `cursor` to fetch the next page (null on the last page)
+        - store: Write-buffer statistics
+    """
+    if not history_store.enabled:
+        raise HTTPException(status_code=503, detail="Prediction history is disabled")
+    if (lat is None) != (lng is None):
+        raise HTTPException(status_code=400, detail="lat and lng must be given together")
+    
+    try:
+        page = await asyncio.to_thread(
+            history_store.query, start=start, end=end, state=state, lat=lat, lng=lng, cursor=cursor, limit=limit
+        )
+        page["store"] = history_store.stats()
+        return page
+        
+    except Exception as e:
+        logger.error(f"History query error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"History query failed: {str(e)}")
@@ -0,0 +1,144 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+import logging
+import uuid
+
+from utils.job_queue import INPUT_FORMATS, JOB_MAX_BYTES, batch_jobs
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api", tags=["jobs"])
+
+# Seconds clients are told to wait when the job queue is full
+QUEUE_FULL_RETRY_AFTER = 30
+# Upload bytes buffered per disk write (each write runs in the threadpool)
+WRITE_BLOCK_BYTES = 1024 * 1024
+
+
+def _require_queue():
+    if not batch_jobs.available:
+        raise HTTPException(status_code=503, detail="Batch jobs are disabled (SAFESTRIDE_JOBS_ENABLED=0)")
+
+
+def _job_links(job_id: str) -> dict:
+    return {"status_url": f"/api/jobs/{job_id}", "results_url": f"/api/jobs/{job_id}/results"}
+
+
+@router.post("/jobs", status_code=202)
+async def submit_job(request: Request):
+    """
+    Submit a batch for asynchronous scoring
+
+    The request body is the batch itself, streamed to disk:
+        - application/json: {"predictions": [...]} or a list of inputs
+        - application/x-ndjson: one input object per line
+        - text/csv: one input per row (API field names, or raw dataset rows with Start_Time)
+
+    Returns:
+        - job_id: Id for polling and downloading
+        - status: "queued"
+        - status_url / results_url: Where to poll and download
+    """
+    _require_queue()
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    input_format = INPUT_FORMATS.get(media_type)
+    if input_format is None:
+        raise HTTPException(status_code=415, detail=f"Content-Type must be one of {sorted(INPUT_FORMATS)}")
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > JOB_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Batch larger than {JOB_MAX_BYTES // 1024 ** 2} MB")
+    # SQLite and file I/O run in the threadpool so a slow disk or a busy database never blocks the event loop
+    if not await run_in_threadpool(batch_jobs.has_capacity):
+        raise HTTPException(status_code=503, detail="Job queue is full, try again later",
+                            headers={"Retry-After": str(QUEUE_FULL_RETRY_AFTER)})
+
+    job_id = uuid.uuid4().hex
+    input_path, result_path = batch_jobs.new_job_paths(job_id, input_format)
+    received = 0
+    try:
+        f = await run_in_threadpool(open, input_path, "wb")
+        try:
+            pending = bytearray()
+            async for block in request.stream():
+                received += len(block)
+                if received > JOB_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Batch larger than {JOB_MAX_BYTES // 1024 ** 2} MB")
+                pending += block
+                if len(pending) >= WRITE_BLOCK_BYTES:
+                    await run_in_threadpool(f.write, bytes(pending))
+                    pending.clear()
+            if pending:
+                await run_in_threadpool(f.write, bytes(pending))
+        finally:
+            await run_in_threadpool(f.close)
+    except BaseException:
+        await run_in_threadpool(input_path.unlink, missing_ok=True)
+        raise
+    if received == 0:
+        await run_in_threadpool(input_path.unlink, missing_ok=True)
+        raise HTTPException(status_code=400, detail="Empty batch")
+
+    client = request.headers.get("x-client-id") or (request.client.host if request.client else None)
+    job = await run_in_threadpool(batch_jobs.submit, job_id, input_format, input_path, result_path, client)
+    logger.info(f"Queued batch job {job_id} ({input_format}, {received / 1024:.0f} KB)")
+    return {"job_id": job_id, "status": job["status"], **_job_links(job_id)}
+
+
+@router.get("/jobs")
+def list_jobs(limit: int = Query(20, ge=1, le=200, description="Number of recent jobs to list")):
+    """
+    Recent batch jobs and worker pool state
+
+    Returns:
+        - queue: Workers, queued / running jobs, limits and counters since startup
+        - jobs: Most recent jobs first (same fields as GET /api/jobs/{job_id})
+    """
+    _require_queue()
+    return {"queue": batch_jobs.stats(), "jobs": batch_jobs.list(limit)}
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Status and progress of a batch job
+
+    Returns:
+        - status: queued, running, done, failed or cancelled
+        - rows / processed / failed_rows / progress: Input rows, rows scored so far
+          (invalid rows included), rows rejected by validation, and processed / rows
+        - created_at / started_at / finished_at / expires_at: Unix timestamps
+        - error: Why the job failed
+    """
+    _require_queue()
+    job = batch_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found (unknown or expired)")
+    return {**job, **_job_links(job_id)}
+
+
+@router.get("/jobs/{job_id}/results")
+def download_job_results(job_id: str):
+    """
+    Download a finished job's results as JSON Lines
+
+    One line per input row, in input order: {"row": i, "success": true, ...prediction}
+    or {"row": i, "success": false, "error": "..."} for rows that failed validation.
+    """
+    _require_queue()
+    job = batch_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found (unknown or expired)")
+    path = batch_jobs.result_path(job_id)
+    if path is None or not path.exists():
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}; results are available once it is done")
+    return FileResponse(path, media_type="application/x-ndjson", filename=f"safestride-{job_id}.jsonl")
+
+
+@router.delete("/jobs/{job_id}")
+def delete_job(job_id: str):
+    """Cancel a queued or running job, or delete a finished job and its results"""
+    _require_queue()
+    outcome = batch_jobs.cancel(job_id)
+    if outcome is None:
+        raise HTTPException(status_code=404, detail="Job not found (unknown or expired)")
+    return {"job_id": job_id, "status": outcome}
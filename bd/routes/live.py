@@ -0,0 +1,169 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from pydantic import TypeAdapter, ValidationError
+from typing import Annotated, Any, Dict
+import asyncio
+import json
+import logging
+import math
+import time
+
+from models.predictor import predictor
+from models.shadow import shadow_scorer
+from models.weather_index import weather_index
+from routes.prediction import PredictionInput
+from utils.admission import admission_controller
+from utils.drift_monitor import drift_monitor
+from utils.history_store import history_store
+from utils.live_sessions import LIVE_IDLE_TIMEOUT, LiveSession, live_sessions
+from utils.logging_utils import prediction_counters
+from utils.preprocessing import FeaturePreprocessor
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api", tags=["live"])
+
+# Per-field validators (same constraints as PredictionInput) for partial updates
+FIELD_VALIDATORS = {
+    field.alias or name: TypeAdapter(Annotated[field.annotation, field])
+    for name, field in PredictionInput.model_fields.items()
+}
+
+# WebSocket close code for "try again later"
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+def _score_session(session: LiveSession) -> Dict[str, Any]:
+    """Score the session's cached feature vector (runs in the threadpool)"""
+    started = time.perf_counter()
+    drift_monitor.observe(session.features[None, :])
+    result = predictor.predict_vector(session.features)
+    latency_ms = (time.perf_counter() - started) * 1000
+
+    prediction_counters.record_predictions([result["label"]], endpoint="live")
+    snapshot = dict(session.input_data)
+    history_store.record("live", snapshot, result, predictor.timestamp, latency_ms)
+    shadow_scorer.submit([snapshot], [result], latency_ms)
+    return result
+
+
+def _validate_changes(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate only the fields present in a partial update"""
+    changes = {}
+    for field, value in message.items():
+        validator = FIELD_VALIDATORS.get(field)
+        if validator is None:
+            raise ValueError(f"Unknown field: {field}")
+        try:
+            changes[field] = validator.validate_python(value)
+        except ValidationError as e:
+            raise ValueError(f"{field}: {e.errors()[0]['msg']}")
+    return changes
+
+
+def _open_session(message: Dict[str, Any]) -> LiveSession:
+    """Validate a complete input and build the session's feature vector"""
+    try:
+        input_dict = PredictionInput.model_validate(message).model_dump(by_alias=True)
+    except ValidationError as e:
+        raise ValueError("; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+    preprocessor = FeaturePreprocessor(predictor.feature_names)
+    weather = weather_index.fill([input_dict])[0]
+    is_valid, errors = preprocessor.validate_input(input_dict)
+    if not is_valid:
+        raise ValueError("; ".join(errors))
+    return LiveSession(preprocessor, input_dict, weather)
+
+
+@router.websocket("/live")
+async def live_scoring(websocket: WebSocket):
+    """
+    Continuous risk scoring for a moving client
+
+    Protocol (JSON text messages):
+        - First message: a complete input, same body as POST /api/predict
+        - Then: objects with only the fields that changed, e.g.
+          {"Start_Lat": 39.74, "Start_Lng": -104.99, "Street": "I-25 N"}
+        - Each message is answered with the /api/predict response plus
+          "seq" (message number) and "rescored" (false when no feature
+          changed and the previous prediction was reused)
+        - Invalid messages are answered with {"seq", "error"}; the session
+          (and its last valid state) is kept
+
+    Clients are charged against the same per-client rate limit as the HTTP
+    prediction routes. Idle sessions are closed after SAFESTRIDE_LIVE_IDLE_TIMEOUT seconds.
+    """
+    if not predictor.loaded or not live_sessions.try_open():
+        await websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+        return
+
+    await websocket.accept()
+    client = websocket.headers.get("x-client-id") or (websocket.client.host if websocket.client else "unknown")
+    session = None
+    seq = 0
+    try:
+        while True:
+            try:
+                text = await asyncio.wait_for(websocket.receive_text(), timeout=LIVE_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                await websocket.close(code=1000, reason="Idle timeout")
+                break
+            seq += 1
+
+            wait_s = admission_controller.check_client(client, time.monotonic())
+            if wait_s > 0:
+                await websocket.send_json({"seq": seq, "error": "Client request rate exceeded",
+                                           "retry_after": math.ceil(wait_s)})
+                continue
+
+            try:
+                message = json.loads(text)
+                if not isinstance(message, dict):
+                    raise ValueError("Expected a JSON object")
+                if session is None:
+                    session = await run_in_threadpool(_open_session, message)
+                    rescore = True
+                else:
+                    # apply() refreshes weather and solar features: off the event loop like scoring
+                    changed = await run_in_threadpool(session.apply, _validate_changes(message))
+                    rescore = bool(changed) or session.last_result is None
+                if rescore:
+                    session.last_result = await run_in_threadpool(_score_session, session)
+            except ValueError as e:
+                await websocket.send_json({"seq": seq, "error": str(e)})
+                continue
+
+            live_sessions.record_message(rescore)
+            result = session.last_result
+            await websocket.send_json({
+                "seq": seq,
+                "rescored": rescore,
+                "success": True,
+                "prediction": result["prediction"],
+                "label": result["label"],
+                "probability": result["probability"],
+                "raw_proba": result["raw_proba"],
+                "risk_factors": result.get("risk_factors", []),
+                "recommendations": result.get("recommendations", []),
+                "nearby_accidents": result.get("nearby_accidents"),
+                "weather": session.weather
+            })
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Live scoring error: {str(e)}")
+        await websocket.close(code=1011)
+    finally:
+        live_sessions.close()
+
+
+@router.get("/live/stats")
+async def get_live_stats():
+    """
+    Live scoring channel activity
+
+    Returns:
+        - active_sessions / sessions_opened / sessions_rejected
+        - messages: Messages answered with a prediction
+        - rescored / reused: Messages that re-ran the model vs. reused the last prediction
+    """
+    return live_sessions.stats()
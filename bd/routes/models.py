@@ -0,0 +1,138 @@
+from fastapi import APIRouter, Body, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List, Optional
+import logging
+import time
+
+from models.model_router import ModelNotAvailable, model_router
+from utils.batch_memory import BatchMemoryTracker, batch_memory, stream_chunks
+from utils.uk_preprocessing import get_uk_default_features
+from utils.preprocessing import get_default_features
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api", tags=["models"])
+
+
+def _model_key(model: Optional[str], header: Optional[str]) -> Optional[str]:
+    return (model or header or "").strip().lower() or None
+
+
+def _route(input_dicts: List[Dict[str, Any]], model_key: Optional[str],
+           validate_only: bool = False) -> Optional[List[Dict[str, Any]]]:
+    try:
+        if validate_only:
+            return model_router.validate_batch(input_dicts, model_key)
+        return model_router.predict_batch(input_dicts, model_key)
+    except ModelNotAvailable as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        logger.error(f"Validation error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Routed prediction error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+
+@router.get("/models")
+async def list_models():
+    """
+    Models served by the router
+
+    Returns:
+        - default: Model used when neither key, region nor fields decide
+        - models: Per model key: description, loaded (models load on first
+          use), load_ms, features, cache size / capacity, requests, rows and
+          cache hits
+        - templates: Example input per model
+    """
+    templates = {"us": get_default_features(), "uk": get_uk_default_features()}
+    stats = model_router.stats()
+    return {**stats, "templates": {key: templates[key] for key in stats["models"] if key in templates}}
+
+
+# Plain functions so FastAPI runs them in the threadpool (first use loads the model)
+@router.post("/models/predict")
+def routed_predict(input_data: Dict[str, Any] = Body(..., description="Raw input of the chosen model"),
+                   model: Optional[str] = Query(None, description="Model key (default: chosen by region)"),
+                   x_safestride_model: Optional[str] = Header(None)):
+    """
+    Predict with the model chosen for this input
+
+    The model comes from the `model` query parameter or X-SafeStride-Model
+    header, else from the input's coordinates (US or UK), else from fields
+    only one model reads (see models/model_router.py). The body is that
+    model's raw input: the /api/predict body for "us", UK road safety fields
+    for "uk" (see GET /api/models for templates).
+
+    Returns:
+        - The model's prediction fields (for "uk": Fatal / Serious / Slight
+          with class_probabilities)
+        - model: Model key that answered
+        - routed_by: "explicit", "region", "fields" or "default"
+        - latency_ms
+    """
+    started = time.perf_counter()
+    result = _route([input_data], _model_key(model, x_safestride_model))[0]
+    return {"success": True, **result, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+
+@router.post("/models/batch-predict")
+def routed_batch_predict(request: Request,
+                         batch_input: Dict[str, List[Dict[str, Any]]] = Body(..., examples=[{"predictions": []}]),
+                         model: Optional[str] = Query(None, description="Model key for every row "
+                                                                        "(default: chosen per row)"),
+                         x_safestride_model: Optional[str] = Header(None)):
+    """
+    Batch predictions across models
+
+    Rows are routed one by one like /api/models/predict, then scored in one
+    batch pass per model; results keep the request order.
+
+    Like /api/batch-predict, batches are scored in chunks sized from the
+    per-worker memory budget: every row is validated first, then a batch
+    larger than one chunk streams its response, and bodies too large for the
+    budget are rejected with 413 before parsing (see utils/batch_memory.py).
+
+    Returns:
+        - results: One prediction per row, with model and routed_by
+        - total_predictions
+        - complete: false when a streamed batch failed part-way; then
+          completed_rows and error tell how far it got and why
+        - models: Rows scored per model key
+    """
+    tracker = getattr(request.state, "batch_memory", None) or BatchMemoryTracker(0)
+    tracker.sample()
+    input_dicts = batch_input.get("predictions")
+    if input_dicts is None:
+        raise HTTPException(status_code=422, detail="Body must be {\"predictions\": [...]}")
+    model_key = _model_key(model, x_safestride_model)
+
+    if len(input_dicts) <= batch_memory.chunk_rows(tracker):
+        rss_before = tracker.sample()
+        results = _route(input_dicts, model_key)
+        batch_memory.observe_chunk(tracker, len(results), rss_before)
+        counts: Dict[str, int] = {}
+        for result in results:
+            counts[result["model"]] = counts.get(result["model"], 0) + 1
+        return {"results": [{"success": True, **result} for result in results],
+                "total_predictions": len(results), "complete": True, "models": counts}
+
+    # Larger than one chunk: fail on any invalid row now, then stream chunk by chunk
+    _route(input_dicts, model_key, validate_only=True)
+    tracker.streamed = True
+    return StreamingResponse(_stream_routed_batch(input_dicts, model_key, tracker),
+                             media_type="application/json")
+
+
+def _stream_routed_batch(input_dicts: List[Dict[str, Any]], model_key: Optional[str],
+                         tracker: BatchMemoryTracker):
+    """Route and score a batch chunk by chunk, yielding the routed_batch_predict JSON"""
+    counts: Dict[str, int] = {}
+
+    def score(start: int, end: int) -> List[Dict[str, Any]]:
+        results = model_router.predict_batch(input_dicts[start:end], model_key)
+        for result in results:
+            counts[result["model"]] = counts.get(result["model"], 0) + 1
+        return [{"success": True, **result} for result in results]
+
+    yield from stream_chunks(score, len(input_dicts), tracker, batch_memory, lambda: {"models": counts})
@@ -0,0 +1,84 @@
+from fastapi import APIRouter, HTTPException, Query
+import logging
+
+from models.shadow import shadow_scorer
+from utils.admission import admission_controller
+from utils.batch_memory import batch_memory
+from utils.drift_monitor import drift_monitor
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api", tags=["monitoring"])
+
+
+@router.get("/drift")
+async def get_drift_report(top: int = Query(10, ge=1, le=43, description="Number of top drifted features to list")):
+    """
+    Compare live inputs against the training distribution
+    
+    Returns:
+        - observations: Rows seen since startup (or the last reset)
+        - summary: Feature counts per status (stable / moderate / significant;
+          features constant at serving time are "excluded")
+        - top_drifted: Features with the highest drift scores
+        - features: Per-feature PSI, status and reference vs live statistics
+    """
+    if not drift_monitor.enabled:
+        raise HTTPException(status_code=503, detail="Drift monitor not configured")
+    
+    try:
+        return drift_monitor.report(top=top)
+    except Exception as e:
+        logger.error(f"Drift report error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Drift report failed: {str(e)}")
+
+
+@router.post("/drift/reset")
+async def reset_drift_monitor():
+    """Discard accumulated observations and start a new monitoring window"""
+    if not drift_monitor.enabled:
+        raise HTTPException(status_code=503, detail="Drift monitor not configured")
+    
+    drift_monitor.reset()
+    return {"status": "reset"}
+
+
+@router.get("/shadow")
+async def get_shadow_report():
+    """
+    Compare the served model with the ml_final candidate on sampled live traffic
+    
+    Returns:
+        - rows_scored: Rows scored by the candidate so far
+        - agreement_rate: Share of rows where both models predict the same class
+        - mean_probability_delta / mean_abs_probability_delta: Candidate minus served P(High Risk)
+        - latency_ms: p50/p95/p99 for the primary request and the shadow scoring call
+    """
+    return shadow_scorer.report()
+
+
+@router.get("/admission")
+async def get_admission_stats():
+    """
+    Admission control state for the prediction routes
+    
+    Returns:
+        - in_flight / queue_length: Current requests per priority class (interactive, batch)
+        - estimated_wait_ms: Queueing delay a new request of each class would see
+        - service_time_ms: Moving average of request service time per class
+        - admitted / queued / shed_estimate / shed_timeout / rate_limited: Counters since startup
+    """
+    return admission_controller.stats()
+
+
+@router.get("/batch-memory")
+async def get_batch_memory_stats():
+    """
+    Memory governance for /api/batch-predict
+    
+    Returns:
+        - budget_mb / max_body_mb / max_rows: Per-worker budget and the largest batch it admits
+        - body_expansion / row_bytes: Current peak-bytes-per-body-byte and per-row chunk cost estimates
+        - requests / rejected / rows / chunks / streamed: Counters since startup
+        - recent: Rows, chunks and peak RSS growth of the latest batch requests
+    """
+    return batch_memory.stats()
@@ -1,12 +1,25 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Dict, Any, List, Optional
 import logging
+import time
 
+from models.latency_budget import LATENCY_BUDGET_MS, latency_budget
 from models.predictor import predictor
+from models.shadow import shadow_scorer
+from models.weather_index import weather_index
+from utils.batch_memory import BatchMemoryTracker, batch_memory, stream_chunks
+from utils.drift_monitor import drift_monitor
+from utils.history_store import history_store
+from utils.inference_threads import inference_threads
+from utils.logging_utils import SampledLogger, prediction_counters
 from utils.preprocessing import FeaturePreprocessor, get_default_features
+from utils.profiling import current_timer
 
 logger = logging.getLogger(__name__)
+# Per-prediction lines are sampled; prediction_counters carries the totals
+prediction_log = SampledLogger(logging.getLogger("safestride.predictions"))
 router = APIRouter(prefix="/api", tags=["predictions"])
 
 
@@ -15,7 +28,8 @@ class PredictionInput(BaseModel):
     """
     Input model for US Accidents binary prediction
     
-    Requires geographic, weather, road, and temporal features
+    Requires geographic, road, and temporal features; weather fields left
+    out are looked up from the weather index (see models/weather_index.py)
     """
     
     # Geographic features
@@ -23,14 +37,14 @@ class PredictionInput(BaseModel):
     Start_Lng: float = Field(..., ge=-180, le=180, description="Longitude (-180 to 180)")
     Distance_mi: float = Field(..., ge=0, alias="Distance(mi)", description="Accident extent in miles")
     
-    # Weather features
-    Temperature_F: float = Field(..., alias="Temperature(F)", description="Temperature in Fahrenheit")
-    Humidity: float = Field(..., ge=0, le=100, alias="Humidity(%)", description="Humidity percentage")
-    Pressure: float = Field(..., alias="Pressure(in)", description="Air pressure in inches")
-    Visibility: float = Field(..., ge=0, alias="Visibility(mi)", description="Visibility in miles")
-    Wind_Speed: float = Field(..., ge=0, alias="Wind_Speed(mph)", description="Wind speed in mph")
-    Precipitation: float = Field(..., ge=0, alias="Precipitation(in)", description="Precipitation in inches")
-    Weather_Condition: str = Field(..., description="Weather description (e.g., 'Fair', 'Heavy Rain', 'Fog')")
+    # Weather features (filled from the nearest station's observations when omitted)
+    Temperature_F: Optional[float] = Field(None, alias="Temperature(F)", description="Temperature in Fahrenheit")
+    Humidity: Optional[float] = Field(None, ge=0, le=100, alias="Humidity(%)", description="Humidity percentage")
+    Pressure: Optional[float] = Field(None, alias="Pressure(in)", description="Air pressure in inches")
+    Visibility: Optional[float] = Field(None, ge=0, alias="Visibility(mi)", description="Visibility in miles")
+    Wind_Speed: Optional[float] = Field(None, ge=0, alias="Wind_Speed(mph)", description="Wind speed in mph")
+    Precipitation: Optional[float] = Field(None, ge=0, alias="Precipitation(in)", description="Precipitation in inches")
+    Weather_Condition: Optional[str] = Field(None, description="Weather description (e.g., 'Fair', 'Heavy Rain', 'Fog')")
     
     # Road features (boolean: 0 or 1)
     Crossing: int = Field(..., ge=0, le=1, description="Pedestrian crossing present (0 or 1)")
@@ -48,7 +62,7 @@ class PredictionInput(BaseModel):
     City: str = Field(..., description="City name")
     State: str = Field(..., description="State code (e.g., 'CA', 'NY')")
     Street: str = Field(..., description="Street name")
-    Sunrise_Sunset: str = Field(..., description="Day or Night")
+    Sunrise_Sunset: Optional[str] = Field(None, description="Day or Night (derived from location, date and hour when omitted)")
     
     class Config:
         populate_by_name = True
@@ -89,6 +103,11 @@ class PredictionResponse(BaseModel):
     raw_proba: List[float]  # [prob_low, prob_high]
     risk_factors: List[str]
     recommendations: List[str]
+    approximate: bool = False  # Answered from the lookup surrogate
+    nearby_accidents: Optional[Dict[str, Any]] = None  # radius_m, count, percentile (hotspot index)
+    weather: Optional[Dict[str, Any]] = None  # station, distance_km, source, fields (filled weather fields)
+    rounds: Optional[int] = None  # Boosting rounds evaluated (/api/predict; fewer under a latency budget)
+    latency_budget: Optional[Dict[str, Any]] = None  # budget_ms, remaining_ms, expected error of the rounds used
 
 
 class BatchPredictionInput(BaseModel):
@@ -100,10 +119,20 @@ class BatchPredictionResponse(BaseModel):
     """Response model for batch predictions"""
     results: List[PredictionResponse]
     total_predictions: int
+    complete: bool = True  # False when a streamed batch failed part-way (see completed_rows / error)
+    completed_rows: Optional[int] = None
+    error: Optional[str] = None
 
 
+# Prediction handlers are plain functions so FastAPI runs them in the threadpool:
+# CPU-bound inference stays off the event loop and utils.admission can queue,
+# prioritize and shed requests while others are being scored.
 @router.post("/predict", response_model=PredictionResponse)
-async def predict_risk(input_data: PredictionInput):
+def predict_risk(input_data: PredictionInput, request: Request,
+                 approximate: bool = Query(False, description="Answer from the precomputed lookup table"),
+                 budget_ms: Optional[float] = Query(None, gt=0, le=60000,
+                                                    description="Latency budget in ms; fewer boosting rounds "
+                                                                "are evaluated to answer within it")):
     """
     Predict accident risk level (Binary: High Risk / Low Risk)
     
@@ -114,7 +143,30 @@ async def predict_risk(input_data: PredictionInput):
         - raw_proba: [prob_low, prob_high]
         - risk_factors: List of identified risk factors
         - recommendations: Safety recommendations
+        - weather: Where omitted weather fields came from (station,
+          distance_km, source, fields), or null when none were filled
+        - rounds: Boosting rounds evaluated (null when approximate)
+        - latency_budget: With a budget, the time left when the rounds were
+          chosen and their calibrated error; null without one
+    
+    Send `X-SafeStride-Profile: timing` (or `?profile=timing`) for a
+    Server-Timing stage breakdown, or `cpu` to also capture a sampling profile.
+    
+    With `?approximate=true` the probability comes from the precomputed lookup
+    table (see /api/metrics "approximate_mode" for its measured error) and the
+    response has `"approximate": true`. Admission control also routes requests
+    it would otherwise shed here. Without a surrogate the full model answers.
+    
+    With `?budget_ms=` (or SAFESTRIDE_LATENCY_BUDGET_MS) only the first K
+    boosting rounds are evaluated, K being the most rounds the startup
+    calibration table expects to finish in the time left, queueing included
+    (see models/latency_budget.py and /api/metrics "latency_budget"). When
+    even the fewest rounds would not fit, the lookup surrogate answers.
     """
+    started = time.perf_counter()
+    timer = current_timer()
+    timer.mark_parsed()
+    approximate = (approximate or getattr(request.state, "approximate", False)) and predictor.surrogate is not None
     try:
         # Convert Pydantic model to dict
         input_dict = input_data.model_dump(by_alias=True)
@@ -122,16 +174,41 @@ async def predict_risk(input_data: PredictionInput):
         # Initialize preprocessor
         preprocessor = FeaturePreprocessor(predictor.feature_names)
         
-        # Validate input
-        is_valid, errors = preprocessor.validate_input(input_dict)
+        # Fill omitted weather fields, then validate input
+        with timer.stage("validate"):
+            weather = weather_index.fill([input_dict])[0]
+            is_valid, errors = preprocessor.validate_input(input_dict)
         if not is_valid:
             raise HTTPException(status_code=400, detail={"errors": errors})
         
-        # Preprocess features (creates 43 features)
-        features_df = preprocessor.preprocess(input_dict)
+        # Pick the boosting rounds that fit the time left (time queued in admission control included)
+        budget_ms = budget_ms or LATENCY_BUDGET_MS
+        entry = budget = None
+        if budget_ms and not approximate and latency_budget.calibrated:
+            remaining_ms = budget_ms - (time.perf_counter() - getattr(request.state, "arrived", started)) * 1000
+            entry = latency_budget.choose(remaining_ms)
+            if entry is None and predictor.surrogate is not None:
+                approximate = True
+            else:
+                entry = entry or latency_budget.table[0]
+            budget = {"budget_ms": budget_ms, "remaining_ms": round(remaining_ms, 2)}
+            if entry is not None:
+                budget.update(expected_mean_abs_error=entry["mean_abs_error"],
+                              expected_decision_agreement=entry["decision_agreement"])
         
-        # Make prediction (scaling happens inside predictor)
-        result = predictor.predict(features_df)
+        if approximate:
+            result = predictor.predict_approximate(input_dict)
+        else:
+            scoring_started = time.perf_counter()
+            # Preprocess features (creates 43 features)
+            with timer.stage("preprocess"):
+                features_df = preprocessor.preprocess(input_dict)
+            drift_monitor.observe(features_df)
+            
+            # Make prediction (scaling happens inside predictor)
+            result = predictor.predict(features_df, rounds=entry["rounds"] if entry else None)
+            if entry is not None:
+                latency_budget.observe(entry, (time.perf_counter() - scoring_started) * 1000)
         
         # Transform response
         response = {
@@ -141,13 +218,31 @@ async def predict_risk(input_data: PredictionInput):
             "probability": result["probability"],
             "raw_proba": result["raw_proba"],
             "risk_factors": result.get("risk_factors", []),
-            "recommendations": result.get("recommendations", [])
+            "recommendations": result.get("recommendations", []),
+            "approximate": approximate,
+            "nearby_accidents": result.get("nearby_accidents"),
+            "weather": weather,
+            "rounds": None if approximate else (entry["rounds"] if entry else predictor.n_rounds),
+            "latency_budget": budget
         }
+        if budget is not None:
+            elapsed_ms = (time.perf_counter() - getattr(request.state, "arrived", started)) * 1000
+            latency_budget.record(entry, predictor.n_rounds, approximate, elapsed_ms > budget_ms)
         
-        logger.info(f"Prediction: {response['prediction']} (prob: {response['probability']:.3f})")
+        endpoint = "approximate" if approximate else "predict"
+        prediction_counters.record_predictions([result["label"]], endpoint=endpoint)
+        latency_ms = (time.perf_counter() - started) * 1000
+        history_store.record(endpoint, input_dict, result, predictor.timestamp, latency_ms)
+        if not approximate:
+            shadow_scorer.submit([input_dict], [result], latency_ms)
+        prediction_log.info("Prediction: %s (prob: %.3f)", response["prediction"], response["probability"],
+                            prediction=response["label"], probability=response["probability"])
         
+        timer.mark_handler_done()
         return response
         
+    except HTTPException:
+        raise
     except ValueError as e:
         logger.error(f"Validation error: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -156,56 +251,117 @@ async def predict_risk(input_data: PredictionInput):
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
 
+def _score_batch_chunk(preprocessor: FeaturePreprocessor, input_dicts: List[Dict[str, Any]],
+                       weather: List[Optional[Dict[str, Any]]], started: float, timer) -> List[Dict[str, Any]]:
+    """Preprocess, score and record one chunk of a batch request"""
+    with timer.stage("preprocess"):
+        features_df = preprocessor.preprocess_batch(input_dicts)
+    drift_monitor.observe(features_df)
+    batch_results = predictor.batch_predict(features_df)
+    del features_df
+    
+    # Transform response
+    results = [
+        {
+            "success": True,
+            "prediction": result["prediction"],
+            "label": result["label"],
+            "probability": result["probability"],
+            "raw_proba": result["raw_proba"],
+            "risk_factors": result.get("risk_factors", []),
+            "recommendations": result.get("recommendations", []),
+            "approximate": False,
+            "nearby_accidents": result.get("nearby_accidents"),
+            "weather": filled
+        }
+        for result, filled in zip(batch_results, weather)
+    ]
+    
+    prediction_counters.record_predictions((r["label"] for r in results), endpoint="batch_predict")
+    latency_ms = (time.perf_counter() - started) * 1000
+    for input_dict, result in zip(input_dicts, batch_results):
+        history_store.record("batch_predict", input_dict, result, predictor.timestamp, latency_ms)
+    shadow_scorer.submit(input_dicts, batch_results, latency_ms)
+    return results
+
+
 @router.post("/batch-predict", response_model=BatchPredictionResponse)
-async def batch_predict_risk(batch_input: BatchPredictionInput):
+def batch_predict_risk(batch_input: BatchPredictionInput, request: Request):
     """
     Make predictions for multiple inputs at once
     
     Returns:
         - results: List of prediction results
         - total_predictions: Total number of predictions made
+        - complete: false when a streamed batch failed part-way; then
+          completed_rows and error tell how far it got and why
+    
+    Batches are scored in chunks sized from the per-worker memory budget
+    (SAFESTRIDE_BATCH_MEMORY_MB); a batch larger than one chunk streams its
+    response as each chunk is scored, and bodies too large for the budget are
+    rejected with 413 before parsing (see utils/batch_memory.py).
+    
+    Supports the same profiling flags as /api/predict.
     """
+    started = time.perf_counter()
+    timer = current_timer()
+    timer.mark_parsed()
+    tracker = getattr(request.state, "batch_memory", None) or BatchMemoryTracker(0)
+    tracker.sample()
     try:
-        results = []
         preprocessor = FeaturePreprocessor(predictor.feature_names)
+        input_dicts = [input_data.model_dump(by_alias=True) for input_data in batch_input.predictions]
+        # The parsed models cost ~20x the dicts; nothing reads them past this point
+        batch_input.predictions.clear()
         
-        for input_data in batch_input.predictions:
-            input_dict = input_data.model_dump(by_alias=True)
-            
-            # Validate input
-            is_valid, errors = preprocessor.validate_input(input_dict)
-            if not is_valid:
-                raise HTTPException(status_code=400, detail={"errors": errors})
-            
-            # Preprocess and predict
-            features_df = preprocessor.preprocess(input_dict)
-            result = predictor.predict(features_df)
+        # Fill omitted weather fields (one batched lookup) and validate every
+        # input before doing any work
+        with timer.stage("validate"):
+            weather = weather_index.fill(input_dicts)
+            for input_dict in input_dicts:
+                is_valid, errors = preprocessor.validate_input(input_dict)
+                if not is_valid:
+                    raise HTTPException(status_code=400, detail={"errors": errors})
+        
+        chunk_rows = batch_memory.chunk_rows(tracker)
+        if len(input_dicts) <= chunk_rows:
+            rss_before = tracker.sample()
+            results = _score_batch_chunk(preprocessor, input_dicts, weather, started, timer)
+            batch_memory.observe_chunk(tracker, len(results), rss_before)
+            prediction_log.info("Batch prediction completed: %d predictions", len(results), batch_size=len(results))
             
-            # Transform response
-            response = {
-                "success": True,
-                "prediction": result["prediction"],
-                "label": result["label"],
-                "probability": result["probability"],
-                "raw_proba": result["raw_proba"],
-                "risk_factors": result.get("risk_factors", []),
-                "recommendations": result.get("recommendations", [])
+            timer.mark_handler_done()
+            return {
+                "results": results,
+                "total_predictions": len(results)
             }
-            results.append(response)
-        
-        logger.info(f"Batch prediction completed: {len(results)} predictions")
-        
-        return {
-            "results": results,
-            "total_predictions": len(results)
-        }
         
+    except HTTPException:
+        raise
     except ValueError as e:
         logger.error(f"Validation error: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Batch prediction error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+    
+    # Larger than one chunk: stream the results so only one chunk's worth is held at a time
+    tracker.streamed = True
+    timer.mark_handler_done()
+    return StreamingResponse(_stream_batch(preprocessor, input_dicts, weather, tracker, started, timer),
+                             media_type="application/json")
+
+
+def _stream_batch(preprocessor: FeaturePreprocessor, input_dicts: List[Dict[str, Any]],
+                  weather: List[Optional[Dict[str, Any]]], tracker: BatchMemoryTracker, started: float, timer):
+    """Score a batch chunk by chunk, yielding the BatchPredictionResponse JSON"""
+    total = len(input_dicts)
+    completed = yield from stream_chunks(
+        lambda start, end: _score_batch_chunk(preprocessor, input_dicts[start:end], weather[start:end],
+                                              started, timer),
+        total, tracker, batch_memory)
+    if completed == total:
+        prediction_log.info("Batch prediction completed: %d predictions", total, batch_size=total)
 
 
 @router.get("/health")
@@ -220,12 +376,14 @@ async def health_check():
     """
     try:
         health_info = predictor.health_check()
+        ready = health_info["status"] == "healthy"
         
         return {
-            "status": "healthy" if health_info["model_loaded"] else "degraded",
+            "status": "healthy" if ready else "degraded",
             "model_status": health_info,
+            "prediction_counters": prediction_counters.snapshot(),
             "api_version": "1.0.0",
-            "message": "SafeStride API is running" if health_info["model_loaded"] else "Model not loaded"
+            "message": "SafeStride API is running" if ready else "Model not loaded or not warmed up"
         }
         
     except Exception as e:
@@ -246,6 +404,12 @@ async def get_model_metrics():
         - f1_score: F1 score
         - roc_auc: ROC-AUC score
         - Additional metrics from training
+        - approximate_mode: Measured error of the lookup surrogate (null if not built)
+        - cascade: Band, live escalation rate and audited agreement of cascade
+          mode, with the measurement from the build (null when off)
+        - inference_threads: Thread budget, per-call grants and BLAS / OpenMP caps
+        - latency_budget: Rounds calibration table (latency and accuracy loss
+          per round count), current slowdown and deadline counters
     """
     try:
         metadata = predictor.get_metrics()
@@ -268,7 +432,12 @@ async def get_model_metrics():
             "model_name": "US Accidents XGBoost Binary Classifier",
             "model_version": metadata.get("training_date", "20251118_162845"),
             "dataset": metadata.get("dataset", "US Accidents (2016-2023)"),
-            "classes": list(metadata.get("class_mapping", {}).values())
+            "classes": list(metadata.get("class_mapping", {}).values()),
+            "approximate_mode": predictor.surrogate.metrics if predictor.surrogate is not None else None,
+            "cascade": predictor.cascade.stats() if predictor.cascade is not None else None,
+            "inference_threads": inference_threads.stats(),
+            "latency_budget": latency_budget.stats(),
+            "weather_index": weather_index.stats()
         }
         
     except Exception as e:
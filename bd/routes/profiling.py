@@ -0,0 +1,24 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+import logging
+
+from utils.profiling import profile_path
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api", tags=["diagnostics"])
+
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str):
+    """
+    Download a sampling profile captured with `X-SafeStride-Profile: cpu`
+    
+    Returns:
+        Folded stacks (`frame;frame;frame count` per line), readable by
+        flamegraph.pl and speedscope
+    """
+    path = profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found")
+    
+    return FileResponse(path, media_type="text/plain", filename=f"safestride-{profile_id}.folded")
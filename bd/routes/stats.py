@@ -0,0 +1,74 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import time
+
+from models.risk_cube import DIMENSION_NAMES, risk_cube
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api", tags=["stats"])
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in value.split(",") if part.strip()] if value else []
+
+
+@router.get("/stats")
+async def get_risk_stats(
+    group_by: Optional[str] = Query(None, description=f"Comma-separated dimensions to break down by: "
+                                                      f"{', '.join(DIMENSION_NAMES)}"),
+    state: Optional[str] = Query(None, description="State codes to include (e.g., 'CA,NY')"),
+    hour: Optional[str] = Query(None, description="Hours to include (0-23, e.g., '7,8,17')"),
+    day_of_week: Optional[str] = Query(None, description="Days to include (0 = Monday)"),
+    weather: Optional[str] = Query(None, description="Weather categories to include (e.g., 'Rain,Heavy Rain')"),
+    crossing: Optional[str] = Query(None, description="0 or 1"),
+    junction: Optional[str] = Query(None, description="0 or 1"),
+    traffic_signal: Optional[str] = Query(None, description="0 or 1"),
+    stop: Optional[str] = Query(None, description="0 or 1"),
+    min_count: int = Query(1, ge=1, description="Leave out groups with fewer accidents")
+):
+    """
+    Accident counts, observed severity and mean predicted risk from the precomputed risk cube
+
+    Example: `/api/stats?group_by=hour&state=CA&weather=Rain,Heavy Rain`
+
+    Returns:
+        - total: Aggregate over the filtered slice
+        - groups: One entry per group_by combination: count, mean_risk (mean
+          P(High Risk) of the model in risk_model), mean_severity and
+          high_severity_rate (share with Severity >= 3)
+        - risk_model / stale: Model version behind mean_risk, and whether it
+          differs from the served model (its layer is not built yet)
+        - cube: Rows and sources the cube was built from
+    """
+    requested = {"state": state, "hour": hour, "day_of_week": day_of_week, "weather": weather,
+                 "crossing": crossing, "junction": junction, "traffic_signal": traffic_signal, "stop": stop}
+    filters: Dict[str, List[str]] = {name: _split(value) for name, value in requested.items() if value}
+    dimensions = list(dict.fromkeys(_split(group_by)))
+
+    start = time.perf_counter()
+    try:
+        result = await asyncio.to_thread(risk_cube.query, group_by=dimensions, filters=filters,
+                                         min_count=min_count)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Stats query error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Stats query failed: {str(e)}")
+
+    return {
+        "group_by": dimensions,
+        "filters": filters,
+        **result,
+        "query_ms": round((time.perf_counter() - start) * 1000, 2),
+        "cube": {key: value for key, value in risk_cube.stats().items() if key != "dimensions"},
+    }
+
+
+@router.get("/stats/dimensions")
+async def get_stats_dimensions():
+    """Dimensions of the risk cube and their values, for building /api/stats queries"""
+    return risk_cube.stats()
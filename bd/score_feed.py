@@ -0,0 +1,104 @@
+"""
+Spool Feed Scoring Daemon
+
+Scores incident / conditions records continuously without going through
+HTTP: JSON Lines files dropped into (or appended to) the spool directory, and
+optionally lines streamed into a local Unix socket, are micro-batched through
+the batch preprocessing and inference path, and the results are written as
+scored-<sequence>.jsonl segments. Read offsets are checkpointed with every
+segment, so after a crash or restart scoring resumes exactly where the last
+committed segment ended (see utils/spool_feed.py).
+
+The predictor, weather index and preprocessor are loaded once at start, with
+the same settings (SAFESTRIDE_* environment variables) as the server.
+SIGTERM / Ctrl+C commit the open segment and exit.
+
+Usage:
+    python score_feed.py
+    python score_feed.py --spool data/feed/spool --output data/feed/scored --socket /run/safestride/feed.sock
+    printf '%s\\n' '{"Start_Lat": 39.7, ...}' | nc -NU /run/safestride/feed.sock
+"""
+
+import argparse
+import logging
+import signal
+import sys
+import threading
+
+# Cap the BLAS / OpenMP thread pools before NumPy and XGBoost load them
+from utils.inference_threads import cap_blas_threads, inference_threads
+
+cap_blas_threads()
+
+from utils.logging_utils import configure_logging, stop_logging
+from utils.spool_feed import (
+    FEED_BATCH_ROWS, FEED_BATCH_WAIT_MS, FEED_DONE_AFTER_S, FEED_OUTPUT_DIR, FEED_POLL_MS, FEED_SEGMENT_ROWS,
+    FEED_SEGMENT_SECONDS, FEED_SPOOL_DIR, UNIX_SOCKETS, SocketSpool, SpoolFeed,
+)
+
+logger = logging.getLogger("safestride.feed")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Score JSON Lines from a spool directory continuously")
+    parser.add_argument("--spool", default=FEED_SPOOL_DIR, help="Directory JSON Lines files are dropped into")
+    parser.add_argument("--output", default=FEED_OUTPUT_DIR, help="Directory for scored segments and the checkpoint")
+    parser.add_argument("--socket", help="Also accept lines on this Unix socket path")
+    parser.add_argument("--batch-rows", type=int, default=FEED_BATCH_ROWS, help="Records per micro-batch")
+    parser.add_argument("--batch-wait-ms", type=float, default=FEED_BATCH_WAIT_MS,
+                        help="Longest wait for a micro-batch to fill")
+    parser.add_argument("--segment-rows", type=int, default=FEED_SEGMENT_ROWS, help="Rows per output segment")
+    parser.add_argument("--segment-seconds", type=float, default=FEED_SEGMENT_SECONDS,
+                        help="Longest a scored row waits for its segment to be committed")
+    parser.add_argument("--poll-ms", type=float, default=FEED_POLL_MS, help="Spool poll interval when idle")
+    parser.add_argument("--done-after", type=float, default=FEED_DONE_AFTER_S,
+                        help="Seconds before idle, fully read files move to <spool>/done (0 = never)")
+    args = parser.parse_args()
+
+    configure_logging()
+    if args.socket and not UNIX_SOCKETS:
+        print("✗ FAILURE: --socket needs Unix domain sockets, which this platform does not have")
+        return 1
+
+    from models.predictor import predictor
+    from models.weather_index import weather_index
+    from utils.preprocessing import FeaturePreprocessor
+
+    try:
+        predictor.load_models()
+    except Exception as e:
+        print(f"✗ FAILURE: could not load the model: {str(e)}")
+        return 1
+    inference_threads.configure(cap_blas_threads())
+    weather_index.configure_for_model(predictor.model_dir)
+
+    feed = SpoolFeed(predictor, FeaturePreprocessor(predictor.feature_names), args.spool, args.output,
+                     batch_rows=args.batch_rows, batch_wait_ms=args.batch_wait_ms,
+                     segment_rows=args.segment_rows, segment_seconds=args.segment_seconds,
+                     poll_ms=args.poll_ms, done_after_s=args.done_after)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: feed.stop())
+
+    server = None
+    if args.socket:
+        feed.spool_dir.mkdir(parents=True, exist_ok=True)
+        server = SocketSpool(args.socket, feed.spool_dir)
+        threading.Thread(target=server.serve_forever, name="feed-socket", daemon=True).start()
+        logger.info(f"🔌 Accepting lines on {args.socket}")
+
+    try:
+        feed.run()
+    except Exception as e:
+        logger.error(f"❌ Feed stopped: {str(e)}")
+        return 1
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        logger.info(f"🛑 Feed stopped: {feed.stats()}")
+        stop_logging()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
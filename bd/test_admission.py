@@ -0,0 +1,163 @@
+"""
+Tests for admission control and load shedding (utils/admission.py)
+"""
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from utils.admission import BATCH, INTERACTIVE, AdmissionController, AdmissionMiddleware, TokenBucket
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(burst=2, now=0.0)
+    assert bucket.take(0.0, rate=1, burst=2) == 0
+    assert bucket.take(0.0, rate=1, burst=2) == 0
+    assert bucket.take(0.0, rate=1, burst=2) == pytest.approx(1.0)
+    assert bucket.take(1.0, rate=1, burst=2) == 0
+
+
+def test_interactive_waiters_are_dispatched_before_batch():
+    async def run():
+        controller = AdmissionController(max_in_flight=1, max_batch_in_flight=1, slo_ms=1000, batch_slo_ms=1000)
+        controller.service_ms = {INTERACTIVE: 1.0, BATCH: 1.0}
+        assert await controller.acquire(INTERACTIVE) is None
+        order = []
+
+        async def waiter(priority):
+            assert await controller.acquire(priority) is None
+            order.append(priority)
+            controller.release(priority, 1.0)
+
+        tasks = [asyncio.create_task(waiter(BATCH)), asyncio.create_task(waiter(INTERACTIVE))]
+        await asyncio.sleep(0)
+        assert controller.stats()["queue_length"] == {INTERACTIVE: 1, BATCH: 1}
+        controller.release(INTERACTIVE, 1.0)
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == [INTERACTIVE, BATCH]
+
+
+def test_shed_when_estimated_wait_exceeds_slo():
+    async def run():
+        controller = AdmissionController(max_in_flight=1, slo_ms=100)
+        controller.service_ms[INTERACTIVE] = 500.0
+        assert await controller.acquire(INTERACTIVE) is None
+        retry_after = await controller.acquire(INTERACTIVE)
+        return controller, retry_after
+
+    controller, retry_after = asyncio.run(run())
+    assert retry_after == 1.0
+    assert controller.counters["shed_estimate"] == 1
+    assert controller.in_flight[INTERACTIVE] == 1
+
+
+def test_queued_request_is_shed_after_waiting_past_slo():
+    async def run():
+        controller = AdmissionController(max_in_flight=1, slo_ms=20)
+        assert await controller.acquire(INTERACTIVE) is None
+        retry_after = await controller.acquire(INTERACTIVE)
+        return controller, retry_after
+
+    controller, retry_after = asyncio.run(run())
+    assert retry_after is not None
+    assert controller.counters["shed_timeout"] == 1
+    assert controller.stats()["queue_length"][INTERACTIVE] == 0
+
+
+def test_batch_requests_are_capped_separately():
+    async def run():
+        controller = AdmissionController(max_in_flight=4, max_batch_in_flight=1, batch_slo_ms=10)
+        assert await controller.acquire(BATCH) is None
+        shed = await controller.acquire(BATCH)
+        interactive = await controller.acquire(INTERACTIVE)
+        return shed, interactive
+
+    shed, interactive = asyncio.run(run())
+    assert shed is not None
+    assert interactive is None
+
+
+def _app(controller):
+    app = FastAPI()
+    release = asyncio.Event()
+
+    @app.post("/api/predict")
+    async def predict():
+        await release.wait()
+        return {"ok": True}
+
+    @app.post("/api/models/predict")
+    async def routed_predict(request: Request):
+        await release.wait()
+        return {"approximate": getattr(request.state, "approximate", False)}
+
+    @app.get("/api/health")
+    async def health():
+        return {"ok": True}
+
+    return AdmissionMiddleware(app, controller), release
+
+
+def test_middleware_sheds_with_503_and_passes_other_routes():
+    async def run():
+        controller = AdmissionController(max_in_flight=1, slo_ms=20, client_rate=0)
+        app, release = _app(controller)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.create_task(client.post("/api/predict"))
+            await asyncio.sleep(0.05)
+            shed = await client.post("/api/predict")
+            health = await client.get("/api/health")
+            release.set()
+            return (await first).status_code, shed, health.status_code, controller
+
+    first, shed, health, controller = asyncio.run(run())
+    assert first == 200
+    assert shed.status_code == 503
+    assert int(shed.headers["retry-after"]) >= 1
+    assert health == 200
+    assert controller.in_flight[INTERACTIVE] == 0
+
+
+def test_middleware_rate_limits_clients_with_429():
+    async def run():
+        controller = AdmissionController(client_rate=1, client_burst=1)
+        app, release = _app(controller)
+        release.set()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            headers = {"X-Client-Id": "a"}
+            return [(await client.post("/api/predict", headers=headers)).status_code for _ in range(2)], \
+                (await client.post("/api/predict", headers={"X-Client-Id": "b"})).status_code
+
+    statuses, other_client = asyncio.run(run())
+    assert statuses == [200, 429]
+    assert other_client == 200
+
+
+def test_fallback_degrades_only_routes_that_answer_approximately():
+    async def run():
+        controller = AdmissionController(max_in_flight=1, slo_ms=20, client_rate=0)
+        controller.approximate_fallback = True
+        app, release = _app(controller)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.create_task(client.post("/api/models/predict"))
+            await asyncio.sleep(0.05)
+            routed = await client.post("/api/models/predict")
+            degraded = asyncio.create_task(client.post("/api/predict"))
+            await asyncio.sleep(0.05)
+            in_flight = dict(controller.in_flight)
+            release.set()
+            return (await first).json(), routed, (await degraded).status_code, in_flight, controller
+
+    first, routed, degraded, in_flight, controller = asyncio.run(run())
+    assert first == {"approximate": False}
+    assert routed.status_code == 503
+    assert degraded == 200
+    # The degraded request ran without taking a slot
+    assert in_flight[INTERACTIVE] == 1
+    assert controller.counters["degraded"] == 1
@@ -0,0 +1,76 @@
+"""
+Tests for the fast-loading artifact formats (models/artifacts.py)
+"""
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+from xgboost import XGBClassifier
+
+from models.artifacts import FlatScaler, FlatTreeEnsemble, artifact_paths
+
+
+@pytest.fixture(scope="module")
+def small_model():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 5))
+    X[rng.random(X.shape) < 0.05] = np.nan
+    y = (np.nan_to_num(X[:, 0]) + 0.5 * np.nan_to_num(X[:, 2]) > 0).astype(int)
+    model = XGBClassifier(n_estimators=15, max_depth=3, tree_method="hist", n_jobs=1)
+    model.fit(X, y)
+    return model, X
+
+
+def test_flat_ensemble_matches_xgboost(small_model):
+    model, X = small_model
+    flat = FlatTreeEnsemble.from_booster(model.get_booster())
+    np.testing.assert_allclose(flat.predict_proba(X), model.predict_proba(X), atol=1e-6)
+    np.testing.assert_array_equal(flat.predict(X), model.predict(X))
+
+
+def test_flat_ensemble_save_load_roundtrip(small_model, tmp_path):
+    model, X = small_model
+    flat = FlatTreeEnsemble.from_booster(model.get_booster())
+    flat.save(tmp_path / "model.npz")
+    loaded = FlatTreeEnsemble.load(tmp_path / "model.npz")
+    assert loaded.n_trees == flat.n_trees == 15
+    assert loaded.max_depth == flat.max_depth
+    np.testing.assert_array_equal(loaded.predict_proba(X), flat.predict_proba(X))
+
+
+def test_first_n_trees_matches_iteration_range(small_model):
+    model, X = small_model
+    flat = FlatTreeEnsemble.from_booster(model.get_booster())
+    expected = model.predict_proba(X, iteration_range=(0, 5))
+    np.testing.assert_allclose(flat.predict_proba(X, n_trees=5), expected, atol=1e-6)
+
+
+def test_flat_scaler_matches_standard_scaler(tmp_path):
+    X = np.random.default_rng(1).normal(3.0, 2.0, size=(50, 4))
+    scaler = StandardScaler().fit(X)
+    flat = FlatScaler.from_sklearn(scaler)
+    np.testing.assert_allclose(flat.transform(X), scaler.transform(X))
+
+    flat.save(tmp_path / "scaler.npz")
+    np.testing.assert_array_equal(FlatScaler.load(tmp_path / "scaler.npz").transform(X), flat.transform(X))
+
+
+def test_artifact_paths_share_the_timestamp(tmp_path):
+    paths = artifact_paths(tmp_path, "20250101_000000")
+    assert paths["model_flat"].name == "US_Accidents_Predictor_Model_20250101_000000.npz"
+    assert paths["scaler_flat"].name == "US_Accidents_Scaler_20250101_000000.npz"
+    assert all("20250101_000000" in path.name for path in paths.values())
+
+
+def test_served_generation_flat_matches_joblib():
+    from models.predictor import SafeStridePredictor
+    from utils.preprocessing import FeaturePreprocessor, get_example_requests
+
+    flat = SafeStridePredictor(artifact_format="flat")
+    flat.load_models()
+    joblib_predictor = SafeStridePredictor(artifact_format="joblib")
+    joblib_predictor.load_models()
+    assert flat.feature_names == list(joblib_predictor.feature_names)
+
+    preprocessor = FeaturePreprocessor(flat.feature_names)
+    features = preprocessor.preprocess_batch([example["data"] for example in get_example_requests()])
+    np.testing.assert_allclose(flat.predict_risk(features), joblib_predictor.predict_risk(features), atol=1e-5)
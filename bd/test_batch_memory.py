@@ -0,0 +1,166 @@
+"""
+Tests for the batch-predict memory governor (utils/batch_memory.py)
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from utils.batch_memory import (
+    BATCH_ROUTES, MAX_CHUNK_ROWS, MIN_CHUNK_ROWS, ROW_BYTES, BatchMemoryGovernor, BatchMemoryMiddleware,
+    BatchMemoryTracker, _raise_estimate,
+)
+
+
+def test_estimates_jump_up_and_relax_toward_the_default():
+    assert _raise_estimate(10.0, 10.0, 30.0) == 30.0
+    relaxed = _raise_estimate(30.0, 10.0, 5.0)
+    assert 10.0 < relaxed < 30.0
+    for _ in range(500):
+        relaxed = _raise_estimate(relaxed, 10.0, 5.0)
+    assert relaxed >= 10.0
+
+
+def test_chunk_rows_follow_the_budget_left():
+    tracker = BatchMemoryTracker(body_bytes=0)
+    tracker.start_rss = tracker.peak_rss = None  # nothing held yet
+    assert BatchMemoryGovernor(budget_mb=1).chunk_rows(tracker) == max(int(2 ** 20 / ROW_BYTES), MIN_CHUNK_ROWS)
+    assert BatchMemoryGovernor(budget_mb=0).chunk_rows(tracker) == MIN_CHUNK_ROWS
+    assert BatchMemoryGovernor(budget_mb=10_000).chunk_rows(tracker) == MAX_CHUNK_ROWS
+
+
+def test_finish_records_the_request():
+    governor = BatchMemoryGovernor(budget_mb=64)
+    tracker = BatchMemoryTracker(body_bytes=2048)
+    governor.observe_chunk(tracker, 10, tracker.sample())
+    governor.observe_chunk(tracker, 5, tracker.sample())
+    governor.finish(tracker)
+    stats = governor.stats()
+    assert (stats["requests"], stats["rows"], stats["chunks"]) == (1, 15, 2)
+    assert stats["recent"][-1]["max_chunk_rows"] == 10
+    # Small bodies are too noisy to learn the expansion from
+    assert stats["body_expansion"] == round(governor.body_expansion, 2) == 24.0
+
+
+def _client(governor):
+    app = FastAPI()
+
+    async def batch(request: Request):
+        body = await request.body()
+        return {"bytes": len(body), "tracked": request.state.batch_memory.body_bytes}
+
+    for route in BATCH_ROUTES:
+        app.post(route)(batch)
+
+    @app.post("/api/predict")
+    async def predict(request: Request):
+        return {"bytes": len(await request.body())}
+
+    transport = httpx.ASGITransport(app=BatchMemoryMiddleware(app, governor))
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+@pytest.mark.parametrize("route", BATCH_ROUTES)
+def test_oversized_batches_are_rejected_before_parsing(route):
+    governor = BatchMemoryGovernor(budget_mb=1)  # about 43 KB of body
+    limit = governor.max_body_bytes()
+
+    async def run():
+        async with _client(governor) as client:
+            small = await client.post(route, content=b"x" * 100)
+            large = await client.post(route, content=b"x" * (limit + 1))
+            other = await client.post("/api/predict", content=b"x" * (limit + 1))
+            return small, large, other
+
+    small, large, other = asyncio.run(run())
+    assert small.json() == {"bytes": 100, "tracked": 100}
+    assert large.status_code == 413
+    assert "batch memory budget" in large.json()["detail"]
+    assert other.status_code == 200
+    assert governor.counters["rejected"] == 1
+    assert governor.counters["requests"] == 1
+
+
+def test_chunked_uploads_are_counted_as_they_arrive():
+    governor = BatchMemoryGovernor(budget_mb=1)
+    limit = governor.max_body_bytes()
+
+    async def body(parts, size):
+        for _ in range(parts):
+            yield b"x" * size
+
+    async def run():
+        async with _client(governor) as client:
+            small = await client.post(BATCH_ROUTES[0], content=body(4, 1000))
+            large = await client.post(BATCH_ROUTES[0], content=body(4, limit // 2))
+            return small, large
+
+    small, large = asyncio.run(run())
+    assert small.json() == {"bytes": 4000, "tracked": 4000}
+    assert large.status_code == 413
+
+
+@pytest.fixture
+def batch_app(monkeypatch):
+    """/api/batch-predict behind the middleware, scoring MIN_CHUNK_ROWS rows per chunk"""
+    import routes.prediction
+
+    if not routes.prediction.predictor.loaded:
+        routes.prediction.predictor.load_models()
+    monkeypatch.setattr(routes.prediction, "batch_memory", BatchMemoryGovernor(budget_mb=0))
+    app = FastAPI()
+    app.include_router(routes.prediction.router)
+    return BatchMemoryMiddleware(app, BatchMemoryGovernor(budget_mb=512))
+
+
+def _post_chunked(app, rows):
+    payload = json.dumps({"predictions": rows}).encode()
+
+    async def body():
+        for start in range(0, len(payload), 64 * 1024):
+            yield payload[start:start + 64 * 1024]
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/batch-predict", content=body(),
+                                     headers={"Content-Type": "application/json"})
+
+    return asyncio.run(run())
+
+
+def test_chunked_uploads_stream_every_chunk(batch_app):
+    from utils.preprocessing import sample_inputs
+
+    rows = sample_inputs(MIN_CHUNK_ROWS * 2 + 10).to_dict("records")
+    response = _post_chunked(batch_app, rows)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total_predictions"] == len(rows) and len(body["results"]) == len(rows)
+    assert body["complete"] is True
+
+
+def test_failed_chunks_close_the_streamed_document(batch_app, monkeypatch):
+    import routes.prediction
+    from utils.preprocessing import sample_inputs
+
+    predictor = routes.prediction.predictor
+    batch_predict = predictor.batch_predict
+    calls = []
+
+    def fail_second_chunk(features_df):
+        calls.append(len(features_df))
+        if len(calls) == 2:
+            raise RuntimeError("scoring failed")
+        return batch_predict(features_df)
+
+    monkeypatch.setattr(predictor, "batch_predict", fail_second_chunk)
+    rows = sample_inputs(MIN_CHUNK_ROWS * 2 + 10).to_dict("records")
+    response = _post_chunked(batch_app, rows)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["complete"] is False and body["error"] == "scoring failed"
+    assert body["completed_rows"] == len(body["results"]) == MIN_CHUNK_ROWS
+    assert body["total_predictions"] == len(rows)
@@ -0,0 +1,98 @@
+"""
+Tests for the model artifact benchmark (benchmark_artifacts.py)
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import benchmark_artifacts
+from benchmark_artifacts import agreement, discover, measure_child, parse_generation, write_report
+from utils.preprocessing import FeaturePreprocessor, sample_inputs
+
+SERVED_DIR, SERVED_TIMESTAMP = benchmark_artifacts.SERVED.split(":")
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    """One flat + joblib generation, one joblib generation without its scaler, one pipeline"""
+    for name in ["Predictor_Model_20250101_000000.npz", "Scaler_20250101_000000.npz",
+                 "Features_20250101_000000.json", "Metadata_20250101_000000.json",
+                 "Predictor_Model_20250101_000000.joblib", "Scaler_20250101_000000.joblib",
+                 "Features_20250101_000000.joblib", "Metadata_20250101_000000.joblib",
+                 "Predictor_Model_20250202_000000.joblib", "Features_20250202_000000.joblib",
+                 "Metadata_20250202_000000.joblib",
+                 "MODEL_20250303_000000_model.joblib", "MODEL_20250303_000000_meta.joblib"]:
+        (tmp_path / f"US_Accidents_{name}").write_bytes(b"x" * 1024)
+    return tmp_path
+
+
+def test_discover_lists_every_generation_and_format(model_dir):
+    candidates = {candidate["name"]: candidate for candidate in discover(model_dir)}
+    prefix = model_dir.name
+    assert set(candidates) == {f"{prefix}/20250303_000000 (pipeline)", f"{prefix}/20250101_000000 (flat)",
+                               f"{prefix}/20250101_000000 (joblib)", f"{prefix}/20250202_000000 (joblib)"}
+    assert candidates[f"{prefix}/20250101_000000 (flat)"]["missing"] == []
+    assert candidates[f"{prefix}/20250101_000000 (flat)"]["disk_mb"] == round(4 * 1024 / 2**20, 3)
+    assert candidates[f"{prefix}/20250202_000000 (joblib)"]["missing"] == ["US_Accidents_Scaler_20250202_000000.joblib"]
+    assert candidates[f"{prefix}/20250303_000000 (pipeline)"]["missing"] == [
+        "US_Accidents_MODEL_20250303_000000_preprocessor.joblib"]
+
+
+def test_parse_generation(model_dir):
+    assert [c["format"] for c in parse_generation(f"{model_dir}:20250101_000000")] == ["flat", "joblib"]
+    assert [c["format"] for c in parse_generation(f"{model_dir}:20250101_000000:joblib")] == ["joblib"]
+    assert parse_generation(f"{model_dir}:20250303_000000")[0]["kind"] == "final"
+    # Unknown generations are still reported, as missing
+    unknown = parse_generation(f"{model_dir}:20990101_000000:native")
+    assert unknown[0]["format"] == "native" and unknown[0]["missing"]
+
+
+def test_agreement_with_the_served_generation(tmp_path):
+    np.save(tmp_path / "served.npy", np.array([0.1, 0.6, 0.7, 0.4]))
+    np.save(tmp_path / "other.npy", np.array([0.2, 0.4, 0.9, 0.4]))
+    served = {"probabilities": str(tmp_path / "served.npy"), "threshold": 0.5}
+    result = agreement({"probabilities": str(tmp_path / "other.npy"), "threshold": 0.5}, served)
+    assert result == {"decision_agreement": 0.75, "mean_abs_delta": 0.125, "max_abs_delta": 0.2,
+                      "high_risk_rate": 0.25}
+
+
+def _measured(name, load_ms):
+    return {"name": name, "disk_mb": 1.0, "load_ms": load_ms, "rss_load_mb": 10.0, "rss_total_mb": 100.0,
+            "single_row_ms": {"p50": 2.0, "p90": 3.0, "p99": 4.0}, "rows_per_s": {"10": 1000, "100": 8000},
+            "metrics": {"accuracy": 0.8}, "threshold": 0.5, "probabilities": "p.npy"}
+
+
+def test_report_lists_measured_and_failed_generations(tmp_path):
+    served = _measured("ml/a (flat)", 100.0)
+    other = {**_measured("ml/a (joblib)", 250.0), "agreement": {"decision_agreement": 1.0}}
+    failed = {"name": "ml/b (joblib)", "error": "missing US_Accidents_Scaler_b.joblib"}
+    report = tmp_path / "reports" / "artifacts.md"
+    write_report([served, other, failed], served, "sampled inputs", 500, [10, 100], report)
+
+    text = report.read_text(encoding="utf-8")
+    assert "| ml/a (joblib) | 0.8 | - | - | 1.0 |" in text
+    assert "2.50x, 1.00x, 1.00x, 1.00x" in text
+    assert "- ml/b (joblib): missing US_Accidents_Scaler_b.joblib" in text
+    raw = json.loads(report.with_suffix(".json").read_text(encoding="utf-8"))
+    assert raw["rows"] == 500 and all("probabilities" not in result for result in raw["results"])
+
+
+def test_child_measures_the_served_generation(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark_artifacts, "MIN_THROUGHPUT_SECONDS", 0.0)
+    reference = sample_inputs(50, seed=31)
+    reference.to_pickle(tmp_path / "reference.pkl")
+    candidate = parse_generation(benchmark_artifacts.SERVED + ":flat")[0]
+    result = measure_child(candidate, str(tmp_path / "reference.pkl"), str(tmp_path / "out.npy"), 5, [10, 100])
+
+    assert set(result["rows_per_s"]) == {"10", "100"}
+    assert result["single_row_ms"]["p50"] <= result["single_row_ms"]["p99"]
+    assert result["threshold"] == benchmark_artifacts.DECISION_THRESHOLD
+
+    from models.predictor import SafeStridePredictor
+
+    predictor = SafeStridePredictor(Path(SERVED_DIR), SERVED_TIMESTAMP, artifact_format="flat")
+    predictor.load_models()
+    expected = predictor.predict_risk(FeaturePreprocessor(predictor.feature_names).preprocess_batch(reference))
+    np.testing.assert_allclose(np.load(tmp_path / "out.npy"), expected, atol=1e-6)
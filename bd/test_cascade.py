@@ -0,0 +1,97 @@
+"""
+Tests for two-stage cascade inference (models/cascade.py, build_cascade.py)
+"""
+import numpy as np
+import pytest
+
+from build_cascade import calibrate_band, train_stage_one
+from models.cascade import CascadeModel, _parse_band
+from models.predictor import SafeStridePredictor
+from utils.preprocessing import FeaturePreprocessor, sample_inputs
+
+
+@pytest.fixture(scope="module")
+def served():
+    predictor = SafeStridePredictor(artifact_format="flat")
+    predictor.load_models()
+    features = FeaturePreprocessor(predictor.feature_names).preprocess_batch(sample_inputs(600))
+    full = predictor.predict_risk(features)
+    stage_one = train_stage_one(features.to_numpy(dtype=np.float64), full, n_trees=8, max_depth=3)
+    return predictor, features, full, stage_one
+
+
+def test_band_setting_is_validated():
+    assert _parse_band(None) is None
+    assert _parse_band("0.2,0.9") == (0.2, 0.9)
+    for value in ("0.6,0.9", "0.1,0.4", "-0.1,0.8"):
+        with pytest.raises(ValueError):
+            _parse_band(value)
+
+
+def test_calibrated_tails_fit_the_disagreement_budget():
+    rng = np.random.default_rng(1)
+    full = rng.random(2000)
+    stage_one = np.clip(full + rng.normal(0, 0.1, 2000), 0, 1)
+    low, high = calibrate_band(stage_one, full, max_disagreement=0.01)
+    assert 0 < low <= 0.5 <= high < 1
+    full_high = full > 0.5
+    assert np.sum((stage_one < low) & full_high) <= 10
+    assert np.sum((stage_one > high) & ~full_high) <= 10
+    # With no budget at all nothing below / above is wrong either
+    strict_low, strict_high = calibrate_band(stage_one, full, max_disagreement=0.0)
+    assert not np.any((stage_one < strict_low) & full_high)
+    assert strict_low <= low and strict_high >= high
+
+
+def test_route_record_and_stats():
+    cascade = CascadeModel(stage_one=None, band=(0.2, 0.8), metrics={}, audit_rate=1.0)
+    prob_high = np.array([0.1, 0.5, 0.9, 0.3])
+    in_band, audited = cascade.route(prob_high)
+    assert list(in_band) == [False, True, False, True]
+    assert list(audited) == [True, False, True, False]
+    # Full-model answers for rows 0-3 (in_band | audited = all): disagrees on row 2
+    cascade.record(prob_high, np.array([0.05, 0.6, 0.4, 0.2]), in_band, audited)
+    assert (cascade.rows, cascade.escalated, cascade.audited, cascade.audit_agreed) == (4, 2, 2, 1)
+
+
+def test_save_and_load(served, tmp_path):
+    _, features, _, stage_one = served
+    cascade = CascadeModel(stage_one, (0.1, 0.9), {"escalation_rate": 0.2})
+    path = tmp_path / "cascade.npz"
+    cascade.save(path)
+    loaded = CascadeModel.load(path)
+    X = features.to_numpy(dtype=np.float64)
+    np.testing.assert_array_equal(loaded.predict_proba_high(X), cascade.predict_proba_high(X))
+    assert loaded.band == (0.1, 0.9) and loaded.metrics == {"escalation_rate": 0.2}
+    assert CascadeModel.load(path, band=(0.3, 0.7)).band == (0.3, 0.7)
+
+
+@pytest.fixture
+def cascaded(served):
+    predictor, features, full, stage_one = served
+    yield predictor, features, full, stage_one
+    predictor.cascade = None
+
+
+def test_rows_in_band_get_the_full_answer(cascaded):
+    predictor, features, full, stage_one = cascaded
+    predictor.cascade = CascadeModel(stage_one, (0.3, 0.7), {})
+    first = predictor.cascade.predict_proba_high(features.to_numpy(dtype=np.float64))
+    probability = np.array([r["raw_proba"][1] for r in predictor.batch_predict(features)])
+    in_band = (first >= 0.3) & (first <= 0.7)
+    assert in_band.any() and (~in_band).any()
+    np.testing.assert_allclose(probability[in_band], full[in_band], atol=1e-4)
+    np.testing.assert_allclose(probability[~in_band], first[~in_band], atol=1e-4)
+    assert predictor.cascade.stats()["escalated"] == in_band.sum()
+
+
+def test_full_band_and_small_batches_match_the_full_model(cascaded):
+    predictor, features, full, stage_one = cascaded
+    predictor.cascade = CascadeModel(stage_one, (0.0, 1.0), {})
+    probability = [r["raw_proba"][1] for r in predictor.batch_predict(features)]
+    np.testing.assert_allclose(probability, full, atol=1e-4)
+
+    predictor.cascade = CascadeModel(stage_one, (0.5, 0.5), {})
+    small = predictor.batch_predict(features.iloc[:5])
+    np.testing.assert_allclose([r["raw_proba"][1] for r in small], full[:5], atol=1e-4)
+    assert predictor.cascade.stats()["rows"] == 0
@@ -0,0 +1,93 @@
+"""
+Tests for the counterfactual search (models/counterfactuals.py)
+"""
+import json
+
+import numpy as np
+import pytest
+
+from models.counterfactuals import CounterfactualSearch, street_type
+from utils.preprocessing import FeaturePreprocessor, get_default_features
+
+with open("MLT/ml/US_Accidents_Features_20251118_162845.json", encoding="utf-8") as f:
+    FEATURE_NAMES = json.load(f)
+
+
+class LinearPredictor:
+    """P(High Risk) from fixed weights over the feature row"""
+
+    feature_names = FEATURE_NAMES
+
+    def __init__(self, bias, **weights):
+        self.bias = bias
+        self.weights = np.array([weights.get(name, 0.0) for name in FEATURE_NAMES])
+
+    def predict_risk(self, features):
+        return np.clip(self.bias + features.to_numpy(dtype=np.float64) @ self.weights, 0.0, 1.0)
+
+
+# Risk drops by 0.25 for a traffic signal and for a stop sign: only both together get under 0.5
+TWO_CONTROLS = {"Traffic_Signal": -0.25, "Stop": -0.25}
+
+
+def test_patched_rows_match_full_preprocessing():
+    rng = np.random.default_rng(0)
+    predictor = LinearPredictor(0.0, **dict(zip(FEATURE_NAMES, rng.normal(size=len(FEATURE_NAMES)))))
+    input_data = {**get_default_features(), "Hour": 20, "Sunrise_Sunset": None, "Street": "Main St"}
+    search = CounterfactualSearch(predictor, input_data)
+    candidates = [frozenset(), frozenset({("hour", 3)}), frozenset({("hour", 13), ("stop", 1)}),
+                  frozenset({("street_type", "highway"), ("day_of_week", 6), ("crossing", 1)})]
+    expected = FeaturePreprocessor(FEATURE_NAMES).preprocess_batch([search._apply(c) for c in candidates])
+    np.testing.assert_allclose(search.score(candidates), predictor.predict_risk(expected))
+
+
+def test_finds_the_smallest_change_set():
+    predictor = LinearPredictor(0.9, **TWO_CONTROLS)
+    result = CounterfactualSearch(predictor, get_default_features()).run(max_changes=3, budget_ms=5000)
+    assert result["complete"]
+    assert result["probability_high"] == 0.9
+    assert len(result["counterfactuals"]) == 1
+    answer = result["counterfactuals"][0]
+    assert {change["factor"] for change in answer["changes"]} == {"traffic_signal", "stop"}
+    assert (answer["size"], answer["distance"], answer["probability_high"]) == (2, 2, 0.4)
+
+
+def test_answers_are_not_expanded_further():
+    predictor = LinearPredictor(0.6, Stop=-0.25)
+    search = CounterfactualSearch(predictor, get_default_features(), factors=["stop", "crossing", "hour"])
+    result = search.run(max_changes=3, budget_ms=5000)
+    # The single change is the answer; nothing of size 2 is scored
+    assert [c["changes"][0]["factor"] for c in result["counterfactuals"]] == ["stop"]
+    assert result["candidates_scored"] == 1 + 1 + 1 + 23
+
+
+def test_circular_distances_rank_nearer_hours_first():
+    predictor = LinearPredictor(0.3, Is_Night=0.5)  # hours 7-21 are Low Risk
+    input_data = {**get_default_features(), "Hour": 23}
+    result = CounterfactualSearch(predictor, input_data, factors=["hour"]).run(limit=3, budget_ms=5000)
+    assert [(c["changes"][0]["to"], c["distance"]) for c in result["counterfactuals"]] == [
+        (21, 2), (20, 3), (19, 4)]
+
+
+def test_low_risk_inputs_need_no_search():
+    predictor = LinearPredictor(0.2)
+    result = CounterfactualSearch(predictor, get_default_features()).run()
+    assert result["counterfactuals"] == [] and result["candidates_scored"] == 1
+
+
+def test_out_of_budget_searches_are_incomplete():
+    predictor = LinearPredictor(0.9, **TWO_CONTROLS)
+    result = CounterfactualSearch(predictor, get_default_features()).run(max_changes=3, budget_ms=0)
+    assert result["complete"] is False
+
+
+def test_unknown_factors_are_rejected():
+    with pytest.raises(ValueError):
+        CounterfactualSearch(LinearPredictor(0.9), get_default_features(), factors=["weather"])
+
+
+@pytest.mark.parametrize("street, expected", [
+    ("I-25 N", "highway"), ("Main St", "main_street"), ("Elm Ct", "local_street"), (None, "local_street"),
+])
+def test_street_types(street, expected):
+    assert street_type(street) == expected
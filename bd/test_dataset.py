@@ -0,0 +1,87 @@
+"""
+Tests for the partitioned Parquet dataset cache (utils/dataset.py)
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.dataset import (
+    MODEL_INPUT_COLUMNS, PARQUET_TYPES, convert_to_parquet, iter_dataset_chunks, iter_parquet_batches,
+    load_parquet, to_model_inputs,
+)
+
+pytest.importorskip("pyarrow")
+
+N_ROWS = 300
+
+
+def _column(name, alias, rng):
+    if alias == "bool":
+        return rng.random(N_ROWS) < 0.3
+    if alias in ("double", "float"):
+        return rng.normal(40, 10, N_ROWS).round(3)
+    if alias == "int8":
+        return rng.integers(1, 5, N_ROWS)
+    if alias.startswith("timestamp"):
+        hours = rng.integers(0, 3 * 365 * 24, N_ROWS)
+        return (pd.Timestamp("2020-01-01") + pd.to_timedelta(hours, unit="h")).strftime("%Y-%m-%d %H:%M:%S")
+    return [f"{name}-{value}" for value in rng.integers(0, 4, N_ROWS)]
+
+
+@pytest.fixture
+def dataset_csv(tmp_path):
+    rng = np.random.default_rng(11)
+    frame = pd.DataFrame({name: _column(name, alias, rng) for name, alias in PARQUET_TYPES.items()
+                          if name != "Year"})
+    frame["State"] = rng.choice(["CA", "TX", "CO"], N_ROWS)
+    frame["Sunrise_Sunset"] = rng.choice(["Day", "Night"], N_ROWS)
+    path = tmp_path / "accidents.csv"
+    frame.to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def parquet_dir(dataset_csv, tmp_path):
+    path = tmp_path / "accidents.parquet"
+    assert convert_to_parquet(str(dataset_csv), str(path), chunk_size=100) == {"rows": N_ROWS, "path": str(path)}
+    return path
+
+
+def _sorted(df):
+    return df.sort_values(["Year", "Month", "Day_of_Week", "Hour", "Start_Lat"]).reset_index(drop=True)
+
+
+def test_dataset_is_partitioned_by_state_and_year(parquet_dir):
+    partitions = {(p.parent.parent.name, p.parent.name) for p in parquet_dir.rglob("*.parquet")}
+    assert {state for state, _ in partitions} == {"State=CA", "State=TX", "State=CO"}
+    assert {year for _, year in partitions} <= {"Year=2020", "Year=2021", "Year=2022"}
+
+
+def test_parquet_and_csv_give_the_same_model_inputs(dataset_csv, parquet_dir):
+    from_csv = to_model_inputs(pd.concat(iter_dataset_chunks(str(dataset_csv), MODEL_INPUT_COLUMNS, 100)))
+    from_parquet = to_model_inputs(pd.concat(iter_dataset_chunks(str(parquet_dir), MODEL_INPUT_COLUMNS, 100)))
+    assert len(from_parquet) == N_ROWS
+    pd.testing.assert_frame_equal(_sorted(from_parquet).astype(str), _sorted(from_csv).astype(str), check_like=True)
+
+
+def test_partition_filter_matches_filtering_the_csv(dataset_csv, parquet_dir):
+    csv = pd.read_csv(dataset_csv)
+    years = pd.to_datetime(csv["Start_Time"]).dt.year
+    expected = csv[(csv["State"] == "TX") & (years == 2021)]
+    loaded = load_parquet(str(parquet_dir), ["Severity", "City"], states=["TX"], years=[2021])
+    assert list(loaded.columns) == ["Severity", "City"]
+    assert len(loaded) == len(expected)
+    assert sorted(loaded["City"].astype(str)) == sorted(expected["City"])
+
+
+def test_batches_are_regrouped_to_full_chunks_and_capped(parquet_dir):
+    sizes = [len(chunk) for chunk in iter_parquet_batches(str(parquet_dir), ["Severity"], batch_size=64)]
+    assert sum(sizes) == N_ROWS
+    assert all(size >= 64 for size in sizes[:-1])
+    capped = list(iter_parquet_batches(str(parquet_dir), ["Severity"], batch_size=64, max_rows=100))
+    assert sum(len(chunk) for chunk in capped) == 100
+
+
+def test_missing_dataset_is_reported(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        next(iter_dataset_chunks(str(tmp_path / "missing.csv")))
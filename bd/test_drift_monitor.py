@@ -0,0 +1,84 @@
+"""
+Tests for the streaming drift monitor (utils/drift_monitor.py)
+"""
+import numpy as np
+import pytest
+
+from utils.drift_monitor import N_BINS, DriftMonitor, DriftReference, population_stability_index
+
+FEATURES = ["Temperature(F)", "Hour", "Crossing", "Flag", "City_Frequency"]
+MEAN = np.array([60.0, 12.5, 0.2, 0.3, 4800.0])
+SCALE = np.array([15.0, 5.0, 0.4, np.sqrt(0.3 * 0.7), 7500.0])
+
+
+def _training_like(rows: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.normal(MEAN[0], SCALE[0], rows),
+        np.round(rng.normal(MEAN[1], SCALE[1], rows)),
+        rng.random(rows) < MEAN[2],
+        rng.random(rows) < MEAN[3],
+        np.full(rows, 0.5),  # what the preprocessor serves
+    ]).astype(float)
+
+
+@pytest.fixture
+def monitor():
+    monitor = DriftMonitor(buffer_rows=256)
+    monitor.configure(DriftReference.from_scaler(FEATURES, MEAN, SCALE))
+    return monitor
+
+
+def test_scaler_reference_uses_two_point_bins_for_zero_one_features():
+    reference = DriftReference.from_scaler(FEATURES, MEAN, SCALE)
+    # Crossing by name, Flag from its Bernoulli variance
+    assert reference.binary.tolist() == [False, False, True, True, False]
+    np.testing.assert_allclose(reference.proportions[3, :2], [0.7, 0.3])
+    assert reference.proportions[3, 2:].sum() == 0
+
+
+def test_integer_features_get_whole_value_bins():
+    reference = DriftReference.from_scaler(FEATURES, MEAN, SCALE)
+    finite = reference.edges[1][np.isfinite(reference.edges[1])]
+    np.testing.assert_array_equal(finite % 1, 0.5)
+    assert reference.proportions[1].sum() == pytest.approx(1.0)
+
+
+def test_training_like_traffic_is_stable(monitor):
+    monitor.observe(_training_like(20000))
+    report = monitor.report()
+    statuses = {f["feature"]: f["status"] for f in report["features"]}
+    assert statuses == {"Temperature(F)": "stable", "Hour": "stable", "Crossing": "stable",
+                        "Flag": "stable", "City_Frequency": "excluded"}
+    assert report["top_drifted"] == []
+
+
+def test_shifted_feature_is_reported(monitor):
+    X = _training_like(20000)
+    X[:, 2] = 1.0
+    monitor.observe(X)
+    report = monitor.report()
+    assert report["top_drifted"] == ["Crossing"]
+    assert report["summary"]["significant"] == 1
+
+
+def test_observations_survive_partial_buffers(monitor):
+    monitor.observe(_training_like(300))
+    monitor.observe(_training_like(5, seed=1))
+    assert monitor.report()["observations"] == 305
+    monitor.reset()
+    assert monitor.report()["observations"] == 0
+
+
+def test_reference_save_load_roundtrip(tmp_path):
+    reference = DriftReference.from_scaler(FEATURES, MEAN, SCALE)
+    reference.save(tmp_path / "reference.npz")
+    loaded = DriftReference.load(tmp_path / "reference.npz")
+    assert loaded.feature_names == FEATURES
+    np.testing.assert_array_equal(loaded.edges, reference.edges)
+    np.testing.assert_array_equal(loaded.excluded, reference.excluded)
+
+
+def test_psi_is_zero_for_identical_distributions():
+    expected = np.full((1, N_BINS), 1 / N_BINS)
+    assert population_stability_index(expected, expected)[0] == pytest.approx(0.0)
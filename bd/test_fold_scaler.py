@@ -0,0 +1,89 @@
+"""
+Tests for folding the StandardScaler into the flat booster (FlatTreeEnsemble.fold_scaler)
+"""
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+from xgboost import XGBClassifier
+
+from models.artifacts import FlatTreeEnsemble
+
+
+@pytest.fixture(scope="module")
+def scaled_model():
+    rng = np.random.default_rng(7)
+    raw = np.column_stack([
+        rng.normal(60, 15, 600),            # temperature-like
+        rng.integers(0, 24, 600),            # hour-like (many ties)
+        rng.random(600) < 0.2,               # 0/1 flag
+        rng.normal(-97.6, 18.3, 600),        # longitude-like (negative mean)
+    ]).astype(float)
+    y = ((raw[:, 0] > 65) ^ (raw[:, 2] > 0.5) | (raw[:, 1] > 18)).astype(int)
+    scaler = StandardScaler().fit(raw)
+    model = XGBClassifier(n_estimators=20, max_depth=4, tree_method="hist", n_jobs=1)
+    model.fit(scaler.transform(raw), y)
+    flat = FlatTreeEnsemble.from_booster(model.get_booster())
+    return raw, scaler, flat
+
+
+def test_folded_model_matches_scaler_then_booster(scaled_model):
+    raw, scaler, flat = scaled_model
+    folded = flat.fold_scaler(scaler.mean_, scaler.scale_)
+    np.testing.assert_array_equal(folded.leaf_indices(raw), flat.leaf_indices(scaler.transform(raw)))
+    np.testing.assert_allclose(folded.predict_proba(raw), flat.predict_proba(scaler.transform(raw)), atol=1e-12)
+
+
+def test_folded_thresholds_are_exact_boundaries(scaled_model):
+    raw, scaler, flat = scaled_model
+    folded = flat.fold_scaler(scaler.mean_, scaler.scale_)
+    split = folded.left != np.arange(len(folded.left))
+    feature, threshold = folded.feature[split], folded.threshold[split]
+    mean, scale = scaler.mean_[feature], scaler.scale_[feature]
+    scaled_at = ((threshold - mean) / scale).astype(np.float32)
+    scaled_below = ((np.nextafter(threshold, -np.inf) - mean) / scale).astype(np.float32)
+    # The raw threshold goes right and the float64 value just below it goes left
+    assert np.all(scaled_at >= flat.threshold[split])
+    assert np.all(scaled_below < flat.threshold[split])
+
+
+def test_values_on_the_boundary_take_the_same_branch(scaled_model):
+    raw, scaler, flat = scaled_model
+    folded = flat.fold_scaler(scaler.mean_, scaler.scale_)
+    split = np.flatnonzero(folded.left != np.arange(len(folded.left)))
+    probes = np.tile(scaler.mean_, (len(split) * 2, 1))
+    for k, node in enumerate(split):
+        probes[2 * k, folded.feature[node]] = folded.threshold[node]
+        probes[2 * k + 1, folded.feature[node]] = np.nextafter(folded.threshold[node], -np.inf)
+    np.testing.assert_array_equal(folded.leaf_indices(probes), flat.leaf_indices(scaler.transform(probes)))
+
+
+def test_missing_values_follow_the_default_branch(scaled_model):
+    raw, scaler, flat = scaled_model
+    folded = flat.fold_scaler(scaler.mean_, scaler.scale_)
+    X = raw[:50].copy()
+    X[::3, 0] = np.nan
+    X[1::4, 3] = np.nan
+    np.testing.assert_allclose(folded.predict_proba(X), flat.predict_proba(scaler.transform(X)), atol=1e-12)
+
+
+def test_non_positive_scale_is_rejected(scaled_model):
+    _, scaler, flat = scaled_model
+    scale = scaler.scale_.copy()
+    scale[1] = 0
+    with pytest.raises(ValueError):
+        flat.fold_scaler(scaler.mean_, scale)
+
+
+def test_served_generation_fused_matches_unfused():
+    from models.predictor import SafeStridePredictor
+    from utils.preprocessing import FeaturePreprocessor, get_example_requests
+
+    fused = SafeStridePredictor(artifact_format="flat", fuse_scaler=True)
+    fused.load_models()
+    unfused = SafeStridePredictor(artifact_format="flat")
+    unfused.load_models()
+    assert fused.scaler_fused and not unfused.scaler_fused
+
+    features = FeaturePreprocessor(fused.feature_names).preprocess_batch(
+        [example["data"] for example in get_example_requests()])
+    np.testing.assert_array_equal(fused.predict_risk(features), unfused.predict_risk(features))
@@ -0,0 +1,86 @@
+"""
+Tests for the prediction history store (utils/history_store.py)
+"""
+import asyncio
+
+import pytest
+
+from utils.history_store import PredictionHistoryStore, location_cell
+
+
+def _result(high: float) -> dict:
+    return {"prediction": "High Risk" if high > 0.5 else "Low Risk", "label": int(high > 0.5),
+            "raw_proba": [1 - high, high]}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PredictionHistoryStore(db_path=str(tmp_path / "history.db"), max_buffer=1000, enabled=True)
+    store.open()
+    yield store
+    if store._conn is not None:
+        store._conn.close()
+
+
+def test_keyset_pages_cover_every_row_once(store):
+    for i in range(25):
+        store.record("predict", {"State": "CO", "Start_Lat": 39.7, "Start_Lng": -105.0, "i": i},
+                     _result(0.2), "v1", 1.0)
+    assert store.flush() == 25
+
+    seen, cursor = [], None
+    while True:
+        page = store.query(cursor=cursor, limit=10)
+        seen.extend(item["inputs"]["i"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == list(range(24, -1, -1))
+
+
+def test_rows_added_between_pages_do_not_shift_the_cursor(store):
+    for i in range(6):
+        store.record("predict", {"i": i}, _result(0.7), "v1", 1.0)
+    store.flush()
+    first = store.query(limit=3)
+    for i in range(6, 9):
+        store.record("predict", {"i": i}, _result(0.7), "v1", 1.0)
+    store.flush()
+    second = store.query(cursor=first["next_cursor"], limit=3)
+    assert [item["inputs"]["i"] for item in first["items"]] == [5, 4, 3]
+    assert [item["inputs"]["i"] for item in second["items"]] == [2, 1, 0]
+
+
+def test_filters_by_state_and_location_cell(store):
+    store.record("predict", {"State": "CO", "Start_Lat": 39.74, "Start_Lng": -104.99}, _result(0.9), "v1", 1.0)
+    store.record("predict", {"State": "CO", "Start_Lat": 40.01, "Start_Lng": -105.27}, _result(0.1), "v1", 1.0)
+    store.record("predict", {"State": "TX", "Start_Lat": 29.76, "Start_Lng": -95.37}, _result(0.4), "v1", 1.0)
+    store.flush()
+
+    assert len(store.query(state="CO")["items"]) == 2
+    nearby = store.query(lat=39.71, lng=-104.92)["items"]
+    assert [item["state"] for item in nearby] == ["CO"]
+    assert nearby[0]["prob_high"] == pytest.approx(0.9)
+    assert location_cell(39.74, -104.99) == (397, -1050)
+
+
+def test_full_buffer_drops_oldest_and_counts(tmp_path):
+    store = PredictionHistoryStore(db_path=str(tmp_path / "history.db"), max_buffer=3, enabled=True)
+    store.open()
+    for i in range(5):
+        store.record("predict", {"i": i}, _result(0.2), "v1", 1.0)
+    assert store.stats()["dropped"] == 2
+    store.flush()
+    assert [item["inputs"]["i"] for item in store.query()["items"]] == [4, 3, 2]
+    store._conn.close()
+
+
+def test_stop_flushes_pending_records(store):
+    async def run():
+        await store.start()
+        store.record("predict", {"i": 1}, _result(0.2), "v1", 1.0)
+        await store.stop()
+
+    asyncio.run(run())
+    assert store.stats()["written"] == 1
+    assert len(store.query()["items"]) == 1
@@ -0,0 +1,80 @@
+"""
+Tests for the hotspot radius counts (models/hotspots.py)
+"""
+import json
+
+import numpy as np
+import pytest
+
+from models.hotspots import CELL_DEGREES, METERS_PER_DEGREE, HotspotIndex
+
+
+@pytest.fixture(scope="module")
+def index():
+    rng = np.random.default_rng(5)
+    # A dense cluster around downtown Denver plus a sparse spread, crossing many cell edges
+    lat = np.concatenate([rng.normal(39.7392, 0.004, 3000), rng.uniform(39.6, 39.9, 2000), [np.nan]])
+    lng = np.concatenate([rng.normal(-104.9903, 0.004, 3000), rng.uniform(-105.1, -104.8, 2000), [0.0]])
+    return HotspotIndex.build(lat, lng)
+
+
+def _brute_force(index, lat, lng, radius_m):
+    radius_deg = radius_m / METERS_PER_DEGREE
+    dy = index.lat.astype(np.float64) - lat
+    dx = (index.lng.astype(np.float64) - lng) * np.cos(np.radians(lat))
+    return int(np.count_nonzero(dx * dx + dy * dy <= radius_deg * radius_deg))
+
+
+def test_non_finite_points_are_dropped(index):
+    assert index.points == 5000
+    assert index.cell_starts[-1] == index.points
+    assert np.all(np.diff(index.cell_keys) > 0)
+
+
+@pytest.mark.parametrize("radius_m", [50.0, 500.0, 2500.0])
+def test_counts_match_brute_force(index, radius_m):
+    rng = np.random.default_rng(int(radius_m))
+    lat = np.append(rng.uniform(39.72, 39.76, 60), index.lat[:5])
+    lng = np.append(rng.uniform(-105.01, -104.97, 60), index.lng[:5])
+    expected = [_brute_force(index, a, b, radius_m) for a, b in zip(lat, lng)]
+    np.testing.assert_array_equal(index.count_within(lat, lng, radius_m), expected)
+
+
+def test_queries_on_cell_edges(index):
+    edge_lat = np.floor(39.7392 / CELL_DEGREES) * CELL_DEGREES
+    edge_lng = np.floor(-104.9903 / CELL_DEGREES) * CELL_DEGREES
+    assert index.count_within(edge_lat, edge_lng, 300.0)[0] == _brute_force(index, edge_lat, edge_lng, 300.0)
+
+
+def test_invalid_queries(index):
+    counts = index.count_within([np.nan, 39.7392], [-104.9903, np.inf])
+    np.testing.assert_array_equal(counts, [0, 0])
+    assert index.count_within(0.0, 0.0)[0] == 0
+    with pytest.raises(ValueError):
+        index.count_within(39.7, -105.0, 0)
+    with pytest.raises(ValueError):
+        index.count_within(39.7, -105.0, 10_000)
+
+
+def test_calibrated_percentiles(index):
+    calibrated = HotspotIndex(index.cell_keys, index.cell_starts, index.lat, index.lng)
+    calibrated.calibrate(radius_m=400.0, samples=500)
+    downtown, empty = calibrated.nearby([39.7392, 0.0], [-104.9903, 0.0])
+    assert downtown["radius_m"] == 400 and empty["radius_m"] == 400
+    assert downtown["percentile"] > 50
+    assert (empty["count"], empty["percentile"]) == (0, 0)
+    assert HotspotIndex.build([39.7], [-105.0]).nearby(39.7, -105.0)[0]["percentile"] is None
+
+
+def test_save_and_memory_mapped_load(index, tmp_path):
+    index.save(tmp_path / "hotspots")
+    loaded = HotspotIndex.load(tmp_path / "hotspots")
+    assert isinstance(loaded.lat, np.memmap)
+    np.testing.assert_array_equal(loaded.count_within(index.lat[:20], index.lng[:20]),
+                                  index.count_within(index.lat[:20], index.lng[:20]))
+
+    meta_path = tmp_path / "hotspots" / "meta.json"
+    meta = json.loads(meta_path.read_text())
+    meta_path.write_text(json.dumps({**meta, "version": 0}))
+    with pytest.raises(ValueError):
+        HotspotIndex.load(tmp_path / "hotspots")
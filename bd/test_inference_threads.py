@@ -0,0 +1,79 @@
+"""
+Tests for per-call inference thread grants (utils/inference_threads.py)
+"""
+import threading
+
+import numpy as np
+import pytest
+
+import utils.inference_threads
+from utils.inference_threads import InferenceThreadController, default_cores, thread_tiers
+
+
+def test_tiers_are_powers_of_two_plus_the_budget():
+    assert thread_tiers(1) == [1]
+    assert thread_tiers(8) == [1, 2, 4, 8]
+    assert thread_tiers(12) == [1, 2, 4, 8, 12]
+
+
+@pytest.mark.parametrize("rows, free, expected", [
+    (1, 12, 1),          # single predictions stay on one thread
+    (2500, 12, 2),       # three threads wanted, rounded down to a tier
+    (100_000, 12, 12),   # a large batch on an idle process gets every core
+    (100_000, 5, 4),     # limited to what other calls leave free
+    (100_000, 0, 1),     # always at least one
+])
+def test_threads_for(rows, free, expected):
+    assert InferenceThreadController(cores=12, rows_per_thread=1000).threads_for(rows, free) == expected
+
+
+def test_reservations_share_one_budget():
+    controller = InferenceThreadController(cores=8, rows_per_thread=100)
+    with controller.reserve(10_000) as first:
+        with controller.reserve(250) as second:
+            assert (first, second) == (8, 1)  # nothing left, still one thread
+            assert controller.stats()["threads_in_use"] == 9
+    stats = controller.stats()
+    assert (stats["in_flight"], stats["threads_in_use"], stats["peak_threads_in_use"]) == (0, 0, 9)
+    assert stats["calls_by_threads"] == {"1": 1, "8": 1}
+
+
+def test_map_rows_matches_a_single_call():
+    controller = InferenceThreadController(cores=4)
+    X = np.arange(103 * 3, dtype=float).reshape(103, 3)
+    seen = []
+
+    def fn(block):
+        seen.append(threading.current_thread().name)
+        return block.sum(axis=1)
+
+    np.testing.assert_array_equal(controller.map_rows(fn, X, 4), X.sum(axis=1))
+    assert len(seen) == 4 and any(name.startswith("safestride-inference") for name in seen)
+    assert controller.map_rows(fn, X[:1], 4).shape == (1,)
+
+
+def test_default_cores_split_between_server_processes(monkeypatch):
+    monkeypatch.delenv("SAFESTRIDE_INFERENCE_CORES", raising=False)
+    monkeypatch.setattr(utils.inference_threads, "available_cores", lambda: 16)
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert default_cores() == 4
+    monkeypatch.setenv("WEB_CONCURRENCY", "32")
+    assert default_cores() == 1
+    monkeypatch.setenv("SAFESTRIDE_INFERENCE_CORES", "6")
+    assert default_cores() == 6
+
+
+@pytest.mark.parametrize("artifact_format", ["flat", "joblib"])
+def test_predictions_do_not_depend_on_the_thread_grant(artifact_format, monkeypatch):
+    from models.predictor import SafeStridePredictor
+
+    predictor = SafeStridePredictor(artifact_format=artifact_format)
+    predictor.load_models()
+    X = np.random.default_rng(0).normal(size=(3000, len(predictor.feature_names)))
+    results = []
+    for rows_per_thread in (10_000, 500):
+        controller = InferenceThreadController(cores=4, rows_per_thread=rows_per_thread)
+        monkeypatch.setattr("models.predictor.inference_threads", controller)
+        results.append(predictor._predict_proba(X))
+        assert controller.stats()["calls_by_threads"] == {"1" if rows_per_thread == 10_000 else "4": 1}
+    np.testing.assert_allclose(results[0], results[1], rtol=1e-6)
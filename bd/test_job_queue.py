@@ -0,0 +1,145 @@
+"""
+Tests for the batch job queue: restart, cancel and worker crashes (utils/job_queue.py, routes/jobs.py)
+"""
+import json
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routes.jobs
+import utils.job_queue
+from utils.job_queue import BatchJobQueue, run_job
+from utils.preprocessing import get_default_features
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = BatchJobQueue(db_path=str(tmp_path / "jobs.db"), jobs_dir=str(tmp_path / "jobs"), enabled=True)
+    queue.open()
+    yield queue
+    queue.stop()
+
+
+def _submit(queue, job_id, lines):
+    input_path, result_path = queue.new_job_paths(job_id, "ndjson")
+    input_path.write_text("".join(line + "\n" for line in lines))
+    return queue.submit(job_id, "ndjson", input_path, result_path)
+
+
+def test_running_jobs_are_requeued_after_a_restart(queue, tmp_path):
+    _submit(queue, "a", ["{}"])
+    queue._execute("UPDATE jobs SET status = 'running', started_at = 1.0 WHERE id = 'a'")
+    queue._conn.close()  # crash: no stop()
+    queue._conn = None
+
+    restarted = BatchJobQueue(db_path=str(tmp_path / "jobs.db"), jobs_dir=str(tmp_path / "jobs"), enabled=True)
+    restarted.open()
+    try:
+        job = restarted.get("a")
+        assert (job["status"], job["started_at"]) == ("queued", None)
+    finally:
+        restarted.stop()
+
+
+def test_cancel_then_delete(queue):
+    job = _submit(queue, "a", ["{}"])
+    assert job["status"] == "queued"
+    assert queue.cancel("a") == "cancelled"
+    assert queue.get("a")["status"] == "cancelled"
+    input_path, _ = queue.new_job_paths("a", "ndjson")
+    assert input_path.exists()
+
+    assert queue.cancel("a") == "deleted"
+    assert queue.get("a") is None
+    assert not input_path.exists()
+    assert queue.cancel("a") is None
+
+
+@pytest.fixture
+def worker_state(monkeypatch):
+    from models.predictor import SafeStridePredictor
+    from utils.preprocessing import FeaturePreprocessor
+
+    predictor = SafeStridePredictor(artifact_format="flat")
+    predictor.load_models()
+    monkeypatch.setitem(utils.job_queue._worker_state, "predictor", predictor)
+    monkeypatch.setitem(utils.job_queue._worker_state, "preprocessor", FeaturePreprocessor(predictor.feature_names))
+
+
+def test_worker_scores_every_row(queue, worker_state):
+    _submit(queue, "a", [json.dumps(get_default_features()), "not json", json.dumps({"Hour": 3})])
+    queue._execute("UPDATE jobs SET status = 'running' WHERE id = 'a'")
+    assert run_job(str(queue.db_path), "a", "ndjson", *map(str, queue.new_job_paths("a", "ndjson"))) == "done"
+
+    job = queue.get("a")
+    assert (job["status"], job["rows"], job["processed"], job["failed_rows"]) == ("done", 3, 3, 2)
+    results = [json.loads(line) for line in queue.result_path("a").read_text().splitlines()]
+    assert [(r["row"], r["success"]) for r in results] == [(0, True), (1, False), (2, False)]
+
+
+def test_worker_stops_a_cancelled_job_between_chunks(queue, worker_state, monkeypatch):
+    monkeypatch.setattr(utils.job_queue, "JOB_CHUNK_ROWS", 1)
+    _submit(queue, "a", [json.dumps(get_default_features())] * 3)
+    queue._execute("UPDATE jobs SET status = 'running' WHERE id = 'a'")
+    queue.cancel("a")
+    input_path, result_path = queue.new_job_paths("a", "ndjson")
+    assert run_job(str(queue.db_path), "a", "ndjson", str(input_path), str(result_path)) == "stopped"
+    assert queue.get("a")["processed"] == 1
+    assert not result_path.exists()
+    assert not result_path.with_name(result_path.name + ".part").exists()
+
+
+class RecordingExecutor:
+    def __init__(self):
+        self.shutdowns = []
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shutdowns.append((wait, cancel_futures))
+
+
+def test_a_broken_pool_is_shut_down_and_replaced(queue):
+    for job_id in ("a", "b"):
+        _submit(queue, job_id, ["{}"])
+        queue._execute("UPDATE jobs SET status = 'running' WHERE id = ?", (job_id,))
+    broken = RecordingExecutor()
+    queue._executor = broken
+    crashed = Future()
+    crashed.set_exception(BrokenProcessPool("worker died"))
+
+    queue._on_finished("a", crashed, broken)
+    assert broken.shutdowns == [(False, True)]
+    assert queue._executor is None
+    assert queue.get("a")["status"] == "failed"
+
+    # A late callback from the old pool leaves the fresh pool alone
+    fresh = RecordingExecutor()
+    queue._executor = fresh
+    queue._on_finished("b", crashed, broken)
+    assert queue._executor is fresh and fresh.shutdowns == []
+    assert queue.counters["failed"] == 2
+
+
+def test_job_routes(queue, monkeypatch):
+    monkeypatch.setattr(routes.jobs, "batch_jobs", queue)
+    monkeypatch.setattr(routes.jobs, "WRITE_BLOCK_BYTES", 16)
+    app = FastAPI()
+    app.include_router(routes.jobs.router)
+    client = TestClient(app)
+
+    body = "\n".join(json.dumps(get_default_features()) for _ in range(3))
+    submitted = client.post("/api/jobs", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert submitted.status_code == 202
+    job_id = submitted.json()["job_id"]
+    input_path, _ = queue.new_job_paths(job_id, "ndjson")
+    assert input_path.read_text() == body
+
+    assert client.get(f"/api/jobs/{job_id}").json()["status"] == "queued"
+    assert [job["job_id"] for job in client.get("/api/jobs").json()["jobs"]] == [job_id]
+    assert client.get(f"/api/jobs/{job_id}/results").status_code == 409
+    assert client.delete(f"/api/jobs/{job_id}").json()["status"] == "cancelled"
+    assert client.post("/api/jobs", content=b"", headers={"Content-Type": "text/csv"}).status_code == 400
+    assert client.post("/api/jobs", content=b"x", headers={"Content-Type": "text/plain"}).status_code == 415
+    assert client.get("/api/jobs/unknown").status_code == 404
@@ -0,0 +1,89 @@
+"""
+Tests for latency budgets over truncated boosting rounds (models/latency_budget.py)
+"""
+import numpy as np
+import pytest
+
+import models.latency_budget
+from models.latency_budget import LatencyBudget
+from models.predictor import SafeStridePredictor
+from utils.preprocessing import FeaturePreprocessor, sample_inputs
+
+TABLE = [
+    {"rounds": 10, "latency_ms": 1.0, "mean_abs_error": 0.05, "max_abs_error": 0.2, "decision_agreement": 0.9},
+    {"rounds": 50, "latency_ms": 3.0, "mean_abs_error": 0.01, "max_abs_error": 0.05, "decision_agreement": 0.98},
+    {"rounds": 200, "latency_ms": 8.0, "mean_abs_error": 0.0, "max_abs_error": 0.0, "decision_agreement": 1.0},
+]
+
+
+@pytest.fixture
+def budget():
+    budget = LatencyBudget()
+    budget.table = [dict(entry) for entry in TABLE]
+    budget.preprocess_ms = 2.0
+    return budget
+
+
+@pytest.mark.parametrize("remaining_ms, rounds", [
+    (100.0, 200), (10.0, 200), (9.9, 50), (5.0, 50), (3.0, 10), (2.9, None),
+])
+def test_choose_the_most_rounds_that_fit(budget, remaining_ms, rounds):
+    entry = budget.choose(remaining_ms)
+    assert (entry["rounds"] if entry else None) == rounds
+
+
+def test_slowdown_moves_requests_to_fewer_rounds(budget):
+    for _ in range(50):
+        budget.observe(budget.table[2], 20.0)  # twice the calibrated 10 ms
+    assert budget.slowdown == pytest.approx(2.0, rel=0.01)
+    assert budget.choose(12.0)["rounds"] == 50 and budget.choose(9.0)["rounds"] == 10
+    # Faster than calibrated never scales estimates below 1
+    for _ in range(100):
+        budget.observe(budget.table[2], 1.0)
+    assert budget.slowdown == 1.0
+
+
+def test_surrogate_answers_decay_the_slowdown(budget):
+    budget._slowdown = 3.0
+    for _ in range(40):
+        budget.record(None, 200, approximate=True, missed=False)
+    assert budget.slowdown < 1.1
+    budget.record(budget.table[0], 200, approximate=False, missed=True)
+    budget.record(budget.table[2], 200, approximate=False, missed=False)
+    stats = budget.stats()
+    assert (stats["requests"], stats["truncated"], stats["approximate"], stats["deadline_missed"]) == (42, 1, 40, 1)
+
+
+@pytest.fixture(scope="module")
+def predictor():
+    predictor = SafeStridePredictor(artifact_format="flat")
+    predictor.load_models()
+    return predictor
+
+
+def test_calibration_table(predictor, monkeypatch):
+    monkeypatch.setattr(models.latency_budget, "CALIBRATION_ROWS", 200)
+    monkeypatch.setattr(models.latency_budget, "CALIBRATION_REPEATS", 3)
+    budget = LatencyBudget()
+    assert budget.calibrated is False
+    budget.calibrate(predictor)
+    rounds = [entry["rounds"] for entry in budget.table]
+    assert rounds == sorted(rounds) and rounds[-1] == predictor.n_rounds
+    latencies = [entry["latency_ms"] for entry in budget.table]
+    assert latencies == sorted(latencies)
+    assert budget.table[-1]["mean_abs_error"] == 0.0 and budget.table[-1]["decision_agreement"] == 1.0
+    assert budget.table[0]["max_abs_error"] > 0.0
+
+
+def test_truncated_rounds_match_across_artifact_formats(predictor):
+    features = FeaturePreprocessor(predictor.feature_names).preprocess_batch(sample_inputs(300, seed=5))
+    joblib = SafeStridePredictor(artifact_format="joblib")
+    joblib.load_models()
+    full = predictor.predict_risk(features)
+    np.testing.assert_array_equal(predictor.predict_risk(features, rounds=predictor.n_rounds), full)
+    for rounds in (5, 50):
+        truncated = predictor.predict_risk(features, rounds=rounds)
+        assert not np.allclose(truncated, full)
+        np.testing.assert_allclose(truncated, joblib.predict_risk(features, rounds=rounds), atol=1e-5)
+    assert predictor.predict(features.iloc[:1], rounds=5)["raw_proba"][1] == pytest.approx(
+        predictor.predict_risk(features.iloc[:1], rounds=5)[0], abs=1e-4)
@@ -0,0 +1,91 @@
+"""
+Tests for incremental feature updates of live scoring sessions (utils/live_sessions.py)
+"""
+import json
+
+import numpy as np
+import pytest
+
+from utils.live_sessions import LiveSession, LiveSessionRegistry
+from utils.preprocessing import FeaturePreprocessor, get_default_features
+
+with open("MLT/ml/US_Accidents_Features_20251118_162845.json", encoding="utf-8") as f:
+    FEATURE_NAMES = json.load(f)
+
+
+@pytest.fixture
+def session():
+    return LiveSession(FeaturePreprocessor(FEATURE_NAMES), get_default_features())
+
+
+@pytest.mark.parametrize("changes", [
+    {"Hour": 23},
+    {"Day_of_Week": 6, "Month": 1},
+    {"Weather_Condition": "Heavy Rain", "Visibility(mi)": 0.5},
+    {"Street": "I-70 W"},
+    {"Crossing": 1, "Temperature(F)": 28.0, "Precipitation(in)": 0.3},
+    {"Start_Lat": 47.6, "Start_Lng": -122.3, "State": "WA"},
+])
+def test_incremental_update_matches_full_preprocessing(session, changes):
+    changed = session.apply(changes)
+    expected = FeaturePreprocessor(FEATURE_NAMES).preprocess_vector({**get_default_features(), **changes})
+    np.testing.assert_array_equal(session.features, expected)
+    assert changed
+    assert set(changed) <= set(FEATURE_NAMES)
+
+
+def test_unchanged_values_need_no_rescoring(session):
+    assert session.apply({"Hour": get_default_features()["Hour"]}) == []
+
+
+def test_fields_without_features_need_no_rescoring(session):
+    before = session.features.copy()
+    assert session.apply({"City": "Somewhere Else"}) == []
+    np.testing.assert_array_equal(session.features, before)
+    assert session.input_data["City"] == "Somewhere Else"
+
+
+def test_registry_caps_sessions():
+    registry = LiveSessionRegistry(max_sessions=1)
+    assert registry.try_open()
+    assert not registry.try_open()
+    registry.close()
+    assert registry.try_open()
+    registry.record_message(rescored=True)
+    registry.record_message(rescored=False)
+    stats = registry.stats()
+    assert (stats["sessions_rejected"], stats["rescored"], stats["reused"]) == (1, 1, 1)
+
+
+def test_updates_are_applied_off_the_event_loop(monkeypatch):
+    import threading
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    import routes.live
+
+    if not routes.live.predictor.loaded:
+        routes.live.predictor.load_models()
+    threads = {}
+    validate, apply = routes.live._validate_changes, LiveSession.apply
+
+    def record_loop(message):
+        threads["loop"] = threading.get_ident()
+        return validate(message)
+
+    def record_apply(self, changes):
+        threads["apply"] = threading.get_ident()
+        return apply(self, changes)
+
+    monkeypatch.setattr(routes.live, "_validate_changes", record_loop)
+    monkeypatch.setattr(LiveSession, "apply", record_apply)
+    app = FastAPI()
+    app.include_router(routes.live.router)
+    with TestClient(app).websocket_connect("/api/live") as websocket:
+        websocket.send_json(get_default_features())
+        assert websocket.receive_json()["rescored"] is True
+        websocket.send_json({"Hour": 23})
+        answer = websocket.receive_json()
+    assert answer["seq"] == 2 and answer["rescored"] is True
+    assert threads["apply"] != threads["loop"]
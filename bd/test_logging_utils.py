@@ -0,0 +1,71 @@
+"""
+Tests for the queue-backed logging setup (utils/logging_utils.py)
+"""
+import logging
+
+from utils import logging_utils
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_stop_logging_restores_original_handlers():
+    root = logging.getLogger()
+    saved = list(root.handlers)
+    for handler in saved:
+        root.removeHandler(handler)
+    original = ListHandler()
+    root.addHandler(original)
+    try:
+        logging_utils.configure_logging()
+        assert original not in root.handlers
+        logging_utils.stop_logging()
+
+        assert root.handlers == [original]
+        logging.getLogger("safestride.test").warning("after shutdown")
+        assert original.messages == ["after shutdown"]
+    finally:
+        logging_utils.stop_logging()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in saved:
+            root.addHandler(handler)
+
+
+def test_stop_logging_without_original_handlers_keeps_emitting(capsys):
+    root = logging.getLogger()
+    saved = list(root.handlers)
+    for handler in saved:
+        root.removeHandler(handler)
+    try:
+        logging_utils.configure_logging()
+        logging_utils.stop_logging()
+        logging.getLogger("safestride.test").info("shutdown line")
+        assert "shutdown line" in capsys.readouterr().out
+    finally:
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in saved:
+            root.addHandler(handler)
+
+
+def test_sampled_logger_rate_zero_is_silent():
+    logger = logging.getLogger("safestride.test.sampled")
+    handler = ListHandler()
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    try:
+        sampled = logging_utils.SampledLogger(logger, rate=0)
+        for _ in range(100):
+            sampled.info("hot path")
+        assert handler.messages == []
+        logging_utils.SampledLogger(logger, rate=1).info("kept")
+        assert handler.messages == ["kept"]
+    finally:
+        logger.removeHandler(handler)
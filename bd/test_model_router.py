@@ -0,0 +1,105 @@
+"""
+Tests for per-request model selection and the routed batch route (models/model_router.py, routes/models.py)
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routes.models
+from models.model_router import ModelNotAvailable, ModelRouter
+from utils.batch_memory import MIN_CHUNK_ROWS, BatchMemoryGovernor
+from utils.preprocessing import get_default_features, sample_inputs
+from utils.uk_preprocessing import get_uk_default_features
+
+
+@pytest.mark.parametrize("input_data, model_key, expected", [
+    ({"Start_Lat": 39.7, "Start_Lng": -105.0}, "uk", ("uk", "explicit")),
+    ({"Start_Lat": 39.7, "Start_Lng": -105.0}, None, ("us", "region")),
+    ({"latitude": 51.5, "longitude": -0.13}, None, ("uk", "region")),
+    ({"latitude": 61.2, "longitude": -149.9}, None, ("us", "region")),  # Alaska
+    ({"Speed_limit": 30, "Road_Surface_Conditions": "Dry"}, None, ("uk", "fields")),
+    ({"Street": "Main St"}, None, ("us", "fields")),
+    ({"Start_Lat": 0.0, "Start_Lng": 0.0, "Speed_limit": 30}, None, ("us", "default")),  # markers of both
+    ({}, None, ("us", "default")),
+])
+def test_resolution_order(input_data, model_key, expected):
+    assert ModelRouter(["us", "uk"]).resolve(input_data, model_key) == expected
+
+
+def test_unknown_and_disabled_models():
+    router = ModelRouter(["uk"])
+    assert router.default == "uk"
+    assert router.resolve({"Start_Lat": 39.7, "Start_Lng": -105.0}) == ("uk", "default")
+    with pytest.raises(ModelNotAvailable):
+        router.resolve({}, "us")
+    with pytest.raises(ModelNotAvailable):
+        ModelRouter([]).resolve({})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    router = ModelRouter(["us", "uk"])
+    monkeypatch.setattr(routes.models, "model_router", router)
+    # No budget: every chunk is MIN_CHUNK_ROWS
+    monkeypatch.setattr(routes.models, "batch_memory", BatchMemoryGovernor(budget_mb=0))
+    app = FastAPI()
+    app.include_router(routes.models.router)
+    return TestClient(app), router
+
+
+def test_mixed_batches_keep_the_request_order(client):
+    client, router = client
+    rows = [get_uk_default_features(), get_default_features(), get_uk_default_features()]
+    response = client.post("/api/models/batch-predict", json={"predictions": rows})
+    assert response.status_code == 200
+    body = response.json()
+    assert [result["model"] for result in body["results"]] == ["uk", "us", "uk"]
+    assert body["models"] == {"uk": 2, "us": 1}
+    # Repeated inputs are answered from each model's cache
+    client.post("/api/models/batch-predict", json={"predictions": rows})
+    assert router.models["uk"].counters["cache_hits"] == 2
+    assert router.models["us"].counters["cache_hits"] == 1
+
+
+def test_large_batches_stream_chunk_by_chunk(client):
+    client, router = client
+    rows = sample_inputs(MIN_CHUNK_ROWS * 2 + 10).to_dict("records")
+    single = [client.post("/api/models/predict", json=row).json() for row in rows[:3]]
+    response = client.post("/api/models/batch-predict", json={"predictions": rows})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total_predictions"] == len(rows) and body["models"] == {"us": len(rows)}
+    assert body["complete"] is True
+    assert [r["raw_proba"] for r in body["results"][:3]] == [r["raw_proba"] for r in single]
+    # Three single predictions, then one scoring pass per chunk
+    assert router.models["us"].counters["requests"] == 3 + 3
+    assert router.models["us"].counters["rows"] == len(rows) + 3
+
+
+def test_invalid_rows_fail_before_anything_is_streamed(client):
+    client, router = client
+    rows = sample_inputs(MIN_CHUNK_ROWS * 2).to_dict("records")
+    rows[-1]["Hour"] = 30
+    response = client.post("/api/models/batch-predict", json={"predictions": rows})
+    assert response.status_code == 400
+    assert f"Row {len(rows) - 1}: Hour must be between 0 and 23" in response.json()["detail"]
+    assert router.models["us"].counters["rows"] == 0
+
+
+def test_failed_chunks_close_the_streamed_document(client, monkeypatch):
+    client, router = client
+    score = router.models["us"].score
+
+    def fail_second_chunk(input_dicts, positions=None):
+        if router.models["us"].counters["requests"] == 1:
+            raise RuntimeError("scoring failed")
+        return score(input_dicts, positions)
+
+    monkeypatch.setattr(router.models["us"], "score", fail_second_chunk)
+    rows = sample_inputs(MIN_CHUNK_ROWS * 2 + 10).to_dict("records")
+    response = client.post("/api/models/batch-predict", json={"predictions": rows})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["complete"] is False and body["error"] == "scoring failed"
+    assert body["completed_rows"] == len(body["results"]) == MIN_CHUNK_ROWS
+    assert body["models"] == {"us": MIN_CHUNK_ROWS}
@@ -0,0 +1,65 @@
+"""
+Tests for per-request profiling (utils/profiling.py)
+"""
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from utils import profiling
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    app = FastAPI()
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+    @app.get("/work")
+    def work():
+        timer = profiling.current_timer()
+        timer.mark_parsed()
+        with timer.stage("infer"):
+            time.sleep(0.01)
+        timer.mark_handler_done()
+        return {"profiled": timer.enabled}
+
+    return TestClient(app)
+
+
+def test_requests_without_profile_pass_through(client):
+    response = client.get("/work")
+    assert response.json() == {"profiled": False}
+    assert "server-timing" not in response.headers
+
+
+def test_timing_header_returns_stage_durations(client):
+    response = client.get("/work", headers={"X-SafeStride-Profile": "timing"})
+    assert response.json() == {"profiled": True}
+    metrics = dict(part.split(";dur=") for part in response.headers["server-timing"].split(", "))
+    assert {"parse", "infer", "serialize", "total"} <= set(metrics)
+    assert float(metrics["infer"]) >= 10
+    assert "x-profile-id" not in response.headers
+
+
+def test_cpu_profile_is_stored_and_resolvable(client, tmp_path):
+    response = client.get("/work?profile=cpu")
+    profile_id = response.headers["x-profile-id"]
+    path = profiling.profile_path(profile_id)
+    assert path == tmp_path / f"{profile_id}.folded"
+    assert path.exists()
+
+
+def test_profile_path_rejects_non_ids(client):
+    assert profiling.profile_path("../../etc/passwd") is None
+    assert profiling.profile_path("0" * 32) is None
+
+
+def test_stage_durations_are_summed():
+    timer = profiling.StageTimer()
+    for _ in range(3):
+        with timer.stage("preprocess"):
+            pass
+    assert list(timer.durations) == ["preprocess"]
+    assert timer.server_timing().startswith("preprocess;dur=")
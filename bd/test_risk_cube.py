@@ -0,0 +1,171 @@
+"""
+Tests for the risk cube: roll-up queries and checkpoint atomicity (models/risk_cube.py)
+"""
+import json
+import os
+
+import numpy as np
+import pytest
+
+import models.risk_cube
+from models.risk_cube import CUBE_SHAPE, DIMENSION_NAMES, DIMENSIONS, RiskCube, RiskCubeStats
+
+MODEL = "20251118_162845"
+
+
+def _cube(seed=0, rows=5000):
+    rng = np.random.default_rng(seed)
+    cube = RiskCube.empty()
+    cells = rng.integers(0, int(np.prod(CUBE_SHAPE)), rows)
+    # Concentrate part of the rows in a few cells so grouped counts are not all 1
+    cells[: rows // 2] = rng.choice(cells[:20], rows // 2)
+    cube.add_observations(cells, rng.integers(1, 5, rows))
+    cube.add_risk(MODEL, cells, rng.random(rows))
+    cube.record_source("all", "fp", rows, MODEL)
+    return cube
+
+
+@pytest.fixture(scope="module")
+def stats(tmp_path_factory):
+    model_dir = tmp_path_factory.mktemp("ml")
+    cube = _cube()
+    cube.save(models.risk_cube.risk_cube_path(model_dir))
+    stats = RiskCubeStats()
+    stats.configure_for_model(model_dir, MODEL)
+    return stats, cube
+
+
+def _expected(cube, group_by, filters):
+    """Brute force over the full cube"""
+    count = cube.observed["count"].astype(float)
+    risk = cube.risk[MODEL]
+    mask = np.ones(CUBE_SHAPE, dtype=bool)
+    for name, labels in filters.items():
+        axis = DIMENSION_NAMES.index(name)
+        keep = np.isin([str(label).upper() for label in DIMENSIONS[axis][1]],
+                       [str(label).upper() for label in labels])
+        mask &= keep.reshape([-1 if i == axis else 1 for i in range(len(CUBE_SHAPE))])
+    groups = {}
+    for index in zip(*np.nonzero(mask & (count > 0))):
+        key = tuple(DIMENSIONS[DIMENSION_NAMES.index(name)][1][index[DIMENSION_NAMES.index(name)]]
+                    for name in group_by)
+        total_count, total_risk = groups.get(key, (0.0, 0.0))
+        groups[key] = (total_count + count[index], total_risk + risk[index])
+    return groups
+
+
+@pytest.mark.parametrize("group_by, filters", [
+    ([], {}),
+    (["state"], {}),
+    (["hour", "state"], {"weather": ["Rain", "Light Snow"]}),
+    (["weather"], {"crossing": [1], "state": ["ca", "TX"]}),
+    (["stop", "day_of_week"], {"hour": [7, 8, 17]}),
+    (list(DIMENSION_NAMES), {}),
+])
+def test_rollups_match_the_full_cube(stats, group_by, filters):
+    stats, cube = stats
+    result = stats.query(group_by, filters)
+    expected = _expected(cube, group_by, filters)
+    got = {tuple(group[name] for name in group_by): group for group in result["groups"]}
+    assert set(got) == set(expected)
+    for key, (count, risk) in expected.items():
+        assert got[key]["count"] == count
+        assert got[key]["mean_risk"] == pytest.approx(risk / count, abs=1e-4)
+    assert result["total"]["count"] == sum(count for count, _ in expected.values())
+    assert result["stale"] is False
+
+
+def test_query_validation_and_min_count(stats):
+    stats, _ = stats
+    with pytest.raises(ValueError):
+        stats.query(["county"])
+    with pytest.raises(ValueError):
+        stats.query([], {"state": ["ZZ"]})
+    busy = stats.query(["state", "hour"], min_count=5)["groups"]
+    assert busy and all(group["count"] >= 5 for group in busy)
+
+
+def test_a_crash_before_meta_keeps_the_last_checkpoint(tmp_path, monkeypatch):
+    cube = _cube(seed=1)
+    cube.save(tmp_path)
+    before = RiskCube.load(tmp_path)
+
+    cube.add_observations(np.array([0, 1, 2]), np.array([3, 3, 3]))
+    cube.record_source("partition-2", "fp2", 3, MODEL)
+    replace = os.replace
+
+    def crash_on_meta(src, dst):
+        if str(dst).endswith("meta.json"):
+            raise OSError("crashed")
+        replace(src, dst)
+
+    monkeypatch.setattr(models.risk_cube.os, "replace", crash_on_meta)
+    with pytest.raises(OSError):
+        cube.save(tmp_path)
+    monkeypatch.setattr(models.risk_cube.os, "replace", replace)
+
+    loaded = RiskCube.load(tmp_path)
+    np.testing.assert_array_equal(loaded.observed["count"], before.observed["count"])
+    assert set(loaded.meta["sources"]) == {"all"}
+
+
+def test_saves_keep_two_generations_and_unchanged_layers(tmp_path):
+    cube = _cube(seed=2)
+    cube.add_risk("old_model", np.array([5]), np.array([0.5]))
+    cube.save(tmp_path)
+    old_layer = cube.meta["files"]["risk"]["old_model"]
+    for _ in range(3):
+        cube.add_risk(MODEL, np.array([0]), np.array([0.25]))
+        cube.save(tmp_path, models=[MODEL])
+
+    files = RiskCube.load(tmp_path).meta["files"]
+    assert files["risk"]["old_model"] == old_layer
+    on_disk = {path.name for path in tmp_path.iterdir()}
+    assert len([name for name in on_disk if name.startswith("observed")]) == 2
+    assert {files["observed"], *files["risk"].values(), "meta.json"} <= on_disk
+    assert not any(name.endswith(".part") for name in on_disk)
+    np.testing.assert_allclose(RiskCube.load(tmp_path).risk[MODEL], cube.risk[MODEL])
+
+
+def test_cubes_without_generations_still_load(tmp_path):
+    cube = _cube(seed=3)
+    cube.save(tmp_path)
+    files = cube.meta["files"]
+    os.rename(tmp_path / files["observed"], tmp_path / "observed.npz")
+    os.rename(tmp_path / files["risk"][MODEL], tmp_path / f"risk_{MODEL}.npz")
+    meta_path = tmp_path / "meta.json"
+    meta = json.loads(meta_path.read_text())
+    del meta["files"], meta["generation"]
+    meta_path.write_text(json.dumps(meta))
+
+    legacy = RiskCube.load(tmp_path)
+    np.testing.assert_array_equal(legacy.observed["count"], cube.observed["count"])
+    legacy.save(tmp_path)
+    assert RiskCube.load(tmp_path).rows == cube.rows
+
+
+def test_cell_indices_place_rows_by_state_hour_and_flags():
+    import pandas as pd
+
+    from utils.preprocessing import WEATHER_CATEGORIES
+
+    weather = {f"Weather_Condition_{category}": [0, 0] for category in WEATHER_CATEGORIES}
+    weather[f"Weather_Condition_{WEATHER_CATEGORIES[2]}"] = [1, 0]
+    features = pd.DataFrame({"Hour": [7, 30], "Day_of_Week": [2, 6], "Crossing": [1, 0], "Junction": [0, 0],
+                             "Traffic_Signal": [0, 1], "Stop": [0, 0], **weather})
+    cells = models.risk_cube.cell_indices(["co", "XX"], features)
+    states = DIMENSIONS[0][1]
+    assert np.unravel_index(cells[0], CUBE_SHAPE) == (states.index("CO"), 7, 2, 2, 1, 0, 0, 0)
+    assert np.unravel_index(cells[1], CUBE_SHAPE) == (states.index("Other"), 23, 6, 0, 0, 0, 1, 0)
+
+
+def test_layers_are_served_once_complete(tmp_path, monkeypatch):
+    monkeypatch.setattr(models.risk_cube, "RELOAD_CHECK_INTERVAL", 0.0)
+    cube = _cube(seed=4)
+    cube.add_risk("new_model", np.array([0]), np.array([0.9]))  # covers no source yet
+    cube.save(models.risk_cube.risk_cube_path(tmp_path))
+    stats = RiskCubeStats()
+    stats.configure_for_model(tmp_path, "new_model")
+    result = stats.query()
+    assert (result["risk_model"], result["stale"]) == (MODEL, True)
+    assert result["total"]["count"] == cube.rows
@@ -0,0 +1,116 @@
+"""
+Tests for shadow scoring of the ml_final candidate (models/shadow.py)
+"""
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+from sklearn.ensemble import HistGradientBoostingClassifier
+
+from models.shadow import FinalModelPipeline, ShadowScorer, _match_installed_node_dtype, weather_severity
+from utils.preprocessing import get_default_features, get_example_requests
+
+
+class StubPipeline:
+    """Candidate returning a fixed probability"""
+
+    model_dir = Path("stub")
+    timestamp = "0"
+    threshold = 0.5
+
+    def __init__(self, probability=0.8, fail_load=False, fail_predict=False):
+        self.probability = probability
+        self.fail_load = fail_load
+        self.fail_predict = fail_predict
+        self.scored = threading.Event()
+
+    def load(self):
+        if self.fail_load:
+            raise OSError("missing artifact")
+
+    def predict_proba_high(self, input_dicts):
+        if self.fail_predict:
+            raise ValueError("Buffer dtype mismatch")
+        self.scored.set()
+        return np.full(len(input_dicts), self.probability)
+
+
+def _primary(high):
+    return {"raw_proba": [1 - high, high], "label": int(high > 0.5)}
+
+
+def test_old_hgb_node_records_are_cast_to_the_installed_dtype():
+    X = np.random.default_rng(0).normal(size=(200, 3))
+    y = (X[:, 0] > 0).astype(int)
+    model = HistGradientBoostingClassifier(max_iter=5).fit(X, y)
+    expected = model.predict_proba(X)
+    # Records as pickled by scikit-learn < 1.3 (feature_idx as uint32)
+    old_dtype = [(name, "<u4" if name == "feature_idx" else dtype)
+                 for name, (dtype, _) in model._predictors[0][0].nodes.dtype.fields.items()]
+    for iteration in model._predictors:
+        for tree in iteration:
+            tree.nodes = tree.nodes.astype(old_dtype)
+    with pytest.raises(ValueError):
+        model.predict_proba(X)
+
+    np.testing.assert_array_equal(_match_installed_node_dtype(model).predict_proba(X), expected)
+
+
+def test_ml_final_candidate_predicts_under_installed_sklearn():
+    pipeline = FinalModelPipeline()
+    pipeline.load()
+    probabilities = pipeline.predict_proba_high([example["data"] for example in get_example_requests()])
+    assert probabilities.shape == (len(get_example_requests()),)
+    assert np.all((probabilities >= 0) & (probabilities <= 1))
+
+
+def test_start_disables_shadowing_when_the_probe_fails():
+    scorer = ShadowScorer(rate=1.0, pipeline=StubPipeline(fail_predict=True))
+    scorer.start()
+    assert not scorer.enabled
+    assert "probe prediction failed" in scorer.report()["load_error"]
+    scorer.submit([get_default_features()], [_primary(0.2)], 1.0)
+    assert scorer.report()["batches_submitted"] == 0
+
+
+def test_start_disables_shadowing_when_loading_fails():
+    scorer = ShadowScorer(rate=1.0, pipeline=StubPipeline(fail_load=True))
+    scorer.start()
+    assert not scorer.enabled
+    assert scorer.report()["load_error"] == "missing artifact"
+
+
+def test_sampled_rows_are_compared_with_the_primary():
+    pipeline = StubPipeline(probability=0.8)
+    scorer = ShadowScorer(rate=1.0, pipeline=pipeline)
+    scorer.start()
+    pipeline.scored.clear()  # set by the startup probe
+    try:
+        scorer.submit([get_default_features()] * 2, [_primary(0.6), _primary(0.3)], 5.0)
+        assert pipeline.scored.wait(5)
+        deadline = time.monotonic() + 5
+        while scorer.report()["rows_scored"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        report = scorer.report()
+        assert report["rows_scored"] == 2
+        assert report["agreement_rate"] == 0.5
+        assert report["mean_probability_delta"] == pytest.approx(0.35)
+    finally:
+        scorer.stop()
+
+
+def test_submit_after_stop_drops_the_sample():
+    scorer = ShadowScorer(rate=1.0, pipeline=StubPipeline())
+    scorer.start()
+    scorer.stop()
+    scorer.submit([get_default_features()], [_primary(0.2)], 1.0)
+    assert scorer.report()["batches_submitted"] == 0
+
+
+def test_weather_severity_keywords():
+    assert weather_severity("Heavy Thunderstorm") == 3
+    assert weather_severity("Light Rain") == 2
+    assert weather_severity("Mostly Cloudy") == 1
+    assert weather_severity("Fair") == 0
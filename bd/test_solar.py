@@ -0,0 +1,90 @@
+"""
+Tests for the server-side Sunrise_Sunset derivation (utils/solar.py)
+"""
+import json
+
+import numpy as np
+import pytest
+
+from utils.preprocessing import FeaturePreprocessor, get_default_features
+from utils.solar import SolarCalculator, pack_keys, sun_times, unpack_keys, utc_offsets
+
+with open("MLT/ml/US_Accidents_Features_20251118_162845.json", encoding="utf-8") as f:
+    FEATURE_NAMES = json.load(f)
+
+DENVER = (39.7392, -104.9903)
+
+
+def test_keys_round_trip():
+    fields = (np.array([0, 519, 719]), np.array([0, 300, 1439]), np.array([2016, 2024, 4095]),
+              np.array([1, 6, 12]), np.array([-10, -7, 5]))
+    for unpacked, expected in zip(unpack_keys(pack_keys(*fields)), fields):
+        np.testing.assert_array_equal(unpacked, expected)
+    assert pack_keys(519, 300, 2024, 6, -6) == int(pack_keys(*map(np.array, ([519], [300], [2024], [6], [-6])))[0])
+
+
+def test_utc_offsets_follow_state_and_dst():
+    offsets = utc_offsets(["CO", "CO", "AZ", "", "NY"], np.array([-105.0, -105.0, -112.0, -75.0, -74.0]),
+                          np.array([1, 6, 6, 6, 11]))
+    np.testing.assert_array_equal(offsets, [-7, -6, -7, -4, -5])
+
+
+@pytest.mark.parametrize("month, sunrise, sunset", [
+    (6, 5.52, 20.52),   # 5:31 / 20:31 MDT
+    (12, 7.18, 16.62),  # 7:11 / 16:37 MST
+])
+def test_denver_sun_times(month, sunrise, sunset):
+    offset = utc_offsets(["CO"], np.array([DENVER[1]]), np.array([month]))
+    rise, set_ = sun_times(np.array([DENVER[0]]), np.array([DENVER[1]]), np.array([2024]), np.array([month]),
+                           offset)
+    assert rise[0] == pytest.approx(sunrise, abs=0.1)
+    assert set_[0] == pytest.approx(sunset, abs=0.1)
+
+
+def test_day_night_by_hour():
+    calculator = SolarCalculator()
+    hours = np.arange(24)
+    labels = calculator.day_night([DENVER[0]] * 24, [DENVER[1]] * 24, [2024] * 24, [6] * 24, hours, ["CO"] * 24)
+    # Hours whose midpoint is well clear of sunrise / sunset
+    assert set(labels[6:20]) == {"Day"}
+    assert set(labels[:5]) == set(labels[21:]) == {"Night"}
+    winter = calculator.day_night([DENVER[0]] * 24, [DENVER[1]] * 24, [2024] * 24, [12] * 24, hours, ["CO"] * 24)
+    assert set(winter[7:16]) == {"Day"}
+    assert set(winter[:6]) == set(winter[17:]) == {"Night"}
+
+
+def test_polar_day_and_night():
+    calculator = SolarCalculator()
+    june = calculator.day_night([80.0] * 24, [20.0] * 24, [2024] * 24, [6] * 24, np.arange(24))
+    december = calculator.day_night([80.0] * 24, [20.0] * 24, [2024] * 24, [12] * 24, np.arange(24))
+    assert set(june) == {"Day"}
+    assert set(december) == {"Night"}
+
+
+def test_scalar_path_matches_batch_and_uses_the_cache():
+    calculator = SolarCalculator()
+    hours = np.arange(24)
+    batch = calculator.day_night([DENVER[0]] * 24, [DENVER[1]] * 24, [2024] * 24, [3] * 24, hours, ["CO"] * 24)
+    assert calculator.stats() == {"entries": 1, "hits": 0, "misses": 1}
+    assert [calculator.day_night_one(*DENVER, 2024, 3, hour, "CO") for hour in hours] == list(batch)
+    assert calculator.stats()["hits"] == 24
+
+
+def test_cache_is_bounded():
+    calculator = SolarCalculator(max_entries=3)
+    calculator.day_night(np.linspace(30, 45, 10), [-100.0] * 10, [2024] * 10, [6] * 10, [12] * 10)
+    assert calculator.stats()["entries"] <= 10
+    calculator.day_night([47.0], [-122.0], [2024], [6], [12])
+    assert calculator.stats()["entries"] == 1
+
+
+@pytest.mark.parametrize("missing", [None, "", "  "])
+def test_preprocessing_derives_missing_sunrise_sunset(missing):
+    preprocessor = FeaturePreprocessor(FEATURE_NAMES)
+    night = {**get_default_features(), "State": "CO", "Month": 6, "Hour": 2, "Sunrise_Sunset": missing}
+    day = {**night, "Hour": 13}
+    explicit = {**night, "Sunrise_Sunset": "Day"}
+    index = FEATURE_NAMES.index("Sunrise_Sunset_Night")
+    assert preprocessor.preprocess_vector(night)[index] == 1
+    assert preprocessor.preprocess_vector(day)[index] == 0
+    assert preprocessor.preprocess_vector(explicit)[index] == 0
@@ -0,0 +1,168 @@
+"""
+Tests for the spool feed: tailing, checkpoint recovery and the socket spool (utils/spool_feed.py)
+"""
+import json
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+import utils.spool_feed
+from utils.preprocessing import FeaturePreprocessor, get_default_features
+from utils.spool_feed import (
+    UNIX_SOCKETS, FilePosition, SegmentWriter, SocketSpool, SpoolFeed, SpoolReader, socket_spool_name,
+)
+
+
+def _line(hour):
+    return json.dumps({**get_default_features(), "Hour": hour}) + "\n"
+
+
+def _segments(output_dir):
+    return [json.loads(line) for path in sorted(output_dir.glob("scored-*.jsonl"))
+            for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_reader_takes_complete_lines_and_restarts_replaced_files(tmp_path):
+    path = tmp_path / "a.jsonl"
+    path.write_text('{"n": 1}\n\n{"n": 2}\n{"n": ', encoding="utf-8")
+    reader = SpoolReader(tmp_path, {})
+    assert reader.read(10) == [("a.jsonl", 1, {"n": 1}), ("a.jsonl", 3, {"n": 2})]
+    assert reader.lag_bytes() == len('{"n": ')
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('3}\n')
+    assert reader.read(10) == [("a.jsonl", 4, {"n": 3})]
+
+    path.unlink()
+    path.write_text('{"n": 9}\n', encoding="utf-8")
+    assert reader.read(10) == [("a.jsonl", 1, {"n": 9})]
+
+
+@pytest.fixture(scope="module")
+def predictor():
+    from models.predictor import SafeStridePredictor
+
+    predictor = SafeStridePredictor(artifact_format="flat")
+    predictor.load_models()
+    return predictor
+
+
+def _feed(predictor, tmp_path, **kwargs):
+    feed = SpoolFeed(predictor, FeaturePreprocessor(predictor.feature_names), tmp_path / "spool",
+                     tmp_path / "scored", batch_rows=4, batch_wait_ms=0, **kwargs)
+    feed.spool_dir.mkdir(exist_ok=True)
+    feed.reader = SpoolReader(feed.spool_dir, feed.writer.recover())
+    return feed
+
+
+def _step(feed, commit=True):
+    feed._score(feed._next_batch())
+    if commit:
+        feed._commit()
+
+
+def test_uncommitted_rows_are_scored_again_after_a_crash(predictor, tmp_path):
+    feed = _feed(predictor, tmp_path)
+    (feed.spool_dir / "a.jsonl").write_text("".join(_line(h) for h in range(6)) + "not json\n",
+                                            encoding="utf-8")
+    _step(feed)
+    _step(feed, commit=False)  # killed before its segment commit
+    feed.writer._file.close()
+
+    feed = _feed(predictor, tmp_path)
+    assert not list(feed.writer.output_dir.glob("*.part"))
+    _step(feed)
+    rows = _segments(feed.writer.output_dir)
+    assert [row["line"] for row in rows] == list(range(1, 8))
+    assert all(row["success"] for row in rows[:6]) and rows[6]["success"] is False
+
+
+def test_crash_after_the_segment_rename_keeps_the_segment(predictor, tmp_path, monkeypatch):
+    feed = _feed(predictor, tmp_path)
+    (feed.spool_dir / "a.jsonl").write_text("".join(_line(h) for h in range(6)), encoding="utf-8")
+    _step(feed)
+    replace = os.replace
+
+    def crash_on_checkpoint(src, dst):
+        if str(dst).endswith("checkpoint.json"):
+            raise OSError("crashed")
+        replace(src, dst)
+
+    monkeypatch.setattr(utils.spool_feed.os, "replace", crash_on_checkpoint)
+    feed._score(feed._next_batch())
+    with pytest.raises(OSError):
+        feed.writer.commit(feed.reader.positions)
+    monkeypatch.setattr(utils.spool_feed.os, "replace", replace)
+
+    # The pending checkpoint belongs to a committed segment: it is applied, nothing is scored twice
+    feed = _feed(predictor, tmp_path)
+    assert feed.writer.sequence == 2
+    assert feed.reader.positions["a.jsonl"].line == 6
+    assert feed.reader.read(10) == []
+    assert [row["line"] for row in _segments(feed.writer.output_dir)] == list(range(1, 7))
+
+
+def test_pending_checkpoints_without_their_segment_are_discarded(tmp_path):
+    writer = SegmentWriter(tmp_path)
+    writer.recover()
+    writer.write(["{}"])
+    writer.commit({"a.jsonl": FilePosition(10, 1, 1)})
+    writer.write_checkpoint({"a.jsonl": FilePosition(20, 2, 1)}, sequence=2, pending=True)
+    (tmp_path / "scored-00000002.jsonl.part").write_text("{}\n", encoding="utf-8")
+
+    positions = SegmentWriter(tmp_path).recover()
+    assert positions == {"a.jsonl": FilePosition(10, 1, 1)}
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["checkpoint.json", "scored-00000001.jsonl"]
+
+
+def test_idle_files_retire_except_the_socket_target(predictor, tmp_path):
+    feed = _feed(predictor, tmp_path, done_after_s=60)
+    old = time.time() - 7200
+    names = ["a.jsonl", socket_spool_name(), socket_spool_name(old)]
+    for name in names:
+        path = feed.spool_dir / name
+        path.write_text(_line(1), encoding="utf-8")
+        os.utime(path, (old, old))
+    (feed.spool_dir / "unread.jsonl").write_text(_line(2), encoding="utf-8")
+    feed.reader.read(len(names))
+    os.utime(feed.spool_dir / "unread.jsonl", (old, old))
+
+    feed._retire_done_files()
+    assert sorted(path.name for path in feed.done_dir.iterdir()) == sorted([names[0], names[2]])
+    assert set(feed.reader.positions) == {socket_spool_name()}
+    assert json.loads(feed.writer.checkpoint_path.read_text())["files"].keys() == {socket_spool_name()}
+
+
+@pytest.mark.skipif(not UNIX_SOCKETS, reason="needs Unix domain sockets")
+def test_socket_lines_after_a_retire_reach_a_new_spool_file(tmp_path):
+    spool_dir = tmp_path / "spool"
+    (spool_dir / "done").mkdir(parents=True)
+    server = SocketSpool(str(tmp_path / "feed.sock"), spool_dir)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def send(lines):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(str(tmp_path / "feed.sock"))
+            client.sendall(b"".join(lines))
+            client.shutdown(socket.SHUT_WR)
+            return json.loads(client.makefile().readline())
+
+    try:
+        assert send([b'{"n": 1}\n', b"\n", b'{"n": 2}']) == {"accepted": 2}
+        name = socket_spool_name()
+        os.replace(spool_dir / name, spool_dir / "done" / name)
+        # A long-lived handle would still point at the moved file
+        server.spool_line(b'{"n": 3}\n')
+        os.replace(spool_dir / name, spool_dir / "done" / f"moved-{name}")
+        server.spool_line(b'{"n": 4}\n')
+        server.end_connection()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert (spool_dir / "done" / name).read_bytes() == b'{"n": 1}\n{"n": 2}\n'
+    assert (spool_dir / "done" / f"moved-{name}").read_bytes() == b'{"n": 3}\n'
+    assert (spool_dir / name).read_bytes() == b'{"n": 4}\n'
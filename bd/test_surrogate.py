@@ -0,0 +1,64 @@
+"""
+Tests for the lookup surrogate behind approximate mode (models/surrogate.py)
+"""
+import os
+
+import numpy as np
+import pytest
+
+from models.surrogate import (
+    LAT_BINS, LNG_BINS, QUANTIZATION_LEVELS, TABLE_SHAPE, LookupSurrogate, surrogate_path,
+)
+
+
+@pytest.fixture
+def surrogate():
+    table = np.zeros(TABLE_SHAPE, dtype=np.uint8)
+    return LookupSurrogate(table, {"label_agreement": 0.9})
+
+
+def test_cell_quantizes_each_dimension(surrogate):
+    cell = surrogate.cell({"Start_Lat": 39.74, "Start_Lng": -104.99, "Street": "I-25 N",
+                           "Crossing": 1, "Stop": 1, "Month": 6, "Distance(mi)": 0.75})
+    assert cell == (31, 20, 1, 0b1001, 5, 1)
+
+
+def test_cell_clips_out_of_range_and_missing_values(surrogate):
+    cell = surrogate.cell({"Start_Lat": 80.0, "Start_Lng": float("nan"), "Street": None,
+                           "Month": 14, "Distance(mi)": float("nan")})
+    assert cell == (LAT_BINS - 1, 0, 0, 0, 11, 0)
+    assert surrogate.cell({"Start_Lat": -10, "Start_Lng": 10})[:2] == (0, LNG_BINS - 1)
+
+
+def test_prediction_is_the_dequantized_cell(surrogate):
+    input_data = {"Start_Lat": 30.2, "Start_Lng": -97.7, "Month": 3}
+    surrogate.table[surrogate.cell(input_data)] = 204
+    assert surrogate.predict_proba_high(input_data) == pytest.approx(204 / QUANTIZATION_LEVELS)
+
+
+def test_save_load_keeps_table_and_metrics(surrogate, tmp_path):
+    surrogate.table[0, 0, 0, 0, 0, 0] = 17
+    path = surrogate_path(tmp_path, "20250101_000000")
+    surrogate.save(path)
+    loaded = LookupSurrogate.load(path)
+    np.testing.assert_array_equal(loaded.table, surrogate.table)
+    assert loaded.metrics == {"label_agreement": 0.9}
+
+
+def test_stale_tables_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        LookupSurrogate(np.zeros((2, 2), dtype=np.uint8), {})
+    path = tmp_path / "old.npz"
+    np.savez(path, table=np.zeros(TABLE_SHAPE, dtype=np.uint8), version=np.array(0), metrics=np.array("{}"))
+    with pytest.raises(ValueError):
+        LookupSurrogate.load(path)
+
+
+@pytest.mark.skipif("SAFESTRIDE_SURROGATE" in os.environ or "SAFESTRIDE_APPROX_FALLBACK" in os.environ,
+                    reason="defaults overridden in the environment")
+def test_approximate_answers_are_off_by_default():
+    from models.predictor import predictor
+    from utils.admission import APPROX_FALLBACK
+
+    assert predictor.load_surrogate is False
+    assert APPROX_FALLBACK is False
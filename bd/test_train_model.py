@@ -0,0 +1,94 @@
+"""
+Tests for the out-of-core training splits (train_model.py)
+"""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import train_model
+from models.artifacts import FlatScaler
+from train_model import DEFAULT_PARAMS, SPLITS, evaluate, load_shard, train_booster, write_shards
+
+with open("MLT/ml/US_Accidents_Features_20251118_162845.json", encoding="utf-8") as f:
+    FEATURE_NAMES = json.load(f)
+
+
+@pytest.fixture
+def dataset_csv(tmp_path):
+    rng = np.random.default_rng(3)
+    n = 600
+    temperature = rng.normal(55, 20, n)
+    frame = pd.DataFrame({
+        "Start_Time": pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 365 * 24, n), unit="h"),
+        "Start_Lat": rng.uniform(30, 45, n),
+        "Start_Lng": rng.uniform(-120, -75, n),
+        "Distance(mi)": rng.exponential(0.5, n),
+        "Temperature(F)": temperature,
+        "Humidity(%)": rng.uniform(20, 100, n),
+        "Pressure(in)": rng.normal(29.9, 0.3, n),
+        "Visibility(mi)": rng.uniform(0, 10, n),
+        "Wind_Speed(mph)": rng.uniform(0, 20, n),
+        "Precipitation(in)": rng.exponential(0.05, n),
+        "Weather_Condition": rng.choice(["Fair", "Light Rain", "Snow"], n),
+        "Crossing": rng.random(n) < 0.1,
+        "Junction": rng.random(n) < 0.1,
+        "Traffic_Signal": rng.random(n) < 0.2,
+        "Stop": rng.random(n) < 0.05,
+        "City": "Denver",
+        "State": "CO",
+        "Street": rng.choice(["I-25 N", "Main St"], n),
+        "Sunrise_Sunset": rng.choice(["Day", "Night"], n),
+        "Severity": np.where(temperature < 45, 3, 2),
+    })
+    path = tmp_path / "accidents.csv"
+    frame.to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def shards(dataset_csv, tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    return write_shards(str(dataset_csv), FEATURE_NAMES, cache_dir, chunk_size=200, max_rows=None,
+                        severity_threshold=3, test_fraction=0.2, validation_fraction=0.15), cache_dir
+
+
+def test_rows_are_split_three_ways(shards):
+    (paths, _, counts), _ = shards
+    assert sum(counts[split] for split in SPLITS) == 600
+    for split in SPLITS:
+        rows = sum(len(load_shard(path)[1]) for path in paths[split])
+        assert rows == counts[split] > 0
+        assert all(path.name.startswith(f"{split}_") for path in paths[split])
+    assert counts["validation"] == pytest.approx(600 * 0.15, abs=30)
+    assert counts["test"] == pytest.approx(600 * 0.2, abs=30)
+
+
+def test_scaler_is_fitted_on_train_rows_only(shards):
+    (paths, scaler, counts), _ = shards
+    train = np.concatenate([load_shard(path)[0] for path in paths["train"]])
+    assert scaler.n_samples_seen_ == counts["train"]
+    np.testing.assert_allclose(scaler.mean_, train.mean(axis=0), rtol=1e-5, atol=1e-5)
+
+
+def test_early_stopping_watches_validation_not_test(shards, monkeypatch):
+    (paths, scaler, counts), cache_dir = shards
+    flat = FlatScaler.from_sklearn(scaler)
+    watched = []
+    train = train_model.xgb.train
+
+    def recording_train(params, dtrain, **kwargs):
+        watched.extend((name, dmatrix.num_row()) for dmatrix, name in kwargs["evals"])
+        return train(params, dtrain, **kwargs)
+
+    monkeypatch.setattr(train_model.xgb, "train", recording_train)
+    booster = train_booster(paths["train"], paths["validation"], flat, FEATURE_NAMES,
+                            {**DEFAULT_PARAMS, "nthread": 1}, 5, cache_dir)
+    assert watched == [("validation", counts["validation"])]
+    assert booster.num_boosted_rounds() <= 5
+
+    performance = evaluate(booster, paths["test"], flat)
+    assert set(performance) >= {"accuracy", "f1_score", "roc_auc"}
+    assert 0 <= performance["accuracy"] <= 1
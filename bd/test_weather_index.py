@@ -0,0 +1,88 @@
+"""
+Tests for filling omitted weather fields from station observations (models/weather_index.py)
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.weather_index import NUMERIC_FIELDS, WeatherEnricher, WeatherObservations, pack_keys
+
+STATIONS = pd.DataFrame({"Airport_Code": ["KDEN", "KBJC"], "lat": [39.85, 39.91], "lng": [-104.67, -105.12]})
+
+
+def _observation(code, timestamp, temperature, condition, **fields):
+    row = {field: 1.0 for field in NUMERIC_FIELDS}
+    row.update({"Airport_Code": code, "Weather_Timestamp": timestamp, "Temperature(F)": temperature,
+                "Weather_Condition": condition, **fields})
+    return row
+
+
+@pytest.fixture
+def index():
+    observations = pd.DataFrame([
+        _observation("KDEN", "2022-01-05 08:53:00", 20.0, "Light Snow"),
+        _observation("KDEN", "2022-01-19 08:53:00", 30.0, "Light Snow"),
+        _observation("KDEN", "2022-01-26 08:53:00", 40.0, "Fair"),
+        _observation("KDEN", "2023-01-10 08:53:00", 10.0, "Snow", **{"Humidity(%)": np.nan}),
+        _observation("KBJC", "2022-07-04 15:10:00", 88.0, "Thunderstorm"),
+    ])
+    return WeatherObservations.build(STATIONS, observations)
+
+
+def test_nearest_station_within_range(index):
+    station, distance = index.nearest_stations(np.array([39.86, 39.92, 41.5]), np.array([-104.68, -105.10, -104.0]))
+    assert [index.stations[s] for s in station[:2]] == ["KDEN", "KBJC"]
+    assert station[2] == -1 and np.isnan(distance[2])
+    assert distance[0] == pytest.approx(1.4, abs=0.1)
+
+
+def test_observed_bucket_then_climatology(index):
+    den, bjc = index.stations.index("KDEN"), index.stations.index("KBJC")
+    values, condition, source = index.resolve(np.array([
+        pack_keys(den, 2022, 1, 8),   # three observations that hour of that month
+        pack_keys(den, 2021, 1, 8),   # no observation that year: climatology over all years
+        pack_keys(den, 2023, 1, 8),   # observed, but Humidity only from climatology
+        pack_keys(bjc, 2022, 1, 8),   # nothing at all
+    ]))
+    temperature = NUMERIC_FIELDS.index("Temperature(F)")
+    humidity = NUMERIC_FIELDS.index("Humidity(%)")
+    assert values[0, temperature] == pytest.approx(30.0)
+    assert index.conditions[condition[0]] == "Light Snow"
+    assert values[1, temperature] == pytest.approx(25.0)
+    assert values[2, temperature] == pytest.approx(10.0)
+    assert values[2, humidity] == pytest.approx(1.0)
+    assert list(source) == [2, 1, 2, 0]
+    assert condition[3] == -1 and np.isnan(values[3]).all()
+
+
+def test_fill_only_touches_missing_fields(index):
+    enricher = WeatherEnricher(max_km=50)
+    enricher.index = index
+    omitted = {"Start_Lat": 39.86, "Start_Lng": -104.68, "Year": 2022, "Month": 1, "Hour": 8,
+               "Temperature(F)": None, "Weather_Condition": ""}
+    given = {**omitted, "Temperature(F)": 5.0, "Weather_Condition": "Fog"}
+    complete = {**given, **{field: 0.5 for field in NUMERIC_FIELDS if field != "Temperature(F)"}}
+    far = {**omitted, "Start_Lat": 45.0}
+    inputs = [omitted, given, complete, far]
+    info = enricher.fill(inputs)
+
+    assert (omitted["Temperature(F)"], omitted["Weather_Condition"]) == (30.0, "Light Snow")
+    assert info[0]["station"] == "KDEN" and info[0]["source"] == "observed"
+    assert (given["Temperature(F)"], given["Weather_Condition"]) == (5.0, "Fog")
+    assert "Temperature(F)" not in info[1]["fields"]
+    assert info[2] is None and info[3] is None
+    assert far["Temperature(F)"] is None
+    stats = enricher.stats()
+    assert (stats["filled_rows"], stats["unresolved_rows"], stats["cache_misses"]) == (2, 1, 1)
+
+    enricher.fill([dict(omitted, **{"Temperature(F)": None})])
+    assert enricher.stats()["cache_hits"] == 1
+
+
+def test_save_and_load(index, tmp_path):
+    index.save(tmp_path / "weather")
+    loaded = WeatherObservations.load(tmp_path / "weather")
+    keys = np.array([pack_keys(0, 2022, 1, 8), pack_keys(1, 2022, 7, 15)])
+    for got, expected in zip(loaded.resolve(keys), index.resolve(keys)):
+        np.testing.assert_array_equal(got, expected)
+    assert loaded.stations == index.stations
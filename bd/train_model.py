@@ -0,0 +1,356 @@
+"""
+Out-of-Core Training Pipeline
+
+Trains the US Accidents risk model from US_Accidents_March23.csv in bounded
+memory and writes a serving-ready model generation to MLT/ml:
+
+1. Stream the CSV in chunks through to_model_inputs and
+   FeaturePreprocessor.preprocess_batch (the serving feature logic, so
+   training and serving features cannot drift apart), split rows into
+   train / validation / test and write them as float32 shards to a cache
+   directory. The StandardScaler is fitted incrementally (partial_fit) on the
+   train rows.
+2. Train XGBoost (hist, all cores) on an external-memory DMatrix that reads
+   the scaled shards back one at a time; XGBoost keeps its quantized pages on
+   disk in the same directory. The validation shards drive early stopping.
+3. Evaluate on the test shards, which neither training nor early stopping
+   has seen, and write the model, scaler, feature list,
+   metadata and feature importance joblib files under a new timestamp, then
+   convert them to the fast formats (see convert_artifacts.py) so
+   SafeStridePredictor(timestamp=...) can serve them as they are.
+
+Peak memory is bounded by --chunk-size rows in pass 1 and by one shard plus
+XGBoost's page cache in pass 2, not by the dataset size. Progress lines report
+rows/s and seconds per boosting round with an ETA.
+
+Label: High Risk (1) when Severity >= --severity-threshold (default 3).
+
+Usage:
+    python train_model.py --csv US_Accidents_March23.csv
+    python train_model.py --csv US_Accidents_March23.csv --max-rows 1000000 --rounds 100
+    python train_model.py --csv US_Accidents_March23.csv --cache-dir /mnt/scratch --threads 16
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.metrics import accuracy_score, confusion_matrix, f1_score, roc_auc_score
+from sklearn.preprocessing import StandardScaler
+
+from models.artifacts import FlatScaler, artifact_paths, export_artifacts, load_json, load_native_model
+from utils.dataset import DEFAULT_CHUNK_SIZE, MODEL_INPUT_COLUMNS, iter_dataset_chunks, to_model_inputs
+from utils.preprocessing import FeaturePreprocessor
+
+DEFAULT_FEATURES = "MLT/ml/US_Accidents_Features_20251118_162845.json"
+SEVERITY_THRESHOLD = 3
+TEST_FRACTION = 0.2
+VALIDATION_FRACTION = 0.1
+SPLITS = ("train", "validation", "test")
+CLASS_MAPPING = {"0": "Low Risk (Minor/No Accident)", "1": "High Risk (Severe Accident)"}
+
+# Hyperparameters of the served 20251118_162845 generation
+DEFAULT_PARAMS = {
+    "objective": "binary:logistic",
+    "eval_metric": "auc",
+    "tree_method": "hist",
+    "max_depth": 6,
+    "learning_rate": 0.1,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "gamma": 0.1,
+    "reg_alpha": 0.05,
+    "reg_lambda": 1.0,
+    "seed": 43,
+}
+DEFAULT_ROUNDS = 200
+EARLY_STOPPING_ROUNDS = 50
+
+
+class ShardIterator(xgb.DataIter):
+    """Feeds the scaled feature shards to XGBoost one at a time (external memory)"""
+
+    def __init__(self, shards: List[Path], scaler: FlatScaler, feature_names: List[str], cache_prefix: str):
+        self.shards = shards
+        self.scaler = scaler
+        self.feature_names = feature_names
+        self._position = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> int:
+        if self._position == len(self.shards):
+            return 0
+        X, y = load_shard(self.shards[self._position])
+        input_data(data=self.scaler.transform(X).astype(np.float32), label=y, feature_names=self.feature_names)
+        self._position += 1
+        return 1
+
+    def reset(self):
+        self._position = 0
+
+
+class RoundTimer(xgb.callback.TrainingCallback):
+    """Prints seconds per round, the validation AUC and an ETA every few rounds"""
+
+    def __init__(self, rounds: int, every: int = 10):
+        super().__init__()
+        self.rounds = rounds
+        self.every = every
+        self.start = None
+
+    def before_training(self, model):
+        self.start = time.perf_counter()
+        return model
+
+    def after_iteration(self, model, epoch: int, evals_log) -> bool:
+        done = epoch + 1
+        if done % self.every == 0 or done == self.rounds:
+            elapsed = time.perf_counter() - self.start
+            auc = evals_log.get("validation", {}).get("auc", [float("nan")])[-1]
+            print(f"  … round {done}/{self.rounds}: validation AUC {auc:.4f}, {elapsed / done:.2f}s/round, "
+                  f"ETA {elapsed / done * (self.rounds - done):.0f}s")
+        return False
+
+
+def load_shard(path: Path) -> Tuple[np.ndarray, np.ndarray]:
+    with np.load(path) as shard:
+        return shard["X"], shard["y"]
+
+
+def write_shards(csv_path: str, feature_names: List[str], cache_dir: Path, chunk_size: int,
+                 max_rows: Optional[int], severity_threshold: int,
+                 test_fraction: float, validation_fraction: float
+                 ) -> Tuple[Dict[str, List[Path]], StandardScaler, Dict[str, int]]:
+    """
+    Pass 1: stream the dataset into train / validation / test feature shards
+
+    Each row lands in test with probability test_fraction, in validation with
+    probability validation_fraction and in train otherwise.
+
+    Returns:
+        Shard paths per split, the scaler fitted on the train rows, and row /
+        label counts per split
+    """
+    preprocessor = FeaturePreprocessor(feature_names)
+    scaler = StandardScaler()
+    rng = np.random.default_rng(DEFAULT_PARAMS["seed"])
+    shards = {split: [] for split in SPLITS}
+    counts = {key: 0 for split in SPLITS for key in (split, f"{split}_positive")}
+
+    start = time.perf_counter()
+    columns = MODEL_INPUT_COLUMNS + ["Severity"]
+    for index, chunk in enumerate(iter_dataset_chunks(csv_path, columns, chunk_size, max_rows)):
+        inputs = to_model_inputs(chunk)
+        y = (inputs.pop("Severity").to_numpy() >= severity_threshold).astype(np.float32)
+        features = preprocessor.preprocess_batch(inputs)
+        draw = rng.random(len(features))
+        masks = {
+            "test": draw < test_fraction,
+            "validation": (draw >= test_fraction) & (draw < test_fraction + validation_fraction),
+        }
+        masks["train"] = ~(masks["test"] | masks["validation"])
+
+        train = features.loc[masks["train"]]
+        if len(train):
+            scaler.partial_fit(train)
+        for split in SPLITS:
+            mask = masks[split]
+            if not mask.any():
+                continue
+            path = cache_dir / f"{split}_{index:05d}.npz"
+            np.savez(path, X=features.loc[mask].to_numpy(dtype=np.float32), y=y[mask])
+            shards[split].append(path)
+            counts[split] += int(mask.sum())
+            counts[f"{split}_positive"] += int(y[mask].sum())
+
+        rows = sum(counts[split] for split in SPLITS)
+        print(f"  … {rows:,} rows ({rows / (time.perf_counter() - start):,.0f} rows/s)", end="\r")
+    print()
+    return shards, scaler, counts
+
+
+def train_booster(train_shards: List[Path], validation_shards: List[Path], scaler: FlatScaler,
+                  feature_names: List[str], params: Dict, rounds: int, cache_dir: Path) -> xgb.Booster:
+    """
+    Pass 2: boost on external-memory DMatrix objects built from the shards
+
+    The validation shards drive early stopping; the test shards are not
+    touched here. The DMatrix page caches live in cache_dir and are released
+    on return.
+    """
+    dtrain = xgb.DMatrix(ShardIterator(train_shards, scaler, feature_names, str(cache_dir / "train")))
+    dvalid = xgb.DMatrix(ShardIterator(validation_shards, scaler, feature_names, str(cache_dir / "validation")))
+    booster = xgb.train(params, dtrain, num_boost_round=rounds, evals=[(dvalid, "validation")],
+                        early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose_eval=False,
+                        callbacks=[RoundTimer(rounds)])
+    # Keep only the trees up to the best round so every artifact format agrees
+    return booster[:booster.best_iteration + 1]
+
+
+def evaluate(booster: xgb.Booster, shards: List[Path], scaler: FlatScaler) -> Dict[str, float]:
+    """Metrics on the test shards, in the layout of the metadata 'performance' block"""
+    labels, proba = [], []
+    for path in shards:
+        X, y = load_shard(path)
+        labels.append(y)
+        proba.append(booster.inplace_predict(scaler.transform(X)))
+    y_true = np.concatenate(labels).astype(int)
+    y_proba = np.concatenate(proba)
+    y_pred = (y_proba > 0.5).astype(int)
+
+    tn, fp, fn, tp = confusion_matrix(y_true, y_pred, labels=[0, 1]).ravel()
+    return {
+        "accuracy": float(accuracy_score(y_true, y_pred)),
+        "f1_score": float(f1_score(y_true, y_pred, zero_division=0)),
+        "roc_auc": float(roc_auc_score(y_true, y_proba)) if 0 < y_true.sum() < len(y_true) else float("nan"),
+        "sensitivity": float(tp / (tp + fn)) if tp + fn else 0.0,
+        "specificity": float(tn / (tn + fp)) if tn + fp else 0.0,
+        "precision": float(tp / (tp + fp)) if tp + fp else 0.0,
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def save_generation(model_dir: Path, timestamp: str, booster: xgb.Booster, scaler: StandardScaler,
+                    feature_names: List[str], metadata: Dict, cache_dir: Path) -> Dict[str, Path]:
+    """Write the joblib artifacts load_models expects, then the fast formats"""
+    paths = artifact_paths(model_dir, timestamp)
+
+    # Round-trip through the native format to get an XGBClassifier like the served one
+    native = cache_dir / "model.ubj"
+    booster.save_model(native)
+    model = load_native_model(native)
+
+    importance = pd.DataFrame({"Feature": feature_names, "Importance": model.feature_importances_})
+    importance = importance.sort_values("Importance", ascending=False)
+    importance_path = model_dir / f"US_Accidents_Feature_Importance_{timestamp}.joblib"
+
+    joblib.dump(model, paths["model_joblib"])
+    joblib.dump(scaler, paths["scaler_joblib"])
+    joblib.dump(list(feature_names), paths["features_joblib"])
+    joblib.dump(metadata, paths["metadata_joblib"])
+    joblib.dump(importance, importance_path)
+
+    written = {name: paths[name] for name in ("model_joblib", "scaler_joblib", "features_joblib", "metadata_joblib")}
+    written["importance_joblib"] = importance_path
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        written.update(export_artifacts(model_dir, timestamp))
+    return written
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Train the SafeStride model out of core from the dataset CSV")
+    parser.add_argument("--csv", default="US_Accidents_March23.csv", help="Path to the US Accidents CSV")
+    parser.add_argument("--model-dir", default="MLT/ml", help="Directory the new generation is written to")
+    parser.add_argument("--features", default=DEFAULT_FEATURES, help="JSON feature list (column order)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk / shard")
+    parser.add_argument("--max-rows", type=int, default=None, help="Only use the first N rows")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="Boosting rounds")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="XGBoost threads")
+    parser.add_argument("--severity-threshold", type=int, default=SEVERITY_THRESHOLD,
+                        help="Severity at or above which an accident is High Risk")
+    parser.add_argument("--test-fraction", type=float, default=TEST_FRACTION, help="Held-out test fraction")
+    parser.add_argument("--validation-fraction", type=float, default=VALIDATION_FRACTION,
+                        help="Fraction used for early stopping, separate from the test rows")
+    parser.add_argument("--cache-dir", default=None, help="Directory for shards and XGBoost pages")
+    parser.add_argument("--keep-cache", action="store_true", help="Keep the shard cache after training")
+    args = parser.parse_args()
+
+    model_dir = Path(args.model_dir)
+    feature_names = list(load_json(Path(args.features)))
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    cache_dir = Path(tempfile.mkdtemp(prefix="safestride-train-", dir=args.cache_dir))
+
+    print("=" * 60)
+    print("SafeStride Out-of-Core Training")
+    print("=" * 60)
+    print(f"  Generation {timestamp}, cache {cache_dir}")
+
+    try:
+        # Pass 1: features
+        start = time.perf_counter()
+        shards, scaler, counts = write_shards(
+            args.csv, feature_names, cache_dir, args.chunk_size, args.max_rows,
+            args.severity_threshold, args.test_fraction, args.validation_fraction)
+        feature_s = time.perf_counter() - start
+        if not all(counts[split] for split in SPLITS) or not counts["train_positive"]:
+            print("✗ FAILURE: Not enough rows (or no High Risk rows) to train on")
+            return 1
+        print(f"  ✓ Wrote {' / '.join(f'{len(shards[split])} {split}' for split in SPLITS)} shards: "
+              f"{' / '.join(f'{counts[split]:,}' for split in SPLITS)} rows ({feature_s:.1f}s)")
+
+        # Pass 2: external-memory training
+        flat_scaler = FlatScaler.from_sklearn(scaler)
+        params = {
+            **DEFAULT_PARAMS,
+            "nthread": args.threads,
+            "scale_pos_weight": (counts["train"] - counts["train_positive"]) / counts["train_positive"],
+        }
+
+        start = time.perf_counter()
+        booster = train_booster(shards["train"], shards["validation"], flat_scaler, feature_names, params,
+                                args.rounds, cache_dir)
+        train_s = time.perf_counter() - start
+        n_trees = booster.num_boosted_rounds()
+        print(f"  ✓ Trained {n_trees} trees ({train_s:.1f}s)")
+
+        performance = evaluate(booster, shards["test"], flat_scaler)
+        print(f"  ✓ Test accuracy {performance['accuracy']:.4f}, F1 {performance['f1_score']:.4f}, "
+              f"ROC-AUC {performance['roc_auc']:.4f}")
+
+        metadata = {
+            "model_version": "1.0",
+            "training_date": time.strftime("%Y-%m-%d %H:%M:%S", time.strptime(timestamp, "%Y%m%d_%H%M%S")),
+            "dataset": "US Accidents (2016-2023)",
+            "model_type": "XGBoost Binary Classifier",
+            "prediction_task": "Accident Risk Prediction (Low/High)",
+            "n_samples_train": counts["train"],
+            "n_samples_validation": counts["validation"],
+            "n_samples_test": counts["test"],
+            "n_features": len(feature_names),
+            "feature_names": feature_names,
+            "performance": performance,
+            "class_mapping": CLASS_MAPPING,
+            "training": {
+                "source": Path(args.csv).name,
+                "severity_threshold": args.severity_threshold,
+                "params": params,
+                "n_trees": n_trees,
+                "early_stopping_split": "validation",
+                "feature_seconds": round(feature_s, 1),
+                "train_seconds": round(train_s, 1),
+                "peak_rss_mb": peak_rss_mb(),
+            },
+        }
+
+        written = save_generation(model_dir, timestamp, booster, scaler, feature_names, metadata, cache_dir)
+        for path in written.values():
+            print(f"  ✓ Wrote {path} ({path.stat().st_size / 1024:.1f} KB)")
+        print(f"  ✓ Peak RSS {metadata['training']['peak_rss_mb']} MB")
+        print()
+        print(f"Serve it with SafeStridePredictor(timestamp=\"{timestamp}\")")
+        return 0
+    finally:
+        if not args.keep_cache:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+"""
+SafeStride Admission Control - load shedding for the prediction routes
+
+Prediction handlers run in the threadpool, so without a limit every request
+that arrives is started at once and all of them slow down together until
+clients time out. This middleware keeps the excess queued in front of the
+handlers where it can be ordered and bounded:
+
+- per-client token buckets (keyed by X-Client-Id, else the peer address);
+  exhausted clients get 429 with Retry-After
+- a global in-flight limit (SAFESTRIDE_MAX_IN_FLIGHT) with a separate cap on
+  concurrent batch requests
+- two priority classes: queued /api/predict requests are always dispatched
+  before queued /api/batch-predict (and /api/counterfactuals) requests
+- early 503 with Retry-After when the estimated queueing delay (work queued
+  ahead / slots, from moving averages of service time) exceeds the class
+  SLO, or when a queued request waits past it
+- with the approximate fallback enabled (SAFESTRIDE_APPROX_FALLBACK and a
+  lookup surrogate loaded), /api/predict requests that would be shed are
+  answered from the surrogate instead, without taking a slot; other routes
+  cannot answer approximately and are still shed
+- the arrival time is kept in the request state, so latency budgets
+  (models/latency_budget.py) count the time spent queued here
+
+Other routes are never queued.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv("SAFESTRIDE_ADMISSION_ENABLED", "1") == "1"
+# Inference capacity: one request per core, and at least two so an interactive
+# request never waits for a whole batch to finish
+MAX_IN_FLIGHT = int(os.getenv("SAFESTRIDE_MAX_IN_FLIGHT", str(max(2, os.cpu_count() or 1))))
+MAX_BATCH_IN_FLIGHT = int(os.getenv("SAFESTRIDE_MAX_BATCH_IN_FLIGHT", str(max(1, MAX_IN_FLIGHT // 2))))
+QUEUE_SLO_MS = float(os.getenv("SAFESTRIDE_QUEUE_SLO_MS", "250"))
+BATCH_QUEUE_SLO_MS = float(os.getenv("SAFESTRIDE_BATCH_QUEUE_SLO_MS", "1000"))
+CLIENT_RATE = float(os.getenv("SAFESTRIDE_CLIENT_RATE", "50"))
+CLIENT_BURST = float(os.getenv("SAFESTRIDE_CLIENT_BURST", "100"))
+APPROX_FALLBACK = os.getenv("SAFESTRIDE_APPROX_FALLBACK", "0") == "1"
+
+MAX_TRACKED_CLIENTS = 10000
+SERVICE_TIME_ALPHA = 0.2
+CLIENT_ID_HEADER = b"x-client-id"
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITY_ROUTES = {
+    "/api/predict": INTERACTIVE,
+    "/api/batch-predict": BATCH,
+    "/api/counterfactuals": BATCH,
+    "/api/models/predict": INTERACTIVE,
+    "/api/models/batch-predict": BATCH,
+}
+# Routes that answer from the lookup surrogate when request.state.approximate is set
+DEGRADABLE_ROUTES = {"/api/predict"}
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate` tokens per second"""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float, rate: float, burst: float) -> float:
+        """Take one token; returns 0 on success, else seconds until one is available"""
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / rate
+
+
+class AdmissionController:
+    """Slot accounting, priority queues and queueing-delay estimates (event loop only)"""
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT, max_batch_in_flight: int = MAX_BATCH_IN_FLIGHT,
+                 slo_ms: float = QUEUE_SLO_MS, batch_slo_ms: float = BATCH_QUEUE_SLO_MS,
+                 client_rate: float = CLIENT_RATE, client_burst: float = CLIENT_BURST):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_batch_in_flight = max(1, min(max_batch_in_flight, self.max_in_flight))
+        self.slo_ms = {INTERACTIVE: slo_ms, BATCH: batch_slo_ms}
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        # Enabled at startup once the lookup surrogate is loaded
+        self.approximate_fallback = False
+        self.in_flight = {INTERACTIVE: 0, BATCH: 0}
+        self.queues = {INTERACTIVE: deque(), BATCH: deque()}
+        self.service_ms = {INTERACTIVE: 0.0, BATCH: 0.0}
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.counters = {
+            "admitted": 0, "queued": 0, "shed_estimate": 0, "shed_timeout": 0, "rate_limited": 0, "degraded": 0,
+        }
+
+    def check_client(self, client: str, now: float) -> float:
+        """Charge one request to the client; returns seconds to wait if over its rate"""
+        if self.client_rate <= 0:
+            return 0.0
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.client_burst, now)
+            if len(self._buckets) > MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        wait = bucket.take(now, self.client_rate, self.client_burst)
+        if wait > 0:
+            self.counters["rate_limited"] += 1
+        return wait
+
+    def _has_slot(self, priority: str) -> bool:
+        if sum(self.in_flight.values()) >= self.max_in_flight:
+            return False
+        if priority == BATCH:
+            return self.in_flight[BATCH] < self.max_batch_in_flight and not self.queues[INTERACTIVE]
+        return True
+
+    def estimate_wait_ms(self, priority: str) -> float:
+        """Work queued ahead of a new request of this class, spread over the slots"""
+        if self._has_slot(priority) and not self.queues[priority]:
+            return 0.0
+        # Requests in service are on average half done
+        work = sum(self.in_flight[p] * self.service_ms[p] / 2 for p in self.in_flight)
+        work += (len(self.queues[INTERACTIVE]) + (priority == INTERACTIVE)) * self.service_ms[INTERACTIVE]
+        if priority == BATCH:
+            work += (len(self.queues[BATCH]) + 1) * self.service_ms[BATCH]
+        return work / self.max_in_flight
+
+    async def acquire(self, priority: str) -> Optional[float]:
+        """
+        Wait for a slot
+
+        Returns:
+            None once a slot is held, else the Retry-After delay in seconds
+        """
+        if self._has_slot(priority) and not self.queues[priority]:
+            self._start(priority)
+            return None
+
+        slo_ms = self.slo_ms[priority]
+        estimate_ms = self.estimate_wait_ms(priority)
+        if estimate_ms > slo_ms:
+            self.counters["shed_estimate"] += 1
+            return _retry_after(estimate_ms)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.queues[priority].append(waiter)
+        self.counters["queued"] += 1
+        try:
+            await asyncio.wait_for(waiter, timeout=slo_ms / 1000)
+        except asyncio.TimeoutError:
+            self._discard(priority, waiter)
+            self._dispatch()
+            self.counters["shed_timeout"] += 1
+            return _retry_after(self.estimate_wait_ms(priority))
+        except asyncio.CancelledError:
+            # Client went away; hand back a slot granted in the meantime
+            if waiter.done() and not waiter.cancelled():
+                self.release(priority, None)
+            else:
+                self._discard(priority, waiter)
+                self._dispatch()
+            raise
+        return None
+
+    def release(self, priority: str, service_ms: Optional[float]):
+        """Free a slot, update the service-time average and dispatch waiters"""
+        self.in_flight[priority] -= 1
+        if service_ms is not None:
+            previous = self.service_ms[priority]
+            self.service_ms[priority] = service_ms if previous == 0 else (
+                previous + SERVICE_TIME_ALPHA * (service_ms - previous))
+        self._dispatch()
+
+    def _start(self, priority: str):
+        self.in_flight[priority] += 1
+        self.counters["admitted"] += 1
+
+    def _discard(self, priority: str, waiter: asyncio.Future):
+        try:
+            self.queues[priority].remove(waiter)
+        except ValueError:
+            pass
+
+    def _dispatch(self):
+        """Grant free slots to queued requests, interactive first"""
+        for priority in (INTERACTIVE, BATCH):
+            queue = self.queues[priority]
+            while queue and self._has_slot(priority):
+                waiter = queue.popleft()
+                if waiter.done():
+                    continue
+                self._start(priority)
+                waiter.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": ADMISSION_ENABLED,
+            "max_in_flight": self.max_in_flight,
+            "max_batch_in_flight": self.max_batch_in_flight,
+            "in_flight": dict(self.in_flight),
+            "queue_length": {p: len(q) for p, q in self.queues.items()},
+            "queue_slo_ms": dict(self.slo_ms),
+            "estimated_wait_ms": {p: round(self.estimate_wait_ms(p), 2) for p in self.queues},
+            "service_time_ms": {p: round(v, 2) for p, v in self.service_ms.items()},
+            "client_rate": self.client_rate,
+            "client_burst": self.client_burst,
+            "approximate_fallback": self.approximate_fallback,
+            "tracked_clients": len(self._buckets),
+            **self.counters,
+        }
+
+
+def _retry_after(wait_ms: float) -> float:
+    return max(1.0, math.ceil(wait_ms / 1000))
+
+
+def _client_key(scope) -> str:
+    for name, value in scope.get("headers", []):
+        if name == CLIENT_ID_HEADER:
+            return value.decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def _send_rejection(send, status: int, retry_after: float, detail: str):
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(int(retry_after)).encode("latin-1")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying admission control to the prediction routes"""
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = controller or admission_controller
+
+    async def __call__(self, scope, receive, send):
+        priority = PRIORITY_ROUTES.get(scope.get("path")) if scope["type"] == "http" else None
+        if priority is None or scope.get("method") != "POST" or not ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controller
+        scope.setdefault("state", {})["arrived"] = time.perf_counter()
+        wait_s = controller.check_client(_client_key(scope), time.monotonic())
+        if wait_s > 0:
+            await _send_rejection(send, 429, math.ceil(wait_s), "Client request rate exceeded")
+            return
+
+        retry_after = await controller.acquire(priority)
+        if retry_after is not None and scope["path"] in DEGRADABLE_ROUTES and controller.approximate_fallback:
+            # Degrade instead of shedding: the route answers from the lookup table
+            controller.counters["degraded"] += 1
+            scope["state"]["approximate"] = True
+            await self.app(scope, receive, send)
+            return
+        if retry_after is not None:
+            logger.debug("Shed %s request to %s (retry after %ss)", priority, scope["path"], retry_after)
+            await _send_rejection(send, 503, retry_after, "Server overloaded, retry later")
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release(priority, (time.perf_counter() - start) * 1000)
+
+
+# Global admission controller instance
+admission_controller = AdmissionController()
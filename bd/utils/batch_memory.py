@@ -0,0 +1,293 @@
+"""
+SafeStride Batch Memory Governor - memory-bounded batch routes
+
+A batch request's memory is dominated by its parsed body (the pydantic models
+cost ~20x the JSON bytes), followed by the DataFrames, result dicts, response
+models and serialized response, which used to exist for every row at once.
+This module keeps one request to /api/batch-predict or /api/models/batch-predict
+within a per-worker budget (SAFESTRIDE_BATCH_MEMORY_MB):
+
+- early rejection: BatchMemoryMiddleware estimates the request's peak from
+  its body size (Content-Length, or the bytes received for chunked uploads)
+  and answers 413 before anything is parsed when it would not fit
+- adaptive chunking: the handler scores the batch in chunks sized from the
+  budget left after parsing and the observed per-row cost of a chunk;
+  batches larger than one chunk stream their response (stream_chunks), which
+  ends with "complete": false, the error and the rows completed when a chunk
+  fails after the headers were sent
+- peak RSS tracking: RSS is sampled when parsing ends and around every chunk;
+  each request's peak growth refines both estimates and is reported at
+  /api/batch-memory
+
+Estimates start from measured defaults, rise immediately when a request or
+chunk is observed to cost more, and relax back toward the defaults (never
+below). RSS comes from psutil when installed, else /proc/self/statm (Linux);
+without either the defaults are used as they are.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    import psutil
+    _PROCESS = psutil.Process()
+except ImportError:
+    _PROCESS = None
+
+logger = logging.getLogger(__name__)
+
+BATCH_MEMORY_MB = float(os.getenv("SAFESTRIDE_BATCH_MEMORY_MB", "512"))
+BATCH_ROUTES = ("/api/batch-predict", "/api/models/batch-predict")
+
+# Defaults measured on the 43-feature model; observations can only raise them
+BODY_EXPANSION = 24.0      # peak RSS growth per request-body byte
+ROW_BYTES = 2048.0         # transient bytes per row while a chunk is scored
+BODY_BYTES_PER_ROW = 450.0  # JSON bytes per input row
+ESTIMATE_DECAY = 0.95      # how fast a raised estimate relaxes toward the default
+MIN_CHUNK_ROWS = 256
+MAX_CHUNK_ROWS = 20_000
+MIN_OBSERVED_BODY_BYTES = 1 << 20  # smaller requests are too noisy to learn from
+RECENT_REQUESTS = 20
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes (None if unavailable)"""
+    if _PROCESS is not None:
+        return _PROCESS.memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+RSS_SOURCE = "psutil" if _PROCESS is not None else ("procfs" if current_rss() is not None else None)
+
+
+def _raise_estimate(current: float, default: float, observed: float) -> float:
+    """High-water estimate: jump up to costlier observations, relax toward the default"""
+    return max(observed, default + (current - default) * ESTIMATE_DECAY)
+
+
+class BatchMemoryTracker:
+    """RSS samples and chunk sizes for one batch request"""
+
+    def __init__(self, body_bytes: int):
+        self.body_bytes = body_bytes
+        self.started = time.perf_counter()
+        self.start_rss = current_rss()
+        self.peak_rss = self.start_rss
+        self.rows = 0
+        self.chunk_rows = []
+        self.streamed = False
+
+    def sample(self) -> Optional[int]:
+        rss = current_rss()
+        if rss is not None and self.peak_rss is not None:
+            self.peak_rss = max(self.peak_rss, rss)
+        return rss
+
+    def growth(self, rss: Optional[int] = None) -> Optional[int]:
+        """RSS growth since the request started (default: at the peak)"""
+        if self.start_rss is None:
+            return None
+        return max((self.peak_rss if rss is None else rss) - self.start_rss, 0)
+
+
+class BatchMemoryGovernor:
+    """Per-worker batch memory budget, cost estimates and request history"""
+
+    def __init__(self, budget_mb: float = BATCH_MEMORY_MB):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.body_expansion = BODY_EXPANSION
+        self.row_bytes = ROW_BYTES
+        self.body_bytes_per_row = BODY_BYTES_PER_ROW
+        self._lock = threading.Lock()
+        self.recent = deque(maxlen=RECENT_REQUESTS)
+        self.counters = {"requests": 0, "rejected": 0, "rows": 0, "chunks": 0, "streamed": 0}
+
+    def max_body_bytes(self) -> int:
+        return int(self.budget_bytes / self.body_expansion)
+
+    def max_rows(self) -> int:
+        return int(self.max_body_bytes() / self.body_bytes_per_row)
+
+    def reject(self, body_bytes: int) -> str:
+        """Count a rejected request and explain the limit"""
+        with self._lock:
+            self.counters["rejected"] += 1
+        return (f"Batch request of {body_bytes / 1024 ** 2:.1f} MB would need about "
+                f"{body_bytes * self.body_expansion / 1024 ** 2:.0f} MB, over the "
+                f"{self.budget_bytes / 1024 ** 2:.0f} MB batch memory budget; split it into requests under "
+                f"{self.max_body_bytes() / 1024 ** 2:.1f} MB (about {self.max_rows():,} rows)")
+
+    def chunk_rows(self, tracker: BatchMemoryTracker) -> int:
+        """Rows for the next chunk, from the budget left after what the request already holds"""
+        held = tracker.growth(tracker.sample()) or 0
+        available = max(self.budget_bytes - held, 0)
+        return min(max(int(available / self.row_bytes), MIN_CHUNK_ROWS), MAX_CHUNK_ROWS)
+
+    def observe_chunk(self, tracker: BatchMemoryTracker, rows: int, rss_before: Optional[int]):
+        """Refine the per-row cost from the RSS growth across one scored chunk"""
+        rss_after = tracker.sample()
+        tracker.rows += rows
+        tracker.chunk_rows.append(rows)
+        if rows >= MIN_CHUNK_ROWS and rss_before is not None and rss_after is not None:
+            with self._lock:
+                self.row_bytes = _raise_estimate(self.row_bytes, ROW_BYTES, max(rss_after - rss_before, 0) / rows)
+
+    def finish(self, tracker: BatchMemoryTracker):
+        """Record a completed request and refine the body expansion estimate"""
+        tracker.sample()
+        growth = tracker.growth()
+        with self._lock:
+            self.counters["requests"] += 1
+            self.counters["rows"] += tracker.rows
+            self.counters["chunks"] += len(tracker.chunk_rows)
+            self.counters["streamed"] += int(tracker.streamed)
+            if growth is not None and tracker.rows and tracker.body_bytes >= MIN_OBSERVED_BODY_BYTES:
+                self.body_expansion = _raise_estimate(self.body_expansion, BODY_EXPANSION,
+                                                      growth / tracker.body_bytes)
+                self.body_bytes_per_row = tracker.body_bytes / tracker.rows
+            self.recent.append({
+                "rows": tracker.rows,
+                "body_kb": round(tracker.body_bytes / 1024, 1),
+                "chunks": len(tracker.chunk_rows),
+                "max_chunk_rows": max(tracker.chunk_rows, default=0),
+                "streamed": tracker.streamed,
+                "peak_rss_growth_mb": None if growth is None else round(growth / 1024 ** 2, 1),
+                "duration_ms": round((time.perf_counter() - tracker.started) * 1000, 1),
+            })
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "budget_mb": round(self.budget_bytes / 1024 ** 2, 1),
+                "rss_source": RSS_SOURCE,
+                "rss_mb": None if current_rss() is None else round(current_rss() / 1024 ** 2, 1),
+                "max_body_mb": round(self.max_body_bytes() / 1024 ** 2, 2),
+                "max_rows": self.max_rows(),
+                "body_expansion": round(self.body_expansion, 2),
+                "row_bytes": round(self.row_bytes, 1),
+                **self.counters,
+                "recent": list(self.recent),
+            }
+
+
+def stream_chunks(score: Callable[[int, int], List[Dict[str, Any]]], total: int, tracker: BatchMemoryTracker,
+                  governor: BatchMemoryGovernor,
+                  summary: Callable[[], Dict[str, Any]] = dict) -> Iterator[str]:
+    """
+    Score a batch chunk by chunk, yielding its JSON response
+
+    Args:
+        score: Results of rows [start, end)
+        total: Rows in the batch
+        tracker, governor: Size each chunk from the budget left and record its cost
+        summary: Extra top-level fields, called once the results are written
+
+    The document is {"results": [...], "total_predictions", "complete", ...}.
+    Headers are already sent when a chunk fails, so it is then closed with
+    "complete": false, "completed_rows" and "error" rather than cut off.
+
+    Returns:
+        Rows completed (the generator's return value)
+    """
+    yield '{"results":['
+    position = 0
+    error = None
+    try:
+        while position < total:
+            end = min(position + governor.chunk_rows(tracker), total)
+            rss_before = tracker.sample()
+            results = score(position, end)
+            governor.observe_chunk(tracker, len(results), rss_before)
+            body = ",".join(json.dumps(result) for result in results)
+            yield body if position == 0 else "," + body
+            position = end
+    except Exception as e:
+        logger.error(f"Batch prediction error after {position} of {total} rows: {str(e)}")
+        error = str(e)
+    tail = {"total_predictions": total, "complete": error is None, **summary()}
+    if error is not None:
+        tail.update(completed_rows=position, error=error)
+    yield "]," + json.dumps(tail)[1:]
+    return position
+
+
+def _content_length(scope) -> Optional[int]:
+    for name, value in scope.get("headers", []):
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+async def _send_error(send, status: int, detail: str):
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class BatchMemoryMiddleware:
+    """ASGI middleware that rejects oversized batches before parsing and tracks the rest"""
+
+    def __init__(self, app, governor: Optional[BatchMemoryGovernor] = None):
+        self.app = app
+        self.governor = governor or batch_memory
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") not in BATCH_ROUTES or scope.get("method") != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        governor = self.governor
+        limit = governor.max_body_bytes()
+        body_bytes = _content_length(scope)
+        if body_bytes is None:
+            # Chunked upload: buffer up to the limit, then replay it to the app
+            messages, body_bytes = [], 0
+            while True:
+                message = await receive()
+                messages.append(message)
+                body_bytes += len(message.get("body", b""))
+                if body_bytes > limit or not message.get("more_body", False):
+                    break
+            pending = iter(messages)
+            receive_more = receive
+
+            async def receive():
+                # Replay the buffered body, then hand over to the server (e.g. a real disconnect)
+                message = next(pending, None)
+                return message if message is not None else await receive_more()
+
+        if body_bytes > limit:
+            await _send_error(send, 413, governor.reject(body_bytes))
+            return
+
+        tracker = BatchMemoryTracker(body_bytes)
+        scope.setdefault("state", {})["batch_memory"] = tracker
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            governor.finish(tracker)
+
+
+# Global batch memory governor instance
+batch_memory = BatchMemoryGovernor()
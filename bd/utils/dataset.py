@@ -0,0 +1,270 @@
+"""
+SafeStride Dataset Utilities - US Accidents (2016 - 2023)
+
+Streams US_Accidents_March23.csv (~3 GB, 46 columns; see
+us-accidents-metadata.json) in fixed-size chunks, and converts raw dataset
+rows into the API input format consumed by FeaturePreprocessor, so offline
+jobs share the serving feature logic.
+
+The CSV can be converted once (convert_dataset.py) into a Parquet dataset
+partitioned by State and Year, with typed columns and dictionary-encoded
+categoricals. iter_dataset_chunks accepts either path, and on Parquet reads
+only the requested columns; load_parquet / iter_parquet_batches also prune by
+partition. Parquet support needs pyarrow (in requirements.txt; imported only
+when a Parquet dataset is used, so the API server never loads it).
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+DEFAULT_CSV_PATH = "US_Accidents_March23.csv"
+DEFAULT_PARQUET_PATH = "US_Accidents_March23.parquet"
+DEFAULT_CHUNK_SIZE = 200_000
+
+# Raw dataset columns needed to build the 43 model features
+MODEL_INPUT_COLUMNS = [
+    'Start_Time', 'Start_Lat', 'Start_Lng', 'Distance(mi)',
+    'Temperature(F)', 'Humidity(%)', 'Pressure(in)', 'Visibility(mi)',
+    'Wind_Speed(mph)', 'Precipitation(in)', 'Weather_Condition',
+    'Crossing', 'Junction', 'Traffic_Signal', 'Stop',
+    'City', 'State', 'Street', 'Sunrise_Sunset',
+]
+
+# Compact dtypes for the columns read from the CSV
+COLUMN_DTYPES: Dict[str, str] = {
+    'Severity': 'int8',
+    'Start_Lat': 'float64', 'Start_Lng': 'float64', 'Distance(mi)': 'float32',
+    'Temperature(F)': 'float32', 'Humidity(%)': 'float32', 'Pressure(in)': 'float32',
+    'Visibility(mi)': 'float32', 'Wind_Speed(mph)': 'float32', 'Precipitation(in)': 'float32',
+    'Weather_Condition': 'category', 'City': 'category', 'State': 'category',
+    'Street': 'string', 'Sunrise_Sunset': 'category',
+    'Crossing': 'bool', 'Junction': 'bool', 'Traffic_Signal': 'bool', 'Stop': 'bool',
+}
+
+
+# Parquet layout: Hive-style State=<code>/Year=<yyyy>/ directories
+PARTITION_COLUMNS = ['State', 'Year']
+# Column types of the Parquet dataset (pyarrow type aliases), in CSV order plus Year
+PARQUET_TYPES: Dict[str, str] = {
+    'ID': 'string', 'Source': 'string', 'Severity': 'int8',
+    'Start_Time': 'timestamp[ns]', 'End_Time': 'timestamp[ns]',
+    'Start_Lat': 'double', 'Start_Lng': 'double', 'End_Lat': 'double', 'End_Lng': 'double',
+    'Distance(mi)': 'float', 'Description': 'string', 'Street': 'string',
+    'City': 'string', 'County': 'string', 'State': 'string', 'Zipcode': 'string',
+    'Country': 'string', 'Timezone': 'string', 'Airport_Code': 'string',
+    'Weather_Timestamp': 'timestamp[ns]',
+    'Temperature(F)': 'float', 'Wind_Chill(F)': 'float', 'Humidity(%)': 'float',
+    'Pressure(in)': 'float', 'Visibility(mi)': 'float', 'Wind_Direction': 'string',
+    'Wind_Speed(mph)': 'float', 'Precipitation(in)': 'float', 'Weather_Condition': 'string',
+    'Amenity': 'bool', 'Bump': 'bool', 'Crossing': 'bool', 'Give_Way': 'bool',
+    'Junction': 'bool', 'No_Exit': 'bool', 'Railway': 'bool', 'Roundabout': 'bool',
+    'Station': 'bool', 'Stop': 'bool', 'Traffic_Calming': 'bool', 'Traffic_Signal': 'bool',
+    'Turning_Loop': 'bool',
+    'Sunrise_Sunset': 'string', 'Civil_Twilight': 'string', 'Nautical_Twilight': 'string',
+    'Astronomical_Twilight': 'string',
+    'Year': 'int16',
+}
+# Low-cardinality text columns, read back as dictionary arrays (pandas category)
+CATEGORICAL_COLUMNS = [
+    'Source', 'City', 'County', 'State', 'Country', 'Timezone', 'Airport_Code',
+    'Wind_Direction', 'Weather_Condition', 'Sunrise_Sunset', 'Civil_Twilight',
+    'Nautical_Twilight', 'Astronomical_Twilight',
+]
+TIMESTAMP_COLUMNS = ['Start_Time', 'End_Time', 'Weather_Timestamp']
+# Row groups per partition file; small partitions are buffered up to the minimum
+MIN_ROWS_PER_GROUP = 8_192
+MAX_ROWS_PER_GROUP = 131_072
+
+
+def iter_dataset_chunks(csv_path: str = DEFAULT_CSV_PATH, columns: Optional[List[str]] = None,
+                        chunk_size: int = DEFAULT_CHUNK_SIZE, max_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    Yield the dataset in chunks, reading only the requested columns
+
+    Args:
+        csv_path: Path to US_Accidents_March23.csv, or to the Parquet dataset
+            directory written by convert_dataset.py
+        columns: Columns to read (default: MODEL_INPUT_COLUMNS)
+        chunk_size: Rows per chunk
+        max_rows: Stop after this many rows (None = whole file)
+    """
+    columns = columns or MODEL_INPUT_COLUMNS
+    if not Path(csv_path).exists():
+        raise FileNotFoundError(f"Dataset not found: {csv_path}")
+    if Path(csv_path).is_dir():
+        yield from iter_parquet_batches(csv_path, columns, batch_size=chunk_size, max_rows=max_rows)
+        return
+
+    dtypes = {col: dtype for col, dtype in COLUMN_DTYPES.items() if col in columns}
+    reader = pd.read_csv(csv_path, usecols=columns, dtype=dtypes, chunksize=chunk_size, nrows=max_rows)
+    for chunk in reader:
+        yield chunk
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+    except ImportError:
+        raise ImportError("Parquet dataset support requires pyarrow (pip install -r requirements.txt)")
+    return pyarrow
+
+
+def _partitioning(pa):
+    schema = pa.schema([(name, pa.type_for_alias(PARQUET_TYPES[name])) for name in PARTITION_COLUMNS])
+    return pa.dataset.partitioning(schema, flavor="hive")
+
+
+def _open_parquet(parquet_dir: str, memory_map: bool):
+    pa = _pyarrow()
+    from pyarrow import fs
+
+    file_format = pa.dataset.ParquetFileFormat(
+        read_options=pa.dataset.ParquetReadOptions(dictionary_columns=CATEGORICAL_COLUMNS))
+    return pa, pa.dataset.dataset(parquet_dir, format=file_format, partitioning=_partitioning(pa),
+                                  filesystem=fs.LocalFileSystem(use_mmap=memory_map))
+
+
+def _partition_filter(pa, states: Optional[List[str]], years: Optional[List[int]]):
+    condition = None
+    if states is not None:
+        condition = pa.dataset.field('State').isin(list(states))
+    if years is not None:
+        year_condition = pa.dataset.field('Year').isin([int(year) for year in years])
+        condition = year_condition if condition is None else condition & year_condition
+    return condition
+
+
+def _to_pandas(table) -> pd.DataFrame:
+    df = table.to_pandas()
+    if 'State' in df.columns:
+        df['State'] = df['State'].astype('category')
+    return df
+
+
+def iter_parquet_batches(parquet_dir: str = DEFAULT_PARQUET_PATH, columns: Optional[List[str]] = None,
+                         states: Optional[List[str]] = None, years: Optional[List[int]] = None,
+                         batch_size: int = DEFAULT_CHUNK_SIZE, max_rows: Optional[int] = None,
+                         memory_map: bool = False) -> Iterator[pd.DataFrame]:
+    """
+    Yield the Parquet dataset in chunks of up to batch_size rows
+
+    Only the requested columns are decoded and only the partitions matching
+    states / years are opened.
+
+    Args:
+        parquet_dir: Directory written by convert_dataset.py
+        columns: Columns to read (default: MODEL_INPUT_COLUMNS)
+        states: State codes to read (None = all)
+        years: Years to read (None = all)
+        batch_size: Rows per chunk
+        max_rows: Stop after this many rows (None = all)
+        memory_map: Memory-map the files instead of reading them
+    """
+    pa, dataset = _open_parquet(parquet_dir, memory_map)
+    scanner = dataset.scanner(columns=columns or MODEL_INPUT_COLUMNS, filter=_partition_filter(pa, states, years),
+                              batch_size=batch_size)
+    pending, pending_rows, total = [], 0, 0
+    for batch in scanner.to_batches():
+        if max_rows is not None:
+            batch = batch.slice(0, max_rows - total)
+        if batch.num_rows == 0:
+            continue
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        total += batch.num_rows
+        # Partition files are small; regroup their batches into full chunks
+        if pending_rows >= batch_size:
+            yield _to_pandas(pa.Table.from_batches(pending))
+            pending, pending_rows = [], 0
+        if max_rows is not None and total >= max_rows:
+            break
+    if pending:
+        yield _to_pandas(pa.Table.from_batches(pending))
+
+
+def load_parquet(parquet_dir: str = DEFAULT_PARQUET_PATH, columns: Optional[List[str]] = None,
+                 states: Optional[List[str]] = None, years: Optional[List[int]] = None,
+                 memory_map: bool = False) -> pd.DataFrame:
+    """
+    Read the selected columns and partitions of the Parquet dataset at once
+
+    Args:
+        parquet_dir: Directory written by convert_dataset.py
+        columns: Columns to read (default: MODEL_INPUT_COLUMNS)
+        states: State codes to read (None = all)
+        years: Years to read (None = all)
+        memory_map: Memory-map the files instead of reading them
+    """
+    pa, dataset = _open_parquet(parquet_dir, memory_map)
+    return _to_pandas(dataset.to_table(columns=columns or MODEL_INPUT_COLUMNS,
+                                       filter=_partition_filter(pa, states, years)))
+
+
+def convert_to_parquet(csv_path: str = DEFAULT_CSV_PATH, parquet_dir: str = DEFAULT_PARQUET_PATH,
+                       chunk_size: int = DEFAULT_CHUNK_SIZE, max_rows: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Write the CSV as a Parquet dataset partitioned by State and Year
+
+    Streams the CSV in chunks; timestamps, numbers and flags are stored typed
+    (PARQUET_TYPES), text columns dictionary-encoded, zstd-compressed. An
+    existing dataset at parquet_dir is replaced.
+
+    Returns:
+        Row count and output directory
+    """
+    pa = _pyarrow()
+    if not Path(csv_path).exists():
+        raise FileNotFoundError(f"Dataset not found: {csv_path}")
+
+    schema = pa.schema([(name, pa.type_for_alias(alias)) for name, alias in PARQUET_TYPES.items()])
+    csv_columns = [name for name in PARQUET_TYPES if name != 'Year']
+    read_dtypes = {name: dtype for name, dtype in COLUMN_DTYPES.items() if dtype not in ('category', 'string')}
+    rows = {"count": 0}
+
+    def batches():
+        reader = pd.read_csv(csv_path, usecols=csv_columns, dtype=read_dtypes, chunksize=chunk_size,
+                             nrows=max_rows)
+        for chunk in reader:
+            for col in TIMESTAMP_COLUMNS:
+                chunk[col] = pd.to_datetime(chunk[col], format='mixed', errors='coerce')
+            for col in ('End_Lat', 'End_Lng'):
+                chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+            chunk['Year'] = chunk['Start_Time'].dt.year.astype('Int16')
+            rows["count"] += len(chunk)
+            yield pa.RecordBatch.from_pandas(chunk[list(PARQUET_TYPES)], schema=schema, preserve_index=False)
+
+    file_format = pa.dataset.ParquetFileFormat()
+    pa.dataset.write_dataset(
+        batches(), parquet_dir, schema=schema, format=file_format, partitioning=_partitioning(pa),
+        file_options=file_format.make_write_options(compression="zstd", use_dictionary=True),
+        existing_data_behavior="delete_matching", basename_template="part-{i}.parquet",
+        min_rows_per_group=MIN_ROWS_PER_GROUP, max_rows_per_group=MAX_ROWS_PER_GROUP,
+    )
+    return {"rows": rows["count"], "path": str(parquet_dir)}
+
+
+def to_model_inputs(chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert raw dataset rows to the API input format
+
+    Derives Hour, Day_of_Week, Month and Year from Start_Time and drops rows
+    whose timestamp cannot be parsed.
+    """
+    start_time = pd.to_datetime(chunk['Start_Time'], format='mixed', errors='coerce')
+    inputs = chunk.drop(columns=['Start_Time']).loc[start_time.notna()].copy()
+    start_time = start_time[start_time.notna()]
+
+    inputs['Hour'] = start_time.dt.hour
+    inputs['Day_of_Week'] = start_time.dt.dayofweek
+    inputs['Month'] = start_time.dt.month
+    inputs['Year'] = start_time.dt.year
+    for col in ('Crossing', 'Junction', 'Traffic_Signal', 'Stop'):
+        if col in inputs.columns:
+            inputs[col] = inputs[col].astype(int)
+    for col in ('Weather_Condition', 'City', 'State', 'Street', 'Sunrise_Sunset'):
+        if col in inputs.columns:
+            inputs[col] = inputs[col].astype(object)
+    return inputs.reset_index(drop=True)
@@ -0,0 +1,304 @@
+"""
+SafeStride Streaming Drift Monitor
+
+Tracks whether live inputs still resemble the training distribution, using
+fixed-size sketches for each of the 43 served features:
+
+- continuous features: counts over fixed bin edges plus running mean/variance
+- binary / one-hot features: count of ones (rate counter)
+
+Served feature rows are copied into a fixed-size buffer, and the sketches are
+updated with vectorized numpy operations each time the buffer fills. Memory
+use is therefore constant no matter how much traffic passes through.
+
+Drift per feature is the Population Stability Index (PSI) between the live
+bin proportions and the reference proportions (< 0.1 stable, < 0.25
+moderate, otherwise significant).
+
+Reference distributions come from (in order of preference):
+1. US_Accidents_DriftReference_*.npz written by build_drift_reference.py from
+   a streaming pass over the dataset
+2. The fitted StandardScaler: exact training rates for 0/1 features (their
+   mean; a feature whose variance is mean * (1 - mean) is treated as 0/1 too),
+   a normal approximation over whole-value bins for integer features (Hour,
+   Day_of_Week, Month, Year) and with equal-mass bins for continuous features
+
+Features the preprocessor fills with a constant at serving time
+(City_Frequency, State_Frequency) carry no signal about live traffic and are
+reported as "excluded" rather than scored.
+"""
+
+import logging
+import threading
+from pathlib import Path
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+N_BINS = 20
+BUFFER_ROWS = 1024
+PSI_EPSILON = 1e-4
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+BINARY_FEATURES = {
+    'Crossing', 'Junction', 'Traffic_Signal', 'Stop',
+    'Is_Weekend', 'Is_Rush_Hour', 'Is_Night', 'Is_Highway', 'Is_Main_Street',
+    'Night_Low_Visibility', 'Freezing_Rain',
+}
+BINARY_PREFIXES = ('Weather_Condition_', 'Sunrise_Sunset_')
+DISCRETE_FEATURES = {'Hour', 'Day_of_Week', 'Month', 'Year'}
+# Filled with a fixed default by the preprocessor, so live values never vary
+SERVING_CONSTANT_FEATURES = {'City_Frequency', 'State_Frequency'}
+
+
+def is_binary_feature(name: str) -> bool:
+    return name in BINARY_FEATURES or name.startswith(BINARY_PREFIXES)
+
+
+def _looks_binary(mean: float, scale: float) -> bool:
+    """Whether scaler statistics are those of a 0/1 feature (variance = p * (1 - p))"""
+    return 0.0 <= mean <= 1.0 and bool(np.isclose(scale ** 2, mean * (1.0 - mean), rtol=1e-3, atol=1e-9))
+
+
+def _whole_value_bins(mean: float, scale: float, z: np.ndarray):
+    """
+    Bin edges and normal-approximation proportions for an integer feature
+
+    Equal-mass edges would split single values between bins; each edge is
+    moved to the half-integer below it instead, so every bin holds whole
+    values. Unused edges are +inf (an always-empty bin).
+    """
+    edges = np.unique(np.floor(mean + scale * z) + 0.5)
+    cdf = np.array([NormalDist(mean, scale).cdf(edge) for edge in edges])
+    proportions = np.diff(np.concatenate([[0.0], cdf, [1.0]]))
+    padded_edges = np.full(N_BINS - 1, np.inf)
+    padded_edges[:len(edges)] = edges
+    padded = np.zeros(N_BINS)
+    padded[:len(proportions)] = proportions
+    return padded_edges, padded
+
+
+def reference_path(model_dir: Path, timestamp: str) -> Path:
+    return Path(model_dir) / f"US_Accidents_DriftReference_{timestamp}.npz"
+
+
+class DriftReference:
+    """
+    Reference distribution over fixed bins for every feature
+
+    For continuous features `edges` holds N_BINS - 1 interior bin edges and
+    `proportions` the expected share per bin. For binary features the edges
+    row is NaN and proportions holds [1 - rate, rate, 0, ...].
+    """
+
+    def __init__(self, feature_names: List[str], binary: np.ndarray, edges: np.ndarray,
+                 proportions: np.ndarray, mean: np.ndarray, std: np.ndarray, source: str):
+        self.feature_names = list(feature_names)
+        self.excluded = np.array([name in SERVING_CONSTANT_FEATURES for name in self.feature_names], dtype=bool)
+        self.binary = np.asarray(binary, dtype=bool)
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.proportions = np.asarray(proportions, dtype=np.float64)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        self.source = source
+
+    @classmethod
+    def from_scaler(cls, feature_names: List[str], mean: np.ndarray, scale: np.ndarray) -> "DriftReference":
+        """Derive a reference from StandardScaler statistics (no dataset needed)"""
+        n = len(feature_names)
+        binary = np.array([is_binary_feature(name) or _looks_binary(mean[j], scale[j])
+                           for j, name in enumerate(feature_names)])
+        z = np.array([NormalDist().inv_cdf(k / N_BINS) for k in range(1, N_BINS)])
+
+        edges = np.full((n, N_BINS - 1), np.nan)
+        proportions = np.zeros((n, N_BINS))
+        for j in range(n):
+            if binary[j]:
+                proportions[j, :2] = [1.0 - mean[j], mean[j]]
+            elif feature_names[j] in DISCRETE_FEATURES and scale[j] > 0:
+                edges[j], proportions[j] = _whole_value_bins(mean[j], scale[j], z)
+            else:
+                edges[j] = mean[j] + scale[j] * z
+                proportions[j] = 1.0 / N_BINS
+        return cls(feature_names, binary, edges, proportions, mean, scale, source="scaler")
+
+    @classmethod
+    def load(cls, path: Path) -> "DriftReference":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                [str(name) for name in data["feature_names"]], data["binary"], data["edges"],
+                data["proportions"], data["mean"], data["std"], source=str(data["source"]),
+            )
+
+    def save(self, path: Path):
+        np.savez(
+            path, feature_names=np.array(self.feature_names), binary=self.binary, edges=self.edges,
+            proportions=self.proportions, mean=self.mean, std=self.std, source=np.array(self.source),
+        )
+
+
+class FeatureSketch:
+    """Fixed-size running summary of a stream of feature rows"""
+
+    def __init__(self, reference: DriftReference):
+        n = len(reference.feature_names)
+        self.reference = reference
+        self.continuous = np.flatnonzero(~reference.binary)
+        self.binary = np.flatnonzero(reference.binary)
+        self.bin_counts = np.zeros((n, N_BINS), dtype=np.int64)
+        self.count = 0
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+
+    def update(self, X: np.ndarray):
+        """Fold a block of rows (n_rows, n_features) into the sketch"""
+        n_rows = X.shape[0]
+        if n_rows == 0:
+            return
+
+        for j in self.continuous:
+            bins = np.searchsorted(self.reference.edges[j], X[:, j], side="right")
+            self.bin_counts[j] += np.bincount(bins, minlength=N_BINS)
+        ones = (X[:, self.binary] > 0.5).sum(axis=0)
+        self.bin_counts[self.binary, 1] += ones
+        self.bin_counts[self.binary, 0] += n_rows - ones
+
+        # Chan et al. parallel update of running mean and variance
+        block_mean = X.mean(axis=0)
+        block_m2 = ((X - block_mean) ** 2).sum(axis=0)
+        total = self.count + n_rows
+        delta = block_mean - self.mean
+        self.mean += delta * n_rows / total
+        self.m2 += block_m2 + delta ** 2 * self.count * n_rows / total
+        self.count = total
+
+    def proportions(self) -> np.ndarray:
+        return self.bin_counts / max(self.count, 1)
+
+
+def population_stability_index(expected: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """Row-wise PSI between two sets of bin proportions"""
+    expected = np.clip(expected, PSI_EPSILON, None)
+    actual = np.clip(actual, PSI_EPSILON, None)
+    return ((actual - expected) * np.log(actual / expected)).sum(axis=1)
+
+
+class DriftMonitor:
+    """Thread-safe, constant-memory drift monitor for the served features"""
+
+    def __init__(self, buffer_rows: int = BUFFER_ROWS):
+        self.buffer_rows = buffer_rows
+        self.reference: Optional[DriftReference] = None
+        self._sketch: Optional[FeatureSketch] = None
+        self._buffer: Optional[np.ndarray] = None
+        self._buffered = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.reference is not None
+
+    def configure(self, reference: DriftReference):
+        with self._lock:
+            self.reference = reference
+            self._sketch = FeatureSketch(reference)
+            self._buffer = np.empty((self.buffer_rows, len(reference.feature_names)))
+            self._buffered = 0
+        logger.info(f"✓ Drift monitor tracking {len(reference.feature_names)} features (reference: {reference.source})")
+
+    def configure_for_model(self, model_dir: Path, timestamp: str, feature_names: List[str], scaler):
+        """Use the dataset reference if one was built, else derive one from the scaler"""
+        path = reference_path(model_dir, timestamp)
+        if path.exists():
+            reference = DriftReference.load(path)
+        else:
+            reference = DriftReference.from_scaler(feature_names, scaler.mean_, scaler.scale_)
+        self.configure(reference)
+
+    def observe(self, features) -> None:
+        """Record served feature rows (DataFrame or array in training column order)"""
+        if self._sketch is None:
+            return
+        X = np.asarray(features, dtype=np.float64)
+        with self._lock:
+            start = 0
+            while start < len(X):
+                take = min(self.buffer_rows - self._buffered, len(X) - start)
+                self._buffer[self._buffered:self._buffered + take] = X[start:start + take]
+                self._buffered += take
+                start += take
+                if self._buffered == self.buffer_rows:
+                    self._flush()
+
+    def _flush(self):
+        self._sketch.update(self._buffer[:self._buffered])
+        self._buffered = 0
+
+    def report(self, top: int = 10) -> Dict[str, Any]:
+        """Per-feature drift scores against the reference"""
+        if self._sketch is None:
+            return {"enabled": False}
+
+        with self._lock:
+            self._flush()
+            sketch = self._sketch
+            live = sketch.proportions()
+            count = sketch.count
+            live_mean = sketch.mean.copy()
+            live_std = np.sqrt(sketch.m2 / max(count - 1, 1))
+
+        reference = self.reference
+        psi = population_stability_index(reference.proportions, live) if count else np.zeros(len(live))
+
+        features = []
+        for j, name in enumerate(reference.feature_names):
+            if reference.excluded[j]:
+                status = "excluded"
+            else:
+                status = _psi_status(psi[j]) if count else "no_data"
+            entry = {
+                "feature": name,
+                "type": "binary" if reference.binary[j] else "continuous",
+                "psi": None if reference.excluded[j] else round(float(psi[j]), 4),
+                "status": status,
+                "reference_mean": round(float(reference.mean[j]), 4),
+                "live_mean": round(float(live_mean[j]), 4),
+            }
+            if not reference.binary[j]:
+                entry["reference_std"] = round(float(reference.std[j]), 4)
+                entry["live_std"] = round(float(live_std[j]), 4)
+            features.append(entry)
+
+        ranked = sorted((f for f in features if f["psi"] is not None), key=lambda f: f["psi"], reverse=True)
+        return {
+            "enabled": True,
+            "reference_source": reference.source,
+            "observations": count,
+            "summary": {
+                status: sum(1 for f in features if f["status"] == status)
+                for status in ("stable", "moderate", "significant")
+            },
+            "top_drifted": [f["feature"] for f in ranked[:top] if f["status"] in ("moderate", "significant")],
+            "features": features,
+        }
+
+    def reset(self):
+        """Start a new observation window"""
+        if self.reference is not None:
+            self.configure(self.reference)
+
+
+def _psi_status(psi: float) -> str:
+    if psi < PSI_MODERATE:
+        return "stable"
+    if psi < PSI_SIGNIFICANT:
+        return "moderate"
+    return "significant"
+
+
+# Global drift monitor instance
+drift_monitor = DriftMonitor()
@@ -0,0 +1,256 @@
+"""
+SafeStride Prediction History Store
+
+Append-only server-side audit trail of every prediction (inputs,
+probabilities, model version, latency) kept in SQLite in WAL mode.
+
+Request handlers only append to an in-memory buffer; a background task
+flushes the buffer in batches from a worker thread, so a prediction never
+waits on disk I/O. If the buffer fills up faster than it can be flushed the
+oldest pending records are dropped and counted rather than slowing requests.
+
+Settings (environment variables):
+    SAFESTRIDE_HISTORY_ENABLED         1
+    SAFESTRIDE_HISTORY_DB              data/history.db
+    SAFESTRIDE_HISTORY_FLUSH_INTERVAL  seconds between flushes (1.0)
+    SAFESTRIDE_HISTORY_BATCH_SIZE      records that trigger an early flush (500)
+    SAFESTRIDE_HISTORY_MAX_BUFFER      pending records kept before dropping (50000)
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+HISTORY_ENABLED = os.getenv("SAFESTRIDE_HISTORY_ENABLED", "1") == "1"
+HISTORY_DB = os.getenv("SAFESTRIDE_HISTORY_DB", "data/history.db")
+FLUSH_INTERVAL = float(os.getenv("SAFESTRIDE_HISTORY_FLUSH_INTERVAL", "1.0"))
+BATCH_SIZE = int(os.getenv("SAFESTRIDE_HISTORY_BATCH_SIZE", "500"))
+MAX_BUFFER = int(os.getenv("SAFESTRIDE_HISTORY_MAX_BUFFER", "50000"))
+
+# Coarse location cells are 0.1 degree (~11 km) squares
+CELL_SIZE_DEG = 0.1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts            REAL    NOT NULL,
+    endpoint      TEXT    NOT NULL,
+    state         TEXT,
+    city          TEXT,
+    lat           REAL,
+    lng           REAL,
+    lat_cell      INTEGER,
+    lng_cell      INTEGER,
+    prediction    TEXT    NOT NULL,
+    label         INTEGER NOT NULL,
+    prob_low      REAL    NOT NULL,
+    prob_high     REAL    NOT NULL,
+    model_version TEXT,
+    latency_ms    REAL,
+    inputs        TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_ts ON predictions (ts);
+CREATE INDEX IF NOT EXISTS idx_predictions_state_ts ON predictions (state, ts);
+CREATE INDEX IF NOT EXISTS idx_predictions_cell_ts ON predictions (lat_cell, lng_cell, ts);
+"""
+
+INSERT_SQL = """
+INSERT INTO predictions (ts, endpoint, state, city, lat, lng, lat_cell, lng_cell, prediction,
+                         label, prob_low, prob_high, model_version, latency_ms, inputs)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def location_cell(lat: float, lng: float) -> tuple:
+    """Coarse grid cell used for location indexing"""
+    return math.floor(lat / CELL_SIZE_DEG), math.floor(lng / CELL_SIZE_DEG)
+
+
+class PredictionHistoryStore:
+    """Buffered, batch-flushed SQLite history of served predictions"""
+
+    def __init__(self, db_path: str = HISTORY_DB, flush_interval: float = FLUSH_INTERVAL,
+                 batch_size: int = BATCH_SIZE, max_buffer: int = MAX_BUFFER, enabled: bool = HISTORY_ENABLED):
+        self.db_path = Path(db_path)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.enabled = enabled
+        self._buffer: deque = deque(maxlen=max_buffer)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+
+    def open(self):
+        """Create the database file and schema"""
+        if not self.enabled:
+            return
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        logger.info(f"✓ Prediction history store opened at {self.db_path}")
+
+    def record(self, endpoint: str, input_data: Dict[str, Any], result: Dict[str, Any],
+               model_version: Optional[str], latency_ms: float):
+        """
+        Queue one prediction for writing; never blocks on I/O
+
+        Serialization of the inputs happens later on the flush thread.
+        """
+        if not self.enabled or self._conn is None:
+            return
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append((time.time(), endpoint, input_data, result, model_version, latency_ms))
+        if self._wakeup is not None and len(self._buffer) >= self.batch_size:
+            # Handlers may run in the threadpool; asyncio.Event is loop-bound
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def start(self):
+        """Start the background flush task (call from the running event loop)"""
+        if not self.enabled or self._conn is None or self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flush task and write everything still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._conn is not None:
+            await asyncio.to_thread(self.flush)
+            self._conn.close()
+            self._conn = None
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"History flush failed: {str(e)}")
+
+    def flush(self) -> int:
+        """Write all buffered records in one transaction; returns rows written"""
+        pending = []
+        while self._buffer:
+            try:
+                pending.append(self._buffer.popleft())
+            except IndexError:
+                break
+        if not pending or self._conn is None:
+            return 0
+
+        rows = [self._to_row(*item) for item in pending]
+        with self._write_lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(INSERT_SQL, rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.written += len(rows)
+        return len(rows)
+
+    @staticmethod
+    def _to_row(ts, endpoint, input_data, result, model_version, latency_ms) -> tuple:
+        lat = input_data.get("Start_Lat")
+        lng = input_data.get("Start_Lng")
+        lat_cell, lng_cell = location_cell(lat, lng) if lat is not None and lng is not None else (None, None)
+        prob_low, prob_high = result["raw_proba"]
+        return (
+            ts, endpoint, input_data.get("State"), input_data.get("City"), lat, lng, lat_cell, lng_cell,
+            result["prediction"], result["label"], prob_low, prob_high, model_version, latency_ms,
+            json.dumps(input_data, separators=(",", ":")),
+        )
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None, state: Optional[str] = None,
+              lat: Optional[float] = None, lng: Optional[float] = None, cursor: Optional[int] = None,
+              limit: int = 100) -> Dict[str, Any]:
+        """
+        Page through history, newest first, using keyset pagination on id
+
+        Args:
+            start, end: Unix timestamp bounds (inclusive)
+            state: State code filter
+            lat, lng: Restrict to the coarse location cell containing this point
+            cursor: `next_cursor` from the previous page
+            limit: Page size
+
+        Returns:
+            Dictionary with `items` and `next_cursor` (None on the last page)
+        """
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("ts <= ?")
+            params.append(end)
+        if state is not None:
+            clauses.append("state = ?")
+            params.append(state)
+        if lat is not None and lng is not None:
+            clauses.extend(["lat_cell = ?", "lng_cell = ?"])
+            params.extend(location_cell(lat, lng))
+        if cursor is not None:
+            clauses.append("id < ?")
+            params.append(cursor)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT * FROM predictions {where} ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+
+        # Readers use their own connection; WAL lets them run alongside the writer
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+        items = []
+        for row in rows:
+            item = dict(row)
+            item["inputs"] = json.loads(item["inputs"])
+            items.append(item)
+        next_cursor = items[-1]["id"] if len(items) == limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+
+# Global history store instance
+history_store = PredictionHistoryStore()
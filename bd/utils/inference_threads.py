@@ -0,0 +1,178 @@
+"""
+SafeStride Inference Threads - one CPU budget for model inference
+
+XGBoost's OpenMP team, NumPy / BLAS pools and the server's own workers all
+size themselves to the whole machine by default, so several workers on a
+16-core box run 16 x 16 threads and throughput drops as workers are added.
+This module gives each process one inference budget and sizes every call
+from it:
+
+- At startup cap_blas_threads() pins the BLAS / OpenMP pools (OMP, OpenBLAS,
+  MKL, ...) to SAFESTRIDE_BLAS_THREADS, through the environment for libraries
+  not loaded yet and threadpoolctl (if installed) for those already loaded.
+  Inference threads are then granted explicitly per call
+- The budget is the process's available cores divided among the server
+  processes (WEB_CONCURRENCY, as set by uvicorn / gunicorn --workers), or
+  SAFESTRIDE_INFERENCE_CORES
+- Each call reserves threads from the budget: one per
+  SAFESTRIDE_ROWS_PER_THREAD rows, at most what other in-flight calls leave
+  free, at least one, rounded down to a tier (powers of two and the budget).
+  Single-row predictions stay on one thread; a large batch on an idle process
+  gets every core
+- The predictor applies the grant per call: an XGBoost booster copy per tier
+  with its nthread set (no shared state to race on), or row blocks of the
+  flat booster on a shared pool (NumPy releases the GIL in its gathers)
+
+Settings (environment variables):
+    SAFESTRIDE_INFERENCE_CORES   inference threads per process (default: cores / WEB_CONCURRENCY)
+    SAFESTRIDE_BLAS_THREADS      BLAS / OpenMP pool size set at startup (1)
+    SAFESTRIDE_ROWS_PER_THREAD   batch rows per inference thread (1000)
+"""
+
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+BLAS_THREADS = int(os.getenv("SAFESTRIDE_BLAS_THREADS", "1"))
+ROWS_PER_THREAD = int(os.getenv("SAFESTRIDE_ROWS_PER_THREAD", "1000"))
+
+# Variables read by the BLAS / OpenMP runtimes when they load
+BLAS_ENV_VARS = (
+    "OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS", "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS",
+)
+
+
+def available_cores() -> int:
+    """Cores this process may run on (CPU affinity aware)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+def server_processes() -> int:
+    try:
+        return max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+    except ValueError:
+        return 1
+
+
+def default_cores() -> int:
+    configured = os.getenv("SAFESTRIDE_INFERENCE_CORES")
+    if configured:
+        return max(int(configured), 1)
+    return max(available_cores() // server_processes(), 1)
+
+
+def cap_blas_threads(threads: int = BLAS_THREADS) -> Dict[str, Any]:
+    """
+    Cap the BLAS / OpenMP thread pools
+
+    Explicit environment settings win; call before NumPy is imported for the
+    variables to take effect, threadpoolctl covers pools loaded earlier.
+
+    Returns:
+        The environment values in effect and the pools threadpoolctl limited
+    """
+    for name in BLAS_ENV_VARS:
+        os.environ.setdefault(name, str(threads))
+    limited = []
+    try:
+        from threadpoolctl import threadpool_info, threadpool_limits
+
+        threadpool_limits(limits=threads)
+        limited = [{"library": pool.get("internal_api"), "threads": pool.get("num_threads")}
+                   for pool in threadpool_info()]
+    except ImportError:
+        pass
+    return {"env": {name: os.environ[name] for name in BLAS_ENV_VARS}, "pools": limited}
+
+
+def thread_tiers(cores: int) -> List[int]:
+    """Thread counts calls are rounded down to: powers of two, plus the budget itself"""
+    tiers = [1]
+    while tiers[-1] * 2 <= cores:
+        tiers.append(tiers[-1] * 2)
+    if tiers[-1] != cores:
+        tiers.append(cores)
+    return tiers
+
+
+class InferenceThreadController:
+    """Per-call inference thread grants from one process-wide budget"""
+
+    def __init__(self, cores: Optional[int] = None, rows_per_thread: int = ROWS_PER_THREAD):
+        self.cores = cores or default_cores()
+        self.rows_per_thread = max(rows_per_thread, 1)
+        self.tiers = thread_tiers(self.cores)
+        self.blas: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._threads_in_use = 0
+        self._peak_threads = 0
+        self._grants: Counter = Counter()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def configure(self, blas: Dict[str, Any]):
+        """Record the BLAS caps applied at startup (reported in stats)"""
+        self.blas = blas
+
+    def threads_for(self, rows: int, free: int) -> int:
+        wanted = -(-max(rows, 1) // self.rows_per_thread)
+        threads = max(min(wanted, free, self.cores), 1)
+        return max(tier for tier in self.tiers if tier <= threads)
+
+    @contextmanager
+    def reserve(self, rows: int) -> Iterator[int]:
+        """Grant threads for one inference call of `rows` rows, held until the block exits"""
+        with self._lock:
+            threads = self.threads_for(rows, self.cores - self._threads_in_use)
+            self._in_flight += 1
+            self._threads_in_use += threads
+            self._peak_threads = max(self._peak_threads, self._threads_in_use)
+            self._grants[threads] += 1
+        try:
+            yield threads
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._threads_in_use -= threads
+
+    def map_rows(self, fn: Callable, X, threads: int):
+        """fn over row blocks of X on `threads` threads (the caller runs the first block), concatenated"""
+        import numpy as np
+
+        if threads <= 1 or len(X) < 2:
+            return fn(X)
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=max(self.cores - 1, 1),
+                                                    thread_name_prefix="safestride-inference")
+        blocks = np.array_split(np.asarray(X), min(threads, len(X)))
+        futures = [self._pool.submit(fn, block) for block in blocks[1:]]
+        first = fn(blocks[0])
+        return np.concatenate([first] + [future.result() for future in futures])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "cores": self.cores,
+                "available_cores": available_cores(),
+                "server_processes": server_processes(),
+                "rows_per_thread": self.rows_per_thread,
+                "tiers": self.tiers,
+                "in_flight": self._in_flight,
+                "threads_in_use": self._threads_in_use,
+                "peak_threads_in_use": self._peak_threads,
+                "calls_by_threads": {str(threads): count for threads, count in sorted(self._grants.items())},
+                "blas": self.blas,
+            }
+
+
+# Global inference thread controller instance
+inference_threads = InferenceThreadController()
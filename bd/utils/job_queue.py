@@ -0,0 +1,517 @@
+"""
+SafeStride Batch Job Queue - asynchronous scoring of large batches
+
+`POST /api/jobs` stores the uploaded batch on disk and returns a job id right
+away; the batch is scored in the background and its results are downloaded
+as a JSON Lines file when the job is done. Nothing large goes through the
+request path or the interactive threadpool.
+
+- Jobs live in a SQLite table (WAL mode) next to their input / result files,
+  so the queue survives restarts: jobs that were running when the server
+  stopped are re-queued and start over on the next startup
+- A dispatcher thread hands queued jobs, oldest first, to a process pool of
+  SAFESTRIDE_JOB_WORKERS workers (separate from the request threadpool and
+  admission control). Workers run at lower CPU priority and load the served
+  model once at start
+- Workers score in chunks, write one result line per input row (invalid rows
+  get `"success": false` and an error instead of failing the job) and record
+  progress after every chunk; between chunks they stop if the job was
+  cancelled or re-queued
+- At most SAFESTRIDE_JOB_MAX_QUEUED jobs wait at once; finished jobs and their
+  files are deleted after SAFESTRIDE_JOB_RETENTION_HOURS
+
+Input formats: JSON (`{"predictions": [...]}` or a bare list, parsed whole),
+JSON Lines (one input object per line, streamed) and CSV (API field names, or
+raw dataset rows with Start_Time, streamed).
+
+Settings (environment variables):
+    SAFESTRIDE_JOBS_ENABLED          1
+    SAFESTRIDE_JOBS_DB               data/jobs.db
+    SAFESTRIDE_JOBS_DIR              data/jobs
+    SAFESTRIDE_JOB_WORKERS           worker processes (1)
+    SAFESTRIDE_JOB_MAX_QUEUED        queued jobs before submissions get 503 (20)
+    SAFESTRIDE_JOB_MAX_MB            largest accepted upload (1024)
+    SAFESTRIDE_JOB_RETENTION_HOURS   hours finished jobs are kept (24)
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+JOBS_ENABLED = os.getenv("SAFESTRIDE_JOBS_ENABLED", "1") == "1"
+JOBS_DB = os.getenv("SAFESTRIDE_JOBS_DB", "data/jobs.db")
+JOBS_DIR = os.getenv("SAFESTRIDE_JOBS_DIR", "data/jobs")
+JOB_WORKERS = int(os.getenv("SAFESTRIDE_JOB_WORKERS", "1"))
+JOB_MAX_QUEUED = int(os.getenv("SAFESTRIDE_JOB_MAX_QUEUED", "20"))
+JOB_MAX_BYTES = int(float(os.getenv("SAFESTRIDE_JOB_MAX_MB", "1024")) * 1024 * 1024)
+JOB_RETENTION_HOURS = float(os.getenv("SAFESTRIDE_JOB_RETENTION_HOURS", "24"))
+
+JOB_CHUNK_ROWS = 10_000
+JOB_NICENESS = 10
+CLEANUP_INTERVAL = 300.0  # seconds between retention sweeps
+
+INPUT_FORMATS = {
+    "application/json": "json",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+}
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("done", "failed", "cancelled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           TEXT    PRIMARY KEY,
+    status       TEXT    NOT NULL,
+    input_format TEXT    NOT NULL,
+    input_path   TEXT    NOT NULL,
+    result_path  TEXT    NOT NULL,
+    client       TEXT,
+    created_at   REAL    NOT NULL,
+    started_at   REAL,
+    finished_at  REAL,
+    rows         INTEGER,
+    processed    INTEGER NOT NULL DEFAULT 0,
+    failed_rows  INTEGER NOT NULL DEFAULT 0,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    error        TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+"""
+
+
+def _connect(db_path) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+class BatchJobQueue:
+    """Persistent job table, dispatcher thread and worker process pool"""
+
+    def __init__(self, db_path: str = JOBS_DB, jobs_dir: str = JOBS_DIR, workers: int = JOB_WORKERS,
+                 max_queued: int = JOB_MAX_QUEUED, retention_hours: float = JOB_RETENTION_HOURS,
+                 enabled: bool = JOBS_ENABLED):
+        self.db_path = Path(db_path)
+        self.jobs_dir = Path(jobs_dir)
+        self.workers = max(workers, 1)
+        self.max_queued = max_queued
+        self.retention_seconds = retention_hours * 3600
+        self.enabled = enabled
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._running: Dict[str, Any] = {}
+        self._last_cleanup = 0.0
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0, "expired": 0}
+
+    @property
+    def available(self) -> bool:
+        return self._conn is not None
+
+    def open(self):
+        """Create the job table and re-queue jobs interrupted by a restart"""
+        if not self.enabled:
+            return
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = _connect(self.db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        requeued = self._execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'")
+        queued = self._count("queued")
+        logger.info(f"✓ Batch job queue opened at {self.db_path} ({queued} queued"
+                    f"{f', {requeued} resumed after restart' if requeued else ''})")
+
+    def start(self):
+        """Start the worker pool and the dispatcher thread"""
+        if not self.available or self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._dispatch_loop, name="job-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop dispatching; running jobs are re-queued and resume on the next start"""
+        if self._thread is not None:
+            with self._wakeup:
+                self._stopping = True
+                self._wakeup.notify_all()
+            self._thread.join()
+            self._thread = None
+        if self._conn is not None:
+            # Workers notice the status change after their current chunk
+            self._execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'")
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self._running.clear()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # ----- requests -----
+
+    def new_job_paths(self, job_id: str, input_format: str) -> Tuple[Path, Path]:
+        suffix = {"json": "json", "ndjson": "jsonl", "csv": "csv"}[input_format]
+        return self.jobs_dir / f"{job_id}.input.{suffix}", self.jobs_dir / f"{job_id}.results.jsonl"
+
+    def has_capacity(self) -> bool:
+        return self._count("queued") < self.max_queued
+
+    def submit(self, job_id: str, input_format: str, input_path: Path, result_path: Path,
+               client: Optional[str] = None) -> Dict[str, Any]:
+        """Queue a job whose input file is already written"""
+        self._execute(
+            "INSERT INTO jobs (id, status, input_format, input_path, result_path, client, created_at) "
+            "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+            (job_id, input_format, str(input_path), str(result_path), client, time.time()),
+        )
+        self.counters["submitted"] += 1
+        with self._wakeup:
+            self._wakeup.notify_all()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if row is None else self._describe(row)
+
+    def list(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._describe(row) for row in rows]
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """Cancel an active job, or delete a finished one with its files; returns the outcome"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job["status"] in ACTIVE_STATUSES:
+            self._execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                          (time.time(), job_id, *ACTIVE_STATUSES))
+            self.counters["cancelled"] += 1
+            return "cancelled"
+        self._delete(job_id)
+        return "deleted"
+
+    def result_path(self, job_id: str) -> Optional[Path]:
+        with self._lock:
+            row = self._conn.execute("SELECT result_path FROM jobs WHERE id = ? AND status = 'done'",
+                                     (job_id,)).fetchone()
+        return None if row is None else Path(row["result_path"])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "workers": self.workers,
+            "queued": self._count("queued") if self.available else 0,
+            "running": len(self._running),
+            "max_queued": self.max_queued,
+            "retention_hours": self.retention_seconds / 3600,
+            **self.counters,
+        }
+
+    def _describe(self, row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        rows = job["rows"]
+        expires_at = job["finished_at"] + self.retention_seconds if job["finished_at"] else None
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "rows": rows,
+            "processed": job["processed"],
+            "failed_rows": job["failed_rows"],
+            "progress": round(job["processed"] / rows, 4) if rows else (1.0 if job["status"] == "done" else 0.0),
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+            "expires_at": expires_at,
+            "attempts": job["attempts"],
+            "error": job["error"],
+        }
+
+    # ----- dispatching -----
+
+    def _dispatch_loop(self):
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+                try:
+                    self._dispatch()
+                    if time.time() - self._last_cleanup >= CLEANUP_INTERVAL:
+                        self.cleanup()
+                except Exception as e:
+                    logger.error(f"Job dispatch failed: {str(e)}")
+                self._wakeup.wait(timeout=CLEANUP_INTERVAL)
+
+    def _dispatch(self):
+        """Start queued jobs, oldest first, while workers are free"""
+        while len(self._running) < self.workers:
+            with self._lock:
+                row = self._conn.execute("SELECT * FROM jobs WHERE status = 'queued' "
+                                         "ORDER BY created_at LIMIT 1").fetchone()
+            if row is None:
+                return
+            started = self._execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1, "
+                "processed = 0, failed_rows = 0, error = NULL WHERE id = ? AND status = 'queued'",
+                (time.time(), row["id"]),
+            )
+            if not started:
+                continue
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context("spawn"),
+                                                     initializer=_init_worker)
+            future = self._executor.submit(run_job, str(self.db_path), row["id"], row["input_format"],
+                                           row["input_path"], row["result_path"])
+            self._running[row["id"]] = future
+            future.add_done_callback(
+                lambda f, job_id=row["id"], executor=self._executor: self._on_finished(job_id, f, executor))
+
+    def _on_finished(self, job_id: str, future, executor: Optional[ProcessPoolExecutor] = None):
+        """Pool callback: record crashes and wake the dispatcher for the next job"""
+        self._running.pop(job_id, None)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None and self._conn is not None:
+            if isinstance(error, BrokenProcessPool) and executor is not None:
+                # A worker died (e.g. out of memory); release the broken pool and start a fresh
+                # one for the next job (unless another job of the same pool already did)
+                executor.shutdown(wait=False, cancel_futures=True)
+                if self._executor is executor:
+                    self._executor = None
+            self._execute("UPDATE jobs SET status = 'failed', finished_at = ?, error = ? "
+                          "WHERE id = ? AND status = 'running'", (time.time(), str(error) or repr(error), job_id))
+        outcome = None if error is not None else future.result()
+        if outcome == "done":
+            self.counters["completed"] += 1
+        elif error is not None or outcome == "failed":
+            self.counters["failed"] += 1
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def cleanup(self) -> int:
+        """Delete finished jobs (rows and files) past the retention period"""
+        self._last_cleanup = time.time()
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED_STATUSES))}) "
+                f"AND finished_at < ?", (*FINISHED_STATUSES, cutoff)).fetchall()
+        for row in rows:
+            self._delete(row["id"])
+        self.counters["expired"] += len(rows)
+        return len(rows)
+
+    def _delete(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute("SELECT input_path, result_path FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        for path in (row["input_path"], row["result_path"], f"{row['result_path']}.part"):
+            Path(path).unlink(missing_ok=True)
+
+    def _execute(self, sql: str, params: tuple = ()) -> int:
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    def _count(self, status: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+
+# ----- worker process -----
+
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker():
+    """Lower the worker's CPU priority and load the served model (and weather index) once"""
+    try:
+        os.nice(JOB_NICENESS)
+    except (AttributeError, OSError):
+        pass
+    from utils.inference_threads import cap_blas_threads
+
+    cap_blas_threads()
+    from models.predictor import predictor
+    from models.weather_index import weather_index
+    from utils.preprocessing import FeaturePreprocessor
+
+    predictor.load_models()
+    weather_index.configure_for_model(predictor.model_dir)
+    _worker_state["predictor"] = predictor
+    _worker_state["preprocessor"] = FeaturePreprocessor(predictor.feature_names)
+
+
+def _count_lines(input_path: str) -> int:
+    lines = 0
+    last = b"\n"
+    with open(input_path, "rb") as f:
+        while block := f.read(1 << 20):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    return lines + (last != b"\n")
+
+
+def read_input(input_format: str, input_path: str) -> Tuple[int, Iterator[List[Any]]]:
+    """
+    Row count (for progress) and the input records in chunks of JOB_CHUNK_ROWS
+
+    Records are raw values, validated per row by the worker. JSON is parsed
+    whole; JSON Lines and CSV are streamed (their row count is a line count,
+    so CSV values with embedded newlines overstate it).
+    """
+    if input_format == "json":
+        with open(input_path) as f:
+            data = json.load(f)
+        records = data.get("predictions") if isinstance(data, dict) else data
+        if not isinstance(records, list):
+            raise ValueError('JSON input must be a list of inputs or {"predictions": [...]}')
+        return len(records), (records[start:start + JOB_CHUNK_ROWS] for start in range(0, len(records), JOB_CHUNK_ROWS))
+    lines = _count_lines(input_path)
+    if input_format == "ndjson":
+        return lines, _iter_ndjson(input_path)
+    return max(lines - 1, 0), _iter_csv(input_path)
+
+
+def parse_ndjson_line(line: str) -> Any:
+    """One JSON Lines record, or a ValueError that the worker reports for that row"""
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        return ValueError(f"Invalid JSON line: {e.msg}")
+
+
+def _iter_ndjson(input_path: str) -> Iterator[List[Any]]:
+    chunk = []
+    with open(input_path) as f:
+        for line in f:
+            if line.strip():
+                chunk.append(parse_ndjson_line(line))
+            if len(chunk) == JOB_CHUNK_ROWS:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def _iter_csv(input_path: str) -> Iterator[List[Any]]:
+    import pandas as pd
+    from utils.dataset import to_model_inputs
+
+    for frame in pd.read_csv(input_path, chunksize=JOB_CHUNK_ROWS, low_memory=False):
+        if "Start_Time" in frame.columns and "Hour" not in frame.columns:
+            frame = to_model_inputs(frame)
+        frame = frame.astype(object).where(frame.notna(), None)
+        yield frame.to_dict("records")
+
+
+def score_records(predictor, preprocessor, records: List[Any]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Validate and score one chunk of raw records in one batch
+
+    Args:
+        predictor: Loaded SafeStridePredictor
+        preprocessor: FeaturePreprocessor for its features
+        records: Raw input values (an Exception stands for a record that failed to parse)
+
+    Returns:
+        One result per record, in order (invalid records get "success": false
+        and an error), and the number of invalid records
+    """
+    from pydantic import ValidationError
+    from models.weather_index import weather_index
+    from routes.prediction import PredictionInput
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(records)
+    parsed = []
+    for i, record in enumerate(records):
+        try:
+            if isinstance(record, Exception):
+                raise record
+            parsed.append((i, PredictionInput.model_validate(record).model_dump(by_alias=True)))
+        except (ValidationError, ValueError, TypeError) as e:
+            message = ("; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+                       if isinstance(e, ValidationError) else str(e))
+            results[i] = {"success": False, "error": message}
+
+    # Omitted weather fields, one batched lookup per chunk
+    weather = weather_index.fill([input_dict for _, input_dict in parsed])
+    valid_rows, input_dicts, filled = [], [], []
+    for (i, input_dict), row_weather in zip(parsed, weather):
+        is_valid, errors = preprocessor.validate_input(input_dict)
+        if not is_valid:
+            results[i] = {"success": False, "error": "; ".join(errors)}
+            continue
+        valid_rows.append(i)
+        input_dicts.append(input_dict)
+        filled.append(row_weather)
+
+    if input_dicts:
+        scored = predictor.batch_predict(preprocessor.preprocess_batch(input_dicts))
+        for i, result, row_weather in zip(valid_rows, scored, filled):
+            results[i] = {"success": True, **result, "weather": row_weather}
+    return results, len(records) - len(input_dicts)
+
+
+def run_job(db_path: str, job_id: str, input_format: str, input_path: str, result_path: str) -> str:
+    """Score one job's input into its result file (runs in a worker process); returns the final status"""
+    predictor = _worker_state["predictor"]
+    preprocessor = _worker_state["preprocessor"]
+    conn = _connect(db_path)
+    partial = Path(f"{result_path}.part")
+    processed = failed = 0
+    try:
+        rows, chunks = read_input(input_format, input_path)
+        conn.execute("UPDATE jobs SET rows = ? WHERE id = ?", (rows, job_id))
+        with open(partial, "w") as out:
+            for records in chunks:
+                results, invalid = score_records(predictor, preprocessor, records)
+                out.write("\n".join(json.dumps({"row": processed + i, **result})
+                                    for i, result in enumerate(results)) + "\n")
+
+                processed += len(records)
+                failed += invalid
+                conn.execute("UPDATE jobs SET processed = ?, failed_rows = ? WHERE id = ?",
+                             (processed, failed, job_id))
+                status = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                if status is None or status["status"] != "running":
+                    # Cancelled, re-queued by a shutdown, or deleted
+                    partial.unlink(missing_ok=True)
+                    return "stopped"
+
+        os.replace(partial, result_path)
+        conn.execute("UPDATE jobs SET status = 'done', finished_at = ?, rows = ?, processed = ?, failed_rows = ? "
+                     "WHERE id = ? AND status = 'running'", (time.time(), processed, processed, failed, job_id))
+        return "done"
+    except Exception as e:
+        partial.unlink(missing_ok=True)
+        conn.execute("UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ? AND status = 'running'",
+                     (time.time(), str(e), job_id))
+        return "failed"
+    finally:
+        conn.close()
+
+
+# Global batch job queue instance
+batch_jobs = BatchJobQueue()
@@ -0,0 +1,130 @@
+"""
+SafeStride Live Scoring Sessions
+
+State for the /api/live WebSocket channel used by continuous tracking
+clients. Each session keeps the full raw input and its 43-value feature
+vector; clients send only the fields that changed, and only the features
+derived from those fields are recomputed (FeaturePreprocessor.update_vector)
+before re-scoring. Updates that leave every feature unchanged (e.g. a new
+City) reuse the previous prediction.
+
+Weather fields the client left out are filled from the weather index and
+follow the client: a change of location or time looks them up again (the
+previous values are kept when no station answers).
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from models.weather_index import LOOKUP_FIELDS, weather_index
+from utils.preprocessing import WEATHER_FIELDS, FeaturePreprocessor, _is_missing
+
+LIVE_MAX_SESSIONS = int(os.getenv("SAFESTRIDE_LIVE_MAX_SESSIONS", "1000"))
+LIVE_IDLE_TIMEOUT = float(os.getenv("SAFESTRIDE_LIVE_IDLE_TIMEOUT", "120"))
+
+
+class LiveSession:
+    """Raw input, cached feature vector and last prediction for one connection"""
+
+    def __init__(self, preprocessor: FeaturePreprocessor, input_data: Dict[str, Any],
+                 weather: Optional[Dict[str, Any]] = None):
+        self.preprocessor = preprocessor
+        self.input_data = dict(input_data)
+        self.features = preprocessor.preprocess_vector(self.input_data)
+        self.last_result: Optional[Dict[str, Any]] = None
+        # Weather enrichment of the input, and the fields the client did not send
+        self.weather = weather
+        self.looked_up = set(weather["fields"]) if weather else set()
+
+    def apply(self, changes: Dict[str, Any]) -> List[str]:
+        """
+        Merge changed input fields and refresh the dependent features
+
+        Returns:
+            Names of the features whose value changed (empty = re-scoring not needed)
+        """
+        changed_fields = [field for field, value in changes.items() if self.input_data.get(field) != value]
+        if not changed_fields:
+            return []
+        previous = dict(self.input_data)
+        self.input_data.update(changes)
+        changed_fields += self._refresh_weather(changes, previous)
+        return self.preprocessor.update_vector(self.features, self.input_data, changed_fields)
+    
+    def _refresh_weather(self, changes: Dict[str, Any], previous: Dict[str, Any]) -> List[str]:
+        """Look the client's omitted weather fields up again after a change; returns those that changed"""
+        for field in WEATHER_FIELDS:
+            if field in changes:
+                if _is_missing(changes[field]):
+                    self.looked_up.add(field)
+                else:
+                    self.looked_up.discard(field)
+        if not self.looked_up:
+            self.weather = None
+        elif self.weather:
+            self.weather = {**self.weather, "fields": [f for f in self.weather["fields"] if f in self.looked_up]}
+        cleared = [field for field in self.looked_up if field in changes]
+        if not self.looked_up or not (cleared or any(field in changes for field in LOOKUP_FIELDS)):
+            return []
+        for field in self.looked_up:
+            self.input_data[field] = None
+        weather = weather_index.fill([self.input_data])[0]
+        for field in self.looked_up:
+            if _is_missing(self.input_data.get(field)):
+                self.input_data[field] = previous.get(field)
+        if weather:
+            self.weather = weather
+        return [field for field in self.looked_up
+                if field not in changes and self.input_data.get(field) != previous.get(field)]
+
+
+class LiveSessionRegistry:
+    """Caps concurrent sessions and counts channel activity"""
+
+    def __init__(self, max_sessions: int = LIVE_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self.active = 0
+        self.opened = 0
+        self.rejected = 0
+        self.messages = 0
+        self.rescored = 0
+        self.reused = 0
+
+    def try_open(self) -> bool:
+        with self._lock:
+            if self.active >= self.max_sessions:
+                self.rejected += 1
+                return False
+            self.active += 1
+            self.opened += 1
+            return True
+
+    def close(self):
+        with self._lock:
+            self.active -= 1
+
+    def record_message(self, rescored: bool):
+        with self._lock:
+            self.messages += 1
+            if rescored:
+                self.rescored += 1
+            else:
+                self.reused += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active_sessions": self.active,
+                "max_sessions": self.max_sessions,
+                "sessions_opened": self.opened,
+                "sessions_rejected": self.rejected,
+                "messages": self.messages,
+                "rescored": self.rescored,
+                "reused": self.reused,
+            }
+
+
+# Global live session registry instance
+live_sessions = LiveSessionRegistry()
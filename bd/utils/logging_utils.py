@@ -0,0 +1,201 @@
+"""
+SafeStride Logging Utilities
+
+Keeps logging off the prediction hot path:
+
+- configure_logging() routes every record through an in-process queue to a
+  background listener thread, so request handlers never block on stdout and
+  message formatting happens on the listener thread
+- SampledLogger emits only a configurable fraction of per-prediction lines
+- PredictionCounters aggregates per-request outcomes and logs one summary
+  line per interval instead of one line per prediction
+
+Settings (environment variables):
+    SAFESTRIDE_LOG_LEVEL             INFO
+    SAFESTRIDE_LOG_FORMAT            text | json
+    SAFESTRIDE_LOG_SAMPLE_RATE       fraction of per-prediction lines kept (0.01)
+    SAFESTRIDE_LOG_SUMMARY_INTERVAL  seconds between counter summaries (60)
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+LOG_LEVEL = os.getenv("SAFESTRIDE_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("SAFESTRIDE_LOG_FORMAT", "text").lower()
+LOG_SAMPLE_RATE = float(os.getenv("SAFESTRIDE_LOG_SAMPLE_RATE", "0.01"))
+LOG_SUMMARY_INTERVAL = float(os.getenv("SAFESTRIDE_LOG_SUMMARY_INTERVAL", "60"))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed via `extra=`
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any `extra=` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        payload.update({k: v for k, v in vars(record).items() if k not in _RESERVED_ATTRS})
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that enqueues the record untouched
+
+    The stdlib QueueHandler formats the message in the calling thread so the
+    record can be pickled across processes. The queue here is in-process, so
+    formatting is left to the listener thread. Log arguments must therefore
+    not be mutated after the call (hot-path lines only pass scalars).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+_original_handlers: List[logging.Handler] = []
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> QueueListener:
+    """
+    Install queue-backed logging on the root logger (idempotent)
+
+    Returns:
+        The running QueueListener; call stop_logging() to flush it
+    """
+    global _listener, _queue_handler, _original_handlers
+    if _listener is not None:
+        return _listener
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    _original_handlers = list(root.handlers)
+    for handler in _original_handlers:
+        root.removeHandler(handler)
+    _queue_handler = _DeferredQueueHandler(log_queue)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """
+    Flush queued records, stop the listener thread and put back the root handlers
+
+    Records logged afterwards (server and worker shutdown lines) go to the
+    handlers the root logger had before configure_logging(), or straight to
+    the listener's stream handler if it had none, instead of a queue nobody
+    drains any more.
+    """
+    global _listener, _queue_handler, _original_handlers
+    if _listener is None:
+        return
+    root = logging.getLogger()
+    root.removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _original_handlers or list(_listener.handlers):
+        root.addHandler(handler)
+    _listener, _queue_handler, _original_handlers = None, None, []
+
+
+class SampledLogger:
+    """Wraps a logger so that only `rate` of calls produce a record"""
+
+    def __init__(self, logger: logging.Logger, rate: float = LOG_SAMPLE_RATE):
+        self.logger = logger
+        self.rate = rate
+
+    def info(self, msg: str, *args, **extra):
+        if self.rate > 0 and random.random() < self.rate and self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(msg, *args, extra={**extra, "sample_rate": self.rate})
+
+
+class PredictionCounters:
+    """Thread-safe running totals of prediction outcomes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, int] = {}
+        self._last_logged: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def increment(self, name: str, amount: int = 1):
+        with self._lock:
+            self._totals[name] = self._totals.get(name, 0) + amount
+
+    def record_predictions(self, labels, endpoint: str):
+        """Count one request's predictions by outcome"""
+        labels = list(labels)
+        high = sum(1 for label in labels if label == 1)
+        with self._lock:
+            for name, amount in (
+                (f"{endpoint}_requests", 1),
+                ("predictions", len(labels)),
+                ("high_risk", high),
+                ("low_risk", len(labels) - high),
+            ):
+                self._totals[name] = self._totals.get(name, 0) + amount
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._totals)
+
+    def start_summary(self, logger: logging.Logger, interval: float = LOG_SUMMARY_INTERVAL):
+        """Log the change in counters every `interval` seconds from a daemon thread"""
+        if self._thread is not None or interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._summary_loop, args=(logger, interval), name="safestride-log-summary", daemon=True
+        )
+        self._thread.start()
+
+    def stop_summary(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _summary_loop(self, logger: logging.Logger, interval: float):
+        started = time.monotonic()
+        while not self._stop.wait(interval):
+            totals = self.snapshot()
+            delta = {k: v - self._last_logged.get(k, 0) for k, v in totals.items()}
+            self._last_logged = totals
+            if any(delta.values()):
+                elapsed = time.monotonic() - started
+                started = time.monotonic()
+                logger.info("Prediction summary: %d predictions (%d high risk) in %.0fs",
+                            delta.get("predictions", 0), delta.get("high_risk", 0), elapsed,
+                            extra={"counters_delta": delta, "counters_total": totals})
+
+
+# Global counters shared by the prediction routes
+prediction_counters = PredictionCounters()
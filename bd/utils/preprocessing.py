@@ -18,6 +18,8 @@ Weather:
 - Wind_Speed(mph) (float): Wind speed in mph
 - Precipitation(in) (float): Precipitation amount in inches
 - Weather_Condition (str): Weather description
+(optional: missing weather fields are filled from the nearest station's
+observations when the weather index is built, see models/weather_index.py)
 
 Road Features:
 - Crossing (bool/int): 0 or 1
@@ -35,16 +37,74 @@ Additional:
 - City (str): City name
 - State (str): State code
 - Street (str): Street name
-- Sunrise_Sunset (str): "Day" or "Night"
+- Sunrise_Sunset (str): "Day" or "Night" (optional: when missing it is derived
+  from Start_Lat, Start_Lng, Year, Month, Hour and State, see utils/solar.py)
 """
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any
+import re
+from typing import Dict, Iterable, List, Any, Union
 import logging
 
+from utils.solar import solar_calculator
+
 logger = logging.getLogger(__name__)
 
+# Weather categories used as one-hot columns during training
+WEATHER_CATEGORIES = [
+    'Fair', 'Fog', 'Haze', 'Heavy Rain', 'Light Drizzle', 
+    'Light Rain', 'Light Snow', 'Light Thunderstorms and Rain',
+    'Mostly Cloudy', 'Other', 'Overcast', 'Partly Cloudy',
+    'Rain', 'Scattered Clouds', 'Thunderstorm'
+]
+
+# Substrings of the upper-cased street name that mark its type
+HIGHWAY_MARKERS = ['I-', 'US-', 'HWY', 'HIGHWAY', 'INTERSTATE']
+MAIN_STREET_MARKERS = ['MAIN', 'AVENUE', 'AVE', 'BOULEVARD', 'BLVD']
+HIGHWAY_PATTERN = '|'.join(re.escape(x) for x in HIGHWAY_MARKERS)
+MAIN_STREET_PATTERN = '|'.join(re.escape(x) for x in MAIN_STREET_MARKERS)
+_HIGHWAY_RE = re.compile(HIGHWAY_PATTERN)
+_MAIN_STREET_RE = re.compile(MAIN_STREET_PATTERN)
+
+TEMPORAL_RANGES = {
+    'Hour': (0, 23),
+    'Day_of_Week': (0, 6),
+    'Month': (1, 12),
+    'Year': (2016, 2030)
+}
+
+# Model features that depend on each raw input field, for incremental updates.
+# Fields not listed map to the feature of the same name; City and State feed
+# no feature at serving time (their frequencies are fixed).
+FIELD_DEPENDENCIES = {
+    'Hour': ['Hour', 'Is_Rush_Hour', 'Is_Night', 'Night_Low_Visibility'],
+    'Day_of_Week': ['Day_of_Week', 'Is_Weekend'],
+    'Visibility(mi)': ['Visibility(mi)', 'Night_Low_Visibility'],
+    'Temperature(F)': ['Temperature(F)', 'Freezing_Rain'],
+    'Precipitation(in)': ['Precipitation(in)', 'Freezing_Rain'],
+    'Street': ['Is_Highway', 'Is_Main_Street'],
+    'Weather_Condition': [f'Weather_Condition_{cat}' for cat in WEATHER_CATEGORIES],
+    'Sunrise_Sunset': ['Sunrise_Sunset_Night', 'Sunrise_Sunset_Unknown'],
+    'City': [],
+    'State': [],
+}
+
+# Raw weather fields (filled from the weather index when the input omits them)
+WEATHER_FIELDS = [
+    'Temperature(F)', 'Humidity(%)', 'Pressure(in)', 'Visibility(mi)',
+    'Wind_Speed(mph)', 'Precipitation(in)', 'Weather_Condition'
+]
+
+# Raw fields Sunrise_Sunset is derived from when the input omits it
+SOLAR_FIELDS = ['Start_Lat', 'Start_Lng', 'Year', 'Month', 'Hour', 'State']
+SUNRISE_SUNSET_FEATURES = FIELD_DEPENDENCIES['Sunrise_Sunset']
+
+
+def _is_missing(value: Any) -> bool:
+    """None, NaN or blank text"""
+    return value is None or value != value or (isinstance(value, str) and not value.strip())
+
 
 class FeaturePreprocessor:
     """
@@ -72,11 +132,27 @@ class FeaturePreprocessor:
         Returns:
             DataFrame with 43 features matching training format
         """
+        return self.preprocess_batch([input_data])
+    
+    def preprocess_batch(self, input_data: Union[List[Dict[str, Any]], pd.DataFrame]) -> pd.DataFrame:
+        """
+        Preprocess many raw inputs at once with column-wise operations
+        
+        Args:
+            input_data: List of raw input dictionaries, or a DataFrame with one
+                row per input (e.g. a chunk of the dataset)
+            
+        Returns:
+            DataFrame with one row per input and 43 features matching training format
+        """
         try:
-            logger.info("Starting US Accidents feature preprocessing...")
+            logger.debug("Starting US Accidents feature preprocessing")
             
             # Create initial dataframe
-            df = pd.DataFrame([input_data])
+            if isinstance(input_data, pd.DataFrame):
+                df = input_data.reset_index(drop=True).copy()
+            else:
+                df = pd.DataFrame(list(input_data))
             
             # ===== NUMERIC FEATURES (9) =====
             numeric_features = [
@@ -95,17 +171,10 @@ class FeaturePreprocessor:
             for feat in boolean_features:
                 if feat not in df.columns:
                     df[feat] = 0
-                df[feat] = df[feat].astype(int)
+                df[feat] = df[feat].fillna(0).astype(int)
             
             # ===== TEMPORAL FEATURES (7) =====
-            temporal_features = {
-                'Hour': (0, 23),
-                'Day_of_Week': (0, 6),
-                'Month': (1, 12),
-                'Year': (2016, 2030)
-            }
-            
-            for feat, (min_val, max_val) in temporal_features.items():
+            for feat, (min_val, max_val) in TEMPORAL_RANGES.items():
                 if feat not in df.columns:
                     df[feat] = min_val
                 df[feat] = pd.to_numeric(df[feat], errors='coerce').fillna(min_val).astype(int)
@@ -123,57 +192,40 @@ class FeaturePreprocessor:
             df['State_Frequency'] = 0.5  # Default mid-range frequency
             
             # ===== STREET TYPE FEATURES (2) =====
-            street = str(input_data.get('Street', '')).upper()
-            df['Is_Highway'] = int(any(x in street for x in ['I-', 'US-', 'HWY', 'HIGHWAY', 'INTERSTATE']))
-            df['Is_Main_Street'] = int(any(x in street for x in ['MAIN', 'AVENUE', 'AVE', 'BOULEVARD', 'BLVD']))
+            street = self._text_column(df, 'Street', '').str.upper()
+            df['Is_Highway'] = street.str.contains(HIGHWAY_PATTERN, regex=True).astype(int)
+            df['Is_Main_Street'] = street.str.contains(MAIN_STREET_PATTERN, regex=True).astype(int)
             
             # ===== INTERACTION FEATURES (2) =====
             df['Night_Low_Visibility'] = ((df['Is_Night'] == 1) & (df['Visibility(mi)'] < 5)).astype(int)
             df['Freezing_Rain'] = ((df['Temperature(F)'] <= 32) & (df['Precipitation(in)'] > 0)).astype(int)
             
             # ===== WEATHER CONDITION ONE-HOT ENCODING (15) =====
-            weather_condition = input_data.get('Weather_Condition', 'Other')
-            
-            # Map weather conditions to categories
-            weather_categories = [
-                'Fair', 'Fog', 'Haze', 'Heavy Rain', 'Light Drizzle', 
-                'Light Rain', 'Light Snow', 'Light Thunderstorms and Rain',
-                'Mostly Cloudy', 'Other', 'Overcast', 'Partly Cloudy',
-                'Rain', 'Scattered Clouds', 'Thunderstorm'
-            ]
-            
-            # Initialize all weather columns to 0
-            for cat in weather_categories:
-                df[f'Weather_Condition_{cat}'] = 0
-            
-            # Set the matching category to 1
-            best_match = self._match_weather_condition(weather_condition, weather_categories)
-            if best_match:
-                df[f'Weather_Condition_{best_match}'] = 1
-            else:
-                df['Weather_Condition_Other'] = 1
+            # Match each distinct condition once, then broadcast to the rows
+            weather_condition = self._text_column(df, 'Weather_Condition', 'Other')
+            matches = {
+                condition: self._match_weather_condition(condition, WEATHER_CATEGORIES) or 'Other'
+                for condition in weather_condition.unique()
+            }
+            best_match = weather_condition.map(matches)
+            for cat in WEATHER_CATEGORIES:
+                df[f'Weather_Condition_{cat}'] = (best_match == cat).astype(int)
             
             # ===== SUNRISE_SUNSET ONE-HOT ENCODING (2) =====
-            sunrise_sunset = input_data.get('Sunrise_Sunset', 'Day')
-            df['Sunrise_Sunset_Night'] = 1 if 'Night' in str(sunrise_sunset) else 0
-            df['Sunrise_Sunset_Unknown'] = 1 if 'Unknown' in str(sunrise_sunset) else 0
+            sunrise_sunset = self._sunrise_sunset_column(df)
+            df['Sunrise_Sunset_Night'] = sunrise_sunset.str.contains('Night', regex=False).astype(int)
+            df['Sunrise_Sunset_Unknown'] = sunrise_sunset.str.contains('Unknown', regex=False).astype(int)
             
             # ===== FEATURE ALIGNMENT (43 features total) =====
-            logger.info("Aligning features with training data...")
+            logger.debug("Aligning features with training data")
             
             # Add any missing columns with 0 values
             for feature in self.feature_names:
                 if feature not in df.columns:
                     df[feature] = 0
-                    logger.debug(f"Added missing feature: {feature}")
-            
-            # Remove extra columns not in training
-            extra_cols = [col for col in df.columns if col not in self.feature_names]
-            if extra_cols:
-                logger.debug(f"Removing extra columns: {extra_cols}")
-                df = df.drop(columns=extra_cols, errors='ignore')
+                    logger.debug("Added missing feature: %s", feature)
             
-            # Reorder columns to match training feature order
+            # Reorder columns to match training feature order (drops extra columns)
             df_final = df[self.feature_names]
             
             # ===== FINAL CLEANING =====
@@ -181,8 +233,7 @@ class FeaturePreprocessor:
             df_final = df_final.replace([np.inf, -np.inf], 0)
             df_final = df_final.astype(float)
             
-            logger.info(f"✓ Preprocessing complete. Shape: {df_final.shape}")
-            logger.info(f"  Features: {len(df_final.columns)} (expected: 43)")
+            logger.debug("Preprocessing complete. Shape: %s", df_final.shape)
             
             return df_final
             
@@ -192,6 +243,151 @@ class FeaturePreprocessor:
             logger.error(traceback.format_exc())
             raise ValueError(f"Error preprocessing input data: {str(e)}")
     
+    def preprocess_vector(self, input_data: Dict[str, Any]) -> np.ndarray:
+        """
+        Preprocess one complete input into a writable feature vector
+        
+        The vector can then be kept up to date with update_vector as
+        individual input fields change.
+        """
+        return self.preprocess_batch([input_data]).to_numpy(dtype=np.float64)[0].copy()
+    
+    def update_vector(self, features: np.ndarray, input_data: Dict[str, Any],
+                      changed_fields: Iterable[str]) -> List[str]:
+        """
+        Recompute only the features that depend on the changed input fields
+        
+        Args:
+            features: Vector from preprocess_vector, updated in place
+            input_data: Complete raw input with the changes already applied
+            changed_fields: Raw input fields that changed
+            
+        Returns:
+            Names of the features whose value changed
+        """
+        index = self._feature_index()
+        changed_fields = list(changed_fields)
+        affected = dict.fromkeys(
+            feature
+            for field in changed_fields
+            for feature in FIELD_DEPENDENCIES.get(field, [field])
+            if feature in index
+        )
+        # A derived Sunrise_Sunset follows the location and time fields
+        if _is_missing(input_data.get('Sunrise_Sunset')) and any(f in SOLAR_FIELDS for f in changed_fields):
+            affected.update((feature, None) for feature in SUNRISE_SUNSET_FEATURES if feature in index)
+        
+        weather_match = None
+        if 'Weather_Condition' in changed_fields:
+            condition = input_data.get('Weather_Condition')
+            weather_match = self._match_weather_condition('Other' if condition is None else condition,
+                                                          WEATHER_CATEGORIES) or 'Other'
+        
+        changed = []
+        for feature in affected:
+            if feature.startswith('Weather_Condition_'):
+                value = float(feature == f'Weather_Condition_{weather_match}')
+            else:
+                value = self._derive_feature(feature, input_data)
+            j = index[feature]
+            if features[j] != value:
+                features[j] = value
+                changed.append(feature)
+        return changed
+    
+    def _feature_index(self) -> Dict[str, int]:
+        if getattr(self, '_index', None) is None:
+            self._index = {name: j for j, name in enumerate(self.feature_names)}
+        return self._index
+    
+    @staticmethod
+    def _derive_feature(feature: str, input_data: Dict[str, Any]) -> float:
+        """Single-row equivalent of the column rules in preprocess_batch"""
+        def number(field):
+            # Missing/unparseable -> 0; infinities survive until the final cleaning
+            value = input_data.get(field)
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return 0.0
+            return 0.0 if np.isnan(value) else value
+        
+        def temporal(field):
+            min_val, max_val = TEMPORAL_RANGES[field]
+            value = input_data.get(field)
+            try:
+                value = int(float(value))
+            except (TypeError, ValueError, OverflowError):
+                value = min_val
+            return min(max(value, min_val), max_val)
+        
+        def text(field, default):
+            value = input_data.get(field)
+            return default if value is None else str(value)
+        
+        def sunrise_sunset():
+            value = input_data.get('Sunrise_Sunset')
+            if not _is_missing(value):
+                return str(value)
+            return solar_calculator.day_night_one(number('Start_Lat'), number('Start_Lng'), temporal('Year'),
+                                                  temporal('Month'), temporal('Hour'), text('State', '').upper())
+        
+        if feature in TEMPORAL_RANGES:
+            return float(temporal(feature))
+        if feature in ('Crossing', 'Junction', 'Traffic_Signal', 'Stop'):
+            return float(int(number(feature)))
+        if feature == 'Is_Weekend':
+            return float(temporal('Day_of_Week') >= 5)
+        if feature == 'Is_Rush_Hour':
+            hour = temporal('Hour')
+            return float(7 <= hour <= 9 or 17 <= hour <= 19)
+        if feature == 'Is_Night':
+            hour = temporal('Hour')
+            return float(hour >= 22 or hour <= 6)
+        if feature == 'Night_Low_Visibility':
+            hour = temporal('Hour')
+            return float((hour >= 22 or hour <= 6) and number('Visibility(mi)') < 5)
+        if feature == 'Freezing_Rain':
+            return float(number('Temperature(F)') <= 32 and number('Precipitation(in)') > 0)
+        if feature == 'Is_Highway':
+            return float(_HIGHWAY_RE.search(text('Street', '').upper()) is not None)
+        if feature == 'Is_Main_Street':
+            return float(_MAIN_STREET_RE.search(text('Street', '').upper()) is not None)
+        if feature == 'Sunrise_Sunset_Night':
+            return float('Night' in sunrise_sunset())
+        if feature == 'Sunrise_Sunset_Unknown':
+            return float('Unknown' in sunrise_sunset())
+        value = number(feature)
+        return value if np.isfinite(value) else 0.0
+    
+    @staticmethod
+    def _text_column(df: pd.DataFrame, column: str, default: str) -> pd.Series:
+        """String view of an optional text column, with missing values set to default"""
+        if column not in df.columns:
+            return pd.Series(default, index=df.index, dtype=object)
+        return df[column].where(df[column].notna(), default).astype(str)
+    
+    def _sunrise_sunset_column(self, df: pd.DataFrame) -> pd.Series:
+        """Sunrise_Sunset text, derived from location and time (one batched solar pass) where missing"""
+        if 'Sunrise_Sunset' in df.columns:
+            given = df['Sunrise_Sunset'].astype(object)
+            missing = given.isna() | given.astype(str).str.strip().eq('')
+        else:
+            given = pd.Series(None, index=df.index, dtype=object)
+            missing = pd.Series(True, index=df.index)
+        if not missing.any():
+            return given.astype(str)
+        
+        rows = missing.to_numpy()
+        derived = solar_calculator.day_night(
+            df['Start_Lat'].to_numpy()[rows], df['Start_Lng'].to_numpy()[rows],
+            df['Year'].to_numpy()[rows], df['Month'].to_numpy()[rows], df['Hour'].to_numpy()[rows],
+            self._text_column(df, 'State', '').str.upper().to_numpy()[rows],
+        )
+        result = given.copy()
+        result[rows] = derived
+        return result.astype(str)
+    
     def _match_weather_condition(self, condition: str, categories: List[str]) -> str:
         """Match weather condition to one of the predefined categories"""
         condition_lower = str(condition).lower()
@@ -258,6 +454,12 @@ class FeaturePreprocessor:
             if not isinstance(hour, int) or hour < 0 or hour > 23:
                 errors.append("Hour must be between 0 and 23")
         
+        # Weather fields are optional in the request but must be known by now
+        missing = [field for field in WEATHER_FIELDS if _is_missing(input_data.get(field))]
+        if missing:
+            errors.append(f"Missing weather fields: {', '.join(missing)} (no weather observation "
+                          f"near this location; send them in the request)")
+        
         return len(errors) == 0, errors
 
 
@@ -300,6 +502,27 @@ def get_default_features() -> Dict[str, Any]:
     }
 
 
+def sample_inputs(n_samples: int, seed: int = 11) -> pd.DataFrame:
+    """Raw inputs spread over the API ranges (offline builds without the dataset, load-time calibration)"""
+    rng = np.random.default_rng(seed)
+    inputs = pd.DataFrame([get_default_features()] * n_samples)
+    inputs["Start_Lat"] = rng.uniform(24.5, 49.0, n_samples)
+    inputs["Start_Lng"] = rng.uniform(-124.5, -67.0, n_samples)
+    inputs["Hour"] = rng.integers(0, 24, n_samples)
+    inputs["Day_of_Week"] = rng.integers(0, 7, n_samples)
+    inputs["Month"] = rng.integers(1, 13, n_samples)
+    inputs["Distance(mi)"] = rng.exponential(0.6, n_samples)
+    inputs["Temperature(F)"] = rng.normal(62, 18, n_samples)
+    inputs["Visibility(mi)"] = rng.choice([10.0, 5.0, 2.0, 0.5], n_samples, p=[0.8, 0.1, 0.06, 0.04])
+    inputs["Precipitation(in)"] = rng.choice([0.0, 0.05, 0.3], n_samples, p=[0.85, 0.1, 0.05])
+    inputs["Street"] = rng.choice(["Local Rd", "Main St", "Oak Ave", "I-95 N", "US-1"], n_samples)
+    inputs["Weather_Condition"] = rng.choice(WEATHER_CATEGORIES, n_samples)
+    inputs["Sunrise_Sunset"] = rng.choice(["Day", "Night"], n_samples, p=[0.7, 0.3])
+    for flag in ["Crossing", "Junction", "Traffic_Signal", "Stop"]:
+        inputs[flag] = (rng.random(n_samples) < 0.15).astype(int)
+    return inputs
+
+
 def get_example_requests() -> List[Dict[str, Any]]:
     """
     Return example request payloads for different risk scenarios
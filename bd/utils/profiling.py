@@ -0,0 +1,224 @@
+"""
+SafeStride Per-Request Profiling
+
+Opt-in latency breakdowns for individual requests. A request enables profiling
+with either the `X-SafeStride-Profile` header or the `profile` query parameter:
+
+- timing: stage durations are returned in a `Server-Timing` response header
+  (parse, validate, preprocess, scale, infer, explain, serialize)
+- cpu: timing plus a sampling profile of the request, stored as folded stacks
+  and downloadable from /api/profiles/{profile_id}
+
+When neither is present the middleware passes the request straight through and
+the stage hooks resolve to a shared no-op context manager.
+"""
+
+import contextlib
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-safestride-profile"
+PROFILE_QUERY_PARAM = "profile"
+PROFILE_DIR = Path(os.getenv("SAFESTRIDE_PROFILE_DIR", "profiles"))
+MAX_STORED_PROFILES = 100
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+class StageTimer:
+    """Accumulates wall-clock duration per named stage for one request"""
+
+    enabled = True
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self.handler_end: Optional[float] = None
+        self.profiler: Optional["SamplingProfiler"] = None
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """Time a block; repeated stages (e.g. per batch row) are summed"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = self.durations.get(name, 0.0) + time.perf_counter() - started
+
+    def mark_parsed(self):
+        """Record request reading and body validation, which run before the handler"""
+        self.durations["parse"] = time.perf_counter() - self.start
+        if self.profiler is not None:
+            # Sync handlers run in the threadpool, not on the event loop thread
+            self.profiler.follow(threading.get_ident())
+
+    def mark_handler_done(self):
+        """Everything after this point until the response starts is serialization"""
+        self.handler_end = time.perf_counter()
+
+    def server_timing(self) -> str:
+        """Format durations as a Server-Timing header value (milliseconds)"""
+        if self.handler_end is not None:
+            self.durations["serialize"] = time.perf_counter() - self.handler_end
+        metrics = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.durations.items()]
+        metrics.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.3f}")
+        return ", ".join(metrics)
+
+
+class _NullTimer:
+    """Stand-in used when profiling is disabled; every hook is a no-op"""
+
+    enabled = False
+
+    def stage(self, name: str):
+        return _NULL_STAGE
+
+    def mark_parsed(self):
+        pass
+
+    def mark_handler_done(self):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+_current_timer: contextvars.ContextVar = contextvars.ContextVar("safestride_stage_timer", default=NULL_TIMER)
+
+
+def current_timer():
+    """Return the active request's StageTimer, or the shared no-op timer"""
+    return _current_timer.get()
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of the followed threads at a fixed interval from
+    a daemon thread
+
+    Produces collapsed ("folded") stacks, one `frame;frame;frame count` line per
+    unique stack, which flamegraph tools and speedscope read directly.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.001):
+        self.thread_ids = [thread_id]
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="safestride-profiler", daemon=True)
+
+    def follow(self, thread_id: int):
+        """Also sample another thread (e.g. the worker running the handler)"""
+        if thread_id not in self.thread_ids:
+            self.thread_ids = self.thread_ids + [thread_id]
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in self.thread_ids:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if stack:
+                    self.samples[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+def profile_path(profile_id: str) -> Optional[Path]:
+    """Resolve a stored profile, rejecting anything that is not a profile id"""
+    try:
+        uuid.UUID(hex=profile_id)
+    except ValueError:
+        return None
+    path = PROFILE_DIR / f"{profile_id}.folded"
+    return path if path.exists() else None
+
+
+def _store_profile(profile_id: str, profiler: SamplingProfiler):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    (PROFILE_DIR / f"{profile_id}.folded").write_text(profiler.folded(), encoding="utf-8")
+
+    stored = sorted(PROFILE_DIR.glob("*.folded"), key=lambda p: p.stat().st_mtime)
+    for stale in stored[:-MAX_STORED_PROFILES]:
+        stale.unlink(missing_ok=True)
+
+
+def _requested_mode(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            return value.decode("latin-1").strip().lower()
+    query = scope.get("query_string", b"")
+    if query and PROFILE_QUERY_PARAM.encode() in query:
+        values = parse_qs(query.decode("latin-1")).get(PROFILE_QUERY_PARAM)
+        if values:
+            return values[0].strip().lower()
+    return None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that enables stage timing / CPU sampling per request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = _requested_mode(scope)
+        if mode not in ("timing", "cpu"):
+            await self.app(scope, receive, send)
+            return
+
+        timer = StageTimer()
+        token = _current_timer.set(timer)
+        profiler = None
+        profile_id = None
+        if mode == "cpu":
+            profile_id = uuid.uuid4().hex
+            profiler = SamplingProfiler(threading.get_ident())
+            timer.profiler = profiler
+            profiler.start()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timer.server_timing().encode("latin-1")))
+                if profile_id:
+                    headers.append((b"x-profile-id", profile_id.encode("latin-1")))
+                    headers.append((b"link", f"</api/profiles/{profile_id}>; rel=\"profile\"".encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timer.reset(token)
+            if profiler is not None:
+                profiler.stop()
+                try:
+                    _store_profile(profile_id, profiler)
+                except OSError as e:
+                    logger.error(f"Failed to store profile {profile_id}: {str(e)}")
@@ -0,0 +1,207 @@
+"""
+SafeStride Solar Position - server-side Sunrise_Sunset derivation
+
+Derives the dataset's Sunrise_Sunset value ("Day" / "Night": whether the sun
+is above the horizon) from Start_Lat, Start_Lng, Year, Month and Hour, for
+inputs that omit it.
+
+- Sunrise and sunset come from the NOAA solar declination / equation of time
+  approximations, vectorized over whole batches, with the standard -0.833°
+  horizon (refraction + solar disc)
+- Inputs carry no day of month, so the 15th stands in for the date (sunrise
+  moves by up to ~2 min/day at US latitudes, so times are within ~30 min),
+  and an hour counts as Day when the sun is up at its midpoint (HH:30)
+- Hour is local clock time: the offset comes from the State's (majority)
+  US time zone with US daylight saving time (Mar-Oct on the 15th; not in AZ
+  and HI), else from the longitude
+- Sunrise / sunset are computed once per (0.25° cell, year, month, UTC
+  offset) and cached, so grid-style batches (many points, few dates) reduce
+  to a dictionary lookup per distinct cell
+"""
+
+import math
+import threading
+from typing import Dict, Tuple
+
+import numpy as np
+
+CELL_DEGREES = 0.25
+HORIZON_DEGREES = -0.833
+DATE_DAY = 15
+DST_MONTHS = (3, 11)  # [March, November)
+MAX_CACHE_ENTRIES = 500_000
+
+# Standard-time UTC offsets by state (the majority zone for split states)
+STATE_UTC_OFFSETS = {
+    **dict.fromkeys(['CT', 'DC', 'DE', 'FL', 'GA', 'IN', 'KY', 'MA', 'MD', 'ME', 'MI', 'NC', 'NH',
+                     'NJ', 'NY', 'OH', 'PA', 'RI', 'SC', 'VA', 'VT', 'WV'], -5),
+    **dict.fromkeys(['AL', 'AR', 'IA', 'IL', 'KS', 'LA', 'MN', 'MO', 'MS', 'ND', 'NE', 'OK', 'SD',
+                     'TN', 'TX', 'WI'], -6),
+    **dict.fromkeys(['AZ', 'CO', 'ID', 'MT', 'NM', 'UT', 'WY'], -7),
+    **dict.fromkeys(['CA', 'NV', 'OR', 'WA'], -8),
+    'AK': -9,
+    'HI': -10,
+}
+NO_DST_STATES = {'AZ', 'HI'}
+
+
+def utc_offsets(states, lng: np.ndarray, month: np.ndarray) -> np.ndarray:
+    """Local clock UTC offset (hours) per row, from the state or the longitude"""
+    distinct, inverse = np.unique(np.asarray(states, dtype=str), return_inverse=True)
+    inverse = inverse.reshape(-1)
+    offsets = np.array([STATE_UTC_OFFSETS.get(state, np.nan) for state in distinct])[inverse]
+    offsets = np.where(np.isnan(offsets), np.round(lng / 15.0), offsets)
+    observes_dst = np.array([state not in NO_DST_STATES for state in distinct])[inverse]
+    return offsets + ((month >= DST_MONTHS[0]) & (month < DST_MONTHS[1]) & observes_dst)
+
+
+# Cache key fields packed into one int64: (name, bits), most significant first
+KEY_FIELDS = [("lat_cell", 10), ("lng_cell", 11), ("year", 12), ("month", 4), ("offset", 6)]
+OFFSET_BIAS = 32
+
+
+def pack_keys(lat_cell, lng_cell, year, month, offset):
+    """Packed cache key(s); works on int64 arrays and on Python ints"""
+    key = 0
+    for (_, bits), value in zip(KEY_FIELDS, (lat_cell, lng_cell, year, month, offset + OFFSET_BIAS)):
+        key = (key << bits) | (value & ((1 << bits) - 1))
+    return key
+
+
+def unpack_keys(key: np.ndarray):
+    values = []
+    for _, bits in reversed(KEY_FIELDS):
+        values.append(key & ((1 << bits) - 1))
+        key = key >> bits
+    lat_cell, lng_cell, year, month, offset = reversed(values)
+    return lat_cell, lng_cell, year, month, offset - OFFSET_BIAS
+
+
+def sun_times(lat: np.ndarray, lng: np.ndarray, year: np.ndarray, month: np.ndarray,
+              offset: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Local clock sunrise and sunset (fractional hours) on the 15th of the month
+
+    Polar day gives (-inf, inf) and polar night (inf, -inf), so the
+    sunrise <= t < sunset test holds for every / no hour.
+    """
+    leap = ((year % 4 == 0) & (year % 100 != 0)) | (year % 400 == 0)
+    days_before = np.array([0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334])[month - 1]
+    day_of_year = days_before + DATE_DAY + (leap & (month > 2))
+
+    # NOAA fractional year (radians) at local noon
+    gamma = 2 * np.pi / np.where(leap, 366, 365) * (day_of_year - 1)
+    equation_of_time = 229.18 * (0.000075 + 0.001868 * np.cos(gamma) - 0.032077 * np.sin(gamma)
+                                 - 0.014615 * np.cos(2 * gamma) - 0.040849 * np.sin(2 * gamma))
+    declination = (0.006918 - 0.399912 * np.cos(gamma) + 0.070257 * np.sin(gamma)
+                   - 0.006758 * np.cos(2 * gamma) + 0.000907 * np.sin(2 * gamma)
+                   - 0.002697 * np.cos(3 * gamma) + 0.00148 * np.sin(3 * gamma))
+
+    phi = np.radians(lat)
+    cos_hour_angle = ((np.sin(np.radians(HORIZON_DEGREES)) - np.sin(phi) * np.sin(declination))
+                      / (np.cos(phi) * np.cos(declination)))
+    half_day = np.degrees(np.arccos(np.clip(cos_hour_angle, -1.0, 1.0))) / 15.0
+    half_day = np.where(cos_hour_angle <= -1.0, np.inf, np.where(cos_hour_angle >= 1.0, -np.inf, half_day))
+
+    solar_noon = 12.0 - lng / 15.0 - equation_of_time / 60.0 + offset
+    return solar_noon - half_day, solar_noon + half_day
+
+
+class SolarCalculator:
+    """Vectorized Day/Night classification with per (cell, date) sunrise/sunset caching"""
+
+    def __init__(self, max_entries: int = MAX_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._cache: Dict[int, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def day_night(self, lat, lng, year, month, hour, states=None) -> np.ndarray:
+        """
+        "Day" / "Night" per row
+
+        Args:
+            lat, lng: Location in degrees
+            year, month, hour: Local date and clock hour (0-23)
+            states: Optional state codes, for the time zone
+
+        Returns:
+            Object array of "Day" / "Night"
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lng = np.atleast_1d(np.asarray(lng, dtype=np.float64))
+        year = np.atleast_1d(np.asarray(year, dtype=np.int64))
+        month = np.clip(np.atleast_1d(np.asarray(month, dtype=np.int64)), 1, 12)
+        hour = np.atleast_1d(np.asarray(hour, dtype=np.float64))
+        if states is None:
+            states = [""] * len(lat)
+        offset = utc_offsets(states, lng, month)
+
+        lat_cell = np.floor((np.clip(lat, -90.0, 90.0) + 90.0) / CELL_DEGREES).astype(np.int64)
+        lng_cell = np.floor((np.clip(lng, -180.0, 180.0) + 180.0) / CELL_DEGREES).astype(np.int64)
+        keys = np.asarray(pack_keys(lat_cell, lng_cell, np.clip(year, 0, 4095), month, offset.astype(np.int64)),
+                          dtype=np.int64)
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+
+        sunrise, sunset = self._sun_times(unique_keys)
+        t = hour + 0.5
+        sunrise, sunset = sunrise[inverse], sunset[inverse]
+        # Sunset past midnight (or sunrise before it) keeps the early / late hours lit
+        is_day = ((sunrise <= t) & (t < sunset)) | (t < sunset - 24.0) | (t >= sunrise + 24.0)
+        return np.where(is_day, "Day", "Night").astype(object)
+
+    def day_night_one(self, lat: float, lng: float, year: int, month: int, hour: int, state: str = "") -> str:
+        """Scalar day_night for single-row paths: a cache hit stays in plain Python"""
+        month = min(max(int(month), 1), 12)
+        offset = STATE_UTC_OFFSETS.get(state)
+        if offset is None:
+            offset = int(np.round(lng / 15.0))
+        offset += DST_MONTHS[0] <= month < DST_MONTHS[1] and state not in NO_DST_STATES
+        key = pack_keys(math.floor((min(max(lat, -90.0), 90.0) + 90.0) / CELL_DEGREES),
+                        math.floor((min(max(lng, -180.0), 180.0) + 180.0) / CELL_DEGREES),
+                        min(max(int(year), 0), 4095), month, int(offset))
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self.hits += 1
+        if cached is None:
+            return self.day_night(lat, lng, year, month, hour, [state])[0]
+        sunrise, sunset = cached
+        t = hour + 0.5
+        return "Day" if sunrise <= t < sunset or t < sunset - 24.0 or t >= sunrise + 24.0 else "Night"
+
+    def _sun_times(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Sunrise / sunset per distinct key, computing (vectorized) only the uncached ones"""
+        sunrise = np.empty(len(keys))
+        sunset = np.empty(len(keys))
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys.tolist()):
+                cached = self._cache.get(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    sunrise[i], sunset[i] = cached
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            todo = keys[missing]
+            lat_cell, lng_cell, year, month, offset = unpack_keys(todo)
+            rise, set_ = sun_times((lat_cell + 0.5) * CELL_DEGREES - 90.0, (lng_cell + 0.5) * CELL_DEGREES - 180.0,
+                                   year, month, offset.astype(np.float64))
+            sunrise[missing], sunset[missing] = rise, set_
+            with self._lock:
+                if len(self._cache) + len(missing) > self.max_entries:
+                    self._cache.clear()
+                self._cache.update(zip(todo.tolist(), zip(rise.tolist(), set_.tolist())))
+        return sunrise, sunset
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+# Global solar calculator instance
+solar_calculator = SolarCalculator()
@@ -0,0 +1,428 @@
+"""
+SafeStride Spool Feed - continuous scoring of JSON Lines dropped into a spool directory
+
+High-volume producers skip HTTP: they drop JSON Lines files (one
+/api/predict input per line) into a spool directory, or append to them, or
+stream lines into a local Unix socket, and a long-running daemon
+(score_feed.py) that loaded the predictor once scores them:
+
+- Reading: spool files (*.jsonl, *.ndjson; oldest first) are tailed from
+  their last committed byte offset; only complete (newline-terminated) lines
+  are read, so files may still be growing. A file whose offset is past its
+  size, or whose inode changed, was replaced and is read again from the start
+- Micro-batches of up to SAFESTRIDE_FEED_BATCH_ROWS records (waiting at most
+  SAFESTRIDE_FEED_BATCH_WAIT_MS for a batch to fill) go through the batch job
+  path: validation, one batched weather lookup, preprocess_batch and
+  batch_predict. Invalid lines get "success": false and an error, like job
+  results
+- Output: scored lines ({"source", "line", ...result}) are appended to a
+  segment file, committed every SAFESTRIDE_FEED_SEGMENT_ROWS rows or
+  SAFESTRIDE_FEED_SEGMENT_SECONDS after its first row, as
+  scored-<sequence>.jsonl in the output directory
+- Checkpoint: each commit fsyncs the segment (.part) and the checkpoint it
+  completes (next read offset and line of every file) to checkpoint.json.tmp,
+  then renames the segment into place (the commit point), then the
+  checkpoint. On startup a pending checkpoint whose segment exists is
+  applied, anything else uncommitted is discarded, and reading resumes at the
+  committed offsets: after a crash every input line appears in exactly one
+  committed segment
+- Spool files read to the end and untouched for SAFESTRIDE_FEED_DONE_AFTER_S
+  are moved to <spool>/done/, except the socket file of the current hour (or
+  of the previous one, within that delay of the hour change)
+- Socket (optional, Unix only): lines received on a Unix socket are appended
+  to an hourly spool file (socket-<date>-<hour>.jsonl) before they are
+  scored, so they are replayed after a crash like any other input. Each line
+  is written through unbuffered, to the file currently at that path (a handle
+  whose file was moved away is reopened), and the handle is closed when a
+  connection ends; each connection gets {"accepted": <lines>} back when it
+  closes its sending side
+
+Settings (environment variables):
+    SAFESTRIDE_FEED_SPOOL_DIR        data/feed/spool
+    SAFESTRIDE_FEED_OUTPUT_DIR       data/feed/scored (segments and checkpoint)
+    SAFESTRIDE_FEED_BATCH_ROWS       records per micro-batch (2000)
+    SAFESTRIDE_FEED_BATCH_WAIT_MS    longest wait for a micro-batch to fill (200)
+    SAFESTRIDE_FEED_SEGMENT_ROWS     rows per output segment (50000)
+    SAFESTRIDE_FEED_SEGMENT_SECONDS  longest a scored row waits for its segment commit (5)
+    SAFESTRIDE_FEED_POLL_MS          spool poll interval when idle (250)
+    SAFESTRIDE_FEED_DONE_AFTER_S     idle read-to-end files move to <spool>/done after this (60; 0 = never)
+"""
+
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.job_queue import parse_ndjson_line, score_records
+
+logger = logging.getLogger(__name__)
+
+FEED_SPOOL_DIR = os.getenv("SAFESTRIDE_FEED_SPOOL_DIR", "data/feed/spool")
+FEED_OUTPUT_DIR = os.getenv("SAFESTRIDE_FEED_OUTPUT_DIR", "data/feed/scored")
+FEED_BATCH_ROWS = int(os.getenv("SAFESTRIDE_FEED_BATCH_ROWS", "2000"))
+FEED_BATCH_WAIT_MS = float(os.getenv("SAFESTRIDE_FEED_BATCH_WAIT_MS", "200"))
+FEED_SEGMENT_ROWS = int(os.getenv("SAFESTRIDE_FEED_SEGMENT_ROWS", "50000"))
+FEED_SEGMENT_SECONDS = float(os.getenv("SAFESTRIDE_FEED_SEGMENT_SECONDS", "5"))
+FEED_POLL_MS = float(os.getenv("SAFESTRIDE_FEED_POLL_MS", "250"))
+FEED_DONE_AFTER_S = float(os.getenv("SAFESTRIDE_FEED_DONE_AFTER_S", "60"))
+
+SPOOL_PATTERNS = ("*.jsonl", "*.ndjson")
+SOCKET_SPOOL_FORMAT = "socket-%Y%m%d-%H.jsonl"
+CHECKPOINT_FILE = "checkpoint.json"
+READ_BLOCK_BYTES = 1 << 20
+STATS_INTERVAL = 30.0
+UNIX_SOCKETS = hasattr(socketserver, "UnixStreamServer")
+
+
+def _fsync_write(path: Path, text: str):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _fsync_dir(path: Path):
+    """Make renames in a directory durable (no-op where directories cannot be opened)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def socket_spool_name(now: Optional[float] = None) -> str:
+    """Spool file the socket appends to at time `now` (default: now)"""
+    return time.strftime(SOCKET_SPOOL_FORMAT, time.localtime(now))
+
+
+@dataclass
+class FilePosition:
+    """Next byte offset and line number to read in one spool file"""
+    offset: int = 0
+    line: int = 0
+    inode: Optional[int] = None
+
+
+class SpoolReader:
+    """Tails the spool files from their positions, complete lines only"""
+
+    def __init__(self, spool_dir: Path, positions: Dict[str, FilePosition]):
+        self.spool_dir = spool_dir
+        self.positions = positions
+
+    def files(self) -> List[Path]:
+        paths = {path for pattern in SPOOL_PATTERNS for path in self.spool_dir.glob(pattern) if path.is_file()}
+        return sorted(paths, key=lambda path: (path.stat().st_mtime, path.name))
+
+    def read(self, max_records: int) -> List[Tuple[str, int, Any]]:
+        """Up to max_records new records as (file name, line number, value), oldest files first"""
+        records: List[Tuple[str, int, Any]] = []
+        for path in self.files():
+            if len(records) >= max_records:
+                break
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            position = self.positions.setdefault(path.name, FilePosition(inode=stat.st_ino))
+            if position.inode != stat.st_ino or stat.st_size < position.offset:
+                logger.warning(f"⚠️ Spool file {path.name} was replaced; reading it from the start")
+                position.offset, position.line, position.inode = 0, 0, stat.st_ino
+            if stat.st_size == position.offset:
+                continue
+            with open(path, "rb") as f:
+                f.seek(position.offset)
+                buffer = b""
+                while len(records) < max_records:
+                    block = f.read(READ_BLOCK_BYTES)
+                    if not block:
+                        break
+                    buffer += block
+                    end = buffer.rfind(b"\n")
+                    if end < 0:
+                        continue  # a line longer than one block
+                    consumed = 0
+                    for raw in buffer[:end].split(b"\n"):
+                        if len(records) >= max_records:
+                            break
+                        consumed += len(raw) + 1
+                        position.line += 1
+                        text = raw.decode("utf-8", errors="replace")
+                        if text.strip():
+                            records.append((path.name, position.line, parse_ndjson_line(text)))
+                    position.offset += consumed
+                    buffer = buffer[consumed:]
+        return records
+
+    def lag_bytes(self) -> int:
+        """Spool bytes not read yet"""
+        lag = 0
+        for path in self.files():
+            position = self.positions.get(path.name)
+            try:
+                lag += max(path.stat().st_size - (position.offset if position else 0), 0)
+            except FileNotFoundError:
+                continue
+        return lag
+
+
+class SegmentWriter:
+    """Output segments and the checkpoint they commit"""
+
+    def __init__(self, output_dir: Path):
+        self.output_dir = output_dir
+        self.checkpoint_path = output_dir / CHECKPOINT_FILE
+        self.pending_path = output_dir / f"{CHECKPOINT_FILE}.tmp"
+        self.sequence = 0  # last committed segment
+        self.rows = 0
+        self.opened_at: Optional[float] = None
+        self._file = None
+
+    def segment_path(self, sequence: int) -> Path:
+        return self.output_dir / f"scored-{sequence:08d}.jsonl"
+
+    def recover(self) -> Dict[str, FilePosition]:
+        """Finish or discard an interrupted commit and return the committed read positions"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if self.pending_path.exists():
+            try:
+                pending = json.loads(self.pending_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                pending = None
+            if pending is not None and self.segment_path(pending["segment"]).exists():
+                # The segment was committed; its checkpoint rename did not happen yet
+                os.replace(self.pending_path, self.checkpoint_path)
+                logger.info(f"↩️ Completed the checkpoint of segment {pending['segment']}")
+            else:
+                self.pending_path.unlink(missing_ok=True)
+        for part in self.output_dir.glob("*.part"):
+            part.unlink()
+
+        state = {"segment": 0, "files": {}}
+        if self.checkpoint_path.exists():
+            state = json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        self.sequence = state["segment"]
+        return {name: FilePosition(**position) for name, position in state["files"].items()}
+
+    def write(self, lines: List[str]):
+        if self._file is None:
+            self._file = open(f"{self.segment_path(self.sequence + 1)}.part", "w", encoding="utf-8")
+            self.opened_at = time.monotonic()
+        self._file.write("\n".join(lines) + "\n")
+        self.rows += len(lines)
+
+    def due(self, max_rows: int, max_seconds: float) -> bool:
+        return self._file is not None and (self.rows >= max_rows or
+                                           time.monotonic() - self.opened_at >= max_seconds)
+
+    def commit(self, positions: Dict[str, FilePosition]) -> Optional[Path]:
+        """Commit the open segment together with the read positions it completes"""
+        if self._file is None:
+            return None
+        sequence = self.sequence + 1
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        self.write_checkpoint(positions, sequence, pending=True)
+        segment = self.segment_path(sequence)
+        os.replace(f"{segment}.part", segment)  # commit point
+        os.replace(self.pending_path, self.checkpoint_path)
+        _fsync_dir(self.output_dir)
+        self.sequence = sequence
+        self.rows = 0
+        self.opened_at = None
+        return segment
+
+    def write_checkpoint(self, positions: Dict[str, FilePosition], sequence: Optional[int] = None,
+                         pending: bool = False):
+        state = {
+            "segment": self.sequence if sequence is None else sequence,
+            "files": {name: vars(position) for name, position in positions.items()},
+            "updated_at": time.time(),
+        }
+        _fsync_write(self.pending_path, json.dumps(state))
+        if not pending:
+            os.replace(self.pending_path, self.checkpoint_path)
+
+
+class _SocketHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        accepted = 0
+        for line in self.rfile:
+            if line.strip():
+                self.server.spool_line(line if line.endswith(b"\n") else line + b"\n")
+                accepted += 1
+        self.server.end_connection()
+        try:
+            self.wfile.write(json.dumps({"accepted": accepted}).encode() + b"\n")
+        except OSError:
+            pass
+
+
+class SocketSpool(socketserver.ThreadingMixIn, getattr(socketserver, "UnixStreamServer", object)):
+    """Unix socket whose lines are appended to an hourly spool file"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, spool_dir: Path):
+        Path(socket_path).unlink(missing_ok=True)
+        super().__init__(socket_path, _SocketHandler)
+        self.spool_dir = spool_dir
+        self._lock = threading.Lock()
+        self._file = None
+        self._name = None
+
+    def spool_line(self, line: bytes):
+        with self._lock:
+            name = socket_spool_name()
+            path = self.spool_dir / name
+            if self._file is not None and (name != self._name or not self._is_current(path)):
+                self._file.close()
+                self._file = None
+            if self._file is None:
+                # Unbuffered: nothing waits in memory for a file the daemon may move to done/
+                self._file = open(path, "ab", buffering=0)
+                self._name = name
+            self._file.write(line)
+
+    def _is_current(self, path: Path) -> bool:
+        """Whether the open handle is still the file at path (not moved to done/ or replaced)"""
+        try:
+            return os.stat(path).st_ino == os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            return False
+
+    def end_connection(self):
+        """Make a connection's lines durable and close the handle (the next line reopens it)"""
+        with self._lock:
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+
+    def server_close(self):
+        super().server_close()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class SpoolFeed:
+    """Micro-batching scoring loop over the spool directory"""
+
+    def __init__(self, predictor, preprocessor, spool_dir: str = FEED_SPOOL_DIR, output_dir: str = FEED_OUTPUT_DIR,
+                 batch_rows: int = FEED_BATCH_ROWS, batch_wait_ms: float = FEED_BATCH_WAIT_MS,
+                 segment_rows: int = FEED_SEGMENT_ROWS, segment_seconds: float = FEED_SEGMENT_SECONDS,
+                 poll_ms: float = FEED_POLL_MS, done_after_s: float = FEED_DONE_AFTER_S):
+        self.predictor = predictor
+        self.preprocessor = preprocessor
+        self.spool_dir = Path(spool_dir)
+        self.done_dir = self.spool_dir / "done"
+        self.writer = SegmentWriter(Path(output_dir))
+        self.batch_rows = batch_rows
+        self.batch_wait_s = batch_wait_ms / 1000.0
+        self.segment_rows = segment_rows
+        self.segment_seconds = segment_seconds
+        self.poll_s = poll_ms / 1000.0
+        self.done_after_s = done_after_s
+        self.stop_event = threading.Event()
+        self.counters = {"rows": 0, "failed_rows": 0, "batches": 0, "segments": 0, "files_done": 0}
+        self.reader: Optional[SpoolReader] = None
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _next_batch(self) -> List[Tuple[str, int, Any]]:
+        """Records for one micro-batch: full, or whatever arrived within the batch wait"""
+        records = self.reader.read(self.batch_rows)
+        deadline = time.monotonic() + self.batch_wait_s
+        while records and len(records) < self.batch_rows and time.monotonic() < deadline \
+                and not self.stop_event.is_set():
+            time.sleep(min(self.poll_s, self.batch_wait_s) / 4)
+            records += self.reader.read(self.batch_rows - len(records))
+        return records
+
+    def _score(self, records: List[Tuple[str, int, Any]]):
+        results, failed = score_records(self.predictor, self.preprocessor, [value for _, _, value in records])
+        self.writer.write([json.dumps({"source": source, "line": line, **result})
+                           for (source, line, _), result in zip(records, results)])
+        self.counters["rows"] += len(records)
+        self.counters["failed_rows"] += failed
+        self.counters["batches"] += 1
+
+    def _commit(self):
+        segment = self.writer.commit(self.reader.positions)
+        if segment is not None:
+            self.counters["segments"] += 1
+            logger.info(f"💾 Committed {segment.name}")
+            self._retire_done_files()
+
+    def _retire_done_files(self):
+        """Move read-to-end, idle spool files to done/ and drop their positions"""
+        if self.done_after_s <= 0:
+            return
+        retired = []
+        now = time.time()
+        # The socket may still append to these
+        targets = {socket_spool_name(now), socket_spool_name(now - self.done_after_s)}
+        for path in self.reader.files():
+            position = self.reader.positions.get(path.name)
+            stat = path.stat()
+            if position is None or position.offset < stat.st_size or now - stat.st_mtime < self.done_after_s \
+                    or path.name in targets:
+                continue
+            self.done_dir.mkdir(exist_ok=True)
+            os.replace(path, self.done_dir / path.name)
+            retired.append(path.name)
+        # Positions of files no longer in the spool are dropped as well
+        present = {path.name for path in self.reader.files()}
+        stale = [name for name in self.reader.positions if name not in present]
+        for name in stale:
+            del self.reader.positions[name]
+        if stale:
+            self.writer.write_checkpoint(self.reader.positions)
+        self.counters["files_done"] += len(retired)
+
+    def run(self):
+        """Score until stop() (e.g. on SIGTERM); the open segment is committed before returning"""
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.reader = SpoolReader(self.spool_dir, self.writer.recover())
+        logger.info(f"📥 Tailing {self.spool_dir} into {self.writer.output_dir} "
+                    f"(resuming after segment {self.writer.sequence})")
+        last_stats = time.monotonic()
+        last_rows = 0
+        while not self.stop_event.is_set():
+            records = self._next_batch()
+            if records:
+                self._score(records)
+            if self.writer.due(self.segment_rows, self.segment_seconds):
+                self._commit()
+            elif not records:
+                if self.writer.rows == 0:
+                    self._retire_done_files()
+                self.stop_event.wait(self.poll_s)
+            if time.monotonic() - last_stats >= STATS_INTERVAL:
+                rate = (self.counters["rows"] - last_rows) / (time.monotonic() - last_stats)
+                logger.info(f"📊 Feed: {self.counters['rows']:,} rows ({rate:,.0f}/s), "
+                            f"{self.counters['failed_rows']:,} invalid, {self.reader.lag_bytes():,} bytes behind")
+                last_stats, last_rows = time.monotonic(), self.counters["rows"]
+        self._commit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "segment": self.writer.sequence,
+            "lag_bytes": self.reader.lag_bytes() if self.reader else None,
+        }
@@ -0,0 +1,231 @@
+"""
+SafeStride Feature Preprocessing Module - UK Road Safety Model (legacy)
+
+Feature engineering for the UK severity model shipped in MLT/
+(SafeStride_Model.joblib, trained on STATS19 road safety data; 85 features,
+see features_list.txt). It predicts Accident_Severity: Fatal, Serious or
+Slight.
+
+REQUIRED INPUT FEATURES:
+- Number_of_Vehicles (int), Number_of_Casualties (int)
+- Speed_limit (int): mph
+- Time (str): "HH:MM" (24-hour)
+- Date (str): "YYYY-MM-DD"
+- Road_Type, Road_Surface_Conditions, Light_Conditions, Weather_Conditions,
+  Urban_or_Rural_Area: label text (e.g. "Wet or damp") or STATS19 code
+
+OPTIONAL INPUT FEATURES (missing ones are passed to the model as missing):
+- latitude, longitude
+- Police_Force, Local_Authority_(District), Local_Authority_(Highway),
+  LSOA_of_Accident_Location: STATS19 codes; highway authorities and LSOAs
+  outside the model's one-hot columns count as "Other"
+- 1st_Road_Class, 1st_Road_Number, 2nd_Road_Class, 2nd_Road_Number,
+  Junction_Detail, Junction_Control, Pedestrian_Crossing-Human_Control,
+  Pedestrian_Crossing-Physical_Facilities, Special_Conditions_at_Site,
+  Carriageway_Hazards, Did_Police_Officer_Attend_Scene_of_Accident: STATS19 codes
+
+Derived features follow the original training pipeline (MODEL_INTEGRATION.md):
+rush hour / night / peak hour flags from the hour, weekday / weekend /
+holiday season from the date, Casualties_per_Vehicle and
+High_Speed_Multi_Vehicle, and one-hot columns (drop-first) for the
+categorical fields.
+"""
+
+import logging
+from typing import Any, Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+from utils.preprocessing import _is_missing
+
+logger = logging.getLogger(__name__)
+
+# STATS19 codes of the categorical fields, by label
+CATEGORY_CODES: Dict[str, Dict[str, int]] = {
+    'Road_Type': {
+        'Roundabout': 1, 'One way street': 2, 'Dual carriageway': 3,
+        'Single carriageway': 6, 'Slip road': 7, 'Unknown': 9,
+    },
+    'Road_Surface_Conditions': {
+        'Dry': 1, 'Wet or damp': 2, 'Snow': 3, 'Frost or ice': 4, 'Flood over 3cm deep': 5,
+    },
+    'Light_Conditions': {
+        'Daylight': 1, 'Darkness - lights lit': 4, 'Darkness - lights unlit': 5,
+        'Darkness - no lighting': 6, 'Darkness - lighting unknown': 7,
+    },
+    'Weather_Conditions': {
+        'Fine no high winds': 1, 'Raining no high winds': 2, 'Snowing no high winds': 3,
+        'Fine + high winds': 4, 'Raining + high winds': 5, 'Snowing + high winds': 6,
+        'Fog or mist': 7, 'Other': 8, 'Unknown': 9,
+    },
+    'Urban_or_Rural_Area': {'Urban': 1, 'Rural': 2, 'Unallocated': 3},
+}
+
+# Code fields one-hot encoded by their string value (unlisted values -> "Other")
+CODE_CATEGORIES = ['Local_Authority_(Highway)', 'LSOA_of_Accident_Location']
+
+# Numeric STATS19 fields passed through as-is (missing -> NaN)
+OPTIONAL_NUMERIC_FIELDS = [
+    'longitude', 'latitude', 'Police_Force', 'Local_Authority_(District)',
+    '1st_Road_Class', '1st_Road_Number', '2nd_Road_Class', '2nd_Road_Number',
+    'Junction_Detail', 'Junction_Control', 'Pedestrian_Crossing-Human_Control',
+    'Pedestrian_Crossing-Physical_Facilities', 'Special_Conditions_at_Site',
+    'Carriageway_Hazards', 'Did_Police_Officer_Attend_Scene_of_Accident',
+]
+
+REQUIRED_FIELDS = ['Number_of_Vehicles', 'Number_of_Casualties', 'Speed_limit', 'Time', 'Date'] + list(CATEGORY_CODES)
+
+# Accident_Severity codes (the label encoder's classes) and their names
+SEVERITY_NAMES = {1: "Fatal", 2: "Serious", 3: "Slight"}
+
+
+def _category_code(field: str, value: Any) -> float:
+    """STATS19 code for a label or code value (NaN when unknown)"""
+    if _is_missing(value):
+        return float('nan')
+    if isinstance(value, str):
+        labels = {label.lower(): code for label, code in CATEGORY_CODES[field].items()}
+        code = labels.get(value.strip().lower())
+        if code is not None:
+            return float(code)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+class UKFeaturePreprocessor:
+    """
+    Preprocesses input features to match the format expected by the UK severity model
+
+    Creates the 85 features of the trained model, in training order
+    """
+
+    def __init__(self, feature_names: List[str]):
+        """
+        Args:
+            feature_names: Feature names in the exact order used during training
+        """
+        self.feature_names = feature_names
+        self._one_hot_values = {
+            field: {name[len(field) + 1:] for name in feature_names if name.startswith(field + '_')}
+            for field in CODE_CATEGORIES
+        }
+
+    def preprocess(self, input_data: Dict[str, Any]) -> pd.DataFrame:
+        return self.preprocess_batch([input_data])
+
+    def preprocess_batch(self, input_data: Union[List[Dict[str, Any]], pd.DataFrame]) -> pd.DataFrame:
+        """
+        Preprocess many raw inputs at once with column-wise operations
+
+        Args:
+            input_data: List of raw input dictionaries (or a DataFrame)
+
+        Returns:
+            DataFrame with one row per input and the model's features, in training order
+        """
+        df = input_data.reset_index(drop=True) if isinstance(input_data, pd.DataFrame) \
+            else pd.DataFrame(list(input_data))
+        n_rows = len(df)
+        features: Dict[str, Any] = {}
+
+        def column(field):
+            return df[field] if field in df.columns else pd.Series([None] * n_rows)
+
+        for field in OPTIONAL_NUMERIC_FIELDS + ['Number_of_Vehicles', 'Number_of_Casualties', 'Speed_limit']:
+            features[field] = pd.to_numeric(column(field), errors='coerce').to_numpy(dtype=np.float64)
+
+        # ===== TIME / DATE FEATURES =====
+        hour = pd.to_datetime(column('Time').astype(str), format='%H:%M', errors='coerce').dt.hour
+        date = pd.to_datetime(column('Date'), format='%Y-%m-%d', errors='coerce')
+        hour = hour.to_numpy(dtype=np.float64)
+        features['Hour'] = hour
+        features['Is_Morning_Rush'] = ((hour >= 7) & (hour <= 10)).astype(float)
+        features['Is_Evening_Rush'] = ((hour >= 17) & (hour <= 20)).astype(float)
+        features['Is_Rush_Hour'] = np.maximum(features['Is_Morning_Rush'], features['Is_Evening_Rush'])
+        features['Is_Night'] = ((hour >= 22) | (hour <= 6)).astype(float)
+        features['Is_Peak_Hour'] = np.isin(hour, [8, 9, 17, 18, 19]).astype(float)
+
+        day_of_week = date.dt.dayofweek.to_numpy(dtype=np.float64)
+        month = date.dt.month.to_numpy(dtype=np.float64)
+        features['Day_of_Week'] = day_of_week
+        features['Month'] = month
+        features['Year'] = date.dt.year.to_numpy(dtype=np.float64)
+        features['Is_Weekend'] = (day_of_week >= 5).astype(float)
+        features['Is_Holiday_Season'] = np.isin(month, [1, 4, 10, 12]).astype(float)
+
+        # ===== INTERACTION FEATURES =====
+        vehicles = features['Number_of_Vehicles']
+        features['Casualties_per_Vehicle'] = features['Number_of_Casualties'] / (vehicles + 1)
+        features['High_Speed_Multi_Vehicle'] = ((features['Speed_limit'] >= 50) & (vehicles > 2)).astype(float)
+
+        # ===== ONE-HOT FEATURES =====
+        for field in CATEGORY_CODES:
+            codes = np.array([_category_code(field, value) for value in column(field)], dtype=np.float64)
+            for name in self.feature_names:
+                if name.startswith(field + '_'):
+                    features[name] = (codes == float(name[len(field) + 1:])).astype(float)
+        for field in CODE_CATEGORIES:
+            known = self._one_hot_values[field]
+            values = ['' if _is_missing(value) else str(value).strip() for value in column(field)]
+            values = [value if value in known or not value else 'Other' for value in values]
+            for code in known:
+                features[f'{field}_{code}'] = np.array([value == code for value in values], dtype=float)
+
+        missing = [name for name in self.feature_names if name not in features]
+        if missing:
+            logger.debug(f"UK features without an input, passed as missing: {missing}")
+        return pd.DataFrame({name: features.get(name, np.full(n_rows, np.nan)) for name in self.feature_names})
+
+    def validate_input(self, input_data: Dict[str, Any]) -> tuple:
+        """
+        Validate one raw input
+
+        Returns:
+            Tuple of (is_valid, error_messages)
+        """
+        errors = [f"Missing required field: {field}" for field in REQUIRED_FIELDS
+                  if _is_missing(input_data.get(field))]
+        for field in ['Number_of_Vehicles', 'Number_of_Casualties', 'Speed_limit']:
+            value = input_data.get(field)
+            if not _is_missing(value):
+                try:
+                    if float(value) < 0:
+                        errors.append(f"{field} must be >= 0")
+                except (TypeError, ValueError):
+                    errors.append(f"{field} must be a number")
+        speed = input_data.get('Speed_limit')
+        if isinstance(speed, (int, float)) and speed > 120:
+            errors.append("Speed_limit must be between 0 and 120")
+        if not _is_missing(input_data.get('Time')) and pd.isna(
+                pd.to_datetime(str(input_data['Time']), format='%H:%M', errors='coerce')):
+            errors.append("Time must be HH:MM (24-hour)")
+        if not _is_missing(input_data.get('Date')) and pd.isna(
+                pd.to_datetime(str(input_data['Date']), format='%Y-%m-%d', errors='coerce')):
+            errors.append("Date must be YYYY-MM-DD")
+        for field in CATEGORY_CODES:
+            value = input_data.get(field)
+            if not _is_missing(value) and _category_code(field, value) != _category_code(field, value):
+                errors.append(f"{field} must be one of: {', '.join(CATEGORY_CODES[field])} (or a STATS19 code)")
+        return len(errors) == 0, errors
+
+
+def get_uk_default_features() -> Dict[str, Any]:
+    """Template of the UK model's input fields with example values"""
+    return {
+        "Number_of_Vehicles": 2,
+        "Number_of_Casualties": 1,
+        "Speed_limit": 30,
+        "Time": "18:30",
+        "Date": "2024-03-15",
+        "Road_Type": "Single carriageway",
+        "Road_Surface_Conditions": "Wet or damp",
+        "Light_Conditions": "Darkness - lights lit",
+        "Weather_Conditions": "Raining no high winds",
+        "Urban_or_Rural_Area": "Urban",
+        "latitude": 51.5074,
+        "longitude": -0.1278,
+        "Police_Force": 1,
+    }